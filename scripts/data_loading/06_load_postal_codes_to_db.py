@@ -4,8 +4,11 @@ Load postal code geometries from JSON into PostgreSQL
 """
 
 import json
-import sys
-import subprocess
+
+import pandas as pd
+from sqlalchemy import text
+
+from svakenett.db import get_engine
 
 JSON_FILE = "data/postal_codes/postal-codes.json"
 
@@ -36,35 +39,18 @@ for code, entry in data.items():
 
 print(f"\n2. Found {len(postal_codes_with_geom)} postal codes with geometries")
 
+engine = get_engine()
+
 # Clear existing data
 print("\n3. Clearing existing postal_codes data...")
-result = subprocess.run([
-    'docker', 'exec', 'svakenett-postgis',
-    'psql', '-U', 'postgres', '-d', 'svakenett',
-    '-c', 'DELETE FROM postal_codes;'
-], capture_output=True, text=True)
-
-if result.returncode != 0:
-    print(f"   Error: {result.stderr}")
-    sys.exit(1)
+with engine.begin() as conn:
+    conn.execute(text("DELETE FROM postal_codes"))
 
 print("   Cleared existing data")
 
-# Generate SQL INSERT statements
-print("\n4. Generating INSERT statements...")
-sql_statements = []
-
-for pc in postal_codes_with_geom:
-    # Escape single quotes in text fields
-    name = pc['name'].replace("'", "''")
-    municipality = pc['municipality_name'].replace("'", "''")
-    county = pc['county'].replace("'", "''")
-
-    # Convert GeoJSON to PostGIS geometry
-    # GeoJSON is already in WGS84 (EPSG:4326)
-    geojson_str = json.dumps(pc['geojson']).replace("'", "''")
-
-    sql = f"""INSERT INTO postal_codes (
+# GeoJSON is already in WGS84 (EPSG:4326); values are bound, not spliced into the SQL
+INSERT_SQL = text("""
+    INSERT INTO postal_codes (
         postal_code,
         postal_name,
         municipality_code,
@@ -74,77 +60,57 @@ for pc in postal_codes_with_geom:
         category,
         boundary_polygon
     ) VALUES (
-        '{pc['code']}',
-        '{name}',
-        '{pc['municipality_code']}',
-        '{municipality}',
-        '{county}',
-        '{pc['county_code']}',
-        '{pc['category']}',
-        ST_GeomFromGeoJSON('{geojson_str}')
-    );"""
-
-    sql_statements.append(sql)
-
-print(f"   Generated {len(sql_statements)} INSERT statements")
-
-# Execute SQL in batches
-print("\n5. Loading data to database...")
+        :code,
+        :name,
+        :municipality_code,
+        :municipality_name,
+        :county,
+        :county_code,
+        :category,
+        ST_GeomFromGeoJSON(:geojson)
+    )
+""")
+
+# Load in batches, one transaction each
+print("\n4. Loading data to database...")
 batch_size = 100
-total_batches = (len(sql_statements) + batch_size - 1) // batch_size
+total_batches = (len(postal_codes_with_geom) + batch_size - 1) // batch_size
 
-for i in range(0, len(sql_statements), batch_size):
-    batch = sql_statements[i:i + batch_size]
-    batch_sql = '\n'.join(batch)
+for i in range(0, len(postal_codes_with_geom), batch_size):
+    batch = [
+        {**pc, 'geojson': json.dumps(pc['geojson'])}
+        for pc in postal_codes_with_geom[i:i + batch_size]
+    ]
 
     batch_num = (i // batch_size) + 1
     print(f"   Processing batch {batch_num}/{total_batches}...", end='\r')
 
-    result = subprocess.run([
-        'docker', 'exec', '-i', 'svakenett-postgis',
-        'psql', '-U', 'postgres', '-d', 'svakenett'
-    ], input=batch_sql, capture_output=True, text=True)
-
-    if result.returncode != 0:
-        print(f"\n   Error in batch {batch_num}: {result.stderr}")
-        sys.exit(1)
+    with engine.begin() as conn:
+        conn.execute(INSERT_SQL, batch)
 
-print(f"\n   Loaded {len(sql_statements)} postal codes successfully!")
+print(f"\n   Loaded {len(postal_codes_with_geom)} postal codes successfully!")
 
 # Verify
-print("\n6. Verifying data...")
-result = subprocess.run([
-    'docker', 'exec', 'svakenett-postgis',
-    'psql', '-U', 'postgres', '-d', 'svakenett', '-t', '-c',
-    'SELECT COUNT(*) FROM postal_codes;'
-], capture_output=True, text=True)
-
-count = result.stdout.strip()
+print("\n5. Verifying data...")
+with engine.connect() as conn:
+    count = conn.execute(text("SELECT COUNT(*) FROM postal_codes")).scalar()
+    agder_count = conn.execute(
+        text("SELECT COUNT(*) FROM postal_codes WHERE postal_code LIKE '4%'")
+    ).scalar()
 print(f"   Total postal codes in database: {count}")
-
-# Show Agder region coverage
-result = subprocess.run([
-    'docker', 'exec', 'svakenett-postgis',
-    'psql', '-U', 'postgres', '-d', 'svakenett', '-t', '-c',
-    "SELECT COUNT(*) FROM postal_codes WHERE postal_code LIKE '4%';"
-], capture_output=True, text=True)
-
-agder_count = result.stdout.strip()
 print(f"   Agder region (4xxx) postal codes: {agder_count}")
 
 # Show sample postal codes
-print("\n7. Sample postal codes from database:")
-result = subprocess.run([
-    'docker', 'exec', 'svakenett-postgis',
-    'psql', '-U', 'postgres', '-d', 'svakenett', '-c',
+print("\n6. Sample postal codes from database:")
+sample = pd.read_sql(
     """SELECT postal_code, postal_name, municipality_name, county_name
        FROM postal_codes
        WHERE postal_code LIKE '4%'
        ORDER BY postal_code
-       LIMIT 5;"""
-], capture_output=True, text=True)
-
-print(result.stdout)
+       LIMIT 5""",
+    engine,
+)
+print(sample.to_string(index=False))
 
 print("\n" + "=" * 70)
 print("[OK] Postal code data loaded successfully!")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Export buildings and weak grid candidates as partitioned GeoParquet
+
+buildings (with all grid metrics and scores) is partitioned by kommunenummer,
+weak_grid_candidates_v4 by 50 km grid cell. Rows are sorted along a geohash
+curve and carry a bbox covering column, so QGIS, notebooks and the CRM sync can
+read just the regions and columns they need.
+
+Usage:
+    python scripts/export/export_geoparquet.py
+    python scripts/export/export_geoparquet.py --tables buildings --partition grid --cell-size 20000
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+from svakenett.geoparquet import DEFAULT_PARTITIONS, GRID_CELL_M, export_geoparquet
+
+DEFAULT_OUTPUT_DIR = Path(os.getenv("DATA_PROCESSED_DIR", "./data/processed")) / "geoparquet"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export partitioned GeoParquet datasets")
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--tables", nargs="+", default=list(DEFAULT_PARTITIONS))
+    parser.add_argument(
+        "--partition",
+        default="default",
+        help="Partition column, 'grid', 'none', or 'default' "
+        "(kommunenummer for buildings, grid otherwise)",
+    )
+    parser.add_argument(
+        "--cell-size", type=int, default=GRID_CELL_M, help="Grid cell size in meters"
+    )
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows per chunk / row group")
+    parser.add_argument("--compression", default="zstd")
+    parser.add_argument(
+        "--workers", type=int, default=4, help="PostgreSQL partitions exported in parallel"
+    )
+    args = parser.parse_args()
+
+    partition = None if args.partition == "none" else args.partition
+    for table in args.tables:
+        counts = export_geoparquet(
+            table,
+            args.output_dir,
+            partition=partition,
+            cell_size=args.cell_size,
+            chunk_size=args.chunk_size,
+            compression=args.compression,
+            workers=args.workers,
+        )
+        print(f"\n{table}: {sum(counts.values()):,} rows in {len(counts)} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Precompute simplified power line variants and export compact line files
+
+Usage:
+    # Build power_lines_simplified for the default zooms (6, 8, 10, 12)
+    python scripts/export/export_line_geometries.py build
+
+    # Export the z10 variant as delta-encoded flat arrays
+    python scripts/export/export_line_geometries.py export --zoom 10 --format flat
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+from svakenett.geometry_export import DEFAULT_ZOOMS, build_simplified_lines, export_lines
+
+OUTPUT_DIR = Path(os.getenv("DATA_PROCESSED_DIR", "./data/processed")) / "geometry"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact power line geometry export")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build power_lines_simplified")
+    build_parser.add_argument("--zooms", type=int, nargs="+", default=list(DEFAULT_ZOOMS))
+
+    export_parser = subparsers.add_parser("export", help="Export one zoom variant")
+    export_parser.add_argument("--zoom", type=int, default=12, help="Use -1 for full resolution")
+    export_parser.add_argument("--format", choices=["flat", "geojson"], default="flat")
+    export_parser.add_argument("--where", help="Filter on power_lines_new (alias p)")
+    export_parser.add_argument("--output", type=Path)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_simplified_lines(tuple(args.zooms))
+    else:
+        zoom = None if args.zoom < 0 else args.zoom
+        suffix = "full" if zoom is None else f"z{zoom}"
+        output = args.output or OUTPUT_DIR / f"power_lines_{suffix}.{args.format}.json"
+        export_lines(output, zoom=zoom, fmt=args.format, where=args.where)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Export type-aware prospect CSVs from a single scan of the scored buildings
+
+Writes all_buildings_scored, high_prospects_only, one file per building type
+and (unless --no-municipalities) one file per municipality.
+
+Usage:
+    python scripts/export/export_prospect_csvs.py
+    python scripts/export/export_prospect_csvs.py --compression zstd --workers 8
+    python scripts/export/export_prospect_csvs.py \\
+        --output-dir /mnt/c/.../unified_buildings_2025-11-24
+"""
+
+import argparse
+import os
+from datetime import date
+from pathlib import Path
+
+from svakenett.prospect_export import export_prospect_csvs
+
+DEFAULT_OUTPUT_DIR = (
+    Path(os.getenv("DATA_PROCESSED_DIR", "./data/processed"))
+    / f"unified_buildings_{date.today().isoformat()}"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export type-aware prospect CSVs")
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--compression", choices=["gzip", "zstd"], default=None)
+    parser.add_argument("--workers", type=int, default=4, help="Writer threads")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument(
+        "--no-municipalities", action="store_true", help="Skip per-municipality files"
+    )
+    args = parser.parse_args()
+
+    counts = export_prospect_csvs(
+        args.output_dir,
+        by_municipality=not args.no_municipalities,
+        compression=args.compression,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+    )
+
+    print(f"\nExported files to: {args.output_dir}")
+    for name, rows in counts.items():
+        print(f"  {name:<50} {rows:>8,} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 #!/bin/bash
 # Load grid company service areas into PostgreSQL
+# Database access goes through DATABASE_URL (svakenett CLI, one connection pool)
+
+set -e  # Exit on error
 
 GEOJSON_FILE="data/grid_companies/service_areas.geojson"
 
@@ -10,7 +13,7 @@ echo "=========================================="
 # Create temporary table for NVE data
 echo ""
 echo "1. Creating temporary table for NVE service areas..."
-docker exec svakenett-postgis psql -U postgres -d svakenett -c "
+svakenett sql -c "
 DROP TABLE IF EXISTS temp_nve_service_areas;
 CREATE TABLE temp_nve_service_areas (
     navn VARCHAR(200),
@@ -21,64 +24,53 @@ CREATE TABLE temp_nve_service_areas (
 );
 "
 
-# Load GeoJSON using Python
+# Load GeoJSON using Python (bound parameters on the DATABASE_URL engine)
 echo ""
 echo "2. Parsing GeoJSON and loading to temp table..."
 python3 << 'EOF'
 import json
-import subprocess
+
+from sqlalchemy import text
+
+from svakenett.db import get_engine
 
 with open('data/grid_companies/service_areas.geojson', 'r') as f:
     data = json.load(f)
 
 print(f"   Processing {len(data['features'])} service areas...")
 
-sql_statements = []
-for feature in data['features']:
-    props = feature['properties']
-    geom = feature['geometry']
-
-    # Extract fields
-    navn = props.get('NAVN', '').replace("'", "''")
-    eier_id = str(props.get('EIER_ID', ''))
-    konstype = props.get('KONSTYPE', '').replace("'", "''")
-    eiertype = props.get('EIERTYPE', '').replace("'", "''")
-
-    # Convert geometry to GeoJSON string
-    geom_json = json.dumps(geom).replace("'", "''")
-
-    # Create INSERT statement
-    sql = f"""INSERT INTO temp_nve_service_areas (navn, eier_id, konstype, eiertype, service_area_polygon)
-    VALUES ('{navn}', '{eier_id}', '{konstype}', '{eiertype}', ST_Multi(ST_GeomFromGeoJSON('{geom_json}')));"""
-
-    sql_statements.append(sql)
-
-# Save to temp file
-with open('/tmp/nve_service_areas.sql', 'w') as f:
-    f.write('\n'.join(sql_statements))
-
-print(f"   Generated {len(sql_statements)} INSERT statements")
+rows = [
+    {
+        'navn': feature['properties'].get('NAVN', ''),
+        'eier_id': str(feature['properties'].get('EIER_ID', '')),
+        'konstype': feature['properties'].get('KONSTYPE', ''),
+        'eiertype': feature['properties'].get('EIERTYPE', ''),
+        'geom': json.dumps(feature['geometry']),
+    }
+    for feature in data['features']
+]
+
+with get_engine().begin() as conn:
+    conn.execute(
+        text("""INSERT INTO temp_nve_service_areas (navn, eier_id, konstype, eiertype, service_area_polygon)
+    VALUES (:navn, :eier_id, :konstype, :eiertype, ST_Multi(ST_GeomFromGeoJSON(:geom)))"""),
+        rows,
+    )
+
+print(f"   Loaded {len(rows)} service areas")
 EOF
 
-# Load into PostgreSQL
-echo ""
-echo "3. Loading data to temporary table..."
-docker exec -i svakenett-postgis psql -U postgres -d svakenett < /tmp/nve_service_areas.sql 2>&1 | grep -E "INSERT|ERROR" | tail -5
-
-# Clean up temp file
-rm /tmp/nve_service_areas.sql
-
 # Verify temp table
 echo ""
-echo "4. Verifying temporary table..."
-docker exec svakenett-postgis psql -U postgres -d svakenett -c "
+echo "3. Verifying temporary table..."
+svakenett sql -c "
 SELECT COUNT(*) as nve_service_areas FROM temp_nve_service_areas;
 "
 
 # Match and update grid_companies table
 echo ""
-echo "5. Matching NVE data to existing grid_companies (by company_code)..."
-docker exec svakenett-postgis psql -U postgres -d svakenett -c "
+echo "4. Matching NVE data to existing grid_companies (by company_code)..."
+svakenett sql -c "
 UPDATE grid_companies gc
 SET service_area_polygon = nve.service_area_polygon
 FROM temp_nve_service_areas nve
@@ -87,8 +79,8 @@ WHERE gc.company_code = nve.eier_id;
 
 # Check how many matched
 echo ""
-echo "6. Checking match results..."
-docker exec svakenett-postgis psql -U postgres -d svakenett -c "
+echo "5. Checking match results..."
+svakenett sql -c "
 SELECT
     (SELECT COUNT(*) FROM grid_companies) as total_kile_companies,
     (SELECT COUNT(*) FROM temp_nve_service_areas) as total_nve_areas,
@@ -98,8 +90,8 @@ SELECT
 
 # Show matched companies
 echo ""
-echo "7. Sample matched companies:"
-docker exec svakenett-postgis psql -U postgres -d svakenett -c "
+echo "6. Sample matched companies:"
+svakenett sql -c "
 SELECT
     company_name,
     company_code,
@@ -113,8 +105,8 @@ LIMIT 10;
 
 # Clean up temporary table
 echo ""
-echo "8. Cleaning up temporary table..."
-docker exec svakenett-postgis psql -U postgres -d svakenett -c "
+echo "7. Cleaning up temporary table..."
+svakenett sql -c "
 DROP TABLE temp_nve_service_areas;
 "
 
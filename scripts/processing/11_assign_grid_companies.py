@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Assign grid companies (or postal codes / municipalities) to points
+
+One engine for what the four 11_assign_by_* scripts did: containment lookup
+against the subdivided service areas, then the nearest area piece within a
+metric distance cap for points outside all areas (NVE data gaps, coastline).
+The method ('contains' / 'nearest') and distance are stored per point in
+<column>_method and <column>_distance_m.
+
+Usage:
+    python scripts/processing/11_assign_grid_companies.py
+    python scripts/processing/11_assign_grid_companies.py --max-distance-km 20
+    python scripts/processing/11_assign_grid_companies.py \\
+        --table buildings --kind postal_code --column postal_code
+"""
+
+import argparse
+
+from svakenett.areas import AREA_TABLES, DEFAULT_MAX_DISTANCE_M, assign_areas
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Assign area codes: containment, then nearest area within a cap"
+    )
+    parser.add_argument("--table", default="cabins", help="Point table with id and geometry")
+    parser.add_argument("--kind", default="grid_company", choices=list(AREA_TABLES))
+    parser.add_argument("--column", default="grid_company_code", help="Column receiving the code")
+    parser.add_argument(
+        "--max-distance-km",
+        type=float,
+        default=DEFAULT_MAX_DISTANCE_M / 1000,
+        help="Nearest-area cap (0 = containment only)",
+    )
+    parser.add_argument("--where", help="Only assign points matching this SQL filter")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    assign_areas(
+        args.table,
+        args.kind,
+        args.column,
+        max_distance_m=args.max_distance_km * 1000,
+        where=args.where,
+        chunk_size=args.chunk_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 #!/bin/bash
 # Load NVE grid infrastructure GeoJSON data into PostGIS database
 # Loads 4 tables: power_lines, power_poles, cables, transformers
+# Database access goes through DATABASE_URL (svakenett CLI, local ogr2ogr)
 
 set -e  # Exit on error
 
@@ -8,15 +9,10 @@ echo "=========================================="
 echo "Loading Grid Infrastructure to PostGIS"
 echo "=========================================="
 
-# Database connection
-DB_CONTAINER="svakenett-postgis"
-DB_NAME="svakenett"
-DB_USER="postgres"
-
-# Check if Docker container is running
-if ! docker ps | grep -q $DB_CONTAINER; then
-    echo "✗ Error: PostgreSQL container '$DB_CONTAINER' is not running"
-    echo "  Start it with: docker-compose up -d"
+# Database connection (svakenett CLI and ogr2ogr both use DATABASE_URL)
+if [ -z "$DATABASE_URL" ]; then
+    echo "✗ Error: DATABASE_URL is not set"
+    echo "  e.g. export DATABASE_URL=postgresql://postgres@localhost:5432/svakenett"
     exit 1
 fi
 
@@ -47,9 +43,7 @@ echo "✓ All required data files found"
 # Create schema (tables, indexes, functions)
 echo ""
 echo "1. Creating database schema..."
-docker exec -i $DB_CONTAINER psql -U $DB_USER -d $DB_NAME < docs/DATABASE_SCHEMA.sql
-
-if [ $? -eq 0 ]; then
+if svakenett sql docs/DATABASE_SCHEMA.sql; then
     echo "✓ Schema created successfully"
 else
     echo "✗ Error creating schema"
@@ -65,28 +59,23 @@ load_geojson() {
     echo ""
     echo "Loading $table_name from $(basename $geojson_file)..."
 
-    # Copy file into container
-    docker cp "$geojson_file" $DB_CONTAINER:/tmp/data.geojson
-
     # Use ogr2ogr to load GeoJSON into PostGIS
     # -append: add to existing table
     # -update: update existing data
     # -f "PostgreSQL": output format
-    # PG:"connection string": database connection
-    docker exec $DB_CONTAINER ogr2ogr \
+    # PG:"connection string": database connection (libpq accepts the URL)
+    if ogr2ogr \
         -f "PostgreSQL" \
         -nln "$table_name" \
         -lco GEOMETRY_NAME=geometry \
         -lco FID=id \
         -overwrite \
         -t_srs EPSG:4326 \
-        PG:"host=localhost user=$DB_USER dbname=$DB_NAME password=$DB_USER" \
-        /tmp/data.geojson
-
-    if [ $? -eq 0 ]; then
+        PG:"$DATABASE_URL" \
+        "$geojson_file"; then
         # Get row count
-        row_count=$(docker exec $DB_CONTAINER psql -U $DB_USER -d $DB_NAME -t -c "SELECT COUNT(*) FROM $table_name;")
-        echo "✓ Loaded $row_count rows into $table_name"
+        echo "✓ Loaded $table_name:"
+        svakenett sql -c "SELECT COUNT(*) AS row_count FROM $table_name;"
     else
         echo "✗ Error loading $table_name"
         return 1
@@ -103,7 +92,7 @@ load_geojson "$DATA_DIR/power_lines.geojson" "power_lines_raw"
 # Transform and clean power_lines data
 echo ""
 echo "3. Transforming power_lines data..."
-docker exec $DB_CONTAINER psql -U $DB_USER -d $DB_NAME <<'SQL'
+svakenett sql - <<'SQL'
 -- Clear existing data
 TRUNCATE power_lines;
 
@@ -145,7 +134,7 @@ load_geojson "$DATA_DIR/power_poles.geojson" "power_poles_raw"
 
 echo ""
 echo "4. Transforming power_poles data..."
-docker exec $DB_CONTAINER psql -U $DB_USER -d $DB_NAME <<'SQL'
+svakenett sql - <<'SQL'
 TRUNCATE power_poles;
 
 INSERT INTO power_poles (
@@ -177,7 +166,7 @@ load_geojson "$DATA_DIR/cables.geojson" "cables_raw"
 
 echo ""
 echo "5. Transforming cables data..."
-docker exec $DB_CONTAINER psql -U $DB_USER -d $DB_NAME <<'SQL'
+svakenett sql - <<'SQL'
 TRUNCATE cables;
 
 INSERT INTO cables (
@@ -216,7 +205,7 @@ load_geojson "$DATA_DIR/transformers.geojson" "transformers_raw"
 
 echo ""
 echo "6. Transforming transformers data..."
-docker exec $DB_CONTAINER psql -U $DB_USER -d $DB_NAME <<'SQL'
+svakenett sql - <<'SQL'
 TRUNCATE transformers;
 
 INSERT INTO transformers (
@@ -246,7 +235,7 @@ echo "✓ Transformers transformed"
 # Verify data load
 echo ""
 echo "7. Verifying data load..."
-docker exec $DB_CONTAINER psql -U $DB_USER -d $DB_NAME <<'SQL'
+svakenett sql - <<'SQL'
 SELECT
     'power_lines' as table_name,
     COUNT(*) as row_count,
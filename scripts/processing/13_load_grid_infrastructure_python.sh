@@ -1,6 +1,7 @@
 #!/bin/bash
 # Load NVE grid infrastructure GeoJSON data into PostGIS using Python
 # Simple, reliable approach that works without ogr2ogr
+# Database access goes through DATABASE_URL (svakenett CLI, one transaction per file)
 
 set -e
 
@@ -216,25 +217,25 @@ echo ""
 echo "Loading data into PostgreSQL..."
 
 echo "  - Power lines..."
-docker exec -i svakenett-postgis psql -U postgres -d svakenett < /tmp/load_power_lines.sql > /dev/null 2>&1
+svakenett sql /tmp/load_power_lines.sql > /dev/null
 echo "  ✓ Power lines loaded"
 
 echo "  - Power poles..."
-docker exec -i svakenett-postgis psql -U postgres -d svakenett < /tmp/load_power_poles.sql > /dev/null 2>&1
+svakenett sql /tmp/load_power_poles.sql > /dev/null
 echo "  ✓ Power poles loaded"
 
 echo "  - Cables..."
-docker exec -i svakenett-postgis psql -U postgres -d svakenett < /tmp/load_cables.sql > /dev/null 2>&1
+svakenett sql /tmp/load_cables.sql > /dev/null
 echo "  ✓ Cables loaded"
 
 echo "  - Transformers..."
-docker exec -i svakenett-postgis psql -U postgres -d svakenett < /tmp/load_transformers.sql > /dev/null 2>&1
+svakenett sql /tmp/load_transformers.sql > /dev/null
 echo "  ✓ Transformers loaded"
 
 # Verify
 echo ""
 echo "Verifying data load..."
-docker exec svakenett-postgis psql -U postgres -d svakenett -c "
+svakenett sql -c "
 SELECT
     'power_lines' as table_name, COUNT(*) as row_count FROM power_lines
 UNION ALL
@@ -1,6 +1,7 @@
 #!/bin/bash
 # Load complete NVE infrastructure data from QGIS geodatabase
 # This replaces the partial data with full dataset
+# Database access goes through DATABASE_URL (svakenett CLI, local ogr2ogr)
 
 set -e
 
@@ -8,9 +9,6 @@ echo "=========================================="
 echo "Loading Complete NVE Infrastructure Data"
 echo "=========================================="
 
-DB_CONTAINER="svakenett-postgis"
-DB_NAME="svakenett"
-DB_USER="postgres"
 GDB_PATH="/mnt/c/Users/klaus/klauspython/qgis/svakenett/NVEKartdata/NVEData.gdb"
 
 # Check if geodatabase exists
@@ -19,15 +17,15 @@ if [ ! -d "$GDB_PATH" ]; then
     exit 1
 fi
 
-# Check database connection
-if ! docker ps | grep -q $DB_CONTAINER; then
-    echo "✗ Error: PostgreSQL container not running"
+# Check database connection settings
+if [ -z "$DATABASE_URL" ]; then
+    echo "✗ Error: DATABASE_URL is not set"
     exit 1
 fi
 
 echo ""
 echo "1. Backing up existing data..."
-docker exec $DB_CONTAINER psql -U $DB_USER -d $DB_NAME <<SQL
+svakenett sql - <<'SQL'
 -- Backup existing tables (in case we need to rollback)
 DROP TABLE IF EXISTS power_lines_backup;
 DROP TABLE IF EXISTS transformers_backup;
@@ -48,7 +46,7 @@ SQL
 
 echo ""
 echo "2. Dropping old infrastructure tables..."
-docker exec $DB_CONTAINER psql -U $DB_USER -d $DB_NAME <<SQL
+svakenett sql - <<'SQL'
 DROP TABLE IF EXISTS power_lines;
 DROP TABLE IF EXISTS transformers;
 SQL
@@ -56,7 +54,7 @@ SQL
 echo ""
 echo "3. Loading Kraftlinje (power lines) - 9,715 features..."
 ogr2ogr -f "PostgreSQL" \
-    PG:"host=localhost port=5432 dbname=$DB_NAME user=$DB_USER" \
+    PG:"$DATABASE_URL" \
     "$GDB_PATH" \
     "Kraftlinje" \
     -nln power_lines \
@@ -68,7 +66,7 @@ ogr2ogr -f "PostgreSQL" \
 echo ""
 echo "4. Loading Transformatorstasjon (transformers) - 106 features..."
 ogr2ogr -f "PostgreSQL" \
-    PG:"host=localhost port=5432 dbname=$DB_NAME user=$DB_USER" \
+    PG:"$DATABASE_URL" \
     "$GDB_PATH" \
     "Transformatorstasjon" \
     -nln transformers \
@@ -79,7 +77,7 @@ ogr2ogr -f "PostgreSQL" \
 
 echo ""
 echo "5. Creating spatial indexes..."
-docker exec $DB_CONTAINER psql -U $DB_USER -d $DB_NAME <<SQL
+svakenett sql - <<'SQL'
 -- Spatial indexes for performance
 CREATE INDEX idx_power_lines_geom ON power_lines USING GIST(geometry);
 CREATE INDEX idx_transformers_geom ON transformers USING GIST(geometry);
@@ -91,7 +89,7 @@ SQL
 
 echo ""
 echo "6. Adding standardized columns (matching old schema)..."
-docker exec $DB_CONTAINER psql -U $DB_USER -d $DB_NAME <<SQL
+svakenett sql - <<'SQL'
 -- Add voltage_kv as alias for spenning_kv
 ALTER TABLE power_lines ADD COLUMN voltage_kv REAL;
 UPDATE power_lines SET voltage_kv = spenning_kv;
@@ -107,7 +105,7 @@ SQL
 
 echo ""
 echo "7. Verification - Infrastructure completeness:"
-docker exec $DB_CONTAINER psql -U $DB_USER -d $DB_NAME <<SQL
+svakenett sql - <<'SQL'
 SELECT
     'Power Lines' as layer,
     COUNT(*) as features,
@@ -132,7 +130,7 @@ SQL
 
 echo ""
 echo "8. Voltage distribution:"
-docker exec $DB_CONTAINER psql -U $DB_USER -d $DB_NAME <<SQL
+svakenett sql - <<'SQL'
 SELECT
     spenning_kv as voltage_kv,
     COUNT(*) as line_count,
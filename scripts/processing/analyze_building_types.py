@@ -1,43 +1,34 @@
 #!/usr/bin/env python3
 """
 Analyze building types in Matrikkelen data to find bolighus vs fritidsbygg
+
+Uses the attribute-only statistics mode (GROUP BY pushed into GDAL, cached
+next to the ingestion ledger) instead of parsing ogrinfo output.
 """
 
-import subprocess
-import json
+import argparse
+
+from svakenett.matrikkelen import BYGNINGSTYPER, building_type_histogram
 
 GDB_PATH = "/mnt/c/users/klaus/klauspython/qgis/svakenett/matrikkelen_data/Basisdata_42_Agder_25833_MatrikkelenBygning_FGDB.gdb"
 
+parser = argparse.ArgumentParser(description="Analyze building types in Matrikkelen")
+parser.add_argument("--gdb", default=GDB_PATH, help="Path to Matrikkelen FileGDB")
+parser.add_argument("--method", choices=["sql", "arrow"], default="sql")
+parser.add_argument("--refresh", action="store_true", help="Ignore cached histogram")
+args = parser.parse_args()
+
 print("Analyzing building types in Matrikkelen...")
 print("=" * 60)
 
-# Use ogr2ogr SQL to get building type counts
-cmd = [
-    "ogrinfo",
-    "-q",
-    "-sql",
-    "SELECT bygningstype, COUNT(*) as count FROM bygning GROUP BY bygningstype ORDER BY count DESC",
-    GDB_PATH
-]
-
-result = subprocess.run(cmd, capture_output=True, text=True)
+type_counts = building_type_histogram(args.gdb, method=args.method, use_cache=not args.refresh)
 
 print("\nBuilding Type Distribution:")
 print("-" * 60)
-print(result.stdout)
-
-# Mapping of building type codes (from Matrikkelen documentation)
-BYGNINGSTYPER = {
-    111: "Enebolig",
-    112: "Tomannsbolig",
-    113: "Rekkehus",
-    121: "Våningshus",
-    131: "Sykehjem/aldershjem",
-    161: "Fritidsbygg (hytte)",
-    163: "Anneks til bolig/fritidsbolig",
-    171: "Garasje/uthus",
-    181: "Næringsbygg",
-}
+print(f"{'bygningstype':>12s}  {'count':>9s}")
+for bygtype, count in type_counts.most_common():
+    label = "NULL" if bygtype is None else str(bygtype)
+    print(f"{label:>12s}  {count:9,}")
 
 print("\n\nBuilding Type Codes:")
 print("-" * 60)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark grid company assignment: unified engine vs the old 11_assign_by_* queries
+
+Takes a random sample of points, runs the core query of each retired variant
+(read-only, no UPDATE) and the containment + nearest engine on the same
+sample, and reports time, assigned share and agreement with the engine.
+
+Usage:
+    python scripts/processing/benchmark_area_assignment.py
+    python scripts/processing/benchmark_area_assignment.py --sample 500 --skip nearest_neighbor
+"""
+
+import argparse
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+from svakenett.areas import DEFAULT_MAX_DISTANCE_M, METRIC_SRID, load_area_index
+from svakenett.db import get_engine
+
+# Core assignment query of each retired script, over bench_points instead of cabins
+LEGACY_QUERIES = {
+    # 11_assign_by_nearest_neighbor.sh: geography distance to every company, 50 km threshold
+    "nearest_neighbor": """
+        SELECT id, code FROM (
+            SELECT DISTINCT ON (p.id) p.id, gc.company_code AS code,
+                   ST_Distance(p.geometry::geography, gc.service_area_polygon::geography) AS d
+            FROM bench_points p CROSS JOIN grid_companies gc
+            WHERE gc.service_area_polygon IS NOT NULL
+            ORDER BY p.id, ST_Distance(p.geometry::geography, gc.service_area_polygon::geography)
+        ) s WHERE d < 50000
+    """,
+    # 11_assign_by_nearest_neighbor_optimized.sh: 100 km geography ST_DWithin, 50 km threshold
+    "nearest_neighbor_optimized": """
+        SELECT id, code FROM (
+            SELECT DISTINCT ON (p.id) p.id, gc.company_code AS code,
+                   ST_Distance(p.geometry::geography, gc.service_area_polygon::geography) AS d
+            FROM bench_points p
+            JOIN grid_companies gc
+                ON ST_DWithin(p.geometry::geography, gc.service_area_polygon::geography, 100000)
+            WHERE gc.service_area_polygon IS NOT NULL
+            ORDER BY p.id, ST_Distance(p.geometry::geography, gc.service_area_polygon::geography)
+        ) s WHERE d < 50000
+    """,
+    # 11_assign_by_nearest_planar.sh / 11_assign_by_batch.sh: 1 degree planar ST_DWithin
+    "nearest_planar": """
+        SELECT DISTINCT ON (p.id) p.id, gc.company_code AS code
+        FROM bench_points p
+        JOIN grid_companies gc ON ST_DWithin(p.geometry, gc.service_area_polygon, 1.0)
+        WHERE gc.service_area_polygon IS NOT NULL
+        ORDER BY p.id, ST_Distance(p.geometry, gc.service_area_polygon)
+    """,
+    # 10_assign_grid_companies_to_cabins.sh before subdivision: containment only
+    "within_full_polygons": """
+        SELECT p.id, gc.company_code AS code
+        FROM bench_points p
+        JOIN grid_companies gc ON ST_Within(p.geometry, gc.service_area_polygon)
+    """,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark grid company assignment variants")
+    parser.add_argument("--table", default="cabins")
+    parser.add_argument("--sample", type=int, default=2000, help="Points in the sample")
+    parser.add_argument("--max-distance-km", type=float, default=DEFAULT_MAX_DISTANCE_M / 1000)
+    parser.add_argument(
+        "--skip", nargs="+", default=[], choices=list(LEGACY_QUERIES), help="Variants to skip"
+    )
+    args = parser.parse_args()
+
+    engine = get_engine()
+    results = []
+    with engine.connect() as conn:
+        conn.execute(text(f"""
+            CREATE TEMP TABLE bench_points AS
+            SELECT id, geometry FROM {args.table}
+            WHERE geometry IS NOT NULL ORDER BY random() LIMIT :n
+        """), {"n": args.sample})
+        points = pd.read_sql(text(f"""
+            SELECT id,
+                ST_X(ST_Transform(geometry, {METRIC_SRID})) AS x,
+                ST_Y(ST_Transform(geometry, {METRIC_SRID})) AS y
+            FROM bench_points ORDER BY id
+        """), conn)
+
+        start = time.perf_counter()
+        index = load_area_index("grid_company", METRIC_SRID, engine)
+        load_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        codes, methods, _ = index.assign_with_fallback(
+            points["x"].to_numpy(), points["y"].to_numpy(), args.max_distance_km * 1000
+        )
+        assign_seconds = time.perf_counter() - start
+        unified = pd.Series(codes, index=points["id"])
+        results.append(("unified (index load)", load_seconds, None, None))
+        results.append(("unified (assign)", assign_seconds, unified.notna().mean(), 1.0))
+
+        for name, query in LEGACY_QUERIES.items():
+            if name in args.skip:
+                continue
+            start = time.perf_counter()
+            legacy = pd.read_sql(text(query), conn).set_index("id")["code"].reindex(points["id"])
+            seconds = time.perf_counter() - start
+            both = legacy.notna() & unified.notna()
+            agreement = (legacy[both] == unified[both]).mean() if both.any() else float("nan")
+            results.append((name, seconds, legacy.notna().mean(), agreement))
+
+    contained = (methods == "contains").sum()
+    print(
+        f"\nSample: {len(points):,} points from {args.table} "
+        f"({contained:,} contained, {len(points) - contained:,} outside all service areas)\n"
+    )
+    print(f"{'Variant':<28} {'Seconds':>9} {'Per 1M pts':>11} {'Assigned':>9} {'Agrees':>8}")
+    for name, seconds, assigned, agreement in results:
+        per_million = (
+            f"{seconds / len(points) * 1e6:>10,.0f}s" if assigned is not None else f"{'':>11}"
+        )
+        assigned_text = f"{assigned:>8.1%}" if assigned is not None else f"{'':>8}"
+        agreement_text = f"{agreement:>7.1%}" if agreement is not None else f"{'':>7}"
+        print(f"{name:<28} {seconds:>9.2f} {per_million} {assigned_text} {agreement_text}")
+
+
+if __name__ == "__main__":
+    main()
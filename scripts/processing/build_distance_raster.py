@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped distance rasters for constant-time point queries
+
+Rasterizes distribution_lines_11_24kv (10 m cells) and transformers_new
+(50 m cells) over the buildings' extent and stores distance and nearest
+feature per cell as .npy files (see svakenett.distance_raster). Layers whose
+source table is unchanged are skipped.
+
+Usage:
+    python scripts/processing/build_distance_raster.py
+    python scripts/processing/build_distance_raster.py --layers line --force
+    python scripts/processing/build_distance_raster.py --query 8.0 58.15
+"""
+
+import argparse
+
+from svakenett.distance_raster import (
+    LAYERS,
+    TILE_CELLS,
+    DistanceRaster,
+    build_distance_rasters,
+    default_raster_dir,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build distance-to-infrastructure rasters")
+    parser.add_argument("--output-dir", default=str(default_raster_dir()), help="Output directory")
+    parser.add_argument(
+        "--layers", nargs="+", choices=list(LAYERS), help="Layers to build (default: all)"
+    )
+    parser.add_argument(
+        "--extent",
+        nargs=4,
+        type=float,
+        metavar=("XMIN", "YMIN", "XMAX", "YMAX"),
+        help="Extent in EPSG:25833 (default: buildings plus margin)",
+    )
+    parser.add_argument("--tile-cells", type=int, default=TILE_CELLS, help="Tile edge in cells")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if up to date")
+    parser.add_argument(
+        "--query", nargs=2, type=float, metavar=("LON", "LAT"), help="Query one point and exit"
+    )
+    args = parser.parse_args()
+
+    if args.query:
+        raster = DistanceRaster(args.output_dir)
+        x, y = raster.to_metric(args.query[0], args.query[1])
+        for layer in raster.layers:
+            distance, feature_id = raster.query(layer, x, y)
+            print(f"{layer:12s} {distance[0]:10.0f} m  (id {feature_id[0]})")
+        return
+
+    build_distance_rasters(
+        args.output_dir,
+        layers=args.layers,
+        extent=tuple(args.extent) if args.extent else None,
+        tile_cells=args.tile_cells,
+        force=args.force,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Feeders of the 11-24 kV network with per-feeder load metrics
+
+Labels feeders (connected parts of distribution_lines_11_24kv between
+transformers), attaches buildings to the feeder of their nearest line piece
+and refreshes the feeders table: building counts per type, estimated peak
+load, conductor length, load per km and per transformer, scores.
+
+Only feeders whose lines changed are rewritten; use --full after changing the
+snap tolerance or the attach distance.
+
+Usage:
+    python scripts/processing/build_feeders.py
+    python scripts/processing/build_feeders.py --full --max-attach 1000
+"""
+
+import argparse
+
+from svakenett.feeders import MAX_ATTACH_M, refresh_feeders
+from svakenett.network import SNAP_M
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Label feeders and aggregate building load per feeder"
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="Re-attach all buildings and rewrite all feeders"
+    )
+    parser.add_argument(
+        "--snap", type=float, default=SNAP_M, help="Line endpoint snap tolerance in meters"
+    )
+    parser.add_argument(
+        "--max-attach", type=float, default=MAX_ATTACH_M, help="Max building-to-line distance (m)"
+    )
+    args = parser.parse_args()
+
+    refresh_feeders(full=args.full, snap_m=args.snap, max_attach_m=args.max_attach)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+H3 hex-grid cells and pre-aggregated cell statistics
+
+Assigns H3 cells (r5/r7/r9) to buildings that have none yet, re-aggregates
+building counts, scores, prospects and v4 candidates per cell, and rolls the
+change up the hierarchy into hex_cell_stats. With --fylke only those counties
+are re-aggregated (e.g. after a partition swap).
+
+Usage:
+    python scripts/processing/build_hex_grid.py
+    python scripts/processing/build_hex_grid.py --fylke 42 --skip-lines
+    python scripts/processing/build_hex_grid.py --export data/processed/hex_r7.gpkg --resolution 7
+"""
+
+import argparse
+
+from svakenett.hexgrid import (
+    MIN_CELL_COUNT,
+    RESOLUTIONS,
+    assign_cells,
+    export_cells,
+    refresh_cell_stats,
+    refresh_line_lengths,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build H3 cell statistics")
+    parser.add_argument("--fylke", nargs="+", help="Only refresh these counties (default: all)")
+    parser.add_argument(
+        "--reassign", action="store_true", help="Recompute cells of all buildings, not only missing"
+    )
+    parser.add_argument(
+        "--skip-lines", action="store_true", help="Keep current power line lengths per cell"
+    )
+    parser.add_argument(
+        "--export", metavar="PATH", help="Only export cells (.gpkg, .geojson, .parquet, .csv)"
+    )
+    parser.add_argument("--resolution", type=int, default=7, choices=RESOLUTIONS)
+    parser.add_argument(
+        "--min-count", type=int, default=MIN_CELL_COUNT, help="Minimum buildings per exported cell"
+    )
+    args = parser.parse_args()
+
+    if args.export:
+        export_cells(args.export, args.resolution, args.min_count)
+        return
+
+    assign_cells(args.fylke, only_missing=not args.reassign)
+    refresh_cell_stats(args.fylke)
+    if not args.skip_lines:
+        refresh_line_lengths()
+
+
+if __name__ == "__main__":
+    main()
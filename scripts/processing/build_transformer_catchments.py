@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Transformer catchments (Voronoi cells) for nearest-transformer lookups
+
+Computes the Voronoi cell of every transformer in EPSG:25833 and stores it,
+subdivided and GiST-indexed, in transformer_catchments(_subdivided). The
+metrics, v4 Step 1 and cabin scripts then find the nearest transformer with
+ST_Intersects instead of a KNN per building.
+
+Only cells around added, moved or removed transformers are regenerated;
+after an incremental update of transformers_new the affected buildings get
+their distance_to_transformer_m recomputed.
+
+Usage:
+    python scripts/processing/build_transformer_catchments.py
+    python scripts/processing/build_transformer_catchments.py --full
+    python scripts/processing/build_transformer_catchments.py --transformers nve_transformers
+"""
+
+import argparse
+
+from svakenett.catchments import refresh_catchments
+from svakenett.network import TRANSFORMERS_TABLE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update transformer catchments")
+    parser.add_argument(
+        "--transformers", default=TRANSFORMERS_TABLE, help="Transformer point table"
+    )
+    parser.add_argument("--full", action="store_true", help="Recompute every catchment")
+    parser.add_argument(
+        "--no-update-buildings",
+        action="store_true",
+        help="Leave distance_to_transformer_m to the metrics stage",
+    )
+    args = parser.parse_args()
+
+    refresh_catchments(
+        args.transformers, full=args.full, update_buildings=not args.no_update_buildings
+    )
+
+
+if __name__ == "__main__":
+    main()
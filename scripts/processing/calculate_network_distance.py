@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Along-grid distance from each building to its feeding transformer
+
+Builds (or reuses) the power line topology, runs one multi-source Dijkstra
+from all transformers and projects every building onto its nearest line.
+Stores buildings.network_distance_to_transformer_m and feeding_transformer_id
+next to the straight-line distance_to_transformer_m.
+
+Usage:
+    python scripts/processing/calculate_network_distance.py
+    python scripts/processing/calculate_network_distance.py \\
+        --where "building_source = 'residential'"
+    python scripts/processing/calculate_network_distance.py --snap 5 --rebuild
+"""
+
+import argparse
+
+from svakenett.network import SNAP_M, update_network_distances
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Network (along-grid) distance to the feeding transformer"
+    )
+    parser.add_argument("--table", default="buildings")
+    parser.add_argument("--where", help="Only buildings matching this SQL filter")
+    parser.add_argument(
+        "--snap", type=float, default=SNAP_M, help="Line endpoint snap tolerance in meters"
+    )
+    parser.add_argument(
+        "--max-attach", type=float, help="Skip buildings farther than this (m) from any line"
+    )
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Rebuild the topology even if lines are unchanged"
+    )
+    args = parser.parse_args()
+
+    update_network_distances(
+        args.table,
+        where=args.where,
+        snap_m=args.snap,
+        max_attach_m=args.max_attach,
+        use_cache=not args.rebuild,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,90 @@
 #!/usr/bin/env python3
 """
 Count building types in Matrikkelen using simple attribute read
+
+Modes:
+  sql   - GROUP BY pushed into GDAL, only aggregate rows are returned (default)
+  arrow - reads only the bygningstype column as Arrow batches, geometry skipped
+  scan  - legacy full feature iteration via fiona (decodes every feature)
+
+Histograms from sql/arrow are cached next to the ingestion ledger and reused
+until the source FileGDB changes (use --refresh to force a recount).
 """
 
-import fiona
+import argparse
 from collections import Counter
 
+from svakenett.matrikkelen import BYGNINGSTYPER, building_type_histogram
+
 GDB_PATH = "/mnt/c/users/klaus/klauspython/qgis/svakenett/matrikkelen_data/Basisdata_42_Agder_25833_MatrikkelenBygning_FGDB.gdb"
 
-print("Counting building types in Matrikkelen...")
-print("=" * 60)
-
-# Mapping of building type codes
-BYGNINGSTYPER = {
-    111: "Enebolig",
-    112: "Tomannsbolig",
-    113: "Rekkehus",
-    121: "Våningshus",
-    131: "Sykehjem/aldershjem",
-    161: "Fritidsbygg (hytte)",
-    163: "Anneks til bolig/fritidsbolig",
-    171: "Garasje/uthus",
-    181: "Næringsbygg",
-}
-
-# Count building types
-type_counts = Counter()
-total = 0
-
-with fiona.open(GDB_PATH, layer='bygning') as src:
-    print(f"Total features: {len(src)}")
-
-    for i, feature in enumerate(src):
-        if i % 50000 == 0:
-            print(f"  Processed {i:,}...")
-
-        bygningstype = feature['properties'].get('bygningstype')
-        if bygningstype:
-            type_counts[bygningstype] += 1
-        total += 1
-
-print(f"\nTotal buildings processed: {total:,}")
-print("\n" + "=" * 60)
-print("Building Type Distribution:")
-print("=" * 60)
-
-# Sort by count
-for bygtype, count in sorted(type_counts.items(), key=lambda x: x[1], reverse=True):
-    name = BYGNINGSTYPER.get(bygtype, f"Unknown ({bygtype})")
-    pct = 100.0 * count / total
-    print(f"{bygtype:3d} - {name:30s}: {count:7,} ({pct:5.1f}%)")
-
-print("=" * 60)
-
-# Calculate relevant categories
-hytter = type_counts.get(161, 0)
-boliger = sum(type_counts.get(t, 0) for t in [111, 112, 113, 121])
-
-print(f"\nSummary:")
-print(f"  Fritidsbygg (hytter):     {hytter:7,} ({100.0*hytter/total:5.1f}%)")
-print(f"  Boliger (111-113, 121):   {boliger:7,} ({100.0*boliger/total:5.1f}%)")
-print(f"  Andre:                    {total-hytter-boliger:7,} ({100.0*(total-hytter-boliger)/total:5.1f}%)")
+
+def count_by_full_scan(gdb_path: str) -> Counter:
+    """Iterate every feature with fiona (slow, kept for cross-checking)."""
+    import fiona
+
+    type_counts = Counter()
+
+    with fiona.open(gdb_path, layer='bygning') as src:
+        print(f"Total features: {len(src)}")
+
+        for i, feature in enumerate(src):
+            if i % 50000 == 0:
+                print(f"  Processed {i:,}...")
+
+            bygningstype = feature['properties'].get('bygningstype')
+            if bygningstype:
+                type_counts[bygningstype] += 1
+            else:
+                type_counts[None] += 1
+
+    return type_counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count building types in Matrikkelen")
+    parser.add_argument("--gdb", default=GDB_PATH, help="Path to Matrikkelen FileGDB")
+    parser.add_argument("--mode", choices=["sql", "arrow", "scan"], default="sql")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached histogram")
+    args = parser.parse_args()
+
+    print("Counting building types in Matrikkelen...")
+    print("=" * 60)
+
+    if args.mode == "scan":
+        type_counts = count_by_full_scan(args.gdb)
+    else:
+        type_counts = building_type_histogram(
+            args.gdb, method=args.mode, use_cache=not args.refresh
+        )
+
+    total = sum(type_counts.values())
+    # Features without bygningstype count towards the total only
+    type_counts.pop(None, None)
+
+    print(f"\nTotal buildings processed: {total:,}")
+    print("\n" + "=" * 60)
+    print("Building Type Distribution:")
+    print("=" * 60)
+
+    # Sort by count
+    for bygtype, count in sorted(type_counts.items(), key=lambda x: x[1], reverse=True):
+        name = BYGNINGSTYPER.get(bygtype, f"Unknown ({bygtype})")
+        pct = 100.0 * count / total
+        print(f"{bygtype:3d} - {name:30s}: {count:7,} ({pct:5.1f}%)")
+
+    print("=" * 60)
+
+    # Calculate relevant categories
+    hytter = type_counts.get(161, 0)
+    boliger = sum(type_counts.get(t, 0) for t in [111, 112, 113, 121])
+
+    print("\nSummary:")
+    print(f"  Fritidsbygg (hytter):     {hytter:7,} ({100.0 * hytter / total:5.1f}%)")
+    print(f"  Boliger (111-113, 121):   {boliger:7,} ({100.0 * boliger / total:5.1f}%)")
+    andre = total - hytter - boliger
+    print(f"  Andre:                    {andre:7,} ({100.0 * andre / total:5.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Building and line density around every building at any radius
+
+Bins buildings (total, per source, per type) and 11-24 kV line length onto a
+metric grid, convolves it with a disc kernel by FFT and samples the result at
+every building (see svakenett.density). Writes
+buildings_/residential_/cabins_/line_km_within_<radius>_est on buildings and
+reports the error against exact counts on the v4 candidates.
+
+Usage:
+    python scripts/processing/estimate_density.py
+    python scripts/processing/estimate_density.py --radius 2500 --cell-size 100
+"""
+
+import argparse
+
+from svakenett.density import DENSITY_CELL_M, update_density
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Estimate building and line density around buildings"
+    )
+    parser.add_argument("--radius", type=float, default=1000.0, help="Disc radius in meters")
+    parser.add_argument(
+        "--cell-size", type=float, default=DENSITY_CELL_M, help="Grid cell size in meters"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=200_000, help="Buildings per streamed chunk"
+    )
+    args = parser.parse_args()
+
+    update_density(radius_m=args.radius, cell_m=args.cell_size, chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Estimated voltage drop per building on the 11-24 kV network
+
+Solves all feeders of distribution_lines_11_24kv at once: peak load per
+building (by type) summed downstream, conductor parameters by line age,
+drop accumulated from the feeding transformer. Writes
+buildings.voltage_drop_pct and the 0-100 scoring factor voltage_drop_factor.
+
+Cheap enough to re-run after every scoring change; the line topology is
+cached until the lines change.
+
+Usage:
+    python scripts/processing/estimate_voltage_drop.py
+    python scripts/processing/estimate_voltage_drop.py --no-cache --max-attach 1000
+"""
+
+import argparse
+
+from svakenett.feeders import MAX_ATTACH_M
+from svakenett.voltage import update_voltage_drops
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate voltage drop per building")
+    parser.add_argument(
+        "--max-attach", type=float, default=MAX_ATTACH_M, help="Max building-to-line distance (m)"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=200_000, help="Buildings per streamed chunk"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Rebuild the line topology")
+    args = parser.parse_args()
+
+    update_voltage_drops(
+        max_attach_m=args.max_attach, chunk_size=args.chunk_size, use_cache=not args.no_cache
+    )
+
+
+if __name__ == "__main__":
+    main()
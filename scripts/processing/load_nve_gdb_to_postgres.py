@@ -4,13 +4,17 @@ Load complete NVE infrastructure data from File Geodatabase to PostgreSQL
 Replaces partial data with full 9,715 power lines dataset
 """
 
+import os
+
 import geopandas as gpd
-from sqlalchemy import create_engine
 import sys
 
+from svakenett.db import get_engine
+
 # Configuration
-DATA_PATH = "/mnt/c/Users/klaus/klauspython/svakenett/data/nve_infrastructure"
-DB_URL = "postgresql://postgres@localhost:5432/svakenett"
+DATA_PATH = os.getenv(
+    "NVE_DATA_DIR", "/mnt/c/Users/klaus/klauspython/svakenett/data/nve_infrastructure"
+)
 
 def load_layer(geojson_file, table_name):
     """Load a GeoJSON file to PostgreSQL"""
@@ -21,8 +25,8 @@ def load_layer(geojson_file, table_name):
         gdf = gpd.read_file(f"{DATA_PATH}/{geojson_file}")
         print(f"  ✓ Read {len(gdf)} features from GeoJSON")
 
-        # Create database engine
-        engine = create_engine(DB_URL)
+        # Shared engine for DATABASE_URL
+        engine = get_engine()
 
         # Write to PostgreSQL
         print(f"  → Writing to PostgreSQL table '{table_name}'...")
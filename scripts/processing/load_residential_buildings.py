@@ -2,20 +2,50 @@
 """
 Load residential buildings (boliger) from Matrikkelen to PostgreSQL
 Building types: 111 (Enebolig), 112 (Tomannsbolig), 113 (Rekkehus), 121 (Våningshus)
+
+With --swap-partition the loaded county also replaces the residential rows of
+its buildings partition (other building sources in that county are kept).
 """
 
+import argparse
+import os
+
 import fiona
-import psycopg2
 import json
 from collections import defaultdict
 
-GDB_PATH = "/mnt/c/users/klaus/klauspython/qgis/svakenett/matrikkelen_data/Basisdata_42_Agder_25833_MatrikkelenBygning_FGDB.gdb"
-DB_CONFIG = {
-    'host': 'localhost',
-    'port': 5432,
-    'database': 'svakenett',
-    'user': 'postgres'
-}
+from svakenett.db import get_engine
+from svakenett.ledger import record_source
+from svakenett.partitions import fylke_of, reload_partition
+
+GDB_PATH = os.getenv(
+    "MATRIKKELEN_GDB",
+    "/mnt/c/users/klaus/klauspython/qgis/svakenett/matrikkelen_data/Basisdata_42_Agder_25833_MatrikkelenBygning_FGDB.gdb",
+)
+
+parser = argparse.ArgumentParser(description="Load residential buildings from Matrikkelen")
+parser.add_argument(
+    "--swap-partition",
+    action="store_true",
+    help="Replace the residential buildings of the loaded county's buildings partition",
+)
+args = parser.parse_args()
+
+# Loaded county -> rows for its buildings partition (postal code from the
+# subdivided polygons of sql/area_index_subdivided.sql)
+PARTITION_SOURCE_SQL = """
+    SELECT
+        r.geometry,
+        r.bygningstype,
+        r.building_type_name,
+        'residential' AS building_source,
+        (SELECT pc.postal_code FROM postal_codes_subdivided pc
+         WHERE ST_Intersects(pc.geometry, r.geometry) LIMIT 1) AS postal_code,
+        r.kommunenummer,
+        r.kommunenavn
+    FROM residential_buildings r
+    WHERE left(r.kommunenummer, 2) = '{fylke}'
+"""
 
 # Residential building types
 RESIDENTIAL_TYPES = {
@@ -29,8 +59,8 @@ print("=" * 70)
 print("Loading Residential Buildings (Boliger) from Matrikkelen")
 print("=" * 70)
 
-# Connect to database
-conn = psycopg2.connect(**DB_CONFIG)
+# Connect to database (pooled connection of the shared DATABASE_URL engine)
+conn = get_engine().raw_connection()
 cur = conn.cursor()
 
 try:
@@ -169,6 +199,28 @@ try:
     for row in cur.fetchall():
         print(f"    {row[0]} - {row[1]}: {row[2]:,}")
 
+    # Record the source so statistics caches can be tied to this ingestion
+    record_source(
+        'matrikkelen_bygning',
+        GDB_PATH,
+        table='residential_buildings',
+        rows=total,
+    )
+
+    if args.swap_partition:
+        print("\n6. Swapping into buildings partitions...")
+        cur.execute(
+            "SELECT DISTINCT kommunenummer FROM residential_buildings "
+            "WHERE kommunenummer IS NOT NULL"
+        )
+        for fylke in sorted({fylke_of(row[0]) for row in cur.fetchall()}):
+            rows = reload_partition(
+                fylke,
+                PARTITION_SOURCE_SQL.format(fylke=fylke),
+                keep_where="building_source <> 'residential'",
+            )
+            print(f"  ✓ buildings partition {fylke}: {rows:,} buildings")
+
     print("\n" + "=" * 70)
     print("✓ Residential Buildings Loaded Successfully")
     print("=" * 70)
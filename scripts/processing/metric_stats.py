@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Summary statistics and histograms of grid metrics from persisted sketches
+
+Sketches (t-digest + moments per metric, building source, building type and
+municipality) are kept current by the metric writers and read from the ledger.
+Missing or out-of-date sketches, including --where filtered ones after the
+table changes, are collected with parallel id-range scans. Replaces the PERCENTILE_CONT
+verification queries, which sorted the whole table per metric.
+
+Usage:
+    python scripts/processing/metric_stats.py
+    python scripts/processing/metric_stats.py \\
+        --where "building_source = 'residential'" --by bygningstype
+    python scripts/processing/metric_stats.py --by building_source bygningstype
+    python scripts/processing/metric_stats.py --histogram weak_grid_score --bins 20
+    python scripts/processing/metric_stats.py --table cabins --group-by none
+"""
+
+import argparse
+
+import pandas as pd
+
+from svakenett.stats import table_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metric summary statistics from quantile sketches")
+    parser.add_argument("--table", default="buildings")
+    parser.add_argument("--where", help="SQL filter applied when collecting")
+    parser.add_argument(
+        "--metrics", nargs="+", help="Metric columns (default: all known metrics in the table)"
+    )
+    parser.add_argument(
+        "--group-by",
+        nargs="+",
+        help=(
+            "Sketch group columns (default: building_source bygningstype kommunenummer; "
+            "'none' for no groups)"
+        ),
+    )
+    parser.add_argument(
+        "--by", nargs="+", default=[], help="Report per these group columns (default: overall)"
+    )
+    parser.add_argument(
+        "--histogram", metavar="METRIC", help="Print a histogram of this metric instead"
+    )
+    parser.add_argument("--bins", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4, help="Parallel scans when collecting")
+    parser.add_argument(
+        "--refresh", action="store_true", help="Recollect even if the table is unchanged"
+    )
+    args = parser.parse_args()
+
+    group_by = [] if args.group_by == ["none"] else args.group_by
+    store = table_stats(
+        args.table,
+        refresh=args.refresh,
+        metrics=args.metrics,
+        group_by=group_by,
+        where=args.where,
+        workers=args.workers,
+    )
+
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_columns", None)
+    if args.histogram:
+        result = store.histogram(args.histogram, args.bins, by=args.by)
+        result["count"] = result["count"].round().astype(int)
+    else:
+        result = store.summary(by=args.by)
+    print(result.round(1).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
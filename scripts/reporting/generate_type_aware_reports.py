@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Generate the type-aware weak grid analysis reports
+
+Reads buildings once, computes every report section in memory and renders them
+as text (01_...txt to 05_...txt), CSV (report_csv/) and HTML
+(type_aware_reports.html). Aggregates are cached per buildings table version,
+so re-rendering after an unchanged scoring run does not touch the database scan.
+
+Usage:
+    python scripts/reporting/generate_type_aware_reports.py
+    python scripts/reporting/generate_type_aware_reports.py --format text --format html
+    python scripts/reporting/generate_type_aware_reports.py \\
+        --output-dir /mnt/c/.../unified_buildings_2025-11-24 --no-cache
+"""
+
+import argparse
+import os
+from datetime import date
+from pathlib import Path
+
+from svakenett.reports import RENDERERS, SECTIONS, generate_reports
+
+DEFAULT_OUTPUT_DIR = (
+    Path(os.getenv("DATA_PROCESSED_DIR", "./data/processed"))
+    / f"unified_buildings_{date.today().isoformat()}"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate type-aware weak grid reports")
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument(
+        "--format",
+        dest="formats",
+        action="append",
+        choices=list(RENDERERS),
+        help="Output format (repeatable, default: all)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Recompute aggregates even if buildings is unchanged",
+    )
+    args = parser.parse_args()
+
+    sections = generate_reports(
+        args.output_dir,
+        formats=tuple(args.formats or RENDERERS),
+        use_cache=not args.no_cache,
+    )
+
+    print(f"\nReports saved to: {args.output_dir}")
+    for key, (stem, title) in SECTIONS.items():
+        print(f"  {stem:<30} {title:<50} {len(sections[key]):>6,} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,66 +8,63 @@ Includes:
 - Type-aware popups
 - Layer controls
 - Marker clustering for performance
+
+Render modes for the building layers:
+  fast    - one compact row array per building type, clustered client-side with
+            FastMarkerCluster; popups are built on click from one JS template
+            (default, no cap on the number of prospects)
+  markers - one folium.Marker with its own HTML popup per building (legacy,
+            capped at --limit prospects per type)
 """
 
-import psycopg2
+import argparse
+import json
+import os
+
 import folium
 from folium import plugins
-import json
 from collections import defaultdict
 
-# Database configuration
-DB_CONFIG = {
-    'host': 'localhost',
-    'port': 5432,
-    'database': 'svakenett',
-    'user': 'postgres'
-}
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+# Building type configuration (names, colors, icons, thresholds)
+from svakenett.building_types import BUILDING_TYPES, thresholds_values_sql
+from svakenett.db import get_engine
+from svakenett.geometry_export import encode_geojson, load_lines
 
 # Output file
 OUTPUT_FILE = "/mnt/c/Users/klaus/klauspython/svakenett/data/processed/unified_buildings_2025-11-24/weak_grid_map_type_aware.html"
 
-# Building type configuration
-BUILDING_TYPES = {
-    161: {
-        'name': 'Fritidsbygg (Cabins)',
-        'color': '#8B4513',  # Brown
-        'icon': 'home',
-        'threshold': 70
-    },
-    111: {
-        'name': 'Enebolig (Single-family)',
-        'color': '#2E8B57',  # Green
-        'icon': 'home',
-        'threshold': 80
-    },
-    112: {
-        'name': 'Tomannsbolig (Duplex)',
-        'color': '#4169E1',  # Blue
-        'icon': 'building',
-        'threshold': 82
-    },
-    113: {
-        'name': 'Rekkehus (Townhouse)',
-        'color': '#FF8C00',  # Orange
-        'icon': 'building',
-        'threshold': 85
-    },
-    121: {
-        'name': 'Våningshus (Apartment)',
-        'color': '#DC143C',  # Red
-        'icon': 'building',
-        'threshold': 85
-    }
-}
+# Power lines are drawn from the simplified variant for this zoom
+# (tolerance ~20 m at Agder latitudes)
+LINE_ZOOM = 12
+
+parser = argparse.ArgumentParser(description="Generate type-aware HTML map")
+parser.add_argument("--render-mode", choices=["fast", "markers"], default="fast")
+parser.add_argument(
+    "--limit",
+    type=int,
+    default=None,
+    help="Max prospects per type (default: none in fast mode, 5000 in markers mode)",
+)
+parser.add_argument("--output", default=OUTPUT_FILE)
+parser.add_argument(
+    "--heatmap-tiles",
+    default=None,
+    help="XYZ heat-map tile directory or URL (from render_heatmap_tiles.py) to overlay",
+)
+args = parser.parse_args()
+
+LIMIT = args.limit if args.limit is not None else (5000 if args.render_mode == "markers" else None)
+OUTPUT_FILE = args.output
 
 print("=" * 70)
 print("Generating Type-Aware HTML Visualization")
 print("=" * 70)
 
-# Connect to database
-conn = psycopg2.connect(**DB_CONFIG)
-cur = conn.cursor()
+# One engine (DATABASE_URL) for prospects, power lines and transformers
+engine = get_engine()
 
 # Create base map centered on Agder
 print("\n1. Creating base map...")
@@ -82,42 +79,111 @@ m = folium.Map(
 # ===========================================================================
 print("\n2. Fetching buildings by type...")
 
-for bygningstype, config in BUILDING_TYPES.items():
-    print(f"   - Processing {config['name']}...")
+# Popup template shared by all fast-mode markers; rendered only when clicked.
+# Row layout: [lat, lon, id, score, distance_m, density, voltage_kv, age_years, postal_code]
+POPUP_TEMPLATE_JS = """
+function svakenettPopup(row, cfg) {
+    var na = function (v, suffix) {
+        return (v === null || v === undefined) ? 'N/A' : v + (suffix || '');
+    };
+    return '<div style="font-family: Arial; font-size: 12px;">' +
+        '<h4 style="margin: 0 0 10px 0; color: ' + cfg.color + ';">' + cfg.name + '</h4>' +
+        '<table style="width: 100%;">' +
+        '<tr><td><b>Building ID:</b></td><td>' + row[2] + '</td></tr>' +
+        '<tr><td><b>Weak Grid Score:</b></td><td><b>' + row[3].toFixed(1) + '</b></td></tr>' +
+        '<tr><td><b>Distance to line:</b></td><td>' + na(row[4], ' m') + '</td></tr>' +
+        '<tr><td><b>Grid density:</b></td><td>' + na(row[5], ' lines/km') + '</td></tr>' +
+        '<tr><td><b>Voltage level:</b></td><td>' + na(row[6], ' kV') + '</td></tr>' +
+        '<tr><td><b>Grid age:</b></td><td>' + (row[7] ? row[7] + ' years' : 'N/A') + '</td></tr>' +
+        '<tr><td><b>Postal code:</b></td><td>' + na(row[8]) + '</td></tr>' +
+        '</table>' +
+        '<p style="margin: 10px 0 0 0; padding: 5px; ' +
+        'background-color: #f0f0f0; border-radius: 3px;">' +
+        '<b>Assessment:</b> High prospect for solar+battery</p></div>';
+}
+"""
 
-    # Create marker cluster for this building type
-    cluster = plugins.MarkerCluster(
-        name=f"{config['name']} (threshold ≥ {config['threshold']})",
-        overlay=True,
-        control=True,
-        show=True if bygningstype == 161 else False  # Show cabins by default
-    )
+# FastMarkerCluster callback: builds the marker from a data row, popup deferred to click
+MARKER_CALLBACK_JS = """
+function (row) {
+    var cfg = %s;
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {
+        icon: L.AwesomeMarkers.icon({
+            icon: cfg.icon,
+            prefix: 'fa',
+            markerColor: row[3] >= cfg.threshold + 10 ? 'red' : 'orange'
+        })
+    });
+    marker.bindPopup(function () { return svakenettPopup(row, cfg); }, {maxWidth: 300});
+    return marker;
+}
+"""
 
-    # Fetch buildings of this type meeting threshold
-    cur.execute("""
-        SELECT
-            id,
-            weak_grid_score,
-            distance_to_line_m,
-            grid_density_lines_1km,
-            voltage_level_kv,
-            grid_age_years,
-            postal_code,
-            ST_Y(geometry) as latitude,
-            ST_X(geometry) as longitude
-        FROM buildings
-        WHERE bygningstype = %s
-          AND weak_grid_score >= %s
-        ORDER BY weak_grid_score DESC
-        LIMIT 5000  -- Limit for performance
-    """, (bygningstype, config['threshold']))
+if args.render_mode == "fast":
+    m.get_root().script.add_child(folium.Element(POPUP_TEMPLATE_JS))
+
+# Single scan over all prospect types, thresholds joined in SQL
+with engine.connect() as conn:
+    rows = conn.execute(
+        text(f"""
+        SELECT *
+        FROM (
+            SELECT
+                b.bygningstype,
+                ROUND(ST_Y(b.geometry)::numeric, 6)::float8 as latitude,
+                ROUND(ST_X(b.geometry)::numeric, 6)::float8 as longitude,
+                b.id,
+                ROUND(b.weak_grid_score::numeric, 1)::float8 as weak_grid_score,
+                ROUND(b.distance_to_line_m)::integer as distance_to_line_m,
+                b.grid_density_lines_1km,
+                b.voltage_level_kv,
+                ROUND(b.grid_age_years)::integer as grid_age_years,
+                b.postal_code,
+                ROW_NUMBER() OVER (
+                    PARTITION BY b.bygningstype ORDER BY b.weak_grid_score DESC
+                ) as rank_in_type
+            FROM buildings b
+            JOIN {thresholds_values_sql()} AS t(bygningstype, threshold)
+                ON b.bygningstype = t.bygningstype
+            WHERE b.weak_grid_score >= t.threshold
+        ) ranked
+        WHERE CAST(:limit AS integer) IS NULL OR rank_in_type <= CAST(:limit AS integer)
+        ORDER BY bygningstype, rank_in_type
+        """),
+        {"limit": LIMIT},
+    ).fetchall()
+
+rows_by_type = defaultdict(list)
+for row in rows:
+    rows_by_type[row[0]].append(list(row[1:-1]))
 
-    buildings = cur.fetchall()
-    print(f"     Found {len(buildings)} prospects (showing up to 5000)")
+for bygningstype, config in BUILDING_TYPES.items():
+    buildings = rows_by_type.get(bygningstype, [])
+    limit_note = f"showing up to {LIMIT}" if LIMIT else "showing all"
+    print(f"   - {config['name']}: {len(buildings)} prospects ({limit_note})")
+
+    layer_name = f"{config['name']} (threshold ≥ {config['threshold']})"
+    show = bygningstype == 161  # Show cabins by default
+
+    if args.render_mode == "fast":
+        # One data array per type; markers and popups are created in the browser
+        cfg = {key: config[key] for key in ('name', 'color', 'icon', 'threshold')}
+        plugins.FastMarkerCluster(
+            data=buildings,
+            callback=MARKER_CALLBACK_JS % json.dumps(cfg),
+            name=layer_name,
+            overlay=True,
+            control=True,
+            show=show,
+        ).add_to(m)
+        continue
+
+    # Create marker cluster for this building type
+    cluster = plugins.MarkerCluster(name=layer_name, overlay=True, control=True, show=show)
 
     # Add markers to cluster
     for building in buildings:
-        (bid, score, dist, density, voltage, age, postal, lat, lon) = building
+        (lat, lon, bid, score, dist, density, voltage, age, postal) = building
 
         # Create popup with building info
         popup_html = f"""
@@ -128,10 +194,10 @@ for bygningstype, config in BUILDING_TYPES.items():
             <table style="width: 100%;">
                 <tr><td><b>Building ID:</b></td><td>{bid}</td></tr>
                 <tr><td><b>Weak Grid Score:</b></td><td><b>{score:.1f}</b></td></tr>
-                <tr><td><b>Distance to line:</b></td><td>{dist:.0f} m</td></tr>
+                <tr><td><b>Distance to line:</b></td><td>{dist} m</td></tr>
                 <tr><td><b>Grid density:</b></td><td>{density} lines/km</td></tr>
                 <tr><td><b>Voltage level:</b></td><td>{voltage} kV</td></tr>
-                <tr><td><b>Grid age:</b></td><td>{f'{age:.0f} years' if age else 'N/A'}</td></tr>
+                <tr><td><b>Grid age:</b></td><td>{f'{age} years' if age else 'N/A'}</td></tr>
                 <tr><td><b>Postal code:</b></td><td>{postal or 'N/A'}</td></tr>
             </table>
             <p style="margin: 10px 0 0 0; padding: 5px; background-color: #f0f0f0; border-radius: 3px;">
@@ -159,20 +225,29 @@ for bygningstype, config in BUILDING_TYPES.items():
 # ===========================================================================
 print("\n3. Adding power lines layer...")
 
-# Fetch power lines
-cur.execute("""
-    SELECT
-        id,
-        spenning_kv as voltage_kv,
-        eierorgnr as owner_orgnr,
-        driftsattaar as year_built,
-        ST_AsGeoJSON(geometry) as geojson
-    FROM power_lines_new
-    -- All lines included (9,715 total)
-""")
-
-power_lines = cur.fetchall()
-print(f"   Adding {len(power_lines)} power lines...")
+# Fetch power lines: zoom-simplified variant with 6-decimal coordinates,
+# one feature per line (MultiLineString parts stay together, one popup each)
+try:
+    line_properties, line_geometries = load_lines(zoom=LINE_ZOOM, engine=engine)
+except ProgrammingError:
+    print("   (power_lines_simplified not built - run export_line_geometries.py build)")
+    line_properties, line_geometries = load_lines(zoom=None, engine=engine)
+
+power_lines = encode_geojson(line_properties, line_geometries)
+print(f"   Adding {len(power_lines['features'])} power lines...")
+
+
+def power_line_style(feature):
+    """Color and weight by voltage"""
+    voltage = feature['properties']['voltage_kv']
+    if voltage is not None and voltage >= 132:
+        return {'color': '#FF0000', 'weight': 3, 'opacity': 0.6}  # High voltage (≥132 kV)
+    elif voltage is not None and voltage >= 33:
+        return {'color': '#FFA500', 'weight': 2, 'opacity': 0.6}  # Medium voltage (33-132 kV)
+    elif voltage is not None and 11 <= voltage <= 24:
+        return {'color': '#FF0000', 'weight': 1.5, 'opacity': 0.6}  # Distribution (11-24 kV)
+    return {'color': '#CCCCCC', 'weight': 1, 'opacity': 0.6}  # Other/unknown voltage
+
 
 # Create feature group for power lines
 power_lines_layer = folium.FeatureGroup(
@@ -182,52 +257,15 @@ power_lines_layer = folium.FeatureGroup(
     show=True  # Visible by default
 )
 
-for line in power_lines:
-    (lid, voltage, owner, year, geojson) = line
-
-    # Parse GeoJSON
-    geom = json.loads(geojson)
-    coords = geom['coordinates']
-
-    # Determine color by voltage
-    if voltage is not None and voltage >= 132:
-        color = '#FF0000'  # Red for high voltage (≥132 kV)
-        weight = 3
-    elif voltage is not None and voltage >= 33:
-        color = '#FFA500'  # Orange for medium voltage (33-132 kV)
-        weight = 2
-    elif voltage is not None and 11 <= voltage <= 24:
-        color = '#FF0000'  # Red for distribution (11-24 kV) - thinner
-        weight = 1.5
-    else:
-        color = '#CCCCCC'  # Gray for other/unknown voltage
-        weight = 1
-
-    # Add line to layer
-    if geom['type'] == 'LineString':
-        # Convert coordinates from [lon, lat] to [lat, lon]
-        line_coords = [[c[1], c[0]] for c in coords]
-
-        folium.PolyLine(
-            locations=line_coords,
-            color=color,
-            weight=weight,
-            opacity=0.6,
-            popup=f"Line ID: {lid}<br>Voltage: {voltage} kV<br>Owner: {owner or 'N/A'}<br>Built: {year or 'Unknown'}"
-        ).add_to(power_lines_layer)
-    elif geom['type'] == 'MultiLineString':
-        # MultiLineString has multiple line segments
-        for line_segment in coords:
-            # Convert coordinates from [lon, lat] to [lat, lon]
-            line_coords = [[c[1], c[0]] for c in line_segment]
-
-            folium.PolyLine(
-                locations=line_coords,
-                color=color,
-                weight=weight,
-                opacity=0.6,
-                popup=f"Line ID: {lid}<br>Voltage: {voltage} kV<br>Owner: {owner or 'N/A'}<br>Built: {year or 'Unknown'}"
-            ).add_to(power_lines_layer)
+# Single GeoJSON layer instead of one PolyLine per line segment
+folium.GeoJson(
+    power_lines,
+    style_function=power_line_style,
+    popup=folium.GeoJsonPopup(
+        fields=['id', 'voltage_kv', 'owner_orgnr', 'year_built'],
+        aliases=['Line ID', 'Voltage (kV)', 'Owner', 'Built'],
+    ),
+).add_to(power_lines_layer)
 
 power_lines_layer.add_to(m)
 
@@ -237,17 +275,16 @@ power_lines_layer.add_to(m)
 print("\n4. Adding transformers layer...")
 
 # Fetch transformers
-cur.execute("""
-    SELECT
-        id,
-        spenning_kv as voltage_kv,
-        eierorgnr as owner_orgnr,
-        ST_Y(geometry) as latitude,
-        ST_X(geometry) as longitude
-    FROM transformers_new
-""")
-
-transformers = cur.fetchall()
+with engine.connect() as conn:
+    transformers = conn.execute(text("""
+        SELECT
+            id,
+            spenning_kv as voltage_kv,
+            eierorgnr as owner_orgnr,
+            ST_Y(geometry) as latitude,
+            ST_X(geometry) as longitude
+        FROM transformers_new
+    """)).fetchall()
 print(f"   Adding {len(transformers)} transformers...")
 
 # Create feature group for transformers
@@ -273,6 +310,26 @@ for transformer in transformers:
 
 transformers_layer.add_to(m)
 
+if args.heatmap_tiles:
+    heatmap_url = args.heatmap_tiles.rstrip('/')
+    heatmap_max_zoom = 12
+    if '://' not in heatmap_url:
+        metadata_path = os.path.join(heatmap_url, 'metadata.json')
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                heatmap_max_zoom = json.load(f)['max_zoom']
+        heatmap_url = os.path.relpath(heatmap_url, os.path.dirname(os.path.abspath(OUTPUT_FILE)))
+    folium.TileLayer(
+        tiles=f"{heatmap_url}/{{z}}/{{x}}/{{y}}.png",
+        attr='Svakenett heat map',
+        name='Prospect density (heat map)',
+        overlay=True,
+        control=True,
+        opacity=0.7,
+        max_native_zoom=heatmap_max_zoom,
+    ).add_to(m)
+    print(f"   ✓ Added heat-map overlay from {heatmap_url}")
+
 # ===========================================================================
 # Add layer control and legend
 # ===========================================================================
@@ -308,10 +365,14 @@ legend_html = """
     </p>
 
     <p style="margin: 10px 0 0 0; font-size: 11px; color: #666;">
-        Showing up to 5,000 highest-scoring prospects per type
+        %s
     </p>
 </div>
-"""
+""" % (
+    f"Showing up to {LIMIT:,} highest-scoring prospects per type"
+    if LIMIT
+    else "Showing all prospects meeting the type threshold"
+)
 
 m.get_root().html.add_child(folium.Element(legend_html))
 
@@ -321,10 +382,6 @@ m.get_root().html.add_child(folium.Element(legend_html))
 print(f"\n6. Saving map to {OUTPUT_FILE}...")
 m.save(OUTPUT_FILE)
 
-# Close database connection
-cur.close()
-conn.close()
-
 print("\n" + "=" * 70)
 print("✓ HTML Map Generated Successfully")
 print("=" * 70)
@@ -333,7 +390,7 @@ print("\nMap includes:")
 print("  - 5 building type layers with type-aware thresholds")
 print("  - Power lines layer (up to 10,000 lines)")
 print("  - Transformers layer (106 transformers)")
-print("  - Marker clustering for performance")
+print(f"  - Marker clustering for performance ({args.render_mode} mode)")
 print("  - Layer controls to toggle visibility")
 print("  - Custom legend with thresholds")
 print("\nOpen in browser to view interactive map")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Render a static XYZ PNG heat-map pyramid of building and prospect density
+
+Streams all buildings from PostGIS, bins them into per-tile NumPy histograms and
+writes <output>/<z>/<x>/<y>.png tiles. Overlay them on the folium map with:
+
+    python scripts/visualization/generate_type_aware_html_map.py --heatmap-tiles <output>
+
+Usage:
+    python scripts/visualization/render_heatmap_tiles.py --weight score
+    python scripts/visualization/render_heatmap_tiles.py --weight candidate --max-zoom 13
+    python scripts/visualization/render_heatmap_tiles.py \\
+        --weight count --where "b.bygningstype = 161"
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+from svakenett.heatmap import WEIGHTS, render_heatmap_tiles
+
+DEFAULT_OUTPUT_DIR = Path(os.getenv("DATA_PROCESSED_DIR", "./data/processed")) / "heatmap"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render heat-map tile pyramid")
+    parser.add_argument(
+        "--weight",
+        choices=list(WEIGHTS),
+        default="score",
+        help="count = buildings, score = weak_grid_score/100, candidate = v4 candidates",
+    )
+    parser.add_argument(
+        "--output", type=Path, default=None, help="Default: data/processed/heatmap/<weight>"
+    )
+    parser.add_argument("--min-zoom", type=int, default=5)
+    parser.add_argument("--max-zoom", type=int, default=12)
+    parser.add_argument("--where", default=None, help="Extra filter on buildings (alias b)")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--cmap", default="YlOrRd", help="Matplotlib colormap")
+    args = parser.parse_args()
+
+    render_heatmap_tiles(
+        args.output or DEFAULT_OUTPUT_DIR / args.weight,
+        weight=args.weight,
+        min_zoom=args.min_zoom,
+        max_zoom=args.max_zoom,
+        where=args.where,
+        chunk_size=args.chunk_size,
+        cmap_name=args.cmap,
+    )
+
+
+if __name__ == "__main__":
+    main()
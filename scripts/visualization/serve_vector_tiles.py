@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Local vector tile (MVT) server and pre-render command
+
+Replaces the static folium HTML for large datasets: the browser map loads only
+the visible tiles of buildings, power lines, transformers and weak grid
+candidates, so all buildings can be shown instead of the top 5,000 per type.
+
+Usage:
+    python scripts/visualization/serve_vector_tiles.py serve --port 8080
+    python scripts/visualization/serve_vector_tiles.py prerender --max-zoom 12
+
+Tiles are cached under data/processed/tiles/<data-version>/ and the cache moves
+to a new version directory whenever a source table changes.
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+from svakenett.tiles import DEFAULT_BOUNDS, TILE_LAYERS, TileCache, prerender, serve
+
+DEFAULT_CACHE_DIR = Path(os.getenv("DATA_PROCESSED_DIR", "./data/processed")) / "tiles"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Svakenett vector tile server")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument(
+        "--layers",
+        nargs="+",
+        choices=list(TILE_LAYERS),
+        default=list(TILE_LAYERS),
+        help="Layers to include in tiles",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Serve map and tiles over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+
+    prerender_parser = subparsers.add_parser("prerender", help="Render tiles into the cache")
+    prerender_parser.add_argument("--min-zoom", type=int, default=5)
+    prerender_parser.add_argument("--max-zoom", type=int, default=12)
+    prerender_parser.add_argument(
+        "--bounds",
+        type=float,
+        nargs=4,
+        metavar=("LON_MIN", "LAT_MIN", "LON_MAX", "LAT_MAX"),
+        default=DEFAULT_BOUNDS,
+    )
+    prerender_parser.add_argument("--workers", type=int, default=8)
+
+    args = parser.parse_args()
+
+    cache = TileCache(args.cache_dir, layers=args.layers)
+
+    if args.command == "serve":
+        serve(cache, host=args.host, port=args.port)
+    else:
+        prerender(
+            cache,
+            bounds=tuple(args.bounds),
+            min_zoom=args.min_zoom,
+            max_zoom=args.max_zoom,
+            workers=args.workers,
+        )
+
+
+if __name__ == "__main__":
+    main()
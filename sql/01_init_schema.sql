@@ -208,6 +208,9 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- updated_at maintenance (BEFORE UPDATE trigger) for delta exports
+\ir updated_at_triggers.sql
+
 -- ============================================================================
 -- 9. Grants (adjust as needed for production)
 -- ============================================================================
@@ -0,0 +1,95 @@
+-- ============================================================================
+-- Subdivided area polygons for fast point-in-polygon assignment
+-- ============================================================================
+-- Purpose: Postal code, municipality and grid company polygons follow the
+--          coastline and have tens of thousands of vertices each. A single
+--          ST_Within test walks all of them, and the bounding box of a coastal
+--          polygon matches far more points than the polygon contains.
+--          ST_Subdivide cuts every polygon into pieces of at most :max_vertices
+--          vertices with tight bounding boxes, so the GiST index does most of
+--          the work and each exact test is cheap.
+--
+-- Tables (rebuilt on every run):
+--   postal_codes_subdivided         (postal_code, geometry)
+--   municipalities_subdivided       (municipality_number, geometry)
+--   grid_company_areas_subdivided   (company_code, geometry)
+--
+-- Assignment: pieces share their cut edges, so use ST_Intersects (not
+-- ST_Within) against the pieces - a point on a cut line touches both pieces
+-- of the same area:
+--   UPDATE cabins c SET postal_code = s.postal_code
+--   FROM postal_codes_subdivided s WHERE ST_Intersects(s.geometry, c.geometry);
+--
+-- Usage:
+--   psql -d svakenett -f sql/area_index_subdivided.sql
+--   psql -d svakenett -v max_vertices=128 -f sql/area_index_subdivided.sql
+-- ============================================================================
+
+\set ON_ERROR_STOP on
+\timing on
+
+\if :{?max_vertices}
+\else
+\set max_vertices 256
+\endif
+
+\echo '========================================================================'
+\echo 'Building subdivided area index (max ' :max_vertices ' vertices per piece)'
+\echo '========================================================================'
+
+SELECT to_regclass('grid_companies') IS NOT NULL AS has_grid_companies \gset
+
+BEGIN;
+
+\echo 'Step 1: Postal codes...'
+DROP TABLE IF EXISTS postal_codes_subdivided;
+CREATE TABLE postal_codes_subdivided AS
+SELECT postal_code, ST_Subdivide(geometry, :max_vertices) AS geometry
+FROM postal_codes
+WHERE geometry IS NOT NULL;
+CREATE INDEX idx_postal_codes_subdivided_geom ON postal_codes_subdivided USING GIST(geometry);
+
+\echo 'Step 2: Municipalities...'
+DROP TABLE IF EXISTS municipalities_subdivided;
+CREATE TABLE municipalities_subdivided AS
+SELECT municipality_number, ST_Subdivide(geometry, :max_vertices) AS geometry
+FROM municipalities
+WHERE geometry IS NOT NULL;
+CREATE INDEX idx_municipalities_subdivided_geom ON municipalities_subdivided USING GIST(geometry);
+
+\echo 'Step 3: Grid company service areas...'
+DROP TABLE IF EXISTS grid_company_areas_subdivided;
+\if :has_grid_companies
+CREATE TABLE grid_company_areas_subdivided AS
+SELECT company_code, ST_Subdivide(service_area_polygon, :max_vertices) AS geometry
+FROM grid_companies
+WHERE service_area_polygon IS NOT NULL;
+CREATE INDEX idx_grid_company_areas_subdivided_geom ON grid_company_areas_subdivided USING GIST(geometry);
+\else
+\echo '  grid_companies not loaded - skipped'
+\endif
+
+COMMIT;
+
+ANALYZE postal_codes_subdivided;
+ANALYZE municipalities_subdivided;
+\if :has_grid_companies
+ANALYZE grid_company_areas_subdivided;
+\endif
+
+\echo ''
+\echo '[Pieces per table]'
+SELECT 'postal_codes' AS source,
+       (SELECT COUNT(*) FROM postal_codes WHERE geometry IS NOT NULL) AS polygons,
+       COUNT(*) AS pieces,
+       MAX(ST_NPoints(geometry)) AS max_vertices
+FROM postal_codes_subdivided
+UNION ALL
+SELECT 'municipalities',
+       (SELECT COUNT(*) FROM municipalities WHERE geometry IS NOT NULL),
+       COUNT(*),
+       MAX(ST_NPoints(geometry))
+FROM municipalities_subdivided;
+
+\echo ''
+\echo '✓ Subdivided area index ready'
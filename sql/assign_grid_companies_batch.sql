@@ -0,0 +1,16 @@
+-- ============================================================================
+-- Grid company assignment for one key range of cabins
+-- ============================================================================
+-- Purpose: Point-in-polygon join of cabins against the subdivided grid
+--          company service areas (sql/area_index_subdivided.sql), per id range
+--          so ranges run concurrently on separate connections
+-- Usage:   python -m svakenett.batches run sql/assign_grid_companies_batch.sql \
+--              --table cabins --concurrency 8
+-- ============================================================================
+
+-- ST_Intersects: points on a cut line touch two pieces of one area
+UPDATE cabins c
+SET grid_company_code = gc.company_code
+FROM grid_company_areas_subdivided gc
+WHERE ST_Intersects(gc.geometry, c.geometry)
+  AND c.id BETWEEN %(lo)s AND %(hi)s;
@@ -0,0 +1,16 @@
+-- ============================================================================
+-- Postal code assignment for one key range of cabins
+-- ============================================================================
+-- Purpose: Point-in-polygon join of cabins against the subdivided postal code
+--          pieces (sql/area_index_subdivided.sql), per id range so ranges run
+--          concurrently on separate connections
+-- Usage:   python -m svakenett.batches run sql/assign_postal_codes_batch.sql \
+--              --table cabins --concurrency 8
+-- ============================================================================
+
+-- ST_Intersects: points on a cut line touch two pieces of one area
+UPDATE cabins c
+SET postal_code = pc.postal_code
+FROM postal_codes_subdivided pc
+WHERE ST_Intersects(pc.geometry, c.geometry)
+  AND c.id BETWEEN %(lo)s AND %(hi)s;
@@ -0,0 +1,88 @@
+-- ============================================================================
+-- Grid metrics for one key range of buildings
+-- ============================================================================
+-- Purpose: Same metrics as building_metrics_partition.sql (distance, voltage
+--          and owner of the nearest line, grid density and age within 1km,
+--          distance to nearest transformer), computed per id range on
+--          concurrent connections. Each range only reads; its rows are
+--          COPYed into a staging table and applied in one UPDATE at the end.
+-- Usage:   python -m svakenett.batches run sql/building_metrics_batch.sql \
+--              --table buildings --where "building_source = 'residential'" \
+--              --into building_metrics_staging -p building_source=residential \
+--              --record-stats --stats-scope building_source=residential
+-- Parameters:
+--   building_source  Only compute buildings of this source (required)
+-- Keep the metric definitions in sync with building_metrics_partition.sql.
+-- Nearest transformer is always KNN here (no psql \if for the catchments).
+-- The staging rows carry the metric stats group columns (building_source,
+-- bygningstype, kommunenummer) so --record-stats can sketch them.
+-- ============================================================================
+
+DROP TABLE IF EXISTS building_metrics_staging;
+
+CREATE UNLOGGED TABLE building_metrics_staging (
+    building_id BIGINT PRIMARY KEY,
+    building_source VARCHAR(50),
+    bygningstype INTEGER,
+    kommunenummer VARCHAR(4),
+    distance_to_line_m NUMERIC,
+    voltage_level_kv REAL,
+    nearest_line_owner TEXT,
+    grid_density_lines_1km INTEGER,
+    grid_density_length_km NUMERIC,
+    grid_age_years NUMERIC,
+    distance_to_transformer_m NUMERIC
+);
+
+SELECT
+    b.id AS building_id,
+    b.building_source,
+    b.bygningstype,
+    b.kommunenummer,
+    ROUND(ST_Distance(b.geometry::geography, nl.geometry::geography)::numeric, 2) AS distance_to_line_m,
+    nl.voltage_kv AS voltage_level_kv,
+    nl.owner_orgnr AS nearest_line_owner,
+    dc.line_count AS grid_density_lines_1km,
+    ROUND(dc.total_length_km::numeric, 2) AS grid_density_length_km,
+    dc.avg_age_years AS grid_age_years,
+    ROUND(ST_Distance(b.geometry::geography, nt.geometry::geography)::numeric, 2) AS distance_to_transformer_m
+FROM buildings b
+-- METRIC 1: Nearest power line
+CROSS JOIN LATERAL (
+    SELECT geometry, voltage_kv, owner_orgnr
+    FROM power_lines_new
+    ORDER BY b.geometry <-> geometry
+    LIMIT 1
+) nl
+-- METRICS 2-3: Grid density and average age within 1km
+CROSS JOIN LATERAL (
+    SELECT
+        COUNT(pl.id) AS line_count,
+        COALESCE(SUM(ST_Length(pl.geometry::geography)) / 1000, 0) AS total_length_km,
+        ROUND(AVG(2025 - pl.year_built)::numeric, 1) AS avg_age_years
+    FROM power_lines_new pl
+    WHERE ST_DWithin(b.geometry::geography, pl.geometry::geography, 1000)
+) dc
+-- METRIC 4: Nearest transformer
+CROSS JOIN LATERAL (
+    SELECT geometry
+    FROM transformers_new
+    ORDER BY b.geometry <-> geometry
+    LIMIT 1
+) nt
+WHERE b.id BETWEEN %(lo)s AND %(hi)s
+  AND b.building_source = %(building_source)s;
+
+UPDATE buildings b
+SET
+    distance_to_line_m = s.distance_to_line_m,
+    voltage_level_kv = s.voltage_level_kv,
+    nearest_line_owner = s.nearest_line_owner,
+    grid_density_lines_1km = s.grid_density_lines_1km,
+    grid_density_length_km = s.grid_density_length_km,
+    grid_age_years = s.grid_age_years,
+    distance_to_transformer_m = s.distance_to_transformer_m
+FROM building_metrics_staging s
+WHERE b.id = s.building_id;
+
+DROP TABLE building_metrics_staging;
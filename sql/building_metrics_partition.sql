@@ -0,0 +1,134 @@
+-- ============================================================================
+-- Grid metrics for one partition of buildings
+-- ============================================================================
+-- Purpose: Distance to nearest line (+ voltage/owner), grid density and age
+--          within 1km, and distance to nearest transformer
+-- Usage:   python -m svakenett.partitions run sql/building_metrics_partition.sql \
+--              -v building_source=residential
+--          (runs once per county partition, in parallel). Without -v partition
+--          the whole buildings table is processed in one pass.
+-- Variables:
+--   partition        Table to update (default: buildings)
+--   building_source  Only update buildings of this source (default: all)
+-- ============================================================================
+
+\if :{?partition}
+\else
+\set partition buildings
+\endif
+
+\if :{?building_source}
+\set source_filter 'building_source = ' :'building_source'
+\else
+\set source_filter 'TRUE'
+\endif
+
+\echo 'Calculating metrics for' :partition
+
+-- METRIC 1: Distance to nearest power line
+WITH nearest_lines AS (
+    SELECT
+        b.id as building_id,
+        ST_Distance(b.geometry::geography, pl.geometry::geography) as distance_m,
+        pl.voltage_kv,
+        pl.owner_orgnr
+    FROM :partition b
+    CROSS JOIN LATERAL (
+        SELECT geometry, voltage_kv, owner_orgnr
+        FROM power_lines_new
+        ORDER BY b.geometry <-> geometry
+        LIMIT 1
+    ) pl
+    WHERE :source_filter
+)
+UPDATE :partition b
+SET
+    distance_to_line_m = ROUND(nl.distance_m::numeric, 2),
+    voltage_level_kv = nl.voltage_kv,
+    nearest_line_owner = nl.owner_orgnr
+FROM nearest_lines nl
+WHERE b.id = nl.building_id;
+
+-- METRIC 2: Grid density (lines within 1km)
+WITH density_calc AS (
+    SELECT
+        b.id as building_id,
+        COUNT(pl.id) as line_count,
+        COALESCE(SUM(ST_Length(pl.geometry::geography)) / 1000, 0) as total_length_km
+    FROM :partition b
+    LEFT JOIN power_lines_new pl
+        ON ST_DWithin(b.geometry::geography, pl.geometry::geography, 1000)
+    WHERE :source_filter
+    GROUP BY b.id
+)
+UPDATE :partition b
+SET
+    grid_density_lines_1km = dc.line_count,
+    grid_density_length_km = ROUND(dc.total_length_km::numeric, 2)
+FROM density_calc dc
+WHERE b.id = dc.building_id;
+
+-- METRIC 3: Grid age (average age of lines within 1km)
+WITH age_calc AS (
+    SELECT
+        b.id as building_id,
+        ROUND(AVG(2025 - pl.year_built)::numeric, 1) as avg_age_years
+    FROM :partition b
+    LEFT JOIN power_lines_new pl
+        ON ST_DWithin(b.geometry::geography, pl.geometry::geography, 1000)
+        AND pl.year_built IS NOT NULL
+    WHERE :source_filter
+    GROUP BY b.id
+)
+UPDATE :partition b
+SET grid_age_years = ac.avg_age_years
+FROM age_calc ac
+WHERE b.id = ac.building_id;
+
+-- METRIC 4: Distance to nearest transformer
+-- Point-in-polygon against the precomputed catchments (svakenett.catchments)
+-- when they exist; KNN over transformers_new otherwise
+SELECT to_regclass('transformer_catchments') IS NOT NULL AS has_catchments \gset
+\if :has_catchments
+SELECT EXISTS (
+    SELECT 1 FROM transformer_catchments WHERE source = 'transformers_new'
+) AS has_catchments \gset
+\endif
+
+\if :has_catchments
+WITH nearest_transformers AS (
+    SELECT DISTINCT ON (b.id)
+        b.id as building_id,
+        ST_Distance(b.geometry::geography, t.geometry::geography) as distance_m
+    FROM :partition b
+    JOIN transformer_catchments_subdivided c
+        ON c.source = 'transformers_new' AND ST_Intersects(c.geometry, b.geometry)
+    JOIN transformers_new t ON t.id = c.transformer_id
+    WHERE :source_filter
+    ORDER BY b.id, distance_m
+)
+UPDATE :partition b
+SET distance_to_transformer_m = ROUND(nt.distance_m::numeric, 2)
+FROM nearest_transformers nt
+WHERE b.id = nt.building_id;
+\else
+WITH nearest_transformers AS (
+    SELECT
+        b.id as building_id,
+        ST_Distance(b.geometry::geography, t.geometry::geography) as distance_m
+    FROM :partition b
+    CROSS JOIN LATERAL (
+        SELECT geometry
+        FROM transformers_new
+        ORDER BY b.geometry <-> geometry
+        LIMIT 1
+    ) t
+    WHERE :source_filter
+)
+UPDATE :partition b
+SET distance_to_transformer_m = ROUND(nt.distance_m::numeric, 2)
+FROM nearest_transformers nt
+WHERE b.id = nt.building_id;
+\endif
+
+\echo '✓ Metrics complete for' :partition
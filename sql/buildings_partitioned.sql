@@ -0,0 +1,166 @@
+-- ============================================================================
+-- Partition the buildings table by county (fylkesnummer)
+-- ============================================================================
+-- Purpose: Scale from Agder (130K buildings) to all of Norway (~4M)
+-- Layout:  buildings is LIST-partitioned on fylkesnummer (first two digits of
+--          kommunenummer), one partition per county (buildings_f03 ...
+--          buildings_f56) plus buildings_default for unknown locations.
+--          Indexes are declared on the parent, so every partition gets its
+--          own GiST index and KNN/ST_DWithin only walk one county's tree.
+--
+-- Idempotent:
+--   - No buildings table yet      -> creates the partitioned table
+--   - Plain (heap) buildings      -> migrates it; the old table is kept as
+--                                    buildings_unpartitioned for rollback
+--   - Already partitioned         -> only adds missing county partitions
+--
+-- Usage:
+--   psql -d svakenett -f sql/buildings_partitioned.sql
+--   DROP TABLE buildings_unpartitioned;   -- once the migration is verified
+--
+-- Per-partition work: python -m svakenett.partitions --help
+-- ============================================================================
+
+\set ON_ERROR_STOP on
+\timing on
+
+\echo '========================================================================'
+\echo 'Partitioning buildings by county (fylkesnummer)'
+\echo '========================================================================'
+
+SELECT
+    EXISTS (SELECT 1 FROM pg_class WHERE relname = 'buildings' AND relkind = 'r') AS buildings_is_heap,
+    EXISTS (SELECT 1 FROM pg_class WHERE relname = 'buildings' AND relkind = 'p') AS buildings_is_partitioned
+\gset
+
+BEGIN;
+
+\if :buildings_is_heap
+\echo 'Step 1: Migrating existing buildings table...'
+
+ALTER TABLE buildings RENAME TO buildings_unpartitioned;
+
+-- Free the index names for the partitioned table
+DO $$
+DECLARE
+    idx record;
+BEGIN
+    FOR idx IN SELECT indexname FROM pg_indexes WHERE tablename = 'buildings_unpartitioned' LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', idx.indexname, left('unpartitioned_' || idx.indexname, 63));
+    END LOOP;
+END $$;
+
+ALTER TABLE buildings_unpartitioned ADD COLUMN IF NOT EXISTS kommunenummer VARCHAR(4);
+ALTER TABLE buildings_unpartitioned ADD COLUMN IF NOT EXISTS fylkesnummer CHAR(2);
+
+-- County from kommunenummer, else from the postal code's municipality
+UPDATE buildings_unpartitioned b
+SET fylkesnummer = COALESCE(
+    left(b.kommunenummer, 2),
+    (SELECT left(pc.municipality_number, 2) FROM postal_codes pc WHERE pc.postal_code = b.postal_code),
+    '00'
+);
+
+ALTER TABLE buildings_unpartitioned ALTER COLUMN fylkesnummer SET NOT NULL;
+
+-- Same columns and defaults as the old table (including the id sequence)
+CREATE TABLE buildings (
+    LIKE buildings_unpartitioned INCLUDING DEFAULTS INCLUDING GENERATED,
+    PRIMARY KEY (fylkesnummer, id)
+) PARTITION BY LIST (fylkesnummer);
+
+SELECT pg_get_serial_sequence('buildings_unpartitioned', 'id') AS id_sequence \gset
+\if :{?id_sequence}
+ALTER SEQUENCE :id_sequence OWNED BY buildings.id;
+\endif
+
+\elif :buildings_is_partitioned
+\echo 'Step 1: buildings is already partitioned'
+
+\else
+\echo 'Step 1: Creating partitioned buildings table...'
+
+CREATE TABLE buildings (
+    id BIGSERIAL,
+    geometry GEOMETRY(Point, 4326) NOT NULL,
+
+    -- Building classification
+    bygningstype INTEGER,
+    building_type_name VARCHAR(100),
+    building_source VARCHAR(50),
+
+    -- Location (fylkesnummer is the partition key)
+    postal_code VARCHAR(4),
+    kommunenummer VARCHAR(4),
+    kommunenavn VARCHAR(100),
+    fylkesnummer CHAR(2) NOT NULL,
+
+    -- Grid metrics
+    distance_to_line_m REAL,
+    voltage_level_kv REAL,
+    nearest_line_owner VARCHAR(20),
+    grid_density_lines_1km INTEGER,
+    grid_density_length_km REAL,
+    grid_age_years REAL,
+    distance_to_transformer_m REAL,
+
+    -- Score
+    weak_grid_score REAL,
+
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (fylkesnummer, id)
+) PARTITION BY LIST (fylkesnummer);
+\endif
+
+\echo 'Step 2: County partitions...'
+
+-- Counties after the 2024 regional reform
+DO $$
+DECLARE
+    fylke text;
+BEGIN
+    FOREACH fylke IN ARRAY ARRAY['03', '11', '15', '18', '31', '32', '33', '34', '39', '40', '42', '46', '50', '55', '56'] LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF buildings FOR VALUES IN (%L)',
+            'buildings_f' || fylke, fylke
+        );
+    END LOOP;
+END $$;
+
+CREATE TABLE IF NOT EXISTS buildings_default PARTITION OF buildings DEFAULT;
+
+\if :buildings_is_heap
+\echo 'Step 3: Copying buildings into partitions...'
+INSERT INTO buildings SELECT * FROM buildings_unpartitioned;
+\endif
+
+\echo 'Step 4: Partitioned indexes (one per partition)...'
+
+CREATE INDEX IF NOT EXISTS idx_buildings_geom ON buildings USING GIST(geometry);
+CREATE INDEX IF NOT EXISTS idx_buildings_postal ON buildings(postal_code);
+CREATE INDEX IF NOT EXISTS idx_buildings_type ON buildings(bygningstype);
+CREATE INDEX IF NOT EXISTS idx_buildings_source ON buildings(building_source);
+CREATE INDEX IF NOT EXISTS idx_buildings_kommune ON buildings(kommunenummer);
+
+\echo 'Step 5: updated_at trigger (cloned to every partition)...'
+\ir updated_at_triggers.sql
+
+COMMIT;
+
+ANALYZE buildings;
+
+\echo ''
+\echo '[Rows per partition]'
+SELECT
+    c.relname AS partition,
+    pg_get_expr(c.relpartbound, c.oid) AS bounds,
+    c.reltuples::bigint AS estimated_rows,
+    pg_size_pretty(pg_total_relation_size(c.oid)) AS total_size
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'buildings'::regclass
+ORDER BY c.relname;
+
+\echo ''
+\echo '✓ buildings is partitioned by fylkesnummer'
@@ -0,0 +1,76 @@
+-- ============================================================================
+-- Grid metrics for one key range of cabins
+-- ============================================================================
+-- Purpose: Distance, voltage and owner of the nearest power line, grid
+--          density and age within 1km and distance to the nearest
+--          transformer, computed per id range on concurrent connections
+--          (replaces the LIMIT/OFFSET loops of 17_calculate_metrics_complete.sh).
+--          Each range only reads; its rows are COPYed into a staging table
+--          and applied in one UPDATE at the end.
+-- Usage:   svakenett metrics --table cabins --concurrency 8
+--          python -m svakenett.batches run sql/cabin_metrics_batch.sql \
+--              --table cabins --into cabin_metrics_staging
+-- Keep the metric definitions in sync with building_metrics_batch.sql.
+-- ============================================================================
+
+DROP TABLE IF EXISTS cabin_metrics_staging;
+
+CREATE UNLOGGED TABLE cabin_metrics_staging (
+    cabin_id BIGINT PRIMARY KEY,
+    distance_to_line_m NUMERIC,
+    voltage_level_kv REAL,
+    nearest_line_owner TEXT,
+    grid_density_lines_1km INTEGER,
+    grid_density_length_km NUMERIC,
+    grid_age_years NUMERIC,
+    distance_to_transformer_m NUMERIC
+);
+
+SELECT
+    c.id AS cabin_id,
+    ROUND(ST_Distance(c.geometry::geography, nl.geometry::geography)::numeric, 2) AS distance_to_line_m,
+    nl.voltage_kv AS voltage_level_kv,
+    nl.owner_orgnr AS nearest_line_owner,
+    dc.line_count AS grid_density_lines_1km,
+    ROUND(dc.total_length_km::numeric, 2) AS grid_density_length_km,
+    dc.avg_age_years AS grid_age_years,
+    ROUND(ST_Distance(c.geometry::geography, nt.geometry::geography)::numeric, 2) AS distance_to_transformer_m
+FROM cabins c
+-- METRIC 1: Nearest power line
+CROSS JOIN LATERAL (
+    SELECT geometry, voltage_kv, owner_orgnr
+    FROM power_lines_new
+    ORDER BY c.geometry <-> geometry
+    LIMIT 1
+) nl
+-- METRICS 2-3: Grid density and average age within 1km
+CROSS JOIN LATERAL (
+    SELECT
+        COUNT(pl.id) AS line_count,
+        COALESCE(SUM(ST_Length(pl.geometry::geography)) / 1000, 0) AS total_length_km,
+        ROUND(AVG(2025 - pl.year_built)::numeric, 1) AS avg_age_years
+    FROM power_lines_new pl
+    WHERE ST_DWithin(c.geometry::geography, pl.geometry::geography, 1000)
+) dc
+-- METRIC 4: Nearest transformer
+CROSS JOIN LATERAL (
+    SELECT geometry
+    FROM transformers_new
+    ORDER BY c.geometry <-> geometry
+    LIMIT 1
+) nt
+WHERE c.id BETWEEN %(lo)s AND %(hi)s;
+
+UPDATE cabins c
+SET
+    distance_to_line_m = s.distance_to_line_m,
+    voltage_level_kv = s.voltage_level_kv,
+    nearest_line_owner = s.nearest_line_owner,
+    grid_density_lines_1km = s.grid_density_lines_1km,
+    grid_density_length_km = s.grid_density_length_km,
+    grid_age_years = s.grid_age_years,
+    distance_to_transformer_m = s.distance_to_transformer_m
+FROM cabin_metrics_staging s
+WHERE c.id = s.cabin_id;
+
+DROP TABLE cabin_metrics_staging;
@@ -0,0 +1,24 @@
+-- ============================================================================
+-- High-value cabin prospects (weak_grid_score >= 70)
+-- ============================================================================
+-- Purpose: Rows of data/high_value_prospects.csv, strongest prospects first
+-- Usage:   svakenett score --table cabins --export data/high_value_prospects.csv
+-- ============================================================================
+
+SELECT
+    c.id,
+    c.postal_code,
+    gc.company_name as grid_company,
+    gc.kile_cost_nok,
+    c.distance_to_line_m,
+    c.grid_density_lines_1km,
+    c.grid_age_years,
+    c.voltage_level_kv,
+    c.weak_grid_score,
+    c.score_category,
+    ST_X(c.geometry) as longitude,
+    ST_Y(c.geometry) as latitude
+FROM cabins c
+LEFT JOIN grid_companies gc ON c.grid_company_code = gc.company_code
+WHERE c.weak_grid_score >= 70
+ORDER BY c.weak_grid_score DESC;
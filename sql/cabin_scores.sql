@@ -0,0 +1,126 @@
+-- ============================================================================
+-- Weak Grid Scores for Cabins (weighted, with KILE)
+-- ============================================================================
+-- Purpose: Normalize the cabin metrics to 0-100, combine them into
+--          weak_grid_score, assign score categories and refresh the
+--          materialized views. Algorithm: docs/SCORING_ALGORITHM_DESIGN.md
+-- Dependencies: cabin metrics (sql/cabin_metrics_batch.sql) and grid company
+--          assignment (svakenett assign grid-companies)
+-- Usage:   svakenett score --table cabins [--export data/high_value_prospects.csv]
+--          svakenett sql sql/cabin_scores.sql
+-- Reports: svakenett sql sql/validate_cabin_scores.sql
+-- ============================================================================
+
+\echo '========================================'
+\echo 'Applying Weak Grid Scoring Algorithm'
+\echo '========================================'
+
+-- ============================================================================
+-- STEP 1: Individual metric scores (normalized 0-100)
+-- ============================================================================
+
+-- Score 1: Distance to Line (40% weight)
+-- Distance score (0-100m=0pts, 100-500m=0-50pts, 500-2000m=50-90pts, 2000m+=100pts)
+UPDATE cabins
+SET score_distance = CASE
+    WHEN distance_to_line_m IS NULL THEN NULL
+    WHEN distance_to_line_m <= 100 THEN 0
+    WHEN distance_to_line_m <= 500 THEN
+        ((distance_to_line_m - 100) / 400.0) * 50
+    WHEN distance_to_line_m <= 2000 THEN
+        50 + ((distance_to_line_m - 500) / 1500.0) * 40
+    ELSE 100
+END;
+
+-- Score 2: Grid Density (25% weight)
+-- Density score (0 lines=100pts, 1-2=80pts, 3-5=50pts, 6-10=20pts, 10+=0pts)
+UPDATE cabins
+SET score_density = CASE
+    WHEN grid_density_lines_1km IS NULL THEN NULL
+    WHEN grid_density_lines_1km >= 10 THEN 0
+    WHEN grid_density_lines_1km >= 6 THEN 20
+    WHEN grid_density_lines_1km >= 3 THEN 50
+    WHEN grid_density_lines_1km >= 1 THEN 80
+    ELSE 100
+END;
+
+-- Score 3: KILE Costs (15% weight)
+-- KILE score (0-500=0pts, 500-1500=0-50pts, 1500-3000=50-80pts, 3000+=100pts)
+UPDATE cabins c
+SET score_kile = CASE
+    WHEN gc.kile_cost_nok IS NULL THEN NULL
+    WHEN gc.kile_cost_nok <= 500 THEN 0
+    WHEN gc.kile_cost_nok <= 1500 THEN
+        ((gc.kile_cost_nok - 500) / 1000.0) * 50
+    WHEN gc.kile_cost_nok <= 3000 THEN
+        50 + ((gc.kile_cost_nok - 1500) / 1500.0) * 30
+    ELSE 100
+END
+FROM grid_companies gc
+WHERE c.grid_company_code = gc.company_code;
+
+-- Score 4: Voltage Level (10% weight)
+-- Voltage score (22kV=100pts, 33-66kV=50pts, 132kV+=0pts)
+UPDATE cabins
+SET score_voltage = CASE
+    WHEN voltage_level_kv IS NULL THEN NULL
+    WHEN voltage_level_kv >= 132 THEN 0
+    WHEN voltage_level_kv >= 33 THEN 50
+    ELSE 100
+END;
+
+-- Score 5: Grid Age (10% weight)
+-- Age score (0-10yrs=0pts, 10-20=25pts, 20-30=50pts, 30-40=75pts, 40+=100pts)
+UPDATE cabins
+SET score_age = CASE
+    WHEN grid_age_years IS NULL THEN NULL
+    WHEN grid_age_years <= 10 THEN 0
+    WHEN grid_age_years <= 20 THEN 25
+    WHEN grid_age_years <= 30 THEN 50
+    WHEN grid_age_years <= 40 THEN 75
+    ELSE 100
+END;
+
+\echo '  ✓ All metric scores normalized'
+
+-- ============================================================================
+-- STEP 2: Weighted composite score
+-- ============================================================================
+-- 40% distance + 25% density + 15% KILE + 10% voltage + 10% age
+
+UPDATE cabins
+SET weak_grid_score = ROUND(
+    (0.40 * COALESCE(score_distance, 0)) +
+    (0.25 * COALESCE(score_density, 0)) +
+    (0.15 * COALESCE(score_kile, 0)) +
+    (0.10 * COALESCE(score_voltage, 0)) +
+    (0.10 * COALESCE(score_age, 0))
+, 2)
+WHERE score_distance IS NOT NULL;  -- Only score cabins with distance data
+
+\echo '  ✓ Composite scores calculated'
+
+-- ============================================================================
+-- STEP 3: Score categories
+-- ============================================================================
+
+UPDATE cabins
+SET score_category = CASE
+    WHEN weak_grid_score >= 90 THEN 'Excellent Prospect (90-100)'
+    WHEN weak_grid_score >= 70 THEN 'Good Prospect (70-89)'
+    WHEN weak_grid_score >= 50 THEN 'Moderate Prospect (50-69)'
+    WHEN weak_grid_score >= 0 THEN 'Poor Prospect (0-49)'
+    ELSE NULL
+END,
+scoring_updated_at = NOW()
+WHERE weak_grid_score IS NOT NULL;
+
+\echo '  ✓ Categories assigned'
+
+-- ============================================================================
+-- STEP 4: Refresh materialized views
+-- ============================================================================
+
+SELECT refresh_grid_analytics();
+
+\echo '  ✓ Materialized views refreshed'
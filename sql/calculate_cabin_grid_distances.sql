@@ -245,6 +245,34 @@ WHERE grid_density_1km IS NOT NULL;
 \echo ''
 \echo '[3/4] Calculating distance to nearest transformer...'
 
+-- Catchments built with
+--   python scripts/processing/build_transformer_catchments.py --transformers nve_transformers
+-- turn this into a point-in-polygon lookup; otherwise KNN per cabin
+SELECT to_regclass('transformer_catchments') IS NOT NULL AS has_catchments \gset
+\if :has_catchments
+SELECT EXISTS (
+    SELECT 1 FROM transformer_catchments WHERE source = 'nve_transformers'
+) AS has_catchments \gset
+\endif
+
+\if :has_catchments
+UPDATE cabins c
+SET nearest_transformer_m = subq.distance_m
+FROM (
+    SELECT DISTINCT ON (c.id)
+        c.id as cabin_id,
+        ST_Distance(
+            c.geometry::geography,
+            t.geometry::geography
+        ) as distance_m
+    FROM cabins c
+    JOIN transformer_catchments_subdivided tc
+        ON tc.source = 'nve_transformers' AND ST_Intersects(tc.geometry, c.geometry)
+    JOIN nve_transformers t ON t.id = tc.transformer_id
+    ORDER BY c.id, distance_m
+) subq
+WHERE c.id = subq.cabin_id;
+\else
 UPDATE cabins c
 SET nearest_transformer_m = subq.distance_m
 FROM (
@@ -263,6 +291,7 @@ FROM (
     ) t
 ) subq
 WHERE c.id = subq.cabin_id;
+\endif
 
 \echo '  ✓ Transformer distances calculated'
 
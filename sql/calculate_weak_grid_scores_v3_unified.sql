@@ -14,60 +14,16 @@
 \echo 'UNIFIED TABLE - All Building Types'
 \echo '========================================'
 
+-- Shared scoring function (weights documented there)
+\ir weak_grid_score_v3_function.sql
+
 -- Reset all scores
 UPDATE buildings SET weak_grid_score = NULL;
 
 -- Apply v3.0 scoring - Score ALL buildings within reasonable distance
 UPDATE buildings
-SET weak_grid_score = (
-    -- ========================================================================
-    -- FACTOR 1: Distance to Power Line (50% weight)
-    -- ========================================================================
-    -- Buildings far from infrastructure = weak grid or off-grid
-    -- Norwegian reality: Many buildings 2-10km from lines
-    -- ========================================================================
-    0.50 * CASE
-        WHEN distance_to_line_m IS NULL THEN 50
-        WHEN distance_to_line_m <= 100 THEN 0          -- Very close = strong grid
-        WHEN distance_to_line_m <= 500 THEN 20         -- Close = good grid
-        WHEN distance_to_line_m <= 1000 THEN 40        -- Moderate = typical grid-connected
-        WHEN distance_to_line_m <= 2000 THEN 60        -- Far = weak grid
-        WHEN distance_to_line_m <= 5000 THEN 80        -- Very far = very weak/expensive connection
-        ELSE 100                                        -- >5km = likely off-grid
-    END
-
-    -- ========================================================================
-    -- FACTOR 2: Grid Density (30% weight)
-    -- ========================================================================
-    + 0.30 * CASE
-        WHEN grid_density_lines_1km IS NULL OR grid_density_lines_1km = 0 THEN 100
-        WHEN grid_density_lines_1km >= 10 THEN 0
-        WHEN grid_density_lines_1km >= 6 THEN 20
-        WHEN grid_density_lines_1km >= 3 THEN 50
-        WHEN grid_density_lines_1km >= 1 THEN 80
-        ELSE 100
-    END
-
-    -- ========================================================================
-    -- FACTOR 3: Voltage Level (12% weight)
-    -- ========================================================================
-    + 0.12 * CASE
-        WHEN voltage_level_kv IS NULL THEN 50
-        WHEN voltage_level_kv >= 132 THEN 0
-        WHEN voltage_level_kv >= 33 THEN 50
-        ELSE 100
-    END
-
-    -- ========================================================================
-    -- FACTOR 4: Grid Age (8% weight)
-    -- ========================================================================
-    + 0.08 * CASE
-        WHEN grid_age_years IS NULL THEN 50
-        WHEN grid_age_years <= 20 THEN 0
-        WHEN grid_age_years <= 30 THEN 50
-        WHEN grid_age_years <= 40 THEN 75
-        ELSE 100
-    END
+SET weak_grid_score = weak_grid_score_v3(
+    distance_to_line_m, grid_density_lines_1km, voltage_level_kv, grid_age_years
 )
 WHERE distance_to_line_m <= 10000;  -- Only score buildings within 10km of infrastructure
 
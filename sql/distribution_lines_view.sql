@@ -0,0 +1,38 @@
+-- ============================================================================
+-- Distribution Lines View (11-24 kV)
+-- ============================================================================
+-- Purpose: Pre-filter to 11-24 kV lines only
+-- Rationale: One-time operation, creates indexed view for all subsequent queries
+-- Performance: ~10-30 seconds (one-time cost)
+-- Used by: optimized_weak_grid_filter_v4.sql (Step 0), pipeline stage distribution_view
+-- ============================================================================
+
+\echo 'Step 0: Creating distribution lines view (11-24 kV)...'
+
+DROP MATERIALIZED VIEW IF EXISTS distribution_lines_11_24kv CASCADE;
+
+CREATE MATERIALIZED VIEW distribution_lines_11_24kv AS
+-- Distribution power lines (11-24 kV)
+SELECT
+    id,
+    geometry,
+    spenning_kv as voltage_kv,
+    driftsattaar::integer as year_built,
+    eierorgnr::text as owner_orgnr
+FROM power_lines_new
+WHERE spenning_kv BETWEEN 11 AND 24;
+
+-- Create spatial index
+CREATE INDEX idx_distribution_lines_geom
+    ON distribution_lines_11_24kv USING GIST(geometry);
+
+\echo '  ✓ Distribution lines view created'
+
+-- Show statistics
+SELECT
+    COUNT(*) as total_lines,
+    COUNT(voltage_kv) as lines_with_voltage,
+    ROUND(AVG(voltage_kv)) as avg_voltage_kv,
+    MIN(voltage_kv) as min_voltage_kv,
+    MAX(voltage_kv) as max_voltage_kv
+FROM distribution_lines_11_24kv;
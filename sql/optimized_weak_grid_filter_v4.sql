@@ -35,38 +35,27 @@
 -- Note: Power poles removed - LineString geometries already represent complete lines
 -- ============================================================================
 
-\echo 'Step 0: Creating distribution lines view (11-24 kV)...'
-
-DROP MATERIALIZED VIEW IF EXISTS distribution_lines_11_24kv CASCADE;
-
-CREATE MATERIALIZED VIEW distribution_lines_11_24kv AS
--- Distribution power lines (11-24 kV)
-SELECT
-    id,
-    geometry,
-    spenning_kv as voltage_kv,
-    driftsattaar::integer as year_built,
-    eierorgnr::text as owner_orgnr
-FROM power_lines_new
-WHERE spenning_kv BETWEEN 11 AND 24;
-
--- Create spatial index
-CREATE INDEX idx_distribution_lines_geom
-    ON distribution_lines_11_24kv USING GIST(geometry);
-
-\echo '  ✓ Distribution lines view created'
-
--- Show statistics
-SELECT
-    COUNT(*) as total_lines,
-    COUNT(voltage_kv) as lines_with_voltage,
-    ROUND(AVG(voltage_kv)) as avg_voltage_kv,
-    MIN(voltage_kv) as min_voltage_kv,
-    MAX(voltage_kv) as max_voltage_kv
-FROM distribution_lines_11_24kv;
+-- Built by distribution_lines_view.sql. The pipeline builds it as a separate
+-- stage and passes -v distribution_view_ready=1 to reuse it here.
+\if :{?distribution_view_ready}
+\echo 'Step 0: Using existing distribution lines view (11-24 kV)'
+\else
+\ir distribution_lines_view.sql
+\endif
 
 \echo ''
 
+-- Per-partition runs (python -m svakenett.partitions run ...) pass
+-- -v partition=buildings_fNN: Steps 1-4 then only scan that county and Step 6
+-- replaces that county's candidates. A plain run scans all of buildings.
+\if :{?partition}
+\set per_partition true
+\echo 'Partition:' :partition
+\else
+\set per_partition false
+\set partition buildings
+\endif
+
 -- ============================================================================
 -- STEP 1: Filter by Transformer Distance >30km (HIGHEST SELECTIVITY)
 -- ============================================================================
@@ -81,6 +70,37 @@ FROM distribution_lines_11_24kv;
 
 DROP TABLE IF EXISTS step1_far_from_transformers;
 
+-- With precomputed transformer catchments (svakenett.catchments) the nearest
+-- transformer is a point-in-polygon lookup; otherwise a KNN per building
+SELECT to_regclass('transformer_catchments') IS NOT NULL AS has_catchments \gset
+\if :has_catchments
+SELECT EXISTS (
+    SELECT 1 FROM transformer_catchments WHERE source = 'transformers_new'
+) AS has_catchments \gset
+\endif
+
+\if :has_catchments
+\echo '  (nearest transformer from precomputed catchments)'
+CREATE TEMP TABLE step1_far_from_transformers AS
+SELECT *
+FROM (
+    SELECT DISTINCT ON (b.id)
+        b.id,
+        b.geometry,
+        b.bygningstype,
+        b.building_type_name,
+        b.building_source,
+        b.postal_code,
+        b.kommunenavn,
+        ST_Distance(b.geometry::geography, t.geometry::geography) as transformer_distance_m
+    FROM :partition b
+    JOIN transformer_catchments_subdivided c
+        ON c.source = 'transformers_new' AND ST_Intersects(c.geometry, b.geometry)
+    JOIN transformers_new t ON t.id = c.transformer_id
+    ORDER BY b.id, transformer_distance_m
+) nearest
+WHERE transformer_distance_m > 30000;
+\else
 CREATE TEMP TABLE step1_far_from_transformers AS
 SELECT
     b.id,
@@ -95,12 +115,13 @@ SELECT
         (SELECT geometry FROM transformers_new
          ORDER BY b.geometry <-> geometry LIMIT 1)::geography
     ) as transformer_distance_m
-FROM buildings b
+FROM :partition b
 WHERE NOT EXISTS (
     SELECT 1
     FROM transformers_new t
     WHERE ST_DWithin(b.geometry::geography, t.geometry::geography, 30000)
 );
+\endif
 
 CREATE INDEX idx_step1_geom ON step1_far_from_transformers USING GIST(geometry);
 
@@ -254,6 +275,9 @@ FROM step4_sparse_grid;
 
 \echo 'Step 5: Calculating building/load density within 1km...'
 
+-- Neighbours are counted in all of buildings (not just :partition), so
+-- buildings near a county border see the load on both sides
+
 DROP TABLE IF EXISTS step5_with_load_density;
 
 CREATE TEMP TABLE step5_with_load_density AS
@@ -298,9 +322,9 @@ FROM step5_with_load_density;
 
 \echo 'Step 6: Final weak grid classification with tiering...'
 
-DROP TABLE IF EXISTS weak_grid_candidates_v4;
+DROP VIEW IF EXISTS step6_candidates;
 
-CREATE TABLE weak_grid_candidates_v4 AS
+CREATE TEMP VIEW step6_candidates AS
 SELECT
     id,
     bygningstype,
@@ -333,12 +357,30 @@ SELECT
     (transformer_distance_m / 1000.0) * (buildings_within_1km + 1) as composite_risk_score,
     geometry
 FROM step5_with_load_density
-WHERE buildings_within_1km >= 3  -- At least 3 buildings (including self) sharing weak grid
+WHERE buildings_within_1km >= 3;  -- At least 3 buildings (including self) sharing weak grid
+
+\if :per_partition
+BEGIN;
+-- Parallel partition runs share the output table: serialize this step
+SELECT pg_advisory_xact_lock(hashtext('weak_grid_candidates_v4'));
+CREATE TABLE IF NOT EXISTS weak_grid_candidates_v4 AS SELECT * FROM step6_candidates WITH NO DATA;
+DELETE FROM weak_grid_candidates_v4 WHERE id IN (SELECT id FROM :partition);
+INSERT INTO weak_grid_candidates_v4 SELECT * FROM step6_candidates;
+CREATE INDEX IF NOT EXISTS idx_weak_grid_v4_geom ON weak_grid_candidates_v4 USING GIST(geometry);
+CREATE INDEX IF NOT EXISTS idx_weak_grid_v4_risk ON weak_grid_candidates_v4(composite_risk_score DESC);
+CREATE INDEX IF NOT EXISTS idx_weak_grid_v4_tier ON weak_grid_candidates_v4(weak_grid_tier);
+COMMIT;
+\else
+DROP TABLE IF EXISTS weak_grid_candidates_v4;
+
+CREATE TABLE weak_grid_candidates_v4 AS
+SELECT * FROM step6_candidates
 ORDER BY transformer_distance_m DESC, buildings_within_1km DESC;
 
 CREATE INDEX idx_weak_grid_v4_geom ON weak_grid_candidates_v4 USING GIST(geometry);
 CREATE INDEX idx_weak_grid_v4_risk ON weak_grid_candidates_v4(composite_risk_score DESC);
 CREATE INDEX idx_weak_grid_v4_tier ON weak_grid_candidates_v4(weak_grid_tier);
+\endif
 
 \echo '  ✓ Step 6 complete'
 \echo ''
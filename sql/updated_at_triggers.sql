@@ -0,0 +1,46 @@
+-- ============================================================================
+-- updated_at change tracking for cabins and buildings
+-- ============================================================================
+-- Purpose: Delta GeoPackage exports (svakenett.gpkg_export, --delta) select
+--          rows stamped since the previous export's watermark. A column
+--          DEFAULT only stamps inserts, so a BEFORE UPDATE trigger stamps
+--          every update that actually changes the row. Updates that write
+--          the same values (a re-run of the metrics or scores) keep the old
+--          stamp, so they do not make the next delta a full export.
+--
+-- updated_at is deliberately not indexed: an index on it would turn every
+-- metrics/scoring update into a non-HOT update.
+--
+-- Idempotent: adds the column where missing and (re)creates the triggers on
+-- whichever of the tables exist. On partitioned buildings the trigger is
+-- declared once on the parent and cloned to every partition.
+--
+-- Usage:
+--   psql -d svakenett -f sql/updated_at_triggers.sql
+--   (also included by 01_init_schema.sql and buildings_partitioned.sql)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS trigger AS $$
+BEGIN
+    IF NEW IS DISTINCT FROM OLD THEN
+        NEW.updated_at := NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tbl text;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['cabins', 'buildings'] LOOP
+        CONTINUE WHEN to_regclass(tbl) IS NULL;
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW()', tbl);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tbl || '_updated_at', tbl);
+        EXECUTE format(
+            'CREATE TRIGGER %I BEFORE UPDATE ON %I FOR EACH ROW EXECUTE FUNCTION set_updated_at()',
+            tbl || '_updated_at', tbl
+        );
+    END LOOP;
+END $$;
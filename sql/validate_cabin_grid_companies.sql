@@ -0,0 +1,53 @@
+-- ============================================================================
+-- Cabin Grid Company Assignment Results
+-- ============================================================================
+-- Purpose: Coverage, top companies, KILE statistics and sample cabins
+--          after svakenett assign grid-companies
+-- Usage:   svakenett sql sql/validate_cabin_grid_companies.sql
+-- ============================================================================
+
+\echo ''
+\echo 'Coverage:'
+SELECT
+    COUNT(*) as total_cabins,
+    COUNT(grid_company_code) as cabins_with_company,
+    COUNT(*) - COUNT(grid_company_code) as cabins_without_company,
+    ROUND(100.0 * COUNT(grid_company_code) / COUNT(*), 1) as coverage_percent
+FROM cabins;
+
+\echo ''
+\echo 'Top 10 grid companies by cabin count:'
+SELECT
+    gc.company_name,
+    gc.company_code,
+    COUNT(c.id) as cabin_count,
+    gc.kile_cost_nok
+FROM cabins c
+JOIN grid_companies gc ON c.grid_company_code = gc.company_code
+GROUP BY gc.company_name, gc.company_code, gc.kile_cost_nok
+ORDER BY COUNT(c.id) DESC
+LIMIT 10;
+
+\echo ''
+\echo 'KILE statistics for companies serving our cabins:'
+SELECT
+    COUNT(DISTINCT gc.company_code) as companies_serving_cabins,
+    SUM(gc.kile_cost_nok) as total_kile_costs,
+    AVG(gc.kile_cost_nok) as avg_kile_cost,
+    MAX(gc.kile_cost_nok) as max_kile_cost
+FROM grid_companies gc
+WHERE gc.company_code IN (SELECT DISTINCT grid_company_code FROM cabins WHERE grid_company_code IS NOT NULL);
+
+\echo ''
+\echo 'Sample cabins with grid company assignments:'
+SELECT
+    c.id,
+    c.postal_code,
+    gc.company_name,
+    gc.kile_cost_nok,
+    ST_X(c.geometry) as lon,
+    ST_Y(c.geometry) as lat
+FROM cabins c
+JOIN grid_companies gc ON c.grid_company_code = gc.company_code
+WHERE gc.kile_cost_nok > 1000
+LIMIT 5;
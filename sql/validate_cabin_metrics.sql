@@ -0,0 +1,34 @@
+-- ============================================================================
+-- Cabin Grid Metrics Results
+-- ============================================================================
+-- Purpose: Metric completeness and the cabins farthest from a line after
+--          svakenett metrics --table cabins
+-- Usage:   svakenett sql sql/validate_cabin_metrics.sql
+-- ============================================================================
+
+\echo ''
+\echo 'Metric completeness:'
+SELECT
+    COUNT(*) as total_cabins,
+    COUNT(distance_to_line_m) as has_distance,
+    COUNT(grid_density_lines_1km) as has_density,
+    COUNT(grid_age_years) as has_age,
+    COUNT(voltage_level_kv) as has_voltage,
+    ROUND(100.0 * COUNT(distance_to_line_m) / COUNT(*), 1) as distance_pct
+FROM cabins;
+
+\echo ''
+\echo 'Sample cabins with calculated metrics:'
+SELECT
+    id,
+    postal_code,
+    ROUND(distance_to_line_m) as dist_m,
+    grid_density_lines_1km as density,
+    ROUND(grid_age_years, 1) as age_yrs,
+    voltage_level_kv as voltage_kv,
+    ST_X(geometry) as lon,
+    ST_Y(geometry) as lat
+FROM cabins
+WHERE distance_to_line_m IS NOT NULL
+ORDER BY distance_to_line_m DESC
+LIMIT 10;
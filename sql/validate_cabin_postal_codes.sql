@@ -0,0 +1,48 @@
+-- ============================================================================
+-- Cabin Postal Code Assignment Results
+-- ============================================================================
+-- Purpose: Coverage, regions, Agder and sample cabins after
+--          svakenett assign postal-codes
+-- Usage:   svakenett sql sql/validate_cabin_postal_codes.sql
+-- ============================================================================
+
+\echo ''
+\echo 'Coverage:'
+SELECT
+    COUNT(*) as total_cabins,
+    COUNT(postal_code) as cabins_with_postal_code,
+    COUNT(*) - COUNT(postal_code) as cabins_without_postal_code,
+    ROUND(100.0 * COUNT(postal_code) / COUNT(*), 1) as coverage_percent
+FROM cabins;
+
+\echo ''
+\echo 'Coverage by region:'
+SELECT
+    SUBSTRING(postal_code FROM 1 FOR 1) as region_prefix,
+    COUNT(*) as cabin_count
+FROM cabins
+WHERE postal_code IS NOT NULL
+GROUP BY SUBSTRING(postal_code FROM 1 FOR 1)
+ORDER BY region_prefix;
+
+\echo ''
+\echo 'Agder region (postal codes 4xxx) coverage:'
+SELECT
+    COUNT(*) as agder_cabins,
+    COUNT(DISTINCT postal_code) as unique_postal_codes
+FROM cabins
+WHERE postal_code LIKE '4%';
+
+\echo ''
+\echo 'Sample cabins with assigned postal codes:'
+SELECT
+    c.id,
+    c.building_type,
+    c.postal_code,
+    pc.postal_name,
+    ST_X(c.geometry) as lon,
+    ST_Y(c.geometry) as lat
+FROM cabins c
+LEFT JOIN postal_codes pc ON c.postal_code = pc.postal_code
+WHERE c.postal_code IS NOT NULL
+LIMIT 5;
@@ -0,0 +1,107 @@
+-- ============================================================================
+-- Cabin Scoring Results
+-- ============================================================================
+-- Purpose: Distribution, top prospects, metric correlations, geography and
+--          grid company comparison of the cabin weak grid scores
+-- Usage:   svakenett sql sql/validate_cabin_scores.sql
+-- ============================================================================
+
+\echo ''
+\echo 'Score distribution by category:'
+SELECT
+    score_category,
+    COUNT(*) as cabin_count,
+    ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER (), 1) as percentage,
+    ROUND(MIN(weak_grid_score), 1) as min_score,
+    ROUND(AVG(weak_grid_score), 1) as avg_score,
+    ROUND(MAX(weak_grid_score), 1) as max_score
+FROM cabins
+WHERE weak_grid_score IS NOT NULL
+GROUP BY score_category
+ORDER BY MIN(weak_grid_score) DESC;
+
+\echo ''
+\echo 'Top 20 highest scoring cabins (weakest grids):'
+SELECT
+    c.id,
+    c.postal_code,
+    gc.company_name as grid_company,
+    ROUND(c.distance_to_line_m, 0) as dist_m,
+    c.grid_density_lines_1km as density,
+    ROUND(c.grid_age_years, 1) as age_yrs,
+    c.voltage_level_kv as voltage,
+    gc.kile_cost_nok as kile,
+    ROUND(c.weak_grid_score, 1) as score,
+    ST_X(c.geometry) as lon,
+    ST_Y(c.geometry) as lat
+FROM cabins c
+LEFT JOIN grid_companies gc ON c.grid_company_code = gc.company_code
+WHERE c.weak_grid_score IS NOT NULL
+ORDER BY c.weak_grid_score DESC, c.distance_to_line_m DESC
+LIMIT 20;
+
+\echo ''
+\echo 'Metric correlation analysis:'
+SELECT
+    'Distance vs Score' as correlation,
+    ROUND(CORR(distance_to_line_m, weak_grid_score)::numeric, 3) as correlation_coef
+FROM cabins
+WHERE weak_grid_score IS NOT NULL AND distance_to_line_m IS NOT NULL
+
+UNION ALL
+
+SELECT
+    'Density vs Score' as correlation,
+    ROUND(CORR(grid_density_lines_1km, weak_grid_score)::numeric, 3) as correlation_coef
+FROM cabins
+WHERE weak_grid_score IS NOT NULL AND grid_density_lines_1km IS NOT NULL
+
+UNION ALL
+
+SELECT
+    'Age vs Score' as correlation,
+    ROUND(CORR(grid_age_years, weak_grid_score)::numeric, 3) as correlation_coef
+FROM cabins
+WHERE weak_grid_score IS NOT NULL AND grid_age_years IS NOT NULL
+
+UNION ALL
+
+SELECT
+    'KILE vs Score' as correlation,
+    ROUND(CORR(gc.kile_cost_nok, c.weak_grid_score)::numeric, 3) as correlation_coef
+FROM cabins c
+JOIN grid_companies gc ON c.grid_company_code = gc.company_code
+WHERE c.weak_grid_score IS NOT NULL;
+
+\echo ''
+\echo 'Geographic distribution of high-value prospects:'
+SELECT
+    LEFT(postal_code, 2) as postal_prefix,
+    COUNT(*) FILTER (WHERE weak_grid_score >= 90) as excellent_prospects,
+    COUNT(*) FILTER (WHERE weak_grid_score >= 70) as good_or_better,
+    COUNT(*) as total_cabins,
+    ROUND(AVG(weak_grid_score), 1) as avg_score
+FROM cabins
+WHERE weak_grid_score IS NOT NULL
+GROUP BY LEFT(postal_code, 2)
+HAVING COUNT(*) FILTER (WHERE weak_grid_score >= 70) > 0
+ORDER BY COUNT(*) FILTER (WHERE weak_grid_score >= 90) DESC
+LIMIT 10;
+
+\echo ''
+\echo 'Grid company comparison - weak grid performance:'
+SELECT
+    gc.company_name,
+    gc.kile_cost_nok,
+    COUNT(c.id) as total_cabins,
+    COUNT(*) FILTER (WHERE c.weak_grid_score >= 90) as excellent_prospects,
+    COUNT(*) FILTER (WHERE c.weak_grid_score >= 70) as good_or_better,
+    ROUND(AVG(c.weak_grid_score), 1) as avg_score,
+    ROUND(AVG(c.distance_to_line_m), 0) as avg_distance_m
+FROM grid_companies gc
+JOIN cabins c ON gc.company_code = c.grid_company_code
+WHERE c.weak_grid_score IS NOT NULL
+GROUP BY gc.company_name, gc.kile_cost_nok
+HAVING COUNT(c.id) >= 10  -- Only companies with 10+ cabins
+ORDER BY AVG(c.weak_grid_score) DESC
+LIMIT 15;
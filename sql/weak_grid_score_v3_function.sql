@@ -0,0 +1,57 @@
+-- ============================================================================
+-- weak_grid_score_v3(): v3.0 composite weak grid score for one building
+-- ============================================================================
+-- Purpose: The v3.0 UNIFIED weights as an inlinable SQL function, shared by
+--          calculate_weak_grid_scores_v3_unified.sql (whole table) and
+--          weak_grid_scores_v3_batch.sql (concurrent key ranges)
+-- Score range: 0-100 (higher = weaker grid = better solar+battery prospect)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION weak_grid_score_v3(
+    distance_to_line_m double precision,
+    grid_density_lines_1km integer,
+    voltage_level_kv double precision,
+    grid_age_years double precision
+) RETURNS numeric
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT
+        -- FACTOR 1: Distance to Power Line (50% weight)
+        -- Norwegian reality: Many buildings 2-10km from lines
+        0.50 * CASE
+            WHEN distance_to_line_m IS NULL THEN 50
+            WHEN distance_to_line_m <= 100 THEN 0          -- Very close = strong grid
+            WHEN distance_to_line_m <= 500 THEN 20         -- Close = good grid
+            WHEN distance_to_line_m <= 1000 THEN 40        -- Moderate = typical grid-connected
+            WHEN distance_to_line_m <= 2000 THEN 60        -- Far = weak grid
+            WHEN distance_to_line_m <= 5000 THEN 80        -- Very far = very weak/expensive connection
+            ELSE 100                                        -- >5km = likely off-grid
+        END
+
+        -- FACTOR 2: Grid Density (30% weight)
+        + 0.30 * CASE
+            WHEN grid_density_lines_1km IS NULL OR grid_density_lines_1km = 0 THEN 100
+            WHEN grid_density_lines_1km >= 10 THEN 0
+            WHEN grid_density_lines_1km >= 6 THEN 20
+            WHEN grid_density_lines_1km >= 3 THEN 50
+            WHEN grid_density_lines_1km >= 1 THEN 80
+            ELSE 100
+        END
+
+        -- FACTOR 3: Voltage Level (12% weight)
+        + 0.12 * CASE
+            WHEN voltage_level_kv IS NULL THEN 50
+            WHEN voltage_level_kv >= 132 THEN 0
+            WHEN voltage_level_kv >= 33 THEN 50
+            ELSE 100
+        END
+
+        -- FACTOR 4: Grid Age (8% weight)
+        + 0.08 * CASE
+            WHEN grid_age_years IS NULL THEN 50
+            WHEN grid_age_years <= 20 THEN 0
+            WHEN grid_age_years <= 30 THEN 50
+            WHEN grid_age_years <= 40 THEN 75
+            ELSE 100
+        END
+$$;
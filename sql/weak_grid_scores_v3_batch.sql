@@ -0,0 +1,18 @@
+-- ============================================================================
+-- Weak Grid Scores v3.0 for one key range of buildings
+-- ============================================================================
+-- Purpose: Same scores as calculate_weak_grid_scores_v3_unified.sql, written
+--          per id range so ranges run concurrently on separate connections
+-- Usage:   python -m svakenett.batches run sql/weak_grid_scores_v3_batch.sql \
+--              --table buildings --concurrency 8
+-- ============================================================================
+
+\ir weak_grid_score_v3_function.sql
+
+-- Only score buildings within 10km of infrastructure; the rest are reset
+UPDATE buildings
+SET weak_grid_score = CASE
+    WHEN distance_to_line_m <= 10000 THEN
+        weak_grid_score_v3(distance_to_line_m, grid_density_lines_1km, voltage_level_kv, grid_age_years)
+    END
+WHERE id BETWEEN %(lo)s AND %(hi)s;
@@ -0,0 +1,244 @@
+"""
+Point-in-area assignment against subdivided polygons
+
+Reads the pieces built by sql/area_index_subdivided.sql (at most 256 vertices
+each) into a shapely STRtree of prepared geometries and assigns area codes to
+whole arrays of points in one vectorized query.
+
+assign_areas() is the assignment engine for tables in PostGIS: points are
+streamed in chunks, looked up by containment first, and the rest fall back to
+the nearest piece within a metric distance cap (EPSG:25833). The method used
+('contains' or 'nearest') and the distance are stored next to the code.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import shapely
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from svakenett.db import copy_frame, get_engine, stream_query
+
+# Area kind -> (subdivided table, code column)
+AREA_TABLES = {
+    "postal_code": ("postal_codes_subdivided", "postal_code"),
+    "municipality": ("municipalities_subdivided", "municipality_number"),
+    "grid_company": ("grid_company_areas_subdivided", "company_code"),
+}
+
+# ETRS89 / UTM 33N - meters, covers all of Norway acceptably
+METRIC_SRID = 25833
+
+# Nearest-area fallback cap (the old nearest-neighbor scripts used 50 km)
+DEFAULT_MAX_DISTANCE_M = 50_000
+
+METHOD_CONTAINS = "contains"
+METHOD_NEAREST = "nearest"
+
+
+@dataclass
+class AreaIndex:
+    """Subdivided area pieces with their codes and a spatial index."""
+
+    kind: str
+    codes: np.ndarray
+    pieces: np.ndarray
+    tree: shapely.STRtree
+    srid: int = 4326
+
+    @classmethod
+    def from_geometries(cls, kind: str, codes, geometries, srid: int = 4326) -> "AreaIndex":
+        """Index already subdivided pieces (one code per piece)."""
+        pieces = np.asarray(geometries, dtype=object)
+        shapely.prepare(pieces)
+        return cls(kind, np.asarray(codes, dtype=object), pieces, shapely.STRtree(pieces), srid)
+
+    def assign(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Code of the area containing each point (None outside all areas).
+
+        Args:
+            x: X coordinates in the index SRID
+            y: Y coordinates in the index SRID
+
+        Returns:
+            Object array of codes, aligned with the points
+        """
+        points = shapely.points(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        point_idx, piece_idx = self.tree.query(points, predicate="intersects")
+        result = np.full(len(points), None, dtype=object)
+        # A point on a cut line touches several pieces of one area; keep the first
+        first = np.unique(point_idx, return_index=True)[1]
+        result[point_idx[first]] = self.codes[piece_idx[first]]
+        return result
+
+    def nearest(
+        self, x: np.ndarray, y: np.ndarray, max_distance: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Code of and distance to the nearest area piece within max_distance.
+
+        Distances are in index SRID units, so use a metric index (srid=METRIC_SRID).
+
+        Returns:
+            (codes, distances); None / NaN where nothing lies within max_distance
+        """
+        points = shapely.points(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        (point_idx, piece_idx), distances = self.tree.query_nearest(
+            points, max_distance=max_distance, return_distance=True, all_matches=False
+        )
+        codes = np.full(len(points), None, dtype=object)
+        result_distances = np.full(len(points), np.nan)
+        codes[point_idx] = self.codes[piece_idx]
+        result_distances[point_idx] = distances
+        return codes, result_distances
+
+    def assign_with_fallback(
+        self, x: np.ndarray, y: np.ndarray, max_distance: float
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Containment lookup, then nearest piece within max_distance for the rest.
+
+        Returns:
+            (codes, methods, distances); distance is 0 for contained points
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        codes = self.assign(x, y)
+        methods = np.where(codes != None, METHOD_CONTAINS, None).astype(object)  # noqa: E711
+        distances = np.where(codes != None, 0.0, np.nan)  # noqa: E711
+
+        outside = np.flatnonzero(codes == None)  # noqa: E711
+        if len(outside) and max_distance > 0:
+            near_codes, near_distances = self.nearest(x[outside], y[outside], max_distance)
+            found = near_codes != None  # noqa: E711
+            codes[outside[found]] = near_codes[found]
+            methods[outside[found]] = METHOD_NEAREST
+            distances[outside[found]] = near_distances[found]
+        return codes, methods, distances
+
+
+def load_area_index(kind: str, srid: int = 4326, engine: Optional[Engine] = None) -> AreaIndex:
+    """
+    Load one kind of subdivided area from PostGIS.
+
+    Args:
+        kind: 'postal_code', 'municipality' or 'grid_company'
+        srid: Coordinate system of the index (METRIC_SRID for distances in meters)
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        AreaIndex ready for assign()
+
+    Example:
+        >>> postal = load_area_index('postal_code')
+        >>> postal.assign(lon, lat)
+    """
+    if kind not in AREA_TABLES:
+        raise ValueError(f"Unknown area kind '{kind}'. Use one of: {', '.join(AREA_TABLES)}")
+    table, code_column = AREA_TABLES[kind]
+    engine = engine or get_engine()
+
+    geometry = "geometry" if srid == 4326 else f"ST_Transform(geometry, {srid})"
+    df = pd.read_sql(
+        f"SELECT {code_column} AS code, ST_AsBinary({geometry}) AS wkb FROM {table}", engine
+    )
+    index = AreaIndex.from_geometries(
+        kind, df["code"], shapely.from_wkb(df["wkb"].map(bytes).to_numpy()), srid
+    )
+    logger.info(f"Loaded {len(df):,} {kind} pieces from {table}")
+    return index
+
+
+def assign_areas(
+    table: str,
+    kind: str,
+    code_column: str,
+    max_distance_m: float = DEFAULT_MAX_DISTANCE_M,
+    where: Optional[str] = None,
+    chunk_size: int = 100_000,
+    engine: Optional[Engine] = None,
+) -> dict[str, int]:
+    """
+    Assign area codes to the points of a table.
+
+    Points inside an area get its code (method 'contains'); points outside
+    all areas get the nearest area within max_distance_m (method 'nearest').
+    The method and distance go to <code_column>_method and
+    <code_column>_distance_m; points beyond the cap are set to NULL.
+
+    Args:
+        table: Point table with id and geometry (EPSG:4326)
+        kind: 'postal_code', 'municipality' or 'grid_company'
+        code_column: Column receiving the code, e.g. 'grid_company_code'
+        max_distance_m: Nearest-area cap in meters; 0 disables the fallback
+        where: Optional SQL filter of the points to assign
+        chunk_size: Points per streamed chunk and COPY batch
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Points per method ('contains', 'nearest', 'unassigned')
+
+    Example:
+        >>> assign_areas('cabins', 'grid_company', 'grid_company_code', max_distance_m=20_000)
+    """
+    engine = engine or get_engine()
+    index = load_area_index(kind, METRIC_SRID, engine)
+
+    method_column = f"{code_column}_method"
+    distance_column = f"{code_column}_distance_m"
+    with engine.begin() as conn:
+        conn.execute(
+            text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {method_column} VARCHAR(10)")
+        )
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {distance_column} REAL"))
+
+    query = f"""
+        SELECT id, ST_X(p) AS x, ST_Y(p) AS y
+        FROM (SELECT id, ST_Transform(geometry, {METRIC_SRID}) AS p FROM {table}
+              WHERE geometry IS NOT NULL{f' AND ({where})' if where else ''}) s
+    """
+    counts = {METHOD_CONTAINS: 0, METHOD_NEAREST: 0, "unassigned": 0}
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "CREATE TEMP TABLE area_assign "
+                "(id BIGINT, code TEXT, method VARCHAR(10), distance_m REAL)"
+            )
+            for chunk in stream_query(query, chunk_size=chunk_size, engine=engine):
+                codes, methods, distances = index.assign_with_fallback(
+                    chunk["x"].to_numpy(float), chunk["y"].to_numpy(float), max_distance_m
+                )
+                batch = pd.DataFrame(
+                    {"id": chunk["id"], "code": codes, "method": methods, "distance_m": distances}
+                )
+                cur.execute("TRUNCATE area_assign")
+                copy_frame(cur, "area_assign", batch)
+                cur.execute(f"""
+                    UPDATE {table} t
+                    SET {code_column} = a.code,
+                        {method_column} = a.method,
+                        {distance_column} = a.distance_m
+                    FROM area_assign a
+                    WHERE t.id = a.id
+                """)
+                conn.commit()
+
+                counts[METHOD_CONTAINS] += int((methods == METHOD_CONTAINS).sum())
+                counts[METHOD_NEAREST] += int((methods == METHOD_NEAREST).sum())
+                counts["unassigned"] += int((methods == None).sum())  # noqa: E711
+                logger.info(f"  {sum(counts.values()):,} points assigned")
+    finally:
+        conn.close()
+
+    logger.success(
+        f"✓ {table}.{code_column}: {counts[METHOD_CONTAINS]:,} contained, "
+        f"{counts[METHOD_NEAREST]:,} nearest (≤{max_distance_m / 1000:g} km), "
+        f"{counts['unassigned']:,} unassigned"
+    )
+    return counts
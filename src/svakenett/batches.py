@@ -0,0 +1,382 @@
+"""
+Concurrent executor for independent batched queries
+
+Splits a table into keyset ranges of its key (id BETWEEN lo AND hi) and runs
+the same parameterized statement for every range on a pool of connections,
+at most `concurrency` at a time. At most `max_pending` batches are in flight
+(running or finished but not yet consumed), so a slow consumer holds back
+dispatch instead of piling up results. Statements that return rows are
+streamed to a COPY writer on its own connection; the others just report
+their row counts. Returned rows can also be sketched into the stored metric
+statistics of the table (see svakenett.stats.StatsUpdate).
+
+Batch SQL files (sql/*_batch.sql) are plain SQL in psycopg2 parameter style:
+
+    -- setup: statements before the first one using %(lo)s/%(hi)s run once
+    CREATE UNLOGGED TABLE ... ;
+    -- per batch: statements using %(lo)s and %(hi)s
+    SELECT ... FROM buildings b WHERE b.id BETWEEN %(lo)s AND %(hi)s;
+    -- finish: statements after the last batch statement run once
+    UPDATE ... ; DROP TABLE ... ;
+
+psql meta-commands are skipped, except \\ir which includes another file.
+
+Usage:
+    python -m svakenett.batches run sql/building_metrics_batch.sql --table buildings \\
+        --where "building_source = %(building_source)s" --into building_metrics_staging \\
+        -p building_source=residential --concurrency 12
+"""
+
+import argparse
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import pandas as pd
+from loguru import logger
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from svakenett.db import copy_frame, get_engine, read_statements, table_columns
+from svakenett.stats import MetricStatsStore, StatsUpdate
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_BATCH_SIZE = 5_000
+
+_BATCH_PARAM = re.compile(r"%\((lo|hi)\)s")
+
+
+def keyset_ranges(
+    table: str,
+    key: str = "id",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    where: Optional[str] = None,
+    engine: Optional[Engine] = None,
+    params: Optional[dict] = None,
+) -> list[dict]:
+    """
+    Consecutive key ranges of about batch_size rows each.
+
+    Args:
+        table: Table to split
+        key: Unique, indexed key column
+        batch_size: Rows per range
+        where: Optional filter (ranges then cover only matching rows), psycopg2
+            style: values as %(name)s from params, a literal % as %%
+        engine: Optional engine (default: get_engine())
+        params: Parameters of the filter
+
+    Returns:
+        [{'lo': ..., 'hi': ...}, ...] with inclusive bounds, in key order
+    """
+    engine = engine or get_engine()
+    query = f"""
+        SELECT MIN(k) AS lo, MAX(k) AS hi
+        FROM (
+            SELECT {key} AS k, (row_number() OVER (ORDER BY {key}) - 1) / %(size)s AS batch
+            FROM {table}
+            {f'WHERE {where}' if where else ''}
+        ) s
+        GROUP BY batch
+        ORDER BY batch
+    """
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(query, {**(params or {}), "size": batch_size})
+            return [{"lo": lo, "hi": hi} for lo, hi in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def read_batch_sql(path: str | Path) -> tuple[list[str], list[str], list[str]]:
+    """
+    Split a batch SQL file into (setup, per-batch, finish) statements.
+
+    Per-batch statements are the ones using %(lo)s or %(hi)s; statements
+    before the first of them are setup, statements after the last are finish.
+    """
+    statements = read_statements(path)
+    batched = [i for i, statement in enumerate(statements) if _BATCH_PARAM.search(statement)]
+    if not batched:
+        raise ValueError(f"{path} has no statement using %(lo)s / %(hi)s")
+    return (
+        statements[: batched[0]],
+        statements[batched[0] : batched[-1] + 1],
+        statements[batched[-1] + 1 :],
+    )
+
+
+class BatchExecutor:
+    """
+    Connection pool plus bounded concurrent dispatch of batched statements.
+
+    Example:
+        >>> with BatchExecutor(concurrency=12) as executor:
+        ...     ranges = keyset_ranges('buildings', engine=executor.engine)
+        ...     update = "UPDATE buildings SET ... WHERE id BETWEEN %(lo)s AND %(hi)s"
+        ...     executor.run([update], ranges)
+    """
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_pending: Optional[int] = None,
+        engine: Optional[Engine] = None,
+    ):
+        self.concurrency = concurrency
+        self.max_pending = max_pending or 2 * concurrency
+        base = engine or get_engine()
+        # Workers plus the COPY writer, no overflow: the pool is the concurrency limit
+        self.engine = create_engine(
+            base.url, pool_size=concurrency + 1, max_overflow=0, pool_pre_ping=True
+        )
+
+    def __enter__(self) -> "BatchExecutor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.engine.dispose()
+
+    def _run(self, statements: list[str], params: dict) -> tuple[int, list[pd.DataFrame]]:
+        """Run one batch in its own transaction: (rows affected, result frames)."""
+        conn = self.engine.raw_connection()
+        try:
+            affected, frames = 0, []
+            with conn.cursor() as cur:
+                for statement in statements:
+                    cur.execute(statement, params or None)
+                    if cur.description is not None:
+                        frames.append(
+                            pd.DataFrame(cur.fetchall(), columns=[c.name for c in cur.description])
+                        )
+                    else:
+                        affected += max(cur.rowcount, 0)
+            conn.commit()
+            return affected, frames
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def dispatch(
+        self, work: Callable[[dict], object], batches: list[dict]
+    ) -> Iterator[tuple[dict, object]]:
+        """
+        Run work(batch) for every batch, yielding (batch, result) as batches finish.
+
+        New batches are only submitted while fewer than max_pending are
+        unconsumed. A failed batch cancels the queued ones and re-raises.
+        """
+        batches = iter(batches)
+        pending: dict[Future, dict] = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            try:
+                while True:
+                    while len(pending) < self.max_pending:
+                        batch = next(batches, None)
+                        if batch is None:
+                            break
+                        pending[pool.submit(work, batch)] = batch
+                    if not pending:
+                        return
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future.result()
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+
+    def run(
+        self,
+        statements: list[str],
+        batches: list[dict],
+        into: Optional[str] = None,
+        params: Optional[dict] = None,
+        stats: Optional[StatsUpdate] = None,
+    ) -> dict[str, int]:
+        """
+        Run statements for every batch; rows they return are COPYed into `into`.
+
+        Args:
+            statements: Per-batch statements (psycopg2 style, %(lo)s / %(hi)s)
+            batches: Parameters per batch, e.g. from keyset_ranges()
+            into: Table receiving returned rows (columns matched by name)
+            params: Extra parameters shared by all batches
+            stats: Returned rows are sketched per batch (in its worker) and
+                added to this update; call stats.save() after the run
+
+        Returns:
+            Counts of 'batches', 'affected' rows and 'copied' rows
+        """
+
+        def work(batch: dict) -> tuple[int, list[pd.DataFrame], Optional[MetricStatsStore]]:
+            affected, frames = self._run(statements, {**(params or {}), **batch})
+            # Sketch in the worker; the main thread only merges the partial stores
+            return affected, frames, stats.sketch(frames) if stats and frames else None
+
+        counts = {"batches": 0, "affected": 0, "copied": 0}
+        writer = self.engine.raw_connection() if into else None
+        started = time.monotonic()
+        try:
+            for _batch, (affected, frames, partial) in self.dispatch(work, batches):
+                counts["batches"] += 1
+                counts["affected"] += affected
+                if partial is not None:
+                    stats.add(partial)
+                rows = sum(len(frame) for frame in frames)
+                if rows and writer is None:
+                    raise ValueError(
+                        "Batch statements return rows; pass into=<table> to store them"
+                    )
+                if rows:
+                    with writer.cursor() as cur:
+                        for frame in frames:
+                            copy_frame(cur, into, frame)
+                    writer.commit()
+                    counts["copied"] += rows
+                if counts["batches"] % 20 == 0 or counts["batches"] == len(batches):
+                    total = counts["affected"] + counts["copied"]
+                    logger.info(
+                        f"  {counts['batches']:,}/{len(batches):,} batches "
+                        f"({total:,} rows, {time.monotonic() - started:.0f}s)"
+                    )
+        finally:
+            if writer is not None:
+                writer.close()
+        return counts
+
+    def execute_once(self, statements: list[str], params: Optional[dict] = None) -> None:
+        """Run setup/finish statements in one transaction."""
+        if statements:
+            self._run(statements, params or {})
+
+
+def run_batch_file(
+    sql_file: str | Path,
+    table: str,
+    key: str = "id",
+    where: Optional[str] = None,
+    into: Optional[str] = None,
+    params: Optional[dict] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    engine: Optional[Engine] = None,
+    record_stats: bool = False,
+    stats_scope: Optional[dict[str, Callable[[object], bool]]] = None,
+) -> dict[str, int]:
+    """
+    Run a batch SQL file over keyset ranges of a table.
+
+    With record_stats, the rows COPYed into `into` (which must carry the
+    table's stats group columns, e.g. building_source, bygningstype and
+    kommunenummer) are sketched and swapped into the table's stored metric
+    statistics, so they need no full rescan afterwards.
+
+    Args:
+        sql_file: Batch SQL file (setup / per-batch / finish statements)
+        table: Table whose key is split into ranges
+        key: Key column
+        where: Optional filter for the ranges (psycopg2 style, %(name)s from params)
+        into: Table receiving rows returned by per-batch statements
+        params: Extra parameters for all statements and the filter
+        batch_size: Rows per range
+        concurrency: Concurrent batches (connections)
+        engine: Optional engine (default: get_engine())
+        record_stats: Update the stored metric sketches of table from the copied rows
+        stats_scope: Stats group column -> predicate selecting the groups whose
+            rows are all rewritten; required with record_stats when where is set
+
+    Returns:
+        Counts of 'batches', 'affected' rows and 'copied' rows
+    """
+    if record_stats and (not into or (where and not stats_scope)):
+        raise ValueError("record_stats needs into, and stats_scope when where is set")
+    setup, per_batch, finish = read_batch_sql(sql_file)
+    params = params or {}
+    stats = None
+    with BatchExecutor(concurrency, engine=engine) as executor:
+        executor.execute_once(setup, params)
+        if record_stats:
+            columns = [name for name, _ in table_columns(into, executor.engine)]
+            stats = StatsUpdate(table, columns, stats_scope, engine)
+            if not set(stats.group_by) <= set(columns):
+                logger.warning(f"{into} lacks stats group columns {stats.group_by}; not sketched")
+                stats = None
+        ranges = keyset_ranges(table, key, batch_size, where, executor.engine, params)
+        logger.info(
+            f"Running {sql_file} over {len(ranges):,} batches of {table} "
+            f"({concurrency} concurrent)..."
+        )
+        counts = executor.run(per_batch, ranges, into, params, stats)
+        executor.execute_once(finish, params)
+    if stats is not None:
+        stats.save()
+    logger.success(
+        f"✓ {sql_file}: {counts['batches']:,} batches, {counts['affected']:,} rows updated, "
+        f"{counts['copied']:,} rows copied"
+    )
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent batched statements over keyset ranges")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run a batch SQL file over keyset ranges of a table")
+    run.add_argument("sql_file")
+    run.add_argument("--table", required=True, help="Table split into key ranges")
+    run.add_argument("--key", default="id", help="Key column")
+    run.add_argument("--where", help="Filter for the ranges; %%(name)s takes a -p parameter")
+    run.add_argument("--into", help="Table receiving rows returned by the batch statements")
+    run.add_argument(
+        "-p", "--param", action="append", default=[], help="Extra parameter name=value"
+    )
+    run.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per batch")
+    run.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Concurrent batches"
+    )
+    run.add_argument(
+        "--record-stats",
+        action="store_true",
+        help="Sketch the rows copied into --into into the table's stored metric statistics",
+    )
+    run.add_argument(
+        "--stats-scope",
+        action="append",
+        default=[],
+        metavar="COLUMN=VALUE",
+        help="Stats groups rewritten by the run (needed with --where), e.g. building_source=x",
+    )
+
+    args = parser.parse_args()
+    params = dict(p.split("=", 1) for p in args.param)
+    stats_scope = {
+        column: lambda v, value=value: str(v) == value
+        for column, value in (s.split("=", 1) for s in args.stats_scope)
+    }
+    try:
+        run_batch_file(
+            args.sql_file,
+            args.table,
+            args.key,
+            args.where,
+            args.into,
+            params,
+            args.batch_size,
+            args.concurrency,
+            record_stats=args.record_stats,
+            stats_scope=stats_scope or None,
+        )
+    except Exception as e:
+        logger.error(f"✗ {args.sql_file}: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Type-aware prospect configuration per building type
+
+Single source for the score thresholds that reports, exports and maps apply:
+
+    - Cabins (161): score >= 70 (intermittent use, higher outage tolerance)
+    - Eneboliger (111): score >= 80 (permanent residence, single household)
+    - Tomannsbolig (112): score >= 82 (2 households affected)
+    - Rekkehus (113): score >= 85 (multi-unit, shared infrastructure)
+    - Våningshus (121): score >= 85 (many households, critical infrastructure)
+
+Medium prospects are 10 points below the high prospect threshold.
+
+peak_load_kw is the estimated peak load per building after diversity (share
+of households drawing peak at the same time), used to sum load per feeder.
+"""
+
+from typing import Optional
+
+BUILDING_TYPES = {
+    161: {
+        "name": "Fritidsbygg (Cabins)",
+        "slug": "cabins_161",
+        "color": "#8B4513",  # Brown
+        "icon": "home",
+        "threshold": 70,
+        "medium_threshold": 60,
+        "peak_load_kw": 4,
+    },
+    111: {
+        "name": "Enebolig (Single-family)",
+        "slug": "enebolig_111",
+        "color": "#2E8B57",  # Green
+        "icon": "home",
+        "threshold": 80,
+        "medium_threshold": 70,
+        "peak_load_kw": 6,
+    },
+    112: {
+        "name": "Tomannsbolig (Duplex)",
+        "slug": "tomannsbolig_112",
+        "color": "#4169E1",  # Blue
+        "icon": "building",
+        "threshold": 82,
+        "medium_threshold": 72,
+        "peak_load_kw": 10,
+    },
+    113: {
+        "name": "Rekkehus (Townhouse)",
+        "slug": "rekkehus_113",
+        "color": "#FF8C00",  # Orange
+        "icon": "building",
+        "threshold": 85,
+        "medium_threshold": 75,
+        "peak_load_kw": 15,
+    },
+    121: {
+        "name": "Våningshus (Apartment)",
+        "slug": "vaningshus_121",
+        "color": "#DC143C",  # Red
+        "icon": "building",
+        "threshold": 85,
+        "medium_threshold": 75,
+        "peak_load_kw": 8,
+    },
+}
+
+# Peak load of building types without a configuration (garages, commercial, ...)
+DEFAULT_PEAK_LOAD_KW = 5
+
+HIGH_PROSPECT = "HIGH_PROSPECT"
+MEDIUM_PROSPECT = "MEDIUM_PROSPECT"
+LOW_PROSPECT = "LOW_PROSPECT"
+
+
+def type_threshold(bygningstype: int) -> Optional[int]:
+    """
+    High prospect score threshold for a building type.
+
+    Args:
+        bygningstype: Building type code
+
+    Returns:
+        Threshold, or None for building types without a prospect threshold
+    """
+    config = BUILDING_TYPES.get(bygningstype)
+    return config["threshold"] if config else None
+
+
+def prospect_category(score: Optional[float], bygningstype: int) -> str:
+    """
+    Classify a score as HIGH/MEDIUM/LOW prospect using the type-aware thresholds.
+
+    Args:
+        score: weak_grid_score (None counts as low)
+        bygningstype: Building type code
+
+    Returns:
+        'HIGH_PROSPECT', 'MEDIUM_PROSPECT' or 'LOW_PROSPECT'
+    """
+    config = BUILDING_TYPES.get(bygningstype)
+    if score is None or config is None:
+        return LOW_PROSPECT
+    if score >= config["threshold"]:
+        return HIGH_PROSPECT
+    if score >= config["medium_threshold"]:
+        return MEDIUM_PROSPECT
+    return LOW_PROSPECT
+
+
+def peak_load_kw(bygningstype: int) -> float:
+    """Estimated peak load of a building type (DEFAULT_PEAK_LOAD_KW if not configured)."""
+    config = BUILDING_TYPES.get(bygningstype)
+    return config["peak_load_kw"] if config else DEFAULT_PEAK_LOAD_KW
+
+
+def thresholds_values_sql(key: str = "threshold") -> str:
+    """
+    VALUES list of (bygningstype, threshold) for joining in SQL.
+
+    Args:
+        key: 'threshold', 'medium_threshold' or 'peak_load_kw'
+
+    Returns:
+        SQL fragment, e.g. "(VALUES (161, 70), (111, 80), ...)"
+
+    Example:
+        >>> sql = (
+        ...     f"SELECT ... FROM buildings b JOIN {thresholds_values_sql()} "
+        ...     "AS t(bygningstype, threshold) USING (bygningstype)"
+        ... )
+    """
+    rows = ", ".join(f"({code}, {config[key]})" for code, config in BUILDING_TYPES.items())
+    return f"(VALUES {rows})"
@@ -0,0 +1,323 @@
+"""
+Transformer catchments: precomputed nearest-transformer areas
+
+The catchment of a transformer is its Voronoi cell. Cells are computed in
+METRIC_SRID (nearest in meters, not in degrees), densified so their edges
+survive reprojection, stored in EPSG:4326 and cut with ST_Subdivide into a
+GiST-indexed table like the area index (sql/area_index_subdivided.sql).
+Nearest transformer is then a point-in-polygon lookup instead of a KNN scan:
+
+    SELECT c.transformer_id
+    FROM transformer_catchments_subdivided c
+    WHERE c.source = 'transformers_new' AND ST_Intersects(c.geometry, b.geometry)
+
+refresh_catchments() only regenerates the cells that changed. A Voronoi cell
+depends only on the transformer's Delaunay neighbours, so adding, moving or
+removing transformers changes the cells of their neighbours (in the old and
+the new triangulation) and nothing else. Those cells are recomputed from a
+local Voronoi diagram over them and their neighbours.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import shapely
+from loguru import logger
+from scipy.spatial import Delaunay, QhullError
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from svakenett.db import copy_frame, get_engine
+from svakenett.network import METRIC_SRID, TRANSFORMERS_TABLE
+
+# Clip box for the outer cells: mainland Norway in METRIC_SRID with margin
+CATCHMENT_EXTENT = (-150_000.0, 6_350_000.0, 1_250_000.0, 8_000_000.0)
+
+# Densify cell edges before reprojecting so they stay straight in meters
+SEGMENT_M = 1000.0
+
+MAX_VERTICES = 256
+
+# Transformers closer than this count as moved / duplicated
+_SAME_POSITION_M = 0.01
+
+_SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS transformer_catchments (
+        source TEXT NOT NULL,
+        transformer_id BIGINT NOT NULL,
+        x DOUBLE PRECISION NOT NULL,
+        y DOUBLE PRECISION NOT NULL,
+        geometry GEOMETRY(Polygon, 4326),
+        PRIMARY KEY (source, transformer_id)
+    );
+    CREATE TABLE IF NOT EXISTS transformer_catchments_subdivided (
+        source TEXT NOT NULL,
+        transformer_id BIGINT NOT NULL,
+        geometry GEOMETRY(Polygon, 4326)
+    );
+    CREATE INDEX IF NOT EXISTS idx_transformer_catchments_subdivided_geom
+        ON transformer_catchments_subdivided USING GIST(geometry);
+    CREATE INDEX IF NOT EXISTS idx_transformer_catchments_subdivided_id
+        ON transformer_catchments_subdivided(source, transformer_id)
+"""
+
+
+def voronoi_cells(xy: np.ndarray, extent: tuple = CATCHMENT_EXTENT) -> np.ndarray:
+    """
+    Voronoi cell of each point, clipped to extent.
+
+    Args:
+        xy: (n, 2) distinct points in METRIC_SRID
+        extent: (xmin, ymin, xmax, ymax) clip box
+
+    Returns:
+        Polygons aligned with xy (empty for points outside extent)
+    """
+    box = shapely.box(*extent)
+    if len(xy) == 0:
+        return np.array([], dtype=object)
+    if len(xy) == 1:
+        return np.array([box], dtype=object)
+    cells = shapely.get_parts(
+        shapely.voronoi_polygons(shapely.multipoints(xy), extend_to=box, ordered=True)
+    )
+    return shapely.intersection(cells, box)
+
+
+def _neighbours(xy: np.ndarray) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """Delaunay neighbours as (indptr, indices), None for degenerate point sets."""
+    if len(xy) < 4:
+        return None
+    try:
+        return Delaunay(xy).vertex_neighbor_vertices
+    except QhullError:
+        return None
+
+
+def _neighbours_of(graph: tuple[np.ndarray, np.ndarray], points: np.ndarray) -> np.ndarray:
+    """Points adjacent to any of points (indices)."""
+    indptr, indices = graph
+    points = np.asarray(points, dtype=np.int64)
+    if len(points) == 0:
+        return points
+    counts = indptr[points + 1] - indptr[points]
+    offsets = np.repeat(indptr[points] - np.cumsum(counts) + counts, counts) + np.arange(
+        counts.sum()
+    )
+    return np.unique(indices[offsets])
+
+
+def changed_cells(
+    old_ids: np.ndarray, old_xy: np.ndarray, new_ids: np.ndarray, new_xy: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Transformers whose catchment must be rewritten or deleted.
+
+    Args:
+        old_ids, old_xy: Transformers the stored catchments were built from
+        new_ids, new_xy: Current transformers (distinct positions)
+
+    Returns:
+        (rewrite, delete): indices into new_ids of cells to (re)compute, and
+        old ids whose stored cells go away (removed or rewritten)
+    """
+    old = pd.DataFrame({"id": old_ids, "x": old_xy[:, 0], "y": old_xy[:, 1]})
+    new = pd.DataFrame(
+        {"id": new_ids, "x": new_xy[:, 0], "y": new_xy[:, 1], "idx": np.arange(len(new_ids))}
+    )
+    both = old.merge(new, on="id", how="outer", suffixes=("_old", ""), indicator=True)
+    moved = (both["_merge"] == "both") & (
+        np.hypot(both["x"] - both["x_old"], both["y"] - both["y_old"]) > _SAME_POSITION_M
+    )
+    changed_old = both["_merge"].eq("left_only") | moved
+    changed_new = both["_merge"].eq("right_only") | moved
+    if not (changed_old.any() or changed_new.any()):
+        return np.array([], dtype=np.int64), np.array([], dtype=old_ids.dtype)
+
+    old_graph, new_graph = _neighbours(old_xy), _neighbours(new_xy)
+    if old_graph is None or new_graph is None:
+        return np.arange(len(new_ids)), old_ids
+
+    old_index = pd.Series(np.arange(len(old_ids)), index=old_ids)
+    new_index = pd.Series(np.arange(len(new_ids)), index=new_ids)
+    added = new_index[both.loc[changed_new, "id"]].to_numpy()
+    removed = old_index[both.loc[changed_old, "id"]].to_numpy()
+
+    # Neighbours of removed transformers in the old triangulation, mapped to the new set
+    old_side = (
+        new_index.reindex(old_ids[_neighbours_of(old_graph, removed)]).dropna().to_numpy(np.int64)
+    )
+    rewrite = np.union1d(np.union1d(added, _neighbours_of(new_graph, added)), old_side)
+    delete = np.union1d(old_ids[removed], new_ids[rewrite])
+    return rewrite, delete
+
+
+def local_cells(xy: np.ndarray, points: np.ndarray, extent: tuple = CATCHMENT_EXTENT) -> np.ndarray:
+    """
+    Voronoi cells of points (indices into xy) from their neighbourhood only.
+
+    A cell is bounded by the bisectors towards its Delaunay neighbours, so a
+    diagram over the points and their neighbours gives the same cells as the
+    diagram over all of xy.
+    """
+    graph = _neighbours(xy)
+    if graph is None or len(points) * 2 >= len(xy):
+        return voronoi_cells(xy, extent)[points]
+    local = np.union1d(points, _neighbours_of(graph, points))
+    cells = voronoi_cells(xy[local], extent)
+    return cells[np.searchsorted(local, points)]
+
+
+def _load_transformers(table: str, engine: Engine) -> pd.DataFrame:
+    """Transformers in METRIC_SRID, one per position (lowest id kept)."""
+    df = pd.read_sql(
+        f"SELECT id, ST_X(p) AS x, ST_Y(p) AS y FROM "
+        f"(SELECT id, ST_Transform(geometry, {METRIC_SRID}) AS p "
+        f"FROM {table} WHERE geometry IS NOT NULL) t "
+        f"ORDER BY id",
+        engine,
+    )
+    key = np.round(df[["x", "y"]] / _SAME_POSITION_M).astype(np.int64)
+    return df[~key.duplicated()].reset_index(drop=True)
+
+
+def refresh_catchments(
+    transformers_table: str = TRANSFORMERS_TABLE,
+    full: bool = False,
+    update_buildings: bool = True,
+    engine: Optional[Engine] = None,
+) -> dict[str, int]:
+    """
+    Build or incrementally update the catchments of a transformer table.
+
+    Args:
+        transformers_table: Point table with id and geometry; stored as the
+            catchments' source, so several transformer tables can coexist
+        full: Recompute every cell
+        update_buildings: After an incremental update of transformers_new,
+            recompute buildings.distance_to_transformer_m inside the rewritten
+            cells (a full build leaves that to the metrics stage)
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Counts of 'transformers', rewritten 'cells', 'deleted' cells and updated 'buildings'
+    """
+    engine = engine or get_engine()
+    with engine.begin() as conn:
+        for statement in _SCHEMA_SQL.split(";"):
+            conn.execute(text(statement))
+
+    transformers = _load_transformers(transformers_table, engine)
+    ids = transformers["id"].to_numpy(np.int64)
+    xy = transformers[["x", "y"]].to_numpy(float)
+    stored = pd.read_sql(
+        text(
+            "SELECT transformer_id, x, y FROM transformer_catchments "
+            "WHERE source = :source ORDER BY transformer_id"
+        ),
+        engine,
+        params={"source": transformers_table},
+    )
+    full = full or stored.empty
+    if full:
+        rewrite, delete = np.arange(len(ids)), stored["transformer_id"].to_numpy(np.int64)
+    else:
+        rewrite, delete = changed_cells(
+            stored["transformer_id"].to_numpy(np.int64), stored[["x", "y"]].to_numpy(float), ids, xy
+        )
+    counts = {
+        "transformers": len(ids),
+        "cells": len(rewrite),
+        "deleted": len(delete),
+        "buildings": 0,
+    }
+    if len(rewrite) == 0 and len(delete) == 0:
+        logger.info(
+            f"Catchments of {transformers_table} are up to date ({len(ids):,} transformers)"
+        )
+        return counts
+
+    logger.info(f"Computing {len(rewrite):,} of {len(ids):,} catchments of {transformers_table}...")
+    cells = shapely.segmentize(local_cells(xy, rewrite), SEGMENT_M)
+    inside = ~shapely.is_empty(cells)
+    if (~inside).any():
+        logger.warning(
+            f"{int((~inside).sum()):,} transformers outside CATCHMENT_EXTENT get no catchment"
+        )
+    frame = pd.DataFrame(
+        {
+            "transformer_id": ids[rewrite][inside],
+            "x": xy[rewrite, 0][inside],
+            "y": xy[rewrite, 1][inside],
+            "wkb": shapely.to_wkb(cells[inside], hex=True),
+        }
+    )
+
+    update_buildings = update_buildings and not full and transformers_table == TRANSFORMERS_TABLE
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            params = {"source": transformers_table, "ids": [int(i) for i in delete]}
+            cur.execute(
+                "DELETE FROM transformer_catchments_subdivided "
+                "WHERE source = %(source)s AND transformer_id = ANY(%(ids)s)",
+                params,
+            )
+            cur.execute(
+                "DELETE FROM transformer_catchments "
+                "WHERE source = %(source)s AND transformer_id = ANY(%(ids)s)",
+                params,
+            )
+            cur.execute(
+                "CREATE TEMP TABLE catchment_new "
+                "(transformer_id BIGINT, x DOUBLE PRECISION, y DOUBLE PRECISION, wkb TEXT) "
+                "ON COMMIT DROP"
+            )
+            copy_frame(cur, "catchment_new", frame)
+            cur.execute(
+                f"""
+                INSERT INTO transformer_catchments (source, transformer_id, x, y, geometry)
+                SELECT %(source)s, transformer_id, x, y,
+                       ST_Transform(ST_GeomFromWKB(decode(wkb, 'hex'), {METRIC_SRID}), 4326)
+                FROM catchment_new
+            """,
+                params,
+            )
+            cur.execute(
+                f"""
+                INSERT INTO transformer_catchments_subdivided (source, transformer_id, geometry)
+                SELECT c.source, c.transformer_id, ST_Subdivide(c.geometry, {MAX_VERTICES})
+                FROM transformer_catchments c
+                JOIN catchment_new n ON n.transformer_id = c.transformer_id
+                WHERE c.source = %(source)s
+            """,
+                params,
+            )
+
+            if update_buildings:
+                cur.execute(
+                    f"""
+                    UPDATE buildings b
+                    SET distance_to_transformer_m = ROUND(
+                        ST_Distance(b.geometry::geography, t.geometry::geography)::numeric, 2)
+                    FROM transformer_catchments_subdivided c
+                    JOIN catchment_new n ON n.transformer_id = c.transformer_id
+                    JOIN {TRANSFORMERS_TABLE} t ON t.id = c.transformer_id
+                    WHERE c.source = %(source)s AND ST_Intersects(c.geometry, b.geometry)
+                """,
+                    params,
+                )
+                counts["buildings"] = cur.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE transformer_catchments_subdivided"))
+    logger.success(
+        f"✓ Catchments of {transformers_table}: {counts['cells']:,} written, "
+        f"{counts['deleted']:,} deleted"
+        + (f", {counts['buildings']:,} building distances updated" if update_buildings else "")
+    )
+    return counts
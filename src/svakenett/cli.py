@@ -0,0 +1,366 @@
+"""
+svakenett command line - one entry point for the processing steps
+
+Each subcommand imports what it needs when it runs, so `svakenett --help` and
+the database-only subcommands start without loading geopandas, folium or
+plotly. Every step connects through DATABASE_URL: the Python steps and ingest
+scripts run in this process and share one connection pool (get_engine()
+returns the same engine for the same URL), plain SQL files run statement by
+statement on one of its connections, and only scripts using psql variables,
+\\if or \\copy go to a psql subprocess - no `docker exec ... psql -c` per
+statement.
+
+Usage:
+    svakenett ingest nve
+    svakenett assign postal-codes
+    svakenett assign grid-companies --executor areas --max-distance-km 20
+    svakenett metrics --executor batches --concurrency 12
+    svakenett metrics --table cabins
+    svakenett score
+    svakenett score --table cabins --export data/high_value_prospects.csv
+    svakenett filter --fylke 42
+    svakenett report --format html
+    svakenett export csv
+    svakenett map html --output data/processed/map.html
+    svakenett sql sql/validate_score_changes.sql
+    svakenett sql -c "SELECT COUNT(*) FROM cabins"
+    svakenett pipeline --dry-run
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# Subcommand targets backed by scripts (run in this process, other arguments passed on)
+INGEST_SCRIPTS = {
+    "nve": "scripts/processing/load_nve_gdb_to_postgres.py",
+    "buildings": "scripts/processing/load_residential_buildings.py",
+    "postal-codes": "scripts/data_loading/06_load_postal_codes_to_db.py",
+    "kile": "scripts/data_loading/04_load_kile_to_db.py",
+}
+REPORT_SCRIPT = "scripts/reporting/generate_type_aware_reports.py"
+EXPORT_SCRIPTS = {
+    "csv": "scripts/export/export_prospect_csvs.py",
+    "geoparquet": "scripts/export/export_geoparquet.py",
+    "lines": "scripts/export/export_line_geometries.py",
+}
+MAP_SCRIPTS = {
+    "html": "scripts/visualization/generate_type_aware_html_map.py",
+    "heatmap": "scripts/visualization/render_heatmap_tiles.py",
+    "tiles": "scripts/visualization/serve_vector_tiles.py",
+}
+
+# Cabin assignment target -> (area kind, cabins column, batch SQL file)
+ASSIGN_TARGETS = {
+    "postal-codes": ("postal_code", "postal_code", "sql/assign_postal_codes_batch.sql"),
+    "grid-companies": ("grid_company", "grid_company_code", "sql/assign_grid_companies_batch.sql"),
+}
+AREA_INDEX_SQL = "sql/area_index_subdivided.sql"
+
+METRICS_SQL = "sql/building_metrics_partition.sql"
+METRICS_BATCH_SQL = "sql/building_metrics_batch.sql"
+CABIN_METRICS_BATCH_SQL = "sql/cabin_metrics_batch.sql"
+SCORING_SQL = "sql/calculate_weak_grid_scores_v3_unified.sql"
+SCORING_BATCH_SQL = "sql/weak_grid_scores_v3_batch.sql"
+CABIN_SCORING_SQL = "sql/cabin_scores.sql"
+CABIN_PROSPECTS_SQL = "sql/cabin_prospects.sql"
+V4_FILTER_SQL = "sql/optimized_weak_grid_filter_v4.sql"
+
+
+def _repo_path(path: str) -> str:
+    return str(REPO_ROOT / path)
+
+
+def _run_script(script: str, args: list[str]) -> None:
+    """Run a repository script as __main__ in this process."""
+    import runpy
+
+    path = Path(_repo_path(script))
+    sys.argv = [str(path), *args]
+    sys.path.insert(0, str(path.parent))
+    runpy.run_path(str(path), run_name="__main__")
+
+
+def _psql(sql_file: str, variables: Optional[list[str]] = None) -> int:
+    """Run a script that needs psql itself (variables, \\if, \\copy) on DATABASE_URL."""
+    command = ["psql", os.getenv("DATABASE_URL", ""), "-v", "ON_ERROR_STOP=1"]
+    for variable in variables or []:
+        command += ["-v", variable]
+    return subprocess.run(command + ["-f", sql_file]).returncode
+
+
+def _exit_on_failed_partitions(codes: dict[str, int]) -> None:
+    if any(codes.values()):
+        sys.exit(1)
+
+
+def cmd_ingest(args) -> None:
+    _run_script(INGEST_SCRIPTS[args.source], args.args)
+
+
+def cmd_assign(args) -> None:
+    kind, column, batch_sql = ASSIGN_TARGETS[args.target]
+    if not args.skip_index:
+        code = _psql(_repo_path(AREA_INDEX_SQL))
+        if code:
+            sys.exit(code)
+
+    if args.executor == "areas":
+        from svakenett.areas import assign_areas
+
+        counts = assign_areas("cabins", kind, column, max_distance_m=args.max_distance_km * 1000)
+        print(", ".join(f"{method}: {n:,}" for method, n in counts.items()))
+    else:
+        from svakenett.batches import run_batch_file
+
+        run_batch_file(_repo_path(batch_sql), "cabins", concurrency=args.concurrency)
+
+
+def cmd_metrics(args) -> None:
+    if args.table == "cabins":
+        from svakenett.batches import run_batch_file
+
+        run_batch_file(
+            _repo_path(CABIN_METRICS_BATCH_SQL),
+            "cabins",
+            into="cabin_metrics_staging",
+            concurrency=args.concurrency,
+        )
+    elif args.executor == "batches":
+        from svakenett.batches import run_batch_file
+
+        run_batch_file(
+            _repo_path(METRICS_BATCH_SQL),
+            "buildings",
+            where="building_source = %(building_source)s",
+            into="building_metrics_staging",
+            params={"building_source": args.source},
+            concurrency=args.concurrency,
+            record_stats=True,
+            stats_scope={"building_source": lambda source: source == args.source},
+        )
+    else:
+        from svakenett.partitions import run_per_partition
+
+        codes = run_per_partition(
+            _repo_path(METRICS_SQL),
+            [f"building_source={args.source}"],
+            args.fylke,
+            args.workers,
+            record_stats=True,
+        )
+        _exit_on_failed_partitions(codes)
+
+
+def _export_cabin_prospects(path: str) -> None:
+    from svakenett.db import get_engine, read_statements
+
+    (query,) = read_statements(_repo_path(CABIN_PROSPECTS_SQL))
+    conn = get_engine().raw_connection()
+    try:
+        with conn.cursor() as cur, open(path, "w", newline="") as out:
+            cur.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", out)
+            print(f"✓ Exported {cur.rowcount:,} prospects to {path}")
+    finally:
+        conn.close()
+
+
+def cmd_score(args) -> None:
+    if args.table == "cabins":
+        from svakenett.db import run_sql_file
+
+        run_sql_file(_repo_path(CABIN_SCORING_SQL))
+        if args.export:
+            _export_cabin_prospects(args.export)
+    elif args.batches:
+        from svakenett.batches import run_batch_file
+
+        run_batch_file(_repo_path(SCORING_BATCH_SQL), "buildings", concurrency=args.concurrency)
+    else:
+        from svakenett.db import run_sql_file
+
+        run_sql_file(_repo_path(SCORING_SQL))
+
+
+def cmd_filter(args) -> None:
+    from sqlalchemy import text
+
+    from svakenett.db import get_engine
+    from svakenett.partitions import run_per_partition
+
+    with get_engine().begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS weak_grid_candidates_v4"))
+    codes = run_per_partition(
+        _repo_path(V4_FILTER_SQL), ["distribution_view_ready=1"], args.fylke, args.workers
+    )
+    _exit_on_failed_partitions(codes)
+
+
+def cmd_report(args) -> None:
+    _run_script(REPORT_SCRIPT, args.args)
+
+
+def cmd_export(args) -> None:
+    _run_script(EXPORT_SCRIPTS[args.target], args.args)
+
+
+def cmd_map(args) -> None:
+    _run_script(MAP_SCRIPTS[args.kind], args.args)
+
+
+def _run_sql(sql_file: str, args) -> None:
+    from svakenett.db import needs_psql, run_sql_file
+
+    if args.profile:
+        from svakenett.profiling import profile_sql_file
+
+        print(profile_sql_file(sql_file, variables=args.variable) / "summary.txt")
+    elif needs_psql(sql_file):
+        code = _psql(sql_file, args.variable)
+        if code:
+            sys.exit(code)
+    else:
+        run_sql_file(sql_file)
+
+
+def cmd_sql(args) -> None:
+    if args.command is None and args.sql_file != "-":
+        _run_sql(args.sql_file, args)
+        return
+    if args.command is not None and args.sql_file != "-":
+        sys.exit("svakenett sql: give a SQL file or -c, not both")
+
+    import tempfile
+
+    # -c text or stdin, through the same file runners
+    with tempfile.NamedTemporaryFile("w", suffix=".sql") as script:
+        script.write(args.command if args.command is not None else sys.stdin.read())
+        script.flush()
+        _run_sql(script.name, args)
+
+
+def cmd_pipeline(args) -> None:
+    from svakenett import pipeline
+
+    sys.argv = ["svakenett pipeline", *args.args]
+    pipeline.main()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="svakenett", description="Weak grid analysis processing steps"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="Load source data into PostGIS", add_help=False)
+    ingest.add_argument("source", choices=list(INGEST_SCRIPTS))
+    ingest.set_defaults(passthrough=True, func=cmd_ingest)
+
+    assign = sub.add_parser("assign", help="Postal code or grid company per cabin")
+    assign.add_argument("target", choices=list(ASSIGN_TARGETS))
+    assign.add_argument(
+        "--executor",
+        choices=["batches", "areas"],
+        default="batches",
+        help="Point-in-area UPDATE per id range, or containment then nearest area (areas)",
+    )
+    assign.add_argument(
+        "--concurrency", type=int, default=8, help="Concurrent id ranges (batches executor)"
+    )
+    assign.add_argument(
+        "--max-distance-km",
+        type=float,
+        default=50,  # areas.DEFAULT_MAX_DISTANCE_M, without importing shapely here
+        help="Nearest-area cap, 0 = containment only (areas executor)",
+    )
+    assign.add_argument(
+        "--skip-index", action="store_true", help="Reuse the subdivided area tables"
+    )
+    assign.set_defaults(func=cmd_assign)
+
+    metrics = sub.add_parser("metrics", help="Grid metrics per building or cabin")
+    metrics.add_argument(
+        "--table", choices=["buildings", "cabins"], default="buildings", help="cabins: id ranges"
+    )
+    metrics.add_argument("--executor", choices=["partitions", "batches"], default="partitions")
+    metrics.add_argument("--source", default="residential", help="building_source to compute")
+    metrics.add_argument("--fylke", nargs="+", help="Only these counties (partitions executor)")
+    metrics.add_argument(
+        "--workers", type=int, default=4, help="Concurrent partitions (partitions executor)"
+    )
+    metrics.add_argument(
+        "--concurrency", type=int, default=8, help="Concurrent id ranges (batches executor)"
+    )
+    metrics.set_defaults(func=cmd_metrics)
+
+    score = sub.add_parser("score", help="v3.0 weak grid scores (cabins: weighted, with KILE)")
+    score.add_argument("--table", choices=["buildings", "cabins"], default="buildings")
+    score.add_argument("--export", metavar="CSV", help="Write cabin prospects scoring 70+ here")
+    score.add_argument(
+        "--batches", action="store_true", help="Score id ranges concurrently, without the summary"
+    )
+    score.add_argument(
+        "--concurrency", type=int, default=8, help="Concurrent id ranges (with --batches)"
+    )
+    score.set_defaults(func=cmd_score)
+
+    filter_ = sub.add_parser("filter", help="v4 filter-first weak grid candidates")
+    filter_.add_argument("--fylke", nargs="+", help="Only these counties")
+    filter_.add_argument("--workers", type=int, default=4, help="Concurrent partitions")
+    filter_.set_defaults(func=cmd_filter)
+
+    report = sub.add_parser("report", help="Type-aware reports (text, CSV, HTML)", add_help=False)
+    report.set_defaults(passthrough=True, func=cmd_report)
+
+    export = sub.add_parser(
+        "export", help="Prospect CSVs, GeoParquet or simplified line geometries", add_help=False
+    )
+    export.add_argument("target", choices=list(EXPORT_SCRIPTS))
+    export.set_defaults(passthrough=True, func=cmd_export)
+
+    map_ = sub.add_parser(
+        "map", help="Interactive HTML map, heat map tiles or vector tile server", add_help=False
+    )
+    map_.add_argument("kind", choices=list(MAP_SCRIPTS))
+    map_.set_defaults(passthrough=True, func=cmd_map)
+
+    sql = sub.add_parser(
+        "sql", help="Run a SQL file on one connection (psql for \\if/\\set scripts)"
+    )
+    sql.add_argument("sql_file", nargs="?", default="-", help="SQL file, - for stdin")
+    sql.add_argument("-c", "--command", help="SQL text to run instead of a file")
+    sql.add_argument(
+        "-v", "--variable", action="append", default=[], help="psql variable name=value"
+    )
+    sql.add_argument(
+        "--profile",
+        action="store_true",
+        help="EXPLAIN ANALYZE each statement (see svakenett.profiling)",
+    )
+    sql.set_defaults(func=cmd_sql)
+
+    pipeline = sub.add_parser(
+        "pipeline", help="Run the cached pipeline (svakenett-pipeline)", add_help=False
+    )
+    pipeline.set_defaults(passthrough=True, func=cmd_pipeline)
+
+    return parser
+
+
+def main():
+    parser = build_parser()
+    # Arguments the subcommand does not know (including -h) go to the script behind it
+    args, extra = parser.parse_known_args()
+    args.args = extra
+    if args.args and not getattr(args, "passthrough", False):
+        parser.error(f"unrecognized arguments: {' '.join(args.args)}")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,50 @@
 Database connection and utilities for PostgreSQL + PostGIS
 """
 
+import hashlib
+import io
+import json
 import os
-from typing import Optional
+import re
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+
+import pandas as pd
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 from dotenv import load_dotenv
 from loguru import logger
-import geopandas as gpd
+
+from svakenett.ledger import ledger_dir
+
+if TYPE_CHECKING:
+    # Imported where needed: geopandas alone takes ~0.5s to import
+    import geopandas as gpd
 
 load_dotenv()
 
+# Size bound of the query-result cache (least recently used results are evicted)
+QUERY_CACHE_MAX_MB = float(os.getenv("SVAKENETT_QUERY_CACHE_MB", "2048"))
+
+# Dollar-quoted bodies and quoted literals/identifiers, comments, or whitespace runs
+_SQL_TOKEN = re.compile(
+    r"(\$(\w*)\$.*?\$\2\$|'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|(--[^\n]*|/\*.*?\*/)|(\s+)", re.DOTALL
+)
+
+# Dollar-quoted bodies and quoted literals, comments, or a statement-ending semicolon
+_SQL_STATEMENT_TOKEN = re.compile(
+    r"(\$(\w*)\$.*?\$\2\$|'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|(--[^\n]*|/\*.*?\*/)|(;)", re.DOTALL
+)
+
+# psql control flow and variables, which only psql itself can run
+_PSQL_ONLY = re.compile(
+    r"^\s*\\(if|elif|set|gset|copy)\b|\\gset\b|(?<![:\w]):(?:'|\"|\{\?)?[A-Za-z_]", re.MULTILINE
+)
+
+# One engine (connection pool) per database URL and process, shared by all callers
+_ENGINES: dict[str, Engine] = {}
+
 
 def get_engine(database_url: Optional[str] = None) -> Engine:
     """
@@ -36,8 +70,11 @@ def get_engine(database_url: Optional[str] = None) -> Engine:
             "DATABASE_URL not found. Set DATABASE_URL environment variable or pass database_url parameter."
         )
 
-    engine = create_engine(database_url, echo=False)
-    logger.info(f"Connected to database: {database_url.split('@')[1] if '@' in database_url else 'local'}")
+    engine = _ENGINES.get(database_url)
+    if engine is None:
+        engine = _ENGINES[database_url] = create_engine(database_url, echo=False)
+        host = database_url.split("@")[1] if "@" in database_url else "local"
+        logger.info(f"Connected to database: {host}")
 
     return engine
 
@@ -69,12 +106,329 @@ def test_connection() -> bool:
         return False
 
 
+def table_versions(tables: list[str], engine: Optional[Engine] = None) -> dict[str, str]:
+    """
+    Cheap version stamp per table, for invalidating caches of derived data.
+
+    Combines the relation OID and relfilenode (which change on DROP/CREATE, TRUNCATE
+    and REFRESH MATERIALIZED VIEW) with the insert/update/delete counters from
+    pg_stat_user_tables. Partitioned tables sum the counters of their partitions.
+    Tables that do not exist get the stamp 'missing'.
+
+    Args:
+        tables: Table or materialized view names
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Mapping of table name to version stamp
+
+    Example:
+        >>> table_versions(['buildings', 'power_lines_new'])
+        {'buildings': '16402.16402:130250:130250:0', 'power_lines_new': ...}
+    """
+    engine = engine or get_engine()
+
+    # Partitioned tables have no counters of their own: sum over the partitions
+    # and include their OIDs, so attaching or detaching one changes the stamp
+    query = text("""
+        SELECT
+            c.relname,
+            c.oid::text || '.' || c.relfilenode::text || ':' ||
+            COALESCE(SUM(s.n_tup_ins), 0) || ':' ||
+            COALESCE(SUM(s.n_tup_upd), 0) || ':' ||
+            COALESCE(SUM(s.n_tup_del), 0) ||
+            COALESCE(
+                ':' || string_agg(p.oid::text || '.' || p.relfilenode::text, ',' ORDER BY p.oid)
+                    FILTER (WHERE p.oid <> c.oid),
+                ''
+            ) AS version
+        FROM pg_class c
+        CROSS JOIN LATERAL (
+            SELECT c.oid
+            UNION ALL
+            SELECT inhrelid FROM pg_inherits WHERE inhparent = c.oid AND c.relkind = 'p'
+        ) AS parts(oid)
+        JOIN pg_class p ON p.oid = parts.oid
+        LEFT JOIN pg_stat_user_tables s ON s.relid = p.oid
+        WHERE c.relname = ANY(:tables)
+          AND c.relkind IN ('r', 'm', 'p')
+          AND pg_table_is_visible(c.oid)
+        GROUP BY c.oid, c.relname, c.relfilenode
+    """)
+
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"tables": list(tables)}).fetchall()
+
+    versions = {name: "missing" for name in tables}
+    versions.update({name: version for name, version in rows})
+    return versions
+
+
+def stream_rows(
+    query: str,
+    params: Optional[dict] = None,
+    chunk_size: int = 50_000,
+    engine: Optional[Engine] = None,
+) -> Iterator[tuple[list[str], list[tuple]]]:
+    """
+    Stream a query in row batches through a server-side cursor.
+
+    Only one batch is held in memory at a time, so this works for full-table
+    scans of national data. Parameters use psycopg2 style (%(name)s).
+
+    Args:
+        query: SQL query
+        params: Optional query parameters
+        chunk_size: Rows per batch
+        engine: Optional engine (default: get_engine())
+
+    Yields:
+        (column names, list of row tuples) with at most chunk_size rows
+    """
+    engine = engine or get_engine()
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor(name=f"svakenett_stream_{uuid.uuid4().hex[:8]}") as cur:
+            cur.itersize = chunk_size
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [col.name for col in cur.description], rows
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def stream_query(
+    query: str,
+    params: Optional[dict] = None,
+    chunk_size: int = 50_000,
+    engine: Optional[Engine] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a query in DataFrame chunks through a server-side cursor.
+
+    Args:
+        query: SQL query
+        params: Optional query parameters (psycopg2 style, %(name)s)
+        chunk_size: Rows per chunk
+        engine: Optional engine (default: get_engine())
+
+    Yields:
+        DataFrames of at most chunk_size rows
+
+    Example:
+        >>> for chunk in stream_query("SELECT id, weak_grid_score FROM buildings"):
+        ...     process(chunk)
+    """
+    for columns, rows in stream_rows(query, params, chunk_size, engine):
+        yield pd.DataFrame(rows, columns=columns)
+
+
+def copy_frame(cursor, table: str, df: pd.DataFrame) -> None:
+    """
+    Bulk-load a DataFrame into a table with COPY (columns matched by name).
+
+    Args:
+        cursor: psycopg2 cursor (e.g. from engine.raw_connection())
+        table: Target table
+        df: Rows to load; missing values are written as NULL
+    """
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, na_rep="")
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+
+
+def table_columns(table: str, engine: Optional[Engine] = None) -> list[tuple[str, str]]:
+    """
+    Column names and data types of a table, in table order.
+
+    Args:
+        table: Table name
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        List of (column_name, data_type) as reported by information_schema
+        (geometry columns report 'USER-DEFINED')
+    """
+    engine = engine or get_engine()
+
+    query = text("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_name = :table
+        ORDER BY ordinal_position
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"table": table}).fetchall()
+    if not rows:
+        raise ValueError(f"Table '{table}' not found")
+    return [(name, data_type) for name, data_type in rows]
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Canonical form of a query for cache keys: comments dropped, whitespace
+    collapsed and keywords/identifiers lowercased, quoted text kept as is.
+    """
+    parts = []
+    pos = 0
+    for match in _SQL_TOKEN.finditer(query):
+        if match.start() > pos:
+            parts.append(query[pos : match.start()].lower())
+        quoted, _tag, _comment, _space = match.groups()
+        if quoted:
+            parts.append(quoted)
+        elif not parts or parts[-1] != " ":
+            # Comments and whitespace collapse to one space; quoted text keeps its spacing
+            parts.append(" ")
+        pos = match.end()
+    parts.append(query[pos:].lower())
+    return "".join(parts).strip()
+
+
+def query_tables(
+    query: str, params: Optional[dict] = None, engine: Optional[Engine] = None
+) -> list[str]:
+    """
+    Tables and materialized views a query reads, from its plan (EXPLAIN, not executed).
+
+    Views resolve to their base tables and partitioned tables to the partitions scanned.
+    """
+    engine = engine or get_engine()
+
+    def relations(node: dict) -> set[str]:
+        found = {node["Relation Name"]} if "Relation Name" in node else set()
+        for child in node.get("Plans", []):
+            found |= relations(child)
+        return found
+
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {query}", params or {}).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return sorted(relations(plan[0]["Plan"]))
+
+
+def query_cache_dir() -> Path:
+    """Directory of cached query results (under the ledger directory)."""
+    path = ledger_dir() / "query_cache"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _evict_query_cache(cache_dir: Path, max_bytes: float) -> None:
+    """Delete least recently used results until the cache fits in max_bytes."""
+    files = sorted(cache_dir.glob("*.parquet"), key=lambda f: f.stat().st_mtime)
+    total = sum(f.stat().st_size for f in files)
+    for file in files:
+        if total <= max_bytes:
+            break
+        total -= file.stat().st_size
+        file.unlink(missing_ok=True)
+        logger.debug(f"Evicted cached query result {file.name}")
+
+
+def cached_query(
+    query: str,
+    params: Optional[dict] = None,
+    geom_col: Optional[str] = None,
+    tables: Optional[list[str]] = None,
+    refresh: bool = False,
+    max_mb: float = QUERY_CACHE_MAX_MB,
+    engine: Optional[Engine] = None,
+) -> "pd.DataFrame | gpd.GeoDataFrame":
+    """
+    Run a query, or return its result from the on-disk cache if nothing it reads changed.
+
+    The cache key is the normalized SQL, the parameters and the table_versions()
+    stamp of every table the query reads (found with EXPLAIN unless given).
+    Results are Parquet files in query_cache_dir(); the least recently used
+    ones are evicted when the cache grows beyond max_mb.
+
+    Args:
+        query: SQL query (parameters in psycopg2 style, %(name)s)
+        params: Optional query parameters (JSON-serialisable)
+        geom_col: Geometry column; returns a GeoDataFrame when given
+        tables: Tables the query reads (default: taken from the query plan)
+        refresh: Ignore a cached result and overwrite it
+        max_mb: Cache size bound in megabytes
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        DataFrame, or GeoDataFrame when geom_col is given
+
+    Example:
+        >>> nearest = cached_query('''
+        ...     SELECT b.id, t.id AS transformer_id
+        ...     FROM buildings b
+        ...     CROSS JOIN LATERAL (SELECT id FROM transformers_new
+        ...                         ORDER BY b.geometry <-> geometry LIMIT 1) t
+        ... ''')
+    """
+    import geopandas as gpd
+
+    engine = engine or get_engine()
+    tables = sorted(tables) if tables is not None else query_tables(query, params, engine)
+    versions = table_versions(tables, engine)
+    key = hashlib.sha1(
+        json.dumps(
+            {
+                "sql": normalize_sql(query),
+                "params": params or {},
+                "versions": versions,
+                "geom_col": geom_col,
+            },
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()[:20]
+
+    cache_dir = query_cache_dir()
+    path = cache_dir / f"{key}.parquet"
+    if path.exists() and not refresh:
+        path.touch()
+        logger.info(f"Using cached query result {path.name} ({', '.join(tables)} unchanged)")
+        return gpd.read_parquet(path) if geom_col else pd.read_parquet(path)
+
+    if geom_col:
+        result = gpd.read_postgis(query, engine, geom_col=geom_col, params=params)
+    else:
+        result = pd.read_sql(query, engine, params=params)
+
+    tmp = path.with_suffix(".parquet.tmp")
+    result.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    _evict_query_cache(cache_dir, max_mb * 1024 * 1024)
+    logger.info(f"Cached query result {path.name} ({len(result):,} rows)")
+    return result
+
+
+def clear_query_cache() -> int:
+    """
+    Delete all cached query results.
+
+    Returns:
+        Number of results deleted
+    """
+    files = list(query_cache_dir().glob("*.parquet"))
+    for file in files:
+        file.unlink(missing_ok=True)
+    return len(files)
+
+
 def load_geodataframe(
     table_name: str,
     geom_col: str = "geometry",
     where: Optional[str] = None,
     limit: Optional[int] = None,
-) -> gpd.GeoDataFrame:
+    cache: bool = False,
+) -> "gpd.GeoDataFrame":
     """
     Load data from PostGIS table as GeoDataFrame.
 
@@ -83,6 +437,7 @@ def load_geodataframe(
         geom_col: Name of the geometry column (default: 'geometry')
         where: Optional WHERE clause (e.g., "score_balanced > 70")
         limit: Optional row limit
+        cache: Reuse the cached result while the tables read are unchanged (see cached_query)
 
     Returns:
         GeoDataFrame with spatial data
@@ -90,6 +445,8 @@ def load_geodataframe(
     Example:
         >>> cabins_gdf = load_geodataframe('cabins', where='score_balanced > 70', limit=100)
     """
+    import geopandas as gpd
+
     engine = get_engine()
 
     query = f"SELECT * FROM {table_name}"
@@ -99,14 +456,17 @@ def load_geodataframe(
         query += f" LIMIT {limit}"
 
     logger.info(f"Loading data from {table_name}...")
-    gdf = gpd.read_postgis(query, engine, geom_col=geom_col)
+    if cache:
+        gdf = cached_query(query, geom_col=geom_col, engine=engine)
+    else:
+        gdf = gpd.read_postgis(query, engine, geom_col=geom_col)
     logger.success(f"✓ Loaded {len(gdf):,} rows from {table_name}")
 
     return gdf
 
 
 def save_geodataframe(
-    gdf: gpd.GeoDataFrame,
+    gdf: "gpd.GeoDataFrame",
     table_name: str,
     if_exists: str = "append",
     create_spatial_index: bool = True,
@@ -147,16 +507,162 @@ def save_geodataframe(
     logger.success(f"✓ Saved {len(gdf):,} rows to {table_name}")
 
 
-def execute_sql_file(sql_file_path: str) -> None:
+def split_sql(sql: str) -> list[str]:
+    """
+    Split SQL into statements, without comments.
+
+    Semicolons inside quoted literals and dollar-quoted function bodies do not
+    end a statement.
+    """
+    statements, current, start = [], [], 0
+    for match in _SQL_STATEMENT_TOKEN.finditer(sql):
+        if match.group(1):
+            continue
+        current.append(sql[start : match.start()])
+        start = match.end()
+        if match.group(4):
+            statements.append("".join(current).strip())
+            current = []
+    current.append(sql[start:])
+    statements.append("".join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+def read_script(path: str | Path) -> list[tuple[str, str]]:
+    """
+    Statements and \\echo texts of a SQL file, without comments, in file order.
+
+    \\ir includes are inlined; other meta-commands (\\timing, ...) are dropped.
+
+    Args:
+        path: SQL file
+
+    Returns:
+        ('sql', statement) and ('echo', text) items; statements without
+        trailing semicolons
+    """
+    path = Path(path)
+    items, lines = [], []
+
+    def flush() -> None:
+        items.extend(("sql", statement) for statement in split_sql("\n".join(lines)))
+        lines.clear()
+
+    for line in path.read_text().splitlines():
+        stripped = line.strip()
+        if stripped.startswith("\\ir "):
+            flush()
+            items.extend(read_script(path.parent / stripped.split(maxsplit=1)[1]))
+        elif stripped == "\\echo" or stripped.startswith("\\echo "):
+            flush()
+            items.append(("echo", _echo_text(stripped[len("\\echo") :])))
+        elif not stripped.startswith("\\"):
+            lines.append(line)
+    flush()
+    return items
+
+
+def _echo_text(arguments: str) -> str:
+    # psql joins the arguments with spaces; '' inside a quoted argument is a quote
+    return " ".join(
+        quoted.replace("''", "'") + bare
+        for quoted, bare in re.findall(r"'((?:[^']|'')*)'|(\S+)", arguments)
+    )
+
+
+def read_statements(path: str | Path) -> list[str]:
+    """
+    Statements of a SQL file, without comments and psql meta-commands.
+
+    \\ir includes are inlined; other meta-commands (\\echo, \\timing, ...) are dropped.
+
+    Args:
+        path: SQL file
+
+    Returns:
+        Statements in file order, without trailing semicolons
+    """
+    return [text for kind, text in read_script(path) if kind == "sql"]
+
+
+def needs_psql(sql_file_path: str | Path) -> bool:
+    """
+    Whether a SQL file (or a file it includes with \\ir) needs psql itself.
+
+    True for \\if/\\set/\\gset and :variable interpolation, which cannot be
+    split into plain statements (run_sql_file, read_statements), and for
+    client-side \\copy.
+    """
+    path = Path(sql_file_path)
+    sql = path.read_text()
+
+    def strip(match: re.Match) -> str:
+        # Literals and comments may contain anything; :'name' is a psql variable though
+        if match.group(3) or (match.group(1) and sql[match.start() - 1 : match.start()] != ":"):
+            return " "
+        return match.group(0)
+
+    if _PSQL_ONLY.search(_SQL_STATEMENT_TOKEN.sub(strip, sql)):
+        return True
+    return any(
+        needs_psql(path.parent / line.split(maxsplit=1)[1])
+        for line in map(str.strip, sql.splitlines())
+        if line.startswith("\\ir ")
+    )
+
+
+def run_sql_file(sql_file_path: str | Path, engine: Optional[Engine] = None) -> None:
+    """
+    Run a SQL file statement by statement on one connection, printing result sets.
+
+    Like psql -f for files whose only meta-commands are \\echo and \\ir (\\echo
+    texts are printed in order); scripts using psql variables, \\if or \\copy
+    need psql itself. Runs in one transaction.
+
+    Args:
+        sql_file_path: Path to .sql file
+        engine: Optional engine (default: get_engine())
+    """
+    engine = engine or get_engine()
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            for kind, statement in read_script(sql_file_path):
+                if kind == "echo":
+                    print(statement)
+                    continue
+                cur.execute(statement)
+                if cur.description is not None:
+                    rows = pd.DataFrame(cur.fetchall(), columns=[c.name for c in cur.description])
+                    print(rows.to_string(index=False) if len(rows) else "(0 rows)", end="\n\n")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def execute_sql_file(sql_file_path: str, profile: bool = False) -> None:
     """
     Execute SQL file against the database.
 
     Args:
         sql_file_path: Path to .sql file
+        profile: Run statement by statement with EXPLAIN ANALYZE and write a
+            profile bundle (see svakenett.profiling)
 
     Example:
         >>> execute_sql_file('sql/01_init_schema.sql')
     """
+    if profile:
+        # svakenett.profiling imports this module
+        from svakenett.profiling import profile_sql_file
+
+        bundle = profile_sql_file(sql_file_path)
+        logger.success(f"✓ SQL file executed: {sql_file_path} (profile: {bundle})")
+        return
+
     engine = get_engine()
 
     logger.info(f"Executing SQL file: {sql_file_path}")
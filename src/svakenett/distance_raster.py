@@ -0,0 +1,340 @@
+"""
+Memory-mapped distance-to-infrastructure rasters
+
+Rasterizes distribution_lines_11_24kv and transformers_new onto fixed metric
+grids (EPSG:25833) over the working extent and stores, per layer, the
+Euclidean distance to the nearest feature and that feature's index as .npy
+files. Readers open them with mmap_mode='r', so a point query is an array
+lookup and worker processes share the pages zero-copy (a DistanceRaster
+pickles as its path).
+
+Distances come from scipy.ndimage.distance_transform_edt, run tile by tile
+with a halo of max_distance_m around each tile. A nearest feature within
+max_distance_m always lies inside the halo, so those distances are exact (to
+the cell size); farther cells are stored as +inf with no feature.
+
+Layout of the output directory:
+    metadata.json                     grid, layers, data versions
+    <layer>_distance.npy              float32 meters (inf beyond max_distance_m)
+    <layer>_feature.npy               int32 index into <layer>_ids.npy (-1: none)
+    <layer>_ids.npy                   int64 source table ids
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import shapely
+from loguru import logger
+from pyproj import Transformer
+from scipy.ndimage import distance_transform_edt
+from sqlalchemy.engine import Engine
+
+from svakenett.db import get_engine, table_versions
+from svakenett.ledger import default_raster_dir
+from svakenett.network import METRIC_SRID
+
+
+@dataclass(frozen=True)
+class RasterLayer:
+    """One distance layer: source table, cell size and exactness cap."""
+
+    name: str
+    table: str
+    cell_m: float
+    max_distance_m: float
+
+
+LAYERS = {
+    "line": RasterLayer("line", "distribution_lines_11_24kv", 10.0, 5_000.0),
+    "transformer": RasterLayer("transformer", "transformers_new", 50.0, 50_000.0),
+}
+
+# Working extent: buildings bounding box plus this margin
+EXTENT_MARGIN_M = 2_000.0
+
+TILE_CELLS = 2048
+
+
+def _grid(extent: tuple, cell_m: float) -> tuple[float, float, int, int]:
+    """Snap extent to cell multiples: (xmin, ymax, rows, cols)."""
+    xmin = np.floor(extent[0] / cell_m) * cell_m
+    ymin = np.floor(extent[1] / cell_m) * cell_m
+    xmax = np.ceil(extent[2] / cell_m) * cell_m
+    ymax = np.ceil(extent[3] / cell_m) * cell_m
+    return (
+        float(xmin),
+        float(ymax),
+        int(round((ymax - ymin) / cell_m)),
+        int(round((xmax - xmin) / cell_m)),
+    )
+
+
+def rasterize_features(
+    geometries: np.ndarray, xmin: float, ymax: float, cell_m: float
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Cells touched by each geometry (lines densified to half a cell).
+
+    Returns:
+        (rows, cols, feature index) per seed cell; rows/cols may lie outside the grid
+    """
+    dense = shapely.segmentize(geometries, cell_m / 2)
+    coords, feature = shapely.get_coordinates(dense, return_index=True)
+    rows = np.floor((ymax - coords[:, 1]) / cell_m).astype(np.int64)
+    cols = np.floor((coords[:, 0] - xmin) / cell_m).astype(np.int64)
+    return rows, cols, feature.astype(np.int32)
+
+
+def distance_tiles(
+    seeds: tuple[np.ndarray, np.ndarray, np.ndarray],
+    shape: tuple[int, int],
+    cell_m: float,
+    max_distance_m: float,
+    distance_out: np.ndarray,
+    feature_out: np.ndarray,
+    tile_cells: int = TILE_CELLS,
+) -> None:
+    """
+    Fill distance and nearest-feature arrays tile by tile with an EDT.
+
+    Args:
+        seeds: (rows, cols, feature) from rasterize_features
+        shape: (rows, cols) of the grid
+        cell_m: Cell size in meters
+        max_distance_m: Halo around each tile; farther cells become inf / -1
+        distance_out, feature_out: Arrays of shape (memmaps) to write into
+        tile_cells: Tile edge length in cells (memory ~16 bytes per cell of tile plus halo)
+    """
+    seed_rows, seed_cols, seed_feature = seeds
+    halo = int(np.ceil(max_distance_m / cell_m))
+    n_rows, n_cols = shape
+
+    for r0 in range(0, n_rows, tile_cells):
+        for c0 in range(0, n_cols, tile_cells):
+            r1, c1 = min(r0 + tile_cells, n_rows), min(c0 + tile_cells, n_cols)
+            wr0, wc0 = r0 - halo, c0 - halo
+            height, width = r1 - r0 + 2 * halo, c1 - c0 + 2 * halo
+            local_r, local_c = seed_rows - wr0, seed_cols - wc0
+            inside = (local_r >= 0) & (local_r < height) & (local_c >= 0) & (local_c < width)
+            if not inside.any():
+                distance_out[r0:r1, c0:c1] = np.inf
+                feature_out[r0:r1, c0:c1] = -1
+                continue
+
+            feature_grid = np.full((height, width), -1, dtype=np.int32)
+            feature_grid[local_r[inside], local_c[inside]] = seed_feature[inside]
+            indices = np.empty((2, height, width), dtype=np.int32)
+            distance = distance_transform_edt(
+                feature_grid < 0, sampling=cell_m, return_indices=True, indices=indices
+            )
+
+            crop = np.s_[halo : halo + r1 - r0, halo : halo + c1 - c0]
+            tile_distance = distance[crop]
+            tile_feature = feature_grid[indices[0][crop], indices[1][crop]]
+            beyond = tile_distance > max_distance_m
+            tile_distance[beyond] = np.inf
+            tile_feature[beyond] = -1
+            distance_out[r0:r1, c0:c1] = tile_distance
+            feature_out[r0:r1, c0:c1] = tile_feature
+
+
+def _working_extent(engine: Engine) -> tuple:
+    """Bounding box of buildings in METRIC_SRID plus EXTENT_MARGIN_M."""
+    bounds = pd.read_sql(
+        f"SELECT ST_XMin(e) AS xmin, ST_YMin(e) AS ymin, ST_XMax(e) AS xmax, ST_YMax(e) AS ymax "
+        f"FROM (SELECT ST_Extent(ST_Transform(geometry, {METRIC_SRID})) AS e FROM buildings) b",
+        engine,
+    ).iloc[0]
+    return (
+        bounds["xmin"] - EXTENT_MARGIN_M,
+        bounds["ymin"] - EXTENT_MARGIN_M,
+        bounds["xmax"] + EXTENT_MARGIN_M,
+        bounds["ymax"] + EXTENT_MARGIN_M,
+    )
+
+
+def _load_features(layer: RasterLayer, engine: Engine) -> tuple[np.ndarray, np.ndarray]:
+    """Source ids and METRIC_SRID geometries of a layer."""
+    df = pd.read_sql(
+        f"SELECT id, ST_AsBinary(ST_Transform(geometry, {METRIC_SRID})) AS wkb FROM {layer.table} "
+        f"WHERE geometry IS NOT NULL ORDER BY id",
+        engine,
+    )
+    return df["id"].to_numpy(np.int64), shapely.from_wkb(df["wkb"].map(bytes).to_numpy())
+
+
+def build_distance_rasters(
+    output_dir: Optional[str | Path] = None,
+    layers: Optional[list[str]] = None,
+    extent: Optional[tuple] = None,
+    tile_cells: int = TILE_CELLS,
+    force: bool = False,
+    engine: Optional[Engine] = None,
+) -> Path:
+    """
+    Build the distance and nearest-feature rasters.
+
+    Layers whose source table, grid and extent are unchanged since the last
+    build are kept. Files are written next to the old ones and swapped in with
+    os.replace, so open readers keep a consistent (old) view.
+
+    Args:
+        output_dir: Output directory (default: default_raster_dir())
+        layers: Layer names (default: all of LAYERS)
+        extent: (xmin, ymin, xmax, ymax) in METRIC_SRID (default: buildings + margin)
+        tile_cells: Tile edge length in cells
+        force: Rebuild even if up to date
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Output directory
+
+    Example:
+        >>> build_distance_rasters(layers=['line'])
+    """
+    engine = engine or get_engine()
+    output_dir = Path(output_dir or default_raster_dir())
+    output_dir.mkdir(parents=True, exist_ok=True)
+    layers = layers or list(LAYERS)
+    unknown = set(layers) - set(LAYERS)
+    if unknown:
+        raise ValueError(f"Unknown raster layer(s) {sorted(unknown)}. Use: {', '.join(LAYERS)}")
+
+    metadata_path = output_dir / "metadata.json"
+    metadata = json.loads(metadata_path.read_text()) if metadata_path.exists() else {"layers": {}}
+    extent = tuple(float(v) for v in (extent or _working_extent(engine)))
+    versions = table_versions([LAYERS[name].table for name in layers], engine)
+
+    for name in layers:
+        layer = LAYERS[name]
+        xmin, ymax, n_rows, n_cols = _grid(extent, layer.cell_m)
+        entry = {
+            "table": layer.table,
+            "data_version": versions[layer.table],
+            "cell_m": layer.cell_m,
+            "max_distance_m": layer.max_distance_m,
+            "xmin": xmin,
+            "ymax": ymax,
+            "shape": [n_rows, n_cols],
+        }
+        previous = {k: v for k, v in metadata["layers"].get(name, {}).items() if k != "built_at"}
+        if not force and previous == entry and (output_dir / f"{name}_distance.npy").exists():
+            logger.info(f"Raster '{name}' is up to date")
+            continue
+
+        logger.info(
+            f"Rasterizing {layer.table} at {layer.cell_m:g} m ({n_rows:,} x {n_cols:,} cells)..."
+        )
+        ids, geometries = _load_features(layer, engine)
+        seeds = rasterize_features(geometries, xmin, ymax, layer.cell_m)
+
+        distance = np.lib.format.open_memmap(
+            output_dir / f"{name}_distance.npy.tmp",
+            mode="w+",
+            dtype=np.float32,
+            shape=(n_rows, n_cols),
+        )
+        feature = np.lib.format.open_memmap(
+            output_dir / f"{name}_feature.npy.tmp",
+            mode="w+",
+            dtype=np.int32,
+            shape=(n_rows, n_cols),
+        )
+        distance_tiles(
+            seeds,
+            (n_rows, n_cols),
+            layer.cell_m,
+            layer.max_distance_m,
+            distance,
+            feature,
+            tile_cells,
+        )
+        distance.flush()
+        feature.flush()
+        del distance, feature
+        with open(output_dir / f"{name}_ids.npy.tmp", "wb") as f:
+            np.save(f, ids)
+        for suffix in ("distance", "feature", "ids"):
+            os.replace(output_dir / f"{name}_{suffix}.npy.tmp", output_dir / f"{name}_{suffix}.npy")
+
+        metadata["layers"][name] = {
+            **entry,
+            "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        metadata["srid"] = METRIC_SRID
+        metadata_path.write_text(json.dumps(metadata, indent=2))
+        logger.success(f"✓ Raster '{name}': {len(ids):,} features, {n_rows * n_cols:,} cells")
+
+    return output_dir
+
+
+class DistanceRaster:
+    """
+    Read-only view of built rasters; arrays are memory-mapped on first use.
+
+    Pickles as its path, so passing it to worker processes shares the mapped
+    files instead of copying arrays.
+
+    Example:
+        >>> raster = DistanceRaster()
+        >>> distance_m, line_id = raster.query('line', *raster.to_metric(lon, lat))
+    """
+
+    def __init__(self, path: Optional[str | Path] = None):
+        self.path = Path(path or default_raster_dir())
+        self.metadata = json.loads((self.path / "metadata.json").read_text())
+        self._arrays: dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    def __reduce__(self):
+        return (DistanceRaster, (self.path,))
+
+    @property
+    def layers(self) -> list[str]:
+        return list(self.metadata["layers"])
+
+    def _layer(self, name: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if name not in self._arrays:
+            if name not in self.metadata["layers"]:
+                raise ValueError(
+                    f"Raster layer '{name}' not built. Available: {', '.join(self.layers)}"
+                )
+            self._arrays[name] = (
+                np.load(self.path / f"{name}_distance.npy", mmap_mode="r"),
+                np.load(self.path / f"{name}_feature.npy", mmap_mode="r"),
+                np.load(self.path / f"{name}_ids.npy"),
+            )
+        return self._arrays[name]
+
+    @staticmethod
+    def to_metric(lon: np.ndarray, lat: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Convert WGS84 lon/lat to METRIC_SRID x/y."""
+        return Transformer.from_crs(4326, METRIC_SRID, always_xy=True).transform(lon, lat)
+
+    def query(self, layer: str, x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Distance to and id of the nearest feature for points in METRIC_SRID.
+
+        Returns:
+            (distance_m, feature_id): NaN / -1 outside the grid,
+            inf / -1 beyond the layer's max_distance_m
+        """
+        distance, feature, ids = self._layer(layer)
+        meta = self.metadata["layers"][layer]
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        rows = np.floor((meta["ymax"] - y) / meta["cell_m"]).astype(np.int64)
+        cols = np.floor((x - meta["xmin"]) / meta["cell_m"]).astype(np.int64)
+        inside = (rows >= 0) & (rows < distance.shape[0]) & (cols >= 0) & (cols < distance.shape[1])
+
+        result_distance = np.full(len(x), np.nan)
+        result_id = np.full(len(x), -1, dtype=np.int64)
+        result_distance[inside] = distance[rows[inside], cols[inside]]
+        index = feature[rows[inside], cols[inside]]
+        result_id[np.flatnonzero(inside)[index >= 0]] = ids[index[index >= 0]]
+        return result_distance, result_id
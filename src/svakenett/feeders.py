@@ -0,0 +1,432 @@
+"""
+Feeders of the 11-24 kV distribution network
+
+A feeder is a connected part of distribution_lines_11_24kv between
+transformers: the line topology (svakenett.network) is cut at every node with
+a transformer, and the remaining line pieces are labelled by a vectorized
+union-find. Each building is attached to the feeder of its nearest line piece,
+and building counts per type, estimated peak load and conductor length are
+summed per feeder into the feeders table, replacing "buildings within 1 km"
+(which counts neighbours on other lines and counts every pair twice).
+
+Feeder ids are hashes of their line pieces, so a refresh after a line update
+only inserts new feeders, deletes vanished ones and re-attaches the buildings
+that were on a vanished feeder or lie near a new one.
+"""
+
+import hashlib
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import shapely
+from loguru import logger
+from scipy.spatial import cKDTree
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from svakenett.building_types import BUILDING_TYPES, DEFAULT_PEAK_LOAD_KW, thresholds_values_sql
+from svakenett.db import copy_frame, get_engine, stream_query
+from svakenett.network import METRIC_SRID, SNAP_M, TRANSFORMER_SNAP_M, Topology, build_topology
+
+LINES_TABLE = "distribution_lines_11_24kv"
+
+# Buildings farther than this from every distribution line are not on a feeder
+MAX_ATTACH_M = 2_000.0
+
+# Bounding-box margin (degrees) when looking for buildings near new feeders;
+# 0.06° longitude is still > MAX_ATTACH_M at 71°N
+_NEAR_DEGREES = 0.06
+
+_SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS feeders (
+        feeder_id VARCHAR(16) PRIMARY KEY,
+        geometry GEOMETRY(MultiLineString, 4326),
+        line_count INTEGER NOT NULL,
+        conductor_length_km DOUBLE PRECISION NOT NULL,
+        min_voltage_kv REAL,
+        avg_year_built REAL,
+        transformer_count INTEGER NOT NULL,
+        transformer_ids INTEGER[],
+        building_count INTEGER NOT NULL DEFAULT 0,
+        residential_count INTEGER NOT NULL DEFAULT 0,
+        cabin_count INTEGER NOT NULL DEFAULT 0,
+        type_counts JSONB,
+        peak_load_kw DOUBLE PRECISION NOT NULL DEFAULT 0,
+        load_kw_per_km DOUBLE PRECISION,
+        load_kw_per_transformer DOUBLE PRECISION,
+        avg_weak_grid_score REAL,
+        prospect_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT NOW()
+    );
+    CREATE INDEX IF NOT EXISTS idx_feeders_geom ON feeders USING GIST(geometry);
+    ALTER TABLE buildings ADD COLUMN IF NOT EXISTS feeder_id VARCHAR(16);
+    CREATE INDEX IF NOT EXISTS idx_buildings_feeder ON buildings(feeder_id)
+"""
+
+
+def union_find(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Connected component label of n elements joined by the pairs (a[i], b[i]).
+
+    Vectorized union-find: every round hooks the larger root of each pair onto
+    the smaller one, then compresses paths by pointer jumping, until all pairs
+    share a root.
+
+    Returns:
+        Root (smallest member) of each element's component
+    """
+    parent = np.arange(n)
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    while True:
+        root_a, root_b = parent[a], parent[b]
+        differ = root_a != root_b
+        if not differ.any():
+            return parent
+        np.minimum.at(
+            parent, np.maximum(root_a, root_b)[differ], np.minimum(root_a, root_b)[differ]
+        )
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+
+
+def _pieces(topology: Topology) -> tuple[np.ndarray, np.ndarray]:
+    """Start break index and line index of every line piece."""
+    line_of = np.repeat(np.arange(len(topology.lines)), np.diff(topology.line_ptr))
+    is_start = np.ones(len(line_of), dtype=bool)
+    is_start[topology.line_ptr[1:] - 1] = False
+    starts = np.flatnonzero(is_start)
+    return starts, line_of[starts]
+
+
+def label_feeders(
+    topology: Topology,
+    line_keys: np.ndarray,
+    transformer_x: np.ndarray,
+    transformer_y: np.ndarray,
+    transformer_ids: np.ndarray,
+    snap_m: float = TRANSFORMER_SNAP_M,
+) -> pd.DataFrame:
+    """
+    Feeder of every line piece.
+
+    Args:
+        topology: Distribution line topology
+        line_keys: Content hash of each topology line (stable across reloads)
+        transformer_x, transformer_y: Transformer positions (METRIC_SRID)
+        transformer_ids: transformers_new.id
+        snap_m: Transformers cut the network at the nearest node within this distance
+
+    Returns:
+        One row per piece: start (break index), line, length_m, feeder_id,
+        transformer_ids (transformers at the piece's end nodes)
+    """
+    starts, piece_line = _pieces(topology)
+    u = topology.break_node[starts]
+    v = topology.break_node[starts + 1]
+
+    # Node positions, and the node each transformer sits on
+    node_xy = np.zeros((topology.n_nodes, 2))
+    node_xy[topology.break_node] = shapely.get_coordinates(
+        shapely.line_interpolate_point(
+            topology.lines[np.repeat(np.arange(len(topology.lines)), np.diff(topology.line_ptr))],
+            topology.break_pos,
+        )
+    )
+    distance, nearest = cKDTree(node_xy).query(
+        np.column_stack([transformer_x, transformer_y]), distance_upper_bound=snap_m
+    )
+    attached = np.isfinite(distance)
+    node_transformers = (
+        pd.Series(np.asarray(transformer_ids)[attached], index=nearest[attached])
+        .groupby(level=0)
+        .agg(list)
+    )
+    is_cut = np.zeros(topology.n_nodes, dtype=bool)
+    is_cut[node_transformers.index.to_numpy()] = True
+
+    # Pieces meeting at a node without a transformer belong to the same feeder
+    incidence = pd.DataFrame(
+        {
+            "node": np.concatenate([u, v]),
+            "piece": np.concatenate([np.arange(len(starts))] * 2),
+        }
+    )
+    incidence = incidence[~is_cut[incidence["node"].to_numpy()]].sort_values("node", kind="stable")
+    nodes = incidence["node"].to_numpy()
+    pieces = incidence["piece"].to_numpy()
+    chained = nodes[1:] == nodes[:-1]
+    component = union_find(len(starts), pieces[:-1][chained], pieces[1:][chained])
+
+    result = pd.DataFrame(
+        {
+            "start": starts,
+            "line": piece_line,
+            "length_m": topology.break_pos[starts + 1] - topology.break_pos[starts],
+            "component": component,
+            "piece_key": [
+                f"{key}:{pos:.1f}"
+                for key, pos in zip(line_keys[piece_line], topology.break_pos[starts])
+            ],
+        }
+    )
+    ids = result.groupby("component")["piece_key"].agg(
+        lambda keys: hashlib.sha1("|".join(sorted(keys)).encode()).hexdigest()[:16]
+    )
+    result["feeder_id"] = ids.reindex(result["component"]).to_numpy()
+
+    at_end = [
+        node_transformers.get(node, []) + node_transformers.get(other, [])
+        for node, other in zip(u, v)
+    ]
+    result["transformer_ids"] = at_end
+    return result.drop(columns=["component", "piece_key"])
+
+
+def _feeder_lines(pieces: pd.DataFrame, lines: pd.DataFrame) -> pd.DataFrame:
+    """Line aggregates per feeder (length-weighted year, lowest voltage, transformers)."""
+    attrs = lines.iloc[pieces["line"].to_numpy()].reset_index(drop=True)
+    frame = pieces.assign(
+        line_id=attrs["id"].to_numpy(),
+        voltage_kv=attrs["voltage_kv"].to_numpy(),
+        year_weight=attrs["year_built"].to_numpy(float) * pieces["length_m"].to_numpy(),
+        year_length=np.where(attrs["year_built"].notna(), pieces["length_m"], 0.0),
+    )
+    grouped = frame.groupby("feeder_id")
+    feeders = pd.DataFrame(
+        {
+            "line_count": grouped["line_id"].nunique(),
+            "conductor_length_km": grouped["length_m"].sum() / 1000,
+            "min_voltage_kv": grouped["voltage_kv"].min(),
+            "avg_year_built": grouped["year_weight"].sum(min_count=1)
+            / grouped["year_length"].sum().replace(0, np.nan),
+            "transformer_ids": grouped["transformer_ids"].agg(
+                lambda lists: sorted({t for ids in lists for t in ids})
+            ),
+            "line_ids": grouped["line_id"].agg(lambda ids: sorted(set(ids))),
+        }
+    )
+    feeders["transformer_count"] = feeders["transformer_ids"].map(len)
+    return feeders.reset_index()
+
+
+def _load_lines(engine: Engine) -> pd.DataFrame:
+    return pd.read_sql(
+        f"""
+        SELECT id, voltage_kv, year_built, md5(ST_AsBinary(geometry)) AS line_key,
+               ST_AsBinary(ST_Transform(geometry, {METRIC_SRID})) AS wkb
+        FROM {LINES_TABLE}
+        WHERE geometry IS NOT NULL
+        ORDER BY id
+        """,
+        engine,
+    )
+
+
+def refresh_feeders(
+    full: bool = False,
+    snap_m: float = SNAP_M,
+    max_attach_m: float = MAX_ATTACH_M,
+    chunk_size: int = 200_000,
+    engine: Optional[Engine] = None,
+) -> dict[str, int]:
+    """
+    Label feeders, attach buildings and recompute the per-feeder metrics.
+
+    Args:
+        full: Re-attach every building and rewrite every feeder
+        snap_m: Line endpoint snap tolerance in meters
+        max_attach_m: Buildings farther than this from every line get no feeder
+        chunk_size: Buildings per streamed chunk
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Counts of feeders ('feeders', 'new', 'removed') and re-attached 'buildings'
+    """
+    engine = engine or get_engine()
+    with engine.begin() as conn:
+        for statement in _SCHEMA_SQL.split(";"):
+            conn.execute(text(statement))
+
+    lines = _load_lines(engine)
+    geometries = shapely.from_wkb(lines["wkb"].map(bytes).to_numpy())
+    parts, part_of = shapely.get_parts(geometries, return_index=True)
+    keep = shapely.length(parts) > 0
+    lines = lines.iloc[part_of[keep]].reset_index(drop=True)
+    topology = build_topology(parts[keep], lines["id"].to_numpy(), snap_m)
+
+    transformers = pd.read_sql(
+        f"SELECT id, ST_X(p) AS x, ST_Y(p) AS y FROM "
+        f"(SELECT id, ST_Transform(geometry, {METRIC_SRID}) AS p FROM transformers_new) t",
+        engine,
+    )
+    pieces = label_feeders(
+        topology,
+        lines["line_key"].to_numpy(),
+        transformers["x"].to_numpy(),
+        transformers["y"].to_numpy(),
+        transformers["id"].to_numpy(),
+    )
+    feeders = _feeder_lines(pieces, lines)
+
+    with engine.connect() as conn:
+        previous = set(conn.execute(text("SELECT feeder_id FROM feeders")).scalars())
+    current = set(feeders["feeder_id"])
+    new_ids = current if full else current - previous
+    removed_ids = previous - current
+    logger.info(f"{len(current):,} feeders ({len(new_ids):,} new, {len(removed_ids):,} removed)")
+
+    new_feeders = feeders[feeders["feeder_id"].isin(new_ids)]
+    new_line_ids = sorted({line for ids in new_feeders["line_ids"] for line in ids})
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            # Feeders: drop vanished ones, insert new ones with their line aggregates
+            cur.execute(
+                "DELETE FROM feeders WHERE feeder_id = ANY(%(ids)s)",
+                {"ids": sorted(removed_ids | new_ids)},
+            )
+            cur.execute("""
+                CREATE TEMP TABLE feeder_new (
+                    feeder_id VARCHAR(16), line_count INTEGER, conductor_length_km DOUBLE PRECISION,
+                    min_voltage_kv REAL, avg_year_built REAL, transformer_count INTEGER,
+                    transformer_ids TEXT, line_ids TEXT
+                )
+            """)
+            copy_frame(
+                cur,
+                "feeder_new",
+                new_feeders.assign(
+                    transformer_ids=new_feeders["transformer_ids"].map(
+                        lambda ids: "{" + ",".join(map(str, ids)) + "}"
+                    ),
+                    line_ids=new_feeders["line_ids"].map(
+                        lambda ids: "{" + ",".join(map(str, ids)) + "}"
+                    ),
+                )[
+                    [
+                        "feeder_id",
+                        "line_count",
+                        "conductor_length_km",
+                        "min_voltage_kv",
+                        "avg_year_built",
+                        "transformer_count",
+                        "transformer_ids",
+                        "line_ids",
+                    ]
+                ],
+            )
+            cur.execute(f"""
+                INSERT INTO feeders (feeder_id, geometry, line_count, conductor_length_km,
+                                     min_voltage_kv, avg_year_built, transformer_count,
+                                     transformer_ids)
+                SELECT f.feeder_id,
+                       (SELECT ST_Multi(ST_Union(l.geometry)) FROM {LINES_TABLE} l
+                        WHERE l.id = ANY(f.line_ids::bigint[])),
+                       f.line_count, f.conductor_length_km, f.min_voltage_kv, f.avg_year_built,
+                       f.transformer_count, f.transformer_ids::integer[]
+                FROM feeder_new f
+            """)
+
+            # Buildings to (re-)attach: unattached, on a vanished feeder, or near a new one
+            if full:
+                scope = "TRUE"
+            else:
+                scope = f"""
+                    b.feeder_id IS NULL
+                    OR b.feeder_id = ANY(%(removed)s)
+                    OR EXISTS (SELECT 1 FROM {LINES_TABLE} l
+                               WHERE l.id = ANY(%(new_lines)s)
+                                 AND b.geometry && ST_Expand(l.geometry, {_NEAR_DEGREES}))
+                """
+            query = f"""
+                SELECT id, ST_X(p) AS x, ST_Y(p) AS y
+                FROM (SELECT b.id, ST_Transform(b.geometry, {METRIC_SRID}) AS p FROM buildings b
+                      WHERE b.geometry IS NOT NULL AND ({scope})) s
+            """
+            params = {"removed": sorted(removed_ids), "new_lines": [int(i) for i in new_line_ids]}
+            piece_feeder = pd.Series(
+                pieces["feeder_id"].to_numpy(), index=pieces["start"].to_numpy()
+            )
+
+            cur.execute("CREATE TEMP TABLE feeder_attach (id BIGINT, feeder_id VARCHAR(16))")
+            n_attached = 0
+            for chunk in stream_query(query, params, chunk_size=chunk_size, engine=engine):
+                feeder = np.full(len(chunk), None, dtype=object)
+                p_idx, p_line, p_pos, _ = topology.locate(
+                    chunk["x"].to_numpy(float), chunk["y"].to_numpy(float), max_attach_m
+                )
+                start, _ = topology.piece_of(p_line, p_pos)
+                feeder[p_idx] = piece_feeder.reindex(start).to_numpy()
+                copy_frame(
+                    cur, "feeder_attach", pd.DataFrame({"id": chunk["id"], "feeder_id": feeder})
+                )
+                n_attached += len(chunk)
+            cur.execute("""
+                UPDATE buildings b SET feeder_id = a.feeder_id
+                FROM feeder_attach a
+                WHERE b.id = a.id AND b.feeder_id IS DISTINCT FROM a.feeder_id
+            """)
+
+            # Building aggregates of all feeders in one set-based pass
+            type_count_columns = ", ".join(
+                f"'{code}', COUNT(*) FILTER (WHERE b.bygningstype = {code})"
+                for code in BUILDING_TYPES
+            )
+            cur.execute(f"""
+                WITH per_feeder AS (
+                    SELECT
+                        b.feeder_id,
+                        COUNT(*) AS building_count,
+                        COUNT(*) FILTER (WHERE b.building_source = 'residential')
+                            AS residential_count,
+                        COUNT(*) FILTER (WHERE b.building_source = 'cabin') AS cabin_count,
+                        jsonb_build_object({type_count_columns}) AS type_counts,
+                        SUM(COALESCE(l.peak_load_kw, {DEFAULT_PEAK_LOAD_KW})) AS peak_load_kw,
+                        AVG(b.weak_grid_score) AS avg_weak_grid_score,
+                        COUNT(*) FILTER (WHERE b.weak_grid_score >= t.threshold) AS prospect_count
+                    FROM buildings b
+                    LEFT JOIN {thresholds_values_sql('peak_load_kw')}
+                        AS l(bygningstype, peak_load_kw)
+                        ON l.bygningstype = b.bygningstype
+                    LEFT JOIN {thresholds_values_sql()} AS t(bygningstype, threshold)
+                        ON t.bygningstype = b.bygningstype
+                    WHERE b.feeder_id IS NOT NULL
+                    GROUP BY b.feeder_id
+                )
+                UPDATE feeders f
+                SET building_count = COALESCE(p.building_count, 0),
+                    residential_count = COALESCE(p.residential_count, 0),
+                    cabin_count = COALESCE(p.cabin_count, 0),
+                    type_counts = p.type_counts,
+                    peak_load_kw = COALESCE(p.peak_load_kw, 0),
+                    load_kw_per_km = COALESCE(p.peak_load_kw, 0) / NULLIF(f.conductor_length_km, 0),
+                    load_kw_per_transformer =
+                        COALESCE(p.peak_load_kw, 0) / NULLIF(f.transformer_count, 0),
+                    avg_weak_grid_score = p.avg_weak_grid_score,
+                    prospect_count = COALESCE(p.prospect_count, 0),
+                    updated_at = NOW()
+                FROM feeders f2
+                LEFT JOIN per_feeder p ON p.feeder_id = f2.feeder_id
+                WHERE f.feeder_id = f2.feeder_id
+            """)
+        conn.commit()
+    finally:
+        conn.close()
+
+    counts = {
+        "feeders": len(current),
+        "new": len(new_ids),
+        "removed": len(removed_ids),
+        "buildings": n_attached,
+    }
+    logger.success(
+        f"✓ {counts['feeders']:,} feeders ({counts['new']:,} new, {counts['removed']:,} removed), "
+        f"{n_attached:,} buildings re-attached"
+    )
+    return counts
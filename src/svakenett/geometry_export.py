@@ -0,0 +1,280 @@
+"""
+Compact export of line geometries for web maps
+
+Precomputes zoom-specific simplified variants of power_lines_new (tolerance
+matched to the pixel size of the target zoom) and serializes them with
+quantized coordinates, either as GeoJSON with 6 decimals or as flat,
+delta-encoded integer arrays.
+"""
+
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from svakenett.db import get_engine
+from svakenett.tiles import meters_per_pixel
+
+SIMPLIFIED_TABLE = "power_lines_simplified"
+DEFAULT_ZOOMS = (6, 8, 10, 12)
+
+# 6 decimals ~ 0.1 m in latitude, well below one pixel at any map zoom
+COORD_PRECISION = 6
+
+LINE_PROPERTIES = {
+    "id": "id",
+    "voltage_kv": "spenning_kv",
+    "owner_orgnr": "eierorgnr::text",
+    "year_built": "driftsattaar",
+}
+
+
+def build_simplified_lines(
+    zooms: tuple[int, ...] = DEFAULT_ZOOMS,
+    engine: Optional[Engine] = None,
+) -> None:
+    """
+    (Re)build power_lines_simplified with one simplified variant per zoom level.
+
+    Geometry is simplified in EPSG:3857 with ST_SimplifyPreserveTopology, using the
+    pixel size of the zoom as tolerance, then stored back in EPSG:4326. Lines that
+    collapse below one pixel are dropped for that zoom.
+
+    Args:
+        zooms: Target zoom levels
+        engine: Optional engine (default: get_engine())
+
+    Example:
+        >>> build_simplified_lines(zooms=(8, 12))
+    """
+    engine = engine or get_engine()
+
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {SIMPLIFIED_TABLE} (
+                line_id INTEGER NOT NULL,
+                zoom SMALLINT NOT NULL,
+                geometry GEOMETRY(Geometry, 4326) NOT NULL,
+                PRIMARY KEY (zoom, line_id)
+            )
+        """))
+
+        for zoom in zooms:
+            tolerance = meters_per_pixel(zoom)
+            conn.execute(text(f"DELETE FROM {SIMPLIFIED_TABLE} WHERE zoom = :zoom"), {"zoom": zoom})
+            result = conn.execute(
+                text(f"""
+                    INSERT INTO {SIMPLIFIED_TABLE} (line_id, zoom, geometry)
+                    SELECT id, :zoom, ST_Transform(simplified, 4326)
+                    FROM (
+                        SELECT id,
+                               ST_SimplifyPreserveTopology(ST_Transform(geometry, 3857), :tolerance)
+                                   AS simplified
+                        FROM power_lines_new
+                    ) s
+                    WHERE ST_Length(simplified) >= :tolerance
+                """),
+                {"zoom": zoom, "tolerance": tolerance},
+            )
+            logger.info(f"  z{zoom}: {result.rowcount:,} lines (tolerance {tolerance:.1f} m)")
+
+        conn.execute(text(f"ANALYZE {SIMPLIFIED_TABLE}"))
+
+    logger.success(f"✓ Built {SIMPLIFIED_TABLE} for zooms {', '.join(map(str, zooms))}")
+
+
+def _line_query(zoom: Optional[int], where: Optional[str]) -> str:
+    props = ",\n            ".join(f"p.{expr} AS {name}" for name, expr in LINE_PROPERTIES.items())
+    if zoom is None:
+        geometry = "p.geometry"
+        source = "power_lines_new p"
+    else:
+        geometry = "s.geometry"
+        source = (
+            f"{SIMPLIFIED_TABLE} s "
+            f"JOIN power_lines_new p ON p.id = s.line_id AND s.zoom = {int(zoom)}"
+        )
+    return f"""
+        SELECT
+            {props},
+            ST_AsBinary({geometry}) AS wkb
+        FROM {source}
+        {f'WHERE {where}' if where else ''}
+        ORDER BY p.id
+    """
+
+
+def load_lines(
+    zoom: Optional[int] = None,
+    where: Optional[str] = None,
+    engine: Optional[Engine] = None,
+) -> tuple[dict[str, list], np.ndarray]:
+    """
+    Load power line attributes and geometries (as shapely arrays).
+
+    Args:
+        zoom: Simplified variant to read (None = full resolution power_lines_new)
+        where: Optional filter on power_lines_new columns (alias p), e.g. "p.spenning_kv >= 11"
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        (properties as column lists, numpy array of shapely geometries)
+    """
+    import shapely
+
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        rows = conn.execute(text(_line_query(zoom, where))).fetchall()
+
+    names = list(LINE_PROPERTIES)
+    properties = {name: [row[i] for row in rows] for i, name in enumerate(names)}
+    geometries = shapely.from_wkb([bytes(row[-1]) for row in rows])
+    return properties, geometries
+
+
+def encode_flat(
+    properties: dict[str, list],
+    geometries: np.ndarray,
+    precision: int = COORD_PRECISION,
+) -> dict:
+    """
+    Encode lines as flat, delta-encoded integer coordinate arrays.
+
+    Each feature keeps all its parts (MultiLineString parts are not split into
+    separate features). Decoding: cumulative sum of 'coords' per axis, divided by
+    'scale'; feature i owns parts part_offsets[i]:part_offsets[i+1] and part j owns
+    vertices coord_offsets[j]:coord_offsets[j+1].
+
+    Args:
+        properties: Attribute columns (one list per property)
+        geometries: Shapely LineString/MultiLineString array
+        precision: Decimal digits kept
+
+    Returns:
+        JSON-serialisable dict
+    """
+    import shapely
+
+    parts, part_feature = shapely.get_parts(geometries, return_index=True)
+    coords, coord_part = shapely.get_coordinates(parts, return_index=True)
+
+    scale = 10**precision
+    quantized = np.round(coords * scale).astype(np.int64)
+    deltas = np.diff(quantized, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+
+    part_offsets = np.searchsorted(part_feature, np.arange(len(geometries) + 1))
+    coord_offsets = np.searchsorted(coord_part, np.arange(len(parts) + 1))
+
+    return {
+        "format": "svakenett-flatlines/1",
+        "scale": scale,
+        "properties": properties,
+        "part_offsets": part_offsets.tolist(),
+        "coord_offsets": coord_offsets.tolist(),
+        "coords": deltas.ravel().tolist(),
+    }
+
+
+def decode_flat(payload: dict) -> list[list[list[tuple[float, float]]]]:
+    """
+    Decode encode_flat() output back to per-feature lists of parts.
+
+    Args:
+        payload: Dict produced by encode_flat()
+
+    Returns:
+        For each feature, a list of parts, each a list of (lon, lat) tuples
+    """
+    coords = np.cumsum(np.asarray(payload["coords"], dtype=np.int64).reshape(-1, 2), axis=0)
+    coords = coords / payload["scale"]
+    part_offsets = payload["part_offsets"]
+    coord_offsets = payload["coord_offsets"]
+
+    features = []
+    for i in range(len(part_offsets) - 1):
+        features.append(
+            [
+                [tuple(c) for c in coords[coord_offsets[j] : coord_offsets[j + 1]].tolist()]
+                for j in range(part_offsets[i], part_offsets[i + 1])
+            ]
+        )
+    return features
+
+
+def encode_geojson(
+    properties: dict[str, list],
+    geometries: np.ndarray,
+    precision: int = COORD_PRECISION,
+) -> dict:
+    """
+    Encode lines as a GeoJSON FeatureCollection with quantized coordinates.
+
+    Args:
+        properties: Attribute columns (one list per property)
+        geometries: Shapely LineString/MultiLineString array
+        precision: Decimal digits kept
+
+    Returns:
+        GeoJSON FeatureCollection dict
+    """
+    import shapely
+
+    rounded = shapely.set_precision(geometries, 10**-precision)
+    geojson = shapely.to_geojson(rounded)
+    names = list(properties)
+
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {name: properties[name][i] for name in names},
+                "geometry": json.loads(geometry),
+            }
+            for i, geometry in enumerate(geojson)
+            if geometry is not None
+        ],
+    }
+
+
+def export_lines(
+    output_path: str | Path,
+    zoom: Optional[int] = 12,
+    fmt: str = "flat",
+    where: Optional[str] = None,
+    precision: int = COORD_PRECISION,
+) -> Path:
+    """
+    Write power lines for a target zoom to a compact JSON file.
+
+    Args:
+        output_path: Output file
+        zoom: Simplified variant (None = full resolution)
+        fmt: 'flat' (delta-encoded arrays) or 'geojson' (quantized GeoJSON)
+        where: Optional filter on power_lines_new (alias p)
+        precision: Decimal digits kept
+
+    Returns:
+        Path of the written file
+
+    Example:
+        >>> export_lines('data/processed/power_lines_z10.json', zoom=10)
+    """
+    encoders = {"flat": encode_flat, "geojson": encode_geojson}
+    if fmt not in encoders:
+        raise ValueError(f"Unknown format '{fmt}'. Use one of: {', '.join(encoders)}")
+
+    properties, geometries = load_lines(zoom=zoom, where=where)
+    payload = encoders[fmt](properties, geometries, precision=precision)
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(payload, separators=(",", ":")))
+
+    size_kb = output_path.stat().st_size / 1024
+    logger.success(f"✓ Exported {len(geometries):,} lines to {output_path} ({size_kb:,.0f} KB)")
+    return output_path
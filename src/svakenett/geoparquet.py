@@ -0,0 +1,351 @@
+"""
+Partitioned GeoParquet export
+
+Streams a PostGIS table into a Hive-partitioned GeoParquet dataset
+(<output>/<table>/<partition>=<value>/part-*.parquet). Rows are sorted by
+partition and then by geohash (a Z-order space-filling curve), so each row group
+covers a compact area, and every row carries a bbox struct column declared as
+the GeoParquet 1.1 covering. Readers can prune by region (partition directory,
+row group bbox statistics) and by column. Only one chunk is held in memory.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from svakenett.db import get_engine, stream_query, table_columns
+
+GEOPARQUET_VERSION = "1.1.0"
+HIVE_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# Default partitioning per exported table: a column name or 'grid'
+DEFAULT_PARTITIONS = {
+    "buildings": "kommunenummer",
+    "weak_grid_candidates_v4": "grid",
+}
+
+# Grid partitions are square cells in EPSG:25833 (UTM 33N)
+GRID_CELL_M = 50_000
+
+GEOHASH_PRECISION = 12
+
+# PostgreSQL data type -> (SQL cast, pyarrow type name)
+_PG_TYPES = {
+    "smallint": (None, "int16"),
+    "integer": (None, "int32"),
+    "bigint": (None, "int64"),
+    "real": (None, "float32"),
+    "double precision": (None, "float64"),
+    "numeric": ("double precision", "float64"),
+    "boolean": (None, "bool_"),
+    "date": (None, "date32"),
+    "timestamp without time zone": (None, "timestamp"),
+    "timestamp with time zone": (None, "timestamp_tz"),
+}
+
+
+def _arrow_type(name: str):
+    import pyarrow as pa
+
+    if name == "timestamp":
+        return pa.timestamp("us")
+    if name == "timestamp_tz":
+        return pa.timestamp("us", tz="UTC")
+    return getattr(pa, name)()
+
+
+def _partition_sql(partition: Optional[str], geom_col: str, cell_size: int) -> str:
+    if partition is None:
+        return "NULL::text"
+    if partition == "grid":
+        point = f"ST_Transform(ST_PointOnSurface({geom_col}), 25833)"
+        return (
+            f"floor(ST_X({point}) / {cell_size})::bigint::text || '_' || "
+            f"floor(ST_Y({point}) / {cell_size})::bigint::text"
+        )
+    return f"{partition}::text"
+
+
+def export_query(
+    table: str,
+    columns: list[tuple[str, str]],
+    partition: Optional[str] = None,
+    geom_col: str = "geometry",
+    cell_size: int = GRID_CELL_M,
+    where: Optional[str] = None,
+) -> str:
+    """
+    SQL streaming a table sorted by partition and geohash, with WKB and bbox.
+
+    Args:
+        table: Source table
+        columns: (name, data_type) of the attribute columns to export
+        partition: Partition column, 'grid' or None
+        geom_col: Geometry column
+        cell_size: Grid cell size in meters (partition='grid')
+        where: Optional filter
+
+    Returns:
+        SQL string
+    """
+    selects = []
+    for name, data_type in columns:
+        cast = _PG_TYPES.get(data_type, ("text", None))[0]
+        selects.append(f"{name}::{cast} AS {name}" if cast else name)
+
+    return f"""
+        SELECT
+            {_partition_sql(partition, geom_col, cell_size)} AS _partition,
+            {', '.join(selects)},
+            ST_AsBinary({geom_col}) AS _wkb,
+            ST_XMin({geom_col}) AS _xmin,
+            ST_YMin({geom_col}) AS _ymin,
+            ST_XMax({geom_col}) AS _xmax,
+            ST_YMax({geom_col}) AS _ymax
+        FROM {table}
+        WHERE {geom_col} IS NOT NULL{f' AND ({where})' if where else ''}
+        ORDER BY 1,
+            ST_GeoHash(ST_Transform(ST_PointOnSurface({geom_col}), 4326), {GEOHASH_PRECISION})
+    """
+
+
+def _leaf_partitions(table: str, engine: Engine) -> list[str]:
+    """PostgreSQL partitions of a table (empty when it is not partitioned)."""
+    with engine.connect() as conn:
+        return list(conn.execute(text("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:table AS regclass)
+            ORDER BY c.relname
+        """), {"table": table}).scalars())
+
+
+def _partition_stats(
+    table: str,
+    partition: Optional[str],
+    geom_col: str,
+    cell_size: int,
+    where: Optional[str],
+    engine: Engine,
+) -> dict[Optional[str], dict]:
+    """Extent and geometry types per partition (needed up front for the file metadata)."""
+    query = text(f"""
+        SELECT
+            {_partition_sql(partition, geom_col, cell_size)} AS part,
+            ST_XMin(ST_Extent({geom_col})), ST_YMin(ST_Extent({geom_col})),
+            ST_XMax(ST_Extent({geom_col})), ST_YMax(ST_Extent({geom_col})),
+            array_agg(DISTINCT GeometryType({geom_col})),
+            COUNT(*)
+        FROM {table}
+        WHERE {geom_col} IS NOT NULL{f' AND ({where})' if where else ''}
+        GROUP BY 1
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(query).fetchall()
+    return {
+        row[0]: {"bbox": [row[1], row[2], row[3], row[4]], "types": row[5], "rows": row[6]}
+        for row in rows
+    }
+
+
+def _geo_metadata(geom_col: str, srid: int, stats: dict) -> dict:
+    """GeoParquet 'geo' file metadata with the bbox covering column."""
+    from pyproj import CRS
+
+    type_names = {
+        "POINT": "Point", "LINESTRING": "LineString", "POLYGON": "Polygon",
+        "MULTIPOINT": "MultiPoint", "MULTILINESTRING": "MultiLineString",
+        "MULTIPOLYGON": "MultiPolygon", "GEOMETRYCOLLECTION": "GeometryCollection",
+    }
+    return {
+        "version": GEOPARQUET_VERSION,
+        "primary_column": geom_col,
+        "columns": {
+            geom_col: {
+                "encoding": "WKB",
+                "geometry_types": sorted({type_names.get(t, t) for t in stats["types"] if t}),
+                "crs": CRS.from_epsg(srid).to_json_dict(),
+                "bbox": stats["bbox"],
+                "covering": {
+                    "bbox": {
+                        "xmin": ["bbox", "xmin"],
+                        "ymin": ["bbox", "ymin"],
+                        "xmax": ["bbox", "xmax"],
+                        "ymax": ["bbox", "ymax"],
+                    }
+                },
+            }
+        },
+    }
+
+
+def _to_record_batch(chunk, columns: list[tuple[str, str]], schema):
+    import pyarrow as pa
+
+    arrays = [
+        pa.array(chunk[name].tolist(), type=schema.field(name).type, from_pandas=True)
+        for name, _ in columns
+    ]
+    arrays.append(pa.array(chunk["_wkb"].map(bytes).tolist(), type=pa.binary()))
+    arrays.append(
+        pa.StructArray.from_arrays(
+            [
+                pa.array(chunk[f"_{k}"].to_numpy(dtype="float64"))
+                for k in ("xmin", "ymin", "xmax", "ymax")
+            ],
+            names=["xmin", "ymin", "xmax", "ymax"],
+        )
+    )
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_geoparquet(
+    table: str,
+    output_dir: str | Path,
+    partition: Optional[str] = "default",
+    geom_col: str = "geometry",
+    cell_size: int = GRID_CELL_M,
+    where: Optional[str] = None,
+    chunk_size: int = 50_000,
+    compression: str = "zstd",
+    workers: int = 4,
+    engine: Optional[Engine] = None,
+) -> dict[str, int]:
+    """
+    Export a PostGIS table to a Hive-partitioned GeoParquet dataset.
+
+    Each streamed chunk becomes (at most) one row group per partition, so
+    chunk_size is also the row group size. Partitioned tables are streamed
+    per PostgreSQL partition in parallel, giving one part-<partition>.parquet
+    per directory and PostgreSQL partition.
+
+    Args:
+        table: Source table, e.g. 'buildings' or 'weak_grid_candidates_v4'
+        output_dir: Dataset root; files go to <output_dir>/<table>/<partition>=<value>/
+        partition: Partition column, 'grid' (EPSG:25833 cells), None for a single
+            file, or 'default' to use DEFAULT_PARTITIONS
+        geom_col: Geometry column
+        cell_size: Grid cell size in meters (partition='grid')
+        where: Optional SQL filter
+        chunk_size: Rows streamed per chunk (= row group size)
+        compression: Parquet compression codec
+        workers: PostgreSQL partitions exported in parallel
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Row count per written file (relative to output_dir)
+
+    Example:
+        >>> export_geoparquet('buildings', 'data/processed/geoparquet')
+        >>> part = ds.partitioning(pa.schema([('kommunenummer', pa.string())]), flavor='hive')
+        >>> pq.read_table('data/processed/geoparquet/buildings', partitioning=part,
+        ...               filters=[('kommunenummer', '=', '4204')])
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    engine = engine or get_engine()
+    if partition == "default":
+        partition = DEFAULT_PARTITIONS.get(table, "grid")
+    partition_name = "grid_cell" if partition == "grid" else partition
+
+    columns = [
+        (name, data_type) for name, data_type in table_columns(table, engine) if name != geom_col
+    ]
+    if partition not in (None, "grid"):
+        if partition not in dict(columns):
+            raise ValueError(f"Partition column '{partition}' not found in {table}")
+        # Hive convention: the partition value lives in the directory name only
+        columns = [(name, data_type) for name, data_type in columns if name != partition]
+
+    with engine.connect() as conn:
+        srid = conn.execute(
+            text(f"SELECT ST_SRID({geom_col}) FROM {table} WHERE {geom_col} IS NOT NULL LIMIT 1")
+        ).scalar()
+
+    schema = pa.schema(
+        [
+            pa.field(name, _arrow_type(_PG_TYPES.get(data_type, (None, "string"))[1]))
+            for name, data_type in columns
+        ]
+        + [
+            pa.field(geom_col, pa.binary()),
+            pa.field(
+                "bbox", pa.struct([(k, pa.float64()) for k in ("xmin", "ymin", "xmax", "ymax")])
+            ),
+        ]
+    )
+
+    logger.info(f"Exporting {table} to GeoParquet (partition: {partition_name or 'none'})...")
+    stats = _partition_stats(table, partition, geom_col, cell_size, where, engine)
+
+    root = Path(output_dir) / table
+
+    def write_source(source: str, filename: str) -> dict[str, int]:
+        """Stream one table (or partition of it) into <partition dir>/<filename>."""
+        source_counts: dict[str, int] = {}
+        writer: Optional[pq.ParquetWriter] = None
+        current = object()
+
+        def open_writer(value):
+            if partition is None:
+                path = root / filename
+            else:
+                path = (
+                    root
+                    / f"{partition_name}={HIVE_NULL_PARTITION if value is None else value}"
+                    / filename
+                )
+            path.parent.mkdir(parents=True, exist_ok=True)
+            file_schema = schema.with_metadata(
+                {"geo": json.dumps(_geo_metadata(geom_col, srid, stats[value]))}
+            )
+            source_counts[str(path.relative_to(output_dir))] = 0
+            return path, pq.ParquetWriter(
+                path, file_schema, compression=compression, write_statistics=True
+            )
+
+        query = export_query(source, columns, partition, geom_col, cell_size, where)
+        try:
+            for chunk in stream_query(query, chunk_size=chunk_size, engine=engine):
+                # Rows arrive sorted by partition, so only one writer is open at a time
+                for value, rows in chunk.groupby("_partition", sort=False, dropna=False):
+                    value = None if value != value else value  # NaN -> None
+                    if value != current:
+                        if writer is not None:
+                            writer.close()
+                        path, writer = open_writer(value)
+                        current = value
+                    writer.write_batch(
+                        _to_record_batch(rows, columns, schema), row_group_size=chunk_size
+                    )
+                    source_counts[str(path.relative_to(output_dir))] += len(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+        return source_counts
+
+    # A partitioned table (buildings by county) is exported one PostgreSQL
+    # partition at a time, in parallel; each writes its own file per directory
+    leaves = _leaf_partitions(table, engine)
+    counts: dict[str, int] = {}
+    if not leaves:
+        counts.update(write_source(table, "part-0.parquet"))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for source_counts in pool.map(
+                lambda leaf: write_source(leaf, f"part-{leaf}.parquet"), leaves
+            ):
+                counts.update(source_counts)
+
+    n_rows = sum(counts.values())
+    logger.success(
+        f"✓ Exported {n_rows:,} rows from {table} to {len(counts)} GeoParquet files in {root}"
+    )
+    return counts
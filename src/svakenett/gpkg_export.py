@@ -0,0 +1,526 @@
+"""
+Streaming GeoPackage export
+
+Writes a PostGIS table into a GeoPackage layer with the standard library sqlite3
+module: rows are streamed from a server-side cursor and appended inside a
+single SQLite transaction, and the R-tree spatial index (with its maintenance
+triggers) is built once at the end. A delta mode appends or replaces only the
+rows whose change column moved since the last export. updated_at on cabins
+and buildings is kept current by the BEFORE UPDATE trigger of
+sql/updated_at_triggers.sql.
+"""
+
+import json
+import sqlite3
+import struct
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from svakenett.db import get_engine, stream_rows, table_columns
+
+# Delta-mode watermarks are stored as layer metadata (GeoPackage metadata extension)
+STATE_METADATA_URI = "https://github.com/Markedslabben/svakenett/export-state"
+
+# Subtracted from the watermark to absorb clock differences between sessions
+WATERMARK_MARGIN_S = 60
+
+GPKG_APPLICATION_ID = 0x47504B47  # 'GPKG'
+GPKG_USER_VERSION = 10200
+
+# PostgreSQL data type -> (GeoPackage column type, SQL expression template)
+_PG_TYPES = {
+    "smallint": ("SMALLINT", "{col}"),
+    "integer": ("MEDIUMINT", "{col}"),
+    "bigint": ("INTEGER", "{col}"),
+    "real": ("FLOAT", "{col}"),
+    "double precision": ("DOUBLE", "{col}"),
+    "numeric": ("DOUBLE", "{col}::double precision"),
+    "boolean": ("BOOLEAN", "{col}"),
+    "date": ("DATE", "to_char({col}, 'YYYY-MM-DD')"),
+    "timestamp without time zone": (
+        "DATETIME",
+        "to_char({col}, 'YYYY-MM-DD\"T\"HH24:MI:SS.MS\"Z\"')",
+    ),
+    "timestamp with time zone": (
+        "DATETIME",
+        "to_char({col} AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS.MS\"Z\"')",
+    ),
+}
+
+_SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS gpkg_spatial_ref_sys (
+        srs_name TEXT NOT NULL,
+        srs_id INTEGER PRIMARY KEY,
+        organization TEXT NOT NULL,
+        organization_coordsys_id INTEGER NOT NULL,
+        definition TEXT NOT NULL,
+        description TEXT
+    );
+    CREATE TABLE IF NOT EXISTS gpkg_contents (
+        table_name TEXT NOT NULL PRIMARY KEY,
+        data_type TEXT NOT NULL,
+        identifier TEXT UNIQUE,
+        description TEXT DEFAULT '',
+        last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+        min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+        srs_id INTEGER REFERENCES gpkg_spatial_ref_sys(srs_id)
+    );
+    CREATE TABLE IF NOT EXISTS gpkg_geometry_columns (
+        table_name TEXT NOT NULL UNIQUE REFERENCES gpkg_contents(table_name),
+        column_name TEXT NOT NULL,
+        geometry_type_name TEXT NOT NULL,
+        srs_id INTEGER NOT NULL REFERENCES gpkg_spatial_ref_sys(srs_id),
+        z TINYINT NOT NULL,
+        m TINYINT NOT NULL,
+        PRIMARY KEY (table_name, column_name)
+    );
+    CREATE TABLE IF NOT EXISTS gpkg_extensions (
+        table_name TEXT,
+        column_name TEXT,
+        extension_name TEXT NOT NULL,
+        definition TEXT NOT NULL,
+        scope TEXT NOT NULL,
+        UNIQUE (table_name, column_name, extension_name)
+    );
+    CREATE TABLE IF NOT EXISTS gpkg_metadata (
+        id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+        md_scope TEXT NOT NULL DEFAULT 'dataset',
+        md_standard_uri TEXT NOT NULL,
+        mime_type TEXT NOT NULL DEFAULT 'text/xml',
+        metadata TEXT NOT NULL DEFAULT ''
+    );
+    CREATE TABLE IF NOT EXISTS gpkg_metadata_reference (
+        reference_scope TEXT NOT NULL,
+        table_name TEXT,
+        column_name TEXT,
+        row_id_value INTEGER,
+        timestamp DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+        md_file_id INTEGER NOT NULL REFERENCES gpkg_metadata(id),
+        md_parent_id INTEGER REFERENCES gpkg_metadata(id)
+    );
+    INSERT OR IGNORE INTO gpkg_extensions VALUES
+        ('gpkg_metadata', NULL, 'gpkg_metadata',
+         'http://www.geopackage.org/spec120/#extension_metadata', 'read-write'),
+        ('gpkg_metadata_reference', NULL, 'gpkg_metadata',
+         'http://www.geopackage.org/spec120/#extension_metadata', 'read-write');
+    INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES
+        ('Undefined cartesian SRS', -1, 'NONE', -1, 'undefined', NULL),
+        ('Undefined geographic SRS', 0, 'NONE', 0, 'undefined', NULL);
+"""
+
+_RTREE_TRIGGERS = """
+    CREATE TRIGGER "rtree_{t}_{c}_insert" AFTER INSERT ON "{t}"
+    WHEN (NEW."{c}" NOT NULL AND NOT ST_IsEmpty(NEW."{c}"))
+    BEGIN
+        INSERT OR REPLACE INTO "rtree_{t}_{c}" VALUES (
+            NEW."{i}",
+            ST_MinX(NEW."{c}"), ST_MaxX(NEW."{c}"), ST_MinY(NEW."{c}"), ST_MaxY(NEW."{c}"));
+    END;
+    CREATE TRIGGER "rtree_{t}_{c}_update1" AFTER UPDATE OF "{c}" ON "{t}"
+    WHEN OLD."{i}" = NEW."{i}" AND (NEW."{c}" NOTNULL AND NOT ST_IsEmpty(NEW."{c}"))
+    BEGIN
+        INSERT OR REPLACE INTO "rtree_{t}_{c}" VALUES (
+            NEW."{i}",
+            ST_MinX(NEW."{c}"), ST_MaxX(NEW."{c}"), ST_MinY(NEW."{c}"), ST_MaxY(NEW."{c}"));
+    END;
+    CREATE TRIGGER "rtree_{t}_{c}_update2" AFTER UPDATE OF "{c}" ON "{t}"
+    WHEN OLD."{i}" = NEW."{i}" AND (NEW."{c}" ISNULL OR ST_IsEmpty(NEW."{c}"))
+    BEGIN
+        DELETE FROM "rtree_{t}_{c}" WHERE id = OLD."{i}";
+    END;
+    CREATE TRIGGER "rtree_{t}_{c}_update3" AFTER UPDATE ON "{t}"
+    WHEN OLD."{i}" != NEW."{i}" AND (NEW."{c}" NOTNULL AND NOT ST_IsEmpty(NEW."{c}"))
+    BEGIN
+        DELETE FROM "rtree_{t}_{c}" WHERE id = OLD."{i}";
+        INSERT OR REPLACE INTO "rtree_{t}_{c}" VALUES (
+            NEW."{i}",
+            ST_MinX(NEW."{c}"), ST_MaxX(NEW."{c}"), ST_MinY(NEW."{c}"), ST_MaxY(NEW."{c}"));
+    END;
+    CREATE TRIGGER "rtree_{t}_{c}_update4" AFTER UPDATE ON "{t}"
+    WHEN OLD."{i}" != NEW."{i}" AND (NEW."{c}" ISNULL OR ST_IsEmpty(NEW."{c}"))
+    BEGIN
+        DELETE FROM "rtree_{t}_{c}" WHERE id IN (OLD."{i}", NEW."{i}");
+    END;
+    CREATE TRIGGER "rtree_{t}_{c}_delete" AFTER DELETE ON "{t}"
+    WHEN OLD."{c}" NOT NULL
+    BEGIN
+        DELETE FROM "rtree_{t}_{c}" WHERE id = OLD."{i}";
+    END;
+"""
+
+_HEADER = struct.Struct("<2sBBi")
+_ENVELOPE = struct.Struct("<4d")
+
+
+def gpkg_geometry(srs_id: int, wkb: bytes, envelope: Optional[tuple] = None) -> bytes:
+    """
+    Wrap little-endian WKB in a GeoPackage binary header.
+
+    Args:
+        srs_id: Spatial reference id
+        wkb: Little-endian (NDR) WKB
+        envelope: (min_x, max_x, min_y, max_y), omitted for points
+
+    Returns:
+        GeoPackage geometry blob
+    """
+    if envelope is None:
+        return _HEADER.pack(b"GP", 0, 0b00000001, srs_id) + wkb
+    return _HEADER.pack(b"GP", 0, 0b00000011, srs_id) + _ENVELOPE.pack(*envelope) + wkb
+
+
+def _blob_bounds(blob: Optional[bytes]) -> Optional[tuple]:
+    """(min_x, max_x, min_y, max_y) of a blob written by gpkg_geometry()."""
+    if blob is None:
+        return None
+    flags = blob[3]
+    if flags & 0b00010000:
+        return None
+    if (flags >> 1) & 0b111:
+        return _ENVELOPE.unpack_from(blob, 8)
+    x, y = struct.unpack_from("<2d", blob, 8 + 5)  # point: byte order + type, then x y
+    return x, x, y, y
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    """Open a GeoPackage with the ST_* functions the R-tree triggers need."""
+    conn = sqlite3.connect(path, isolation_level=None)
+
+    def bound(index):
+        return lambda blob: None if (b := _blob_bounds(blob)) is None else b[index]
+
+    conn.create_function("ST_MinX", 1, bound(0), deterministic=True)
+    conn.create_function("ST_MaxX", 1, bound(1), deterministic=True)
+    conn.create_function("ST_MinY", 1, bound(2), deterministic=True)
+    conn.create_function("ST_MaxY", 1, bound(3), deterministic=True)
+    conn.create_function(
+        "ST_IsEmpty", 1, lambda blob: int(_blob_bounds(blob) is None), deterministic=True
+    )
+    return conn
+
+
+def _drop_layer(conn: sqlite3.Connection, layer: str, geom_col: str) -> None:
+    conn.execute(f'DROP TABLE IF EXISTS "{layer}"')
+    conn.execute(f'DROP TABLE IF EXISTS "rtree_{layer}_{geom_col}"')
+    for table in ("gpkg_geometry_columns", "gpkg_extensions", "gpkg_contents"):
+        conn.execute(f"DELETE FROM {table} WHERE table_name = ?", (layer,))
+    _write_state(conn, layer, None)
+
+
+def _read_state(conn: sqlite3.Connection, layer: str) -> Optional[dict]:
+    row = conn.execute(
+        """
+        SELECT m.metadata
+        FROM gpkg_metadata m
+        JOIN gpkg_metadata_reference r ON r.md_file_id = m.id
+        WHERE r.reference_scope = 'table' AND r.table_name = ? AND m.md_standard_uri = ?
+    """,
+        (layer, STATE_METADATA_URI),
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _write_state(conn: sqlite3.Connection, layer: str, state: Optional[dict]) -> None:
+    """Replace the export state of a layer (None removes it)."""
+    ids = [
+        row[0]
+        for row in conn.execute(
+            """
+        SELECT m.id
+        FROM gpkg_metadata m
+        JOIN gpkg_metadata_reference r ON r.md_file_id = m.id
+        WHERE r.table_name = ? AND m.md_standard_uri = ?
+    """,
+            (layer, STATE_METADATA_URI),
+        )
+    ]
+    for md_id in ids:
+        conn.execute("DELETE FROM gpkg_metadata_reference WHERE md_file_id = ?", (md_id,))
+        conn.execute("DELETE FROM gpkg_metadata WHERE id = ?", (md_id,))
+    if state is None:
+        return
+    md_id = conn.execute(
+        "INSERT INTO gpkg_metadata (md_scope, md_standard_uri, mime_type, metadata) "
+        "VALUES ('dataset', ?, 'application/json', ?)",
+        (STATE_METADATA_URI, json.dumps(state)),
+    ).lastrowid
+    conn.execute(
+        "INSERT INTO gpkg_metadata_reference (reference_scope, table_name, md_file_id) "
+        "VALUES ('table', ?, ?)",
+        (layer, md_id),
+    )
+
+
+def _create_layer(
+    conn: sqlite3.Connection,
+    layer: str,
+    geom_col: str,
+    geometry_type: str,
+    srs_id: int,
+    attributes: list[tuple[str, str]],
+) -> None:
+    columns = ",\n".join(f'"{name}" {gpkg_type}' for name, gpkg_type in attributes)
+    conn.execute(f"""
+        CREATE TABLE "{layer}" (
+            fid INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            "{geom_col}" {geometry_type}{',' if attributes else ''}
+            {columns}
+        )
+    """)
+    conn.execute(
+        "INSERT INTO gpkg_contents (table_name, data_type, identifier, srs_id) "
+        "VALUES (?, 'features', ?, ?)",
+        (layer, layer, srs_id),
+    )
+    conn.execute(
+        "INSERT INTO gpkg_geometry_columns VALUES (?, ?, ?, ?, 0, 0)",
+        (layer, geom_col, geometry_type, srs_id),
+    )
+
+
+def _build_rtree(conn: sqlite3.Connection, layer: str, geom_col: str) -> None:
+    rtree = f"rtree_{layer}_{geom_col}"
+    conn.execute(f'CREATE VIRTUAL TABLE "{rtree}" USING rtree(id, minx, maxx, miny, maxy)')
+    conn.execute(f"""
+        INSERT INTO "{rtree}"
+        SELECT fid,
+            ST_MinX("{geom_col}"), ST_MaxX("{geom_col}"),
+            ST_MinY("{geom_col}"), ST_MaxY("{geom_col}")
+        FROM "{layer}"
+        WHERE "{geom_col}" NOT NULL AND NOT ST_IsEmpty("{geom_col}")
+    """)
+    triggers = _RTREE_TRIGGERS.format(t=layer, c=geom_col, i="fid")
+    for statement in triggers.split("END;")[:-1]:
+        conn.execute(statement + "END;")
+    conn.execute(
+        "INSERT OR REPLACE INTO gpkg_extensions VALUES (?, ?, 'gpkg_rtree_index', "
+        "'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')",
+        (layer, geom_col),
+    )
+
+
+def _update_contents(conn: sqlite3.Connection, layer: str, geom_col: str) -> None:
+    conn.execute(
+        f"""
+        UPDATE gpkg_contents SET
+            (min_x, max_x, min_y, max_y) = (
+                SELECT MIN(minx), MAX(maxx), MIN(miny), MAX(maxy) FROM "rtree_{layer}_{geom_col}"
+            ),
+            last_change = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')
+        WHERE table_name = ?
+    """,
+        (layer,),
+    )
+
+
+def export_gpkg(
+    table: str,
+    output_path: str | Path,
+    layer: Optional[str] = None,
+    columns: Optional[list[str]] = None,
+    where: Optional[str] = None,
+    key_column: Optional[str] = "id",
+    delta: bool = False,
+    change_column: str = "updated_at",
+    geom_col: str = "geometry",
+    chunk_size: int = 50_000,
+    engine: Optional[Engine] = None,
+) -> int:
+    """
+    Stream a PostGIS table into a GeoPackage layer.
+
+    A full export replaces the layer (other layers in the file are kept). With
+    delta=True only rows whose change_column is at or after the watermark of the
+    previous export are written; rows already in the layer are replaced, matched
+    on key_column (used as the feature id). Deleted source rows are not removed.
+    The watermark is the start of the oldest transaction open when the export
+    began, less WATERMARK_MARGIN_S, so rows committed late by a long transaction
+    are still picked up by the next delta (at the cost of rewriting a few rows).
+
+    Args:
+        table: Source table, e.g. 'cabins'
+        output_path: GeoPackage file (created if missing)
+        layer: Layer name (default: table name)
+        columns: Attribute columns to export (default: all)
+        where: Optional SQL filter
+        key_column: Integer key used as feature id (None = sequential fid; no delta)
+        delta: Only append/replace rows changed since the last export
+        change_column: Timestamp column compared against the stored watermark; it
+            must change on every update (updated_at with sql/updated_at_triggers.sql)
+        geom_col: Geometry column
+        chunk_size: Rows streamed per chunk
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Number of rows written
+
+    Example:
+        >>> export_gpkg('cabins', 'agder_cabins.gpkg', columns=['postal_code', 'score_balanced'])
+        >>> export_gpkg('cabins', 'agder_cabins.gpkg', delta=True)
+    """
+    engine = engine or get_engine()
+    layer = layer or table
+    output_path = Path(output_path)
+
+    if delta and key_column is None:
+        raise ValueError("Delta export needs a key_column to match existing features")
+
+    source_columns = dict(table_columns(table, engine))
+    if delta and change_column not in source_columns:
+        raise ValueError(
+            f"Column '{change_column}' not found in {table}; "
+            "for updated_at run sql/updated_at_triggers.sql"
+        )
+    for name in [*(columns or []), *([key_column] if key_column else [])]:
+        if name not in source_columns:
+            raise ValueError(f"Column '{name}' not found in {table}")
+
+    selected = columns if columns is not None else [c for c in source_columns if c != geom_col]
+    selected = [c for c in selected if c not in (geom_col, key_column)]
+
+    with engine.connect() as conn:
+        geometry_type, srid = conn.execute(
+            text("""
+                SELECT type, srid FROM geometry_columns
+                WHERE f_table_name = :table AND f_geometry_column = :geom_col
+            """),
+            {"table": table, "geom_col": geom_col},
+        ).one()
+        srs_definition = conn.execute(
+            text("SELECT srtext FROM spatial_ref_sys WHERE srid = :srid"), {"srid": srid}
+        ).scalar()
+        # Recorded on every export with a change column, so a later delta run can continue.
+        # The trigger stamps rows with their transaction's start time, and a transaction
+        # still open now commits rows stamped before this export. The watermark is
+        # therefore the start of the oldest open transaction (at most now), not the
+        # newest stamp in the data.
+        track_changes = change_column in source_columns
+        new_watermark = (
+            conn.execute(
+                text("""
+                    SELECT (LEAST(now(), MIN(xact_start)) - make_interval(secs => :margin))
+                        ::timestamp::text
+                    FROM pg_stat_activity
+                    WHERE xact_start IS NOT NULL
+                """),
+                {"margin": WATERMARK_MARGIN_S},
+            ).scalar()
+            if track_changes
+            else None
+        )
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    gpkg = _connect(output_path)
+    try:
+        gpkg.execute(f"PRAGMA application_id = {GPKG_APPLICATION_ID}")
+        gpkg.execute(f"PRAGMA user_version = {GPKG_USER_VERSION}")
+        gpkg.executescript(_SCHEMA_SQL)
+
+        # Everything below, including all streamed rows, is one SQLite transaction
+        gpkg.execute("BEGIN")
+        gpkg.execute(
+            "INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES (?, ?, 'EPSG', ?, ?, NULL)",
+            (f"EPSG:{srid}", srid, srid, srs_definition or "undefined"),
+        )
+
+        state = _read_state(gpkg, layer) if delta else None
+        layer_exists = (
+            gpkg.execute("SELECT 1 FROM gpkg_contents WHERE table_name = ?", (layer,)).fetchone()
+            is not None
+        )
+
+        appending = delta and layer_exists and state is not None and state["watermark"] is not None
+        if appending:
+            # Appended rows must match the columns of the existing layer
+            selected = [
+                row[1]
+                for row in gpkg.execute(f'PRAGMA table_info("{layer}")')
+                if row[1] not in ("fid", geom_col)
+            ]
+        attributes = []
+        expressions = []
+        for name in selected:
+            gpkg_type, template = _PG_TYPES.get(source_columns[name], ("TEXT", "{col}::text"))
+            attributes.append((name, gpkg_type))
+            expressions.append(f"{template.format(col=name)} AS {name}")
+
+        filters = [f"{geom_col} IS NOT NULL", f"NOT ST_IsEmpty({geom_col})"] + (
+            [f"({where})"] if where else []
+        )
+        params = {}
+        if appending:
+            # Rows stamped since the watermark; some were already written last time
+            # and are replaced
+            filters.append(f"{change_column} >= %(since)s::timestamp")
+            params["since"] = state["watermark"]
+            logger.info(
+                f"Delta export of {table} → {output_path}:{layer} "
+                f"(changed since {state['watermark']})"
+            )
+        else:
+            if delta:
+                logger.info(f"No previous export of {layer}, writing all rows")
+            _drop_layer(gpkg, layer, geom_col)
+            _create_layer(gpkg, layer, geom_col, geometry_type.upper(), srid, attributes)
+            logger.info(f"Exporting {table} → {output_path}:{layer}...")
+
+        is_point = geometry_type.upper() == "POINT"
+        fid_sql = f"{key_column}" if key_column else "NULL::integer"
+        query = f"""
+            SELECT
+                {fid_sql} AS _fid,
+                ST_AsBinary(ST_Force2D({geom_col}), 'NDR') AS _wkb,
+                ST_XMin({geom_col}), ST_XMax({geom_col}), ST_YMin({geom_col}), ST_YMax({geom_col})
+                {''.join(f', {expr}' for expr in expressions)}
+            FROM {table}
+            WHERE {' AND '.join(filters)}
+        """
+        names = ", ".join(['fid', f'"{geom_col}"'] + [f'"{name}"' for name, _ in attributes])
+        placeholders = ", ".join("?" * (len(attributes) + 2))
+        insert = f'INSERT OR REPLACE INTO "{layer}" ({names}) VALUES ({placeholders})'
+
+        n_rows = 0
+        for _, rows in stream_rows(query, params or None, chunk_size=chunk_size, engine=engine):
+            gpkg.executemany(
+                insert,
+                (
+                    (
+                        row[0],
+                        gpkg_geometry(srid, bytes(row[1]), None if is_point else row[2:6]),
+                        *row[6:],
+                    )
+                    for row in rows
+                ),
+            )
+            n_rows += len(rows)
+            logger.info(f"  Wrote {n_rows:,} rows")
+
+        has_rtree = (
+            gpkg.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (f"rtree_{layer}_{geom_col}",)
+            ).fetchone()
+            is not None
+        )
+        if not has_rtree:
+            # Deferred: one bulk R-tree load instead of a trigger call per row
+            _build_rtree(gpkg, layer, geom_col)
+        _update_contents(gpkg, layer, geom_col)
+
+        if track_changes:
+            _write_state(gpkg, layer, {"change_column": change_column, "watermark": new_watermark})
+        gpkg.execute("COMMIT")
+    except BaseException:
+        if gpkg.in_transaction:
+            gpkg.execute("ROLLBACK")
+        raise
+    finally:
+        gpkg.close()
+
+    logger.success(
+        f"✓ {'Appended' if delta else 'Exported'} {n_rows:,} rows to {output_path}:{layer}"
+    )
+    return n_rows
@@ -0,0 +1,287 @@
+"""
+Raster heat-map tile pyramid for building and prospect density
+
+Streams projected building coordinates from PostGIS, bins them into 256x256
+NumPy histograms per XYZ tile at the deepest zoom, derives lower zooms by 2x2
+summing, and writes colorized PNG tiles that folium/Leaflet can overlay.
+Tiles are float32 and each zoom level is written as soon as it is finished, so
+at most two levels (one zoom and its parent) are in memory. Memory is
+proportional to the number of non-empty tiles, not to the extent.
+"""
+
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from loguru import logger
+from sqlalchemy.engine import Engine
+
+from svakenett.db import get_engine, stream_query, table_versions
+from svakenett.tiles import TILE_SIZE_PX, WORLD_SIZE_M
+
+# Weight expressions per heat-map mode (b = buildings, c = weak_grid_candidates_v4)
+WEIGHTS = {
+    "count": "1.0",
+    "score": "COALESCE(b.weak_grid_score, 0) / 100.0",
+    "candidate": "CASE WHEN c.id IS NOT NULL THEN 1.0 ELSE 0.0 END",
+}
+
+TileGrid = dict[tuple[int, int], np.ndarray]
+
+
+def building_points_query(weight: str, where: Optional[str] = None) -> str:
+    """
+    SQL returning Web Mercator x/y and weight per building.
+
+    Args:
+        weight: Key of WEIGHTS
+        where: Optional extra filter on buildings (alias b)
+
+    Returns:
+        SQL string
+    """
+    if weight not in WEIGHTS:
+        raise ValueError(f"Unknown weight '{weight}'. Use one of: {', '.join(WEIGHTS)}")
+
+    join = "LEFT JOIN weak_grid_candidates_v4 c ON c.id = b.id" if weight == "candidate" else ""
+    filters = [f"({where})"] if where else []
+    if weight == "candidate":
+        filters.append("c.id IS NOT NULL")
+    where_sql = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+    return f"""
+        SELECT
+            ST_X(ST_Transform(b.geometry, 3857)) AS x,
+            ST_Y(ST_Transform(b.geometry, 3857)) AS y,
+            {WEIGHTS[weight]} AS weight
+        FROM buildings b
+        {join}
+        {where_sql}
+    """
+
+
+def accumulate(
+    tiles: TileGrid, x: np.ndarray, y: np.ndarray, weights: np.ndarray, zoom: int
+) -> None:
+    """
+    Add weighted points to per-tile 256x256 histograms at one zoom level.
+
+    Points are binned with a single np.unique/np.bincount over combined
+    tile+pixel keys, then scattered into the touched tiles.
+
+    Args:
+        tiles: Tile grid updated in place ({(tx, ty): flat float32[256 * 256]})
+        x: Web Mercator x (meters)
+        y: Web Mercator y (meters)
+        weights: Weight per point
+        zoom: Zoom level of the grid
+    """
+    world_px = TILE_SIZE_PX * 2**zoom
+    half = WORLD_SIZE_M / 2
+    px = np.floor((x + half) / WORLD_SIZE_M * world_px).astype(np.int64)
+    py = np.floor((half - y) / WORLD_SIZE_M * world_px).astype(np.int64)
+
+    valid = (px >= 0) & (px < world_px) & (py >= 0) & (py < world_px) & (weights != 0)
+    px, py, weights = px[valid], py[valid], weights[valid]
+    if len(px) == 0:
+        return
+
+    tx, ty = px // TILE_SIZE_PX, py // TILE_SIZE_PX
+    pixel = (py % TILE_SIZE_PX) * TILE_SIZE_PX + (px % TILE_SIZE_PX)
+    keys = (tx << 40) | (ty << 16) | pixel
+
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=weights)
+
+    tile_keys = unique_keys >> 16
+    boundaries = np.flatnonzero(np.diff(tile_keys)) + 1
+    for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(unique_keys)]):
+        key = int(tile_keys[start])
+        tile = tiles.get((key >> 24, key & 0xFFFFFF))
+        if tile is None:
+            tile = np.zeros(TILE_SIZE_PX * TILE_SIZE_PX, dtype=np.float32)
+            tiles[(key >> 24, key & 0xFFFFFF)] = tile
+        tile[unique_keys[start:end] & 0xFFFF] += sums[start:end]
+
+
+def downsample(tiles: TileGrid) -> TileGrid:
+    """
+    Build the next lower zoom level by summing 2x2 pixel blocks of child tiles.
+
+    Args:
+        tiles: Tile grid at zoom z (flat 256*256 arrays)
+
+    Returns:
+        Tile grid at zoom z-1
+    """
+    half = TILE_SIZE_PX // 2
+    parents: TileGrid = {}
+    for (tx, ty), child in tiles.items():
+        parent = parents.get((tx // 2, ty // 2))
+        if parent is None:
+            parent = np.zeros((TILE_SIZE_PX, TILE_SIZE_PX), dtype=np.float32)
+            parents[(tx // 2, ty // 2)] = parent
+        block = child.reshape(half, 2, half, 2).sum(axis=(1, 3))
+        oy, ox = (ty % 2) * half, (tx % 2) * half
+        parent[oy : oy + half, ox : ox + half] += block
+    return {key: tile.ravel() for key, tile in parents.items()}
+
+
+def colorize(tile: np.ndarray, vmax: float, cmap_name: str = "YlOrRd") -> np.ndarray:
+    """
+    Map tile values to RGBA with log scaling; empty pixels are transparent.
+
+    Args:
+        tile: Flat or 2-D tile values
+        vmax: Value mapped to the top of the color ramp
+        cmap_name: Matplotlib colormap name
+
+    Returns:
+        uint8 array of shape (256, 256, 4)
+    """
+    from matplotlib import colormaps
+
+    values = tile.reshape(TILE_SIZE_PX, TILE_SIZE_PX)
+    scaled = np.clip(np.log1p(values) / np.log1p(max(vmax, 1e-9)), 0.0, 1.0)
+    rgba = colormaps[cmap_name](scaled, bytes=True)
+    rgba[..., 3] = np.where(values > 0, (90 + 150 * scaled).astype(np.uint8), 0)
+    return rgba
+
+
+def build_pyramid(
+    chunks: Iterable,
+    min_zoom: int,
+    max_zoom: int,
+) -> Iterator[tuple[int, TileGrid]]:
+    """
+    Aggregate streamed point chunks into a tile pyramid, one zoom level at a time.
+
+    Levels are yielded from max_zoom down; the next level is derived from the
+    previous one after the caller is done with it, so finished levels are
+    not kept.
+
+    Args:
+        chunks: Iterable of DataFrames with x, y (EPSG:3857) and weight columns
+        min_zoom: Lowest zoom level kept
+        max_zoom: Zoom level binned from the points
+
+    Yields:
+        (zoom, tile grid)
+    """
+    tiles: TileGrid = {}
+    n_points = 0
+    for chunk in chunks:
+        accumulate(
+            tiles,
+            chunk["x"].to_numpy(dtype=np.float64),
+            chunk["y"].to_numpy(dtype=np.float64),
+            chunk["weight"].to_numpy(dtype=np.float64),
+            max_zoom,
+        )
+        n_points += len(chunk)
+    logger.info(f"  Binned {n_points:,} points into {len(tiles):,} tiles at z{max_zoom}")
+
+    for zoom in range(max_zoom, min_zoom - 1, -1):
+        yield zoom, tiles
+        if zoom > min_zoom:
+            tiles = downsample(tiles)
+
+
+def write_pyramid(
+    pyramid: Iterable[tuple[int, TileGrid]],
+    output_dir: str | Path,
+    cmap_name: str = "YlOrRd",
+    percentile: float = 99.5,
+) -> dict[int, float]:
+    """
+    Write colorized PNG tiles as <output_dir>/<z>/<x>/<y>.png, level by level.
+
+    Each zoom level is normalized by a high percentile of its non-empty pixels so
+    colors stay comparable across tiles of the same zoom.
+
+    Args:
+        pyramid: (zoom, tile grid) pairs, e.g. from build_pyramid()
+        output_dir: Output directory
+        cmap_name: Matplotlib colormap name
+        percentile: Percentile of non-empty pixel values used as color maximum
+
+    Returns:
+        {zoom: vmax used}
+    """
+    from matplotlib.image import imsave
+
+    output_dir = Path(output_dir)
+    vmax_by_zoom = {}
+    for zoom, tiles in pyramid:
+        if not tiles:
+            continue
+        nonzero = np.concatenate([tile[tile > 0] for tile in tiles.values()])
+        vmax = float(np.percentile(nonzero, percentile)) if len(nonzero) else 1.0
+        vmax_by_zoom[zoom] = vmax
+
+        for (tx, ty), tile in tiles.items():
+            path = output_dir / str(zoom) / str(tx) / f"{ty}.png"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            imsave(path, colorize(tile, vmax, cmap_name))
+
+        logger.info(f"  z{zoom}: {len(tiles):,} tiles (vmax {vmax:.2f})")
+    return vmax_by_zoom
+
+
+def render_heatmap_tiles(
+    output_dir: str | Path,
+    weight: str = "score",
+    min_zoom: int = 5,
+    max_zoom: int = 12,
+    where: Optional[str] = None,
+    chunk_size: int = 100_000,
+    cmap_name: str = "YlOrRd",
+    engine: Optional[Engine] = None,
+) -> Path:
+    """
+    Render a static XYZ PNG heat-map pyramid of building/prospect density.
+
+    Args:
+        output_dir: Output directory (tiles in <z>/<x>/<y>.png, plus metadata.json)
+        weight: 'count', 'score' (weak_grid_score/100) or 'candidate' (v4 candidates only)
+        min_zoom: Lowest zoom level
+        max_zoom: Highest zoom level (binned directly from the points)
+        where: Optional filter on buildings (alias b), e.g. "b.bygningstype = 161"
+        chunk_size: Rows streamed per chunk
+        cmap_name: Matplotlib colormap name
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Output directory
+
+    Example:
+        >>> render_heatmap_tiles('data/processed/heatmap_score', weight='score')
+    """
+    engine = engine or get_engine()
+    output_dir = Path(output_dir)
+
+    logger.info(f"Rendering {weight} heat map z{min_zoom}-z{max_zoom} to {output_dir}...")
+    chunks = stream_query(
+        building_points_query(weight, where), chunk_size=chunk_size, engine=engine
+    )
+    pyramid = build_pyramid(chunks, min_zoom, max_zoom)
+    vmax_by_zoom = write_pyramid(pyramid, output_dir, cmap_name)
+    vmax_by_zoom = dict(sorted(vmax_by_zoom.items()))
+
+    tables = ["buildings"] + (["weak_grid_candidates_v4"] if weight == "candidate" else [])
+    metadata = {
+        "weight": weight,
+        "where": where,
+        "min_zoom": min_zoom,
+        "max_zoom": max_zoom,
+        "colormap": cmap_name,
+        "vmax_by_zoom": vmax_by_zoom,
+        "data_versions": table_versions(tables, engine),
+        "rendered_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    (output_dir / "metadata.json").write_text(json.dumps(metadata, indent=2))
+
+    logger.success(f"✓ Wrote heat-map tiles z{min_zoom}-z{max_zoom} to {output_dir}")
+    return output_dir
@@ -0,0 +1,537 @@
+"""
+H3 hex-grid index and pre-aggregated cell statistics
+
+Every building carries its H3 cell at a few resolutions (h3_r5, h3_r7, h3_r9).
+Building counts, score sums, prospect and candidate counts are aggregated per
+finest cell and county, power line length per finest cell, and rolled up the
+H3 hierarchy into hex_cell_stats. All sums are additive, so a refresh only
+computes the change of the affected finest cells and adds that delta to their
+ancestors. Dashboards, density lookups and anonymized exports then read
+hex_cell_stats by cell id instead of joining against postal code polygons.
+"""
+
+from typing import Optional
+
+import h3.api.basic_int as h3
+import numpy as np
+import pandas as pd
+from loguru import logger
+from pyproj import Transformer
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from svakenett.building_types import thresholds_values_sql
+from svakenett.db import copy_frame, get_engine, stream_query, table_columns, table_versions
+
+# Coarse to fine: r5 ~250 km² (region), r7 ~5 km² (village), r9 ~0.1 km² (cluster)
+RESOLUTIONS = (5, 7, 9)
+FINEST = RESOLUTIONS[-1]
+
+# Same minimum as postal_code_scores (GDPR): cells with fewer buildings are not exported
+MIN_CELL_COUNT = 5
+
+# Power lines are split into pieces of at most this length before cell assignment
+LINE_SEGMENT_M = 100
+
+# Additive per-cell measures (mean_score is derived from score_sum / scored_count)
+MEASURES = [
+    "building_count",
+    "scored_count",
+    "score_sum",
+    "prospect_count",
+    "candidate_count",
+    "line_length_km",
+]
+
+_SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS hex_cell_county_stats (
+        fylkesnummer CHAR(2) NOT NULL,
+        cell BIGINT NOT NULL,
+        building_count INTEGER NOT NULL,
+        scored_count INTEGER NOT NULL,
+        score_sum DOUBLE PRECISION NOT NULL,
+        prospect_count INTEGER NOT NULL,
+        candidate_count INTEGER NOT NULL,
+        PRIMARY KEY (fylkesnummer, cell)
+    );
+    CREATE INDEX IF NOT EXISTS idx_hex_county_stats_cell ON hex_cell_county_stats(cell);
+
+    CREATE TABLE IF NOT EXISTS hex_cell_lines (
+        cell BIGINT PRIMARY KEY,
+        line_length_km DOUBLE PRECISION NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS hex_cell_stats (
+        resolution SMALLINT NOT NULL,
+        cell BIGINT NOT NULL,
+        parent BIGINT,
+        building_count INTEGER NOT NULL,
+        scored_count INTEGER NOT NULL,
+        score_sum DOUBLE PRECISION NOT NULL,
+        mean_score REAL GENERATED ALWAYS AS (score_sum / NULLIF(scored_count, 0)) STORED,
+        prospect_count INTEGER NOT NULL,
+        candidate_count INTEGER NOT NULL,
+        line_length_km DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (resolution, cell)
+    );
+    CREATE INDEX IF NOT EXISTS idx_hex_cell_stats_parent ON hex_cell_stats(resolution, parent);
+"""
+
+
+def cell_column(resolution: int) -> str:
+    """Building column holding the cell at a resolution, e.g. 7 -> 'h3_r7'."""
+    return f"h3_r{resolution}"
+
+
+def cell_ids(
+    lon: np.ndarray, lat: np.ndarray, resolutions: tuple[int, ...] = RESOLUTIONS
+) -> dict[int, np.ndarray]:
+    """
+    H3 cells (as int64) of points at each resolution.
+
+    Args:
+        lon: Longitudes (EPSG:4326)
+        lat: Latitudes (EPSG:4326)
+        resolutions: H3 resolutions; coarser cells are derived as parents of the finest
+
+    Returns:
+        Mapping of resolution to cell id array
+    """
+    finest = max(resolutions)
+    cells = np.fromiter(
+        (h3.latlng_to_cell(y, x, finest) for x, y in zip(lon, lat)), dtype="int64", count=len(lon)
+    )
+    return {res: cells if res == finest else parent_cells(cells, res) for res in resolutions}
+
+
+def parent_cells(cells: np.ndarray, resolution: int) -> np.ndarray:
+    """Ancestor of each cell at a coarser resolution."""
+    return np.fromiter(
+        (h3.cell_to_parent(int(cell), resolution) for cell in cells),
+        dtype="int64",
+        count=len(cells),
+    )
+
+
+def _county_expr(engine: Engine) -> str:
+    """County of a building: the partition key when present, else from kommunenummer."""
+    columns = dict(table_columns("buildings", engine))
+    if "fylkesnummer" in columns:
+        return "b.fylkesnummer"
+    return "COALESCE(left(b.kommunenummer, 2), '00')"
+
+
+def ensure_schema(engine: Optional[Engine] = None) -> None:
+    """Create the cell columns on buildings and the cell statistics tables."""
+    engine = engine or get_engine()
+    with engine.begin() as conn:
+        for res in RESOLUTIONS:
+            column = cell_column(res)
+            conn.execute(text(f"ALTER TABLE buildings ADD COLUMN IF NOT EXISTS {column} BIGINT"))
+            conn.execute(
+                text(f"CREATE INDEX IF NOT EXISTS idx_buildings_{column} ON buildings({column})")
+            )
+        for statement in _SCHEMA_SQL.split(";"):
+            if statement.strip():
+                conn.execute(text(statement))
+
+
+def assign_cells(
+    fylker: Optional[list[str]] = None,
+    only_missing: bool = True,
+    chunk_size: int = 50_000,
+    engine: Optional[Engine] = None,
+) -> int:
+    """
+    Store the H3 cells of buildings in h3_r5/h3_r7/h3_r9.
+
+    Args:
+        fylker: Only these counties (default: all)
+        only_missing: Only buildings without cells yet (new or reloaded ones)
+        chunk_size: Rows per streamed chunk and COPY batch
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Buildings updated
+    """
+    engine = engine or get_engine()
+    ensure_schema(engine)
+
+    filters = ["b.geometry IS NOT NULL"]
+    if only_missing:
+        filters.append(f"b.{cell_column(FINEST)} IS NULL")
+    if fylker:
+        filters.append(f"{_county_expr(engine)} IN ({', '.join(repr(f) for f in fylker)})")
+    query = (
+        "SELECT b.id, ST_X(b.geometry) AS lon, ST_Y(b.geometry) AS lat "
+        f"FROM buildings b WHERE {' AND '.join(filters)}"
+    )
+
+    columns = [cell_column(res) for res in RESOLUTIONS]
+    conn = engine.raw_connection()
+    n_rows = 0
+    try:
+        with conn.cursor() as cur:
+            column_defs = ", ".join(f"{c} BIGINT" for c in columns)
+            cur.execute(f"CREATE TEMP TABLE hex_assign (id BIGINT, {column_defs})")
+            for chunk in stream_query(query, chunk_size=chunk_size, engine=engine):
+                cells = cell_ids(chunk["lon"].to_numpy(float), chunk["lat"].to_numpy(float))
+                batch = pd.DataFrame(
+                    {"id": chunk["id"], **{cell_column(res): ids for res, ids in cells.items()}}
+                )
+                cur.execute("TRUNCATE hex_assign")
+                copy_frame(cur, "hex_assign", batch)
+                cur.execute(f"""
+                    UPDATE buildings b
+                    SET {', '.join(f'{c} = a.{c}' for c in columns)}
+                    FROM hex_assign a
+                    WHERE b.id = a.id
+                """)
+                conn.commit()
+                n_rows += len(batch)
+                logger.info(f"  Assigned cells to {n_rows:,} buildings")
+    finally:
+        conn.close()
+
+    logger.success(
+        f"✓ Assigned H3 cells (r{', r'.join(map(str, RESOLUTIONS))}) to {n_rows:,} buildings"
+    )
+    return n_rows
+
+
+def _county_stats_sql(county_expr: str, candidates: bool) -> str:
+    candidate_join = "LEFT JOIN weak_grid_candidates_v4 c ON c.id = b.id" if candidates else ""
+    candidate_count = "COUNT(c.id)" if candidates else "0"
+    return f"""
+        INSERT INTO hex_cell_county_stats
+        SELECT
+            {county_expr} AS fylkesnummer,
+            b.{cell_column(FINEST)} AS cell,
+            COUNT(*),
+            COUNT(b.weak_grid_score),
+            COALESCE(SUM(b.weak_grid_score), 0),
+            COUNT(*) FILTER (WHERE b.weak_grid_score >= t.threshold),
+            {candidate_count}
+        FROM buildings b
+        LEFT JOIN {thresholds_values_sql()} AS t(bygningstype, threshold)
+            ON t.bygningstype = b.bygningstype
+        {candidate_join}
+        WHERE b.{cell_column(FINEST)} IS NOT NULL AND {{scope}}
+        GROUP BY 1, 2
+        RETURNING cell
+    """
+
+
+def _finest_totals(conn, cells: Optional[np.ndarray]) -> pd.DataFrame:
+    """Current truth per finest cell: county layer summed + line lengths."""
+    scope = "WHERE cell = ANY(%(cells)s)" if cells is not None else ""
+    query = f"""
+        SELECT
+            COALESCE(s.cell, l.cell) AS cell,
+            COALESCE(s.building_count, 0) AS building_count,
+            COALESCE(s.scored_count, 0) AS scored_count,
+            COALESCE(s.score_sum, 0) AS score_sum,
+            COALESCE(s.prospect_count, 0) AS prospect_count,
+            COALESCE(s.candidate_count, 0) AS candidate_count,
+            COALESCE(l.line_length_km, 0) AS line_length_km
+        FROM (
+            SELECT cell, SUM(building_count) AS building_count, SUM(scored_count) AS scored_count,
+                   SUM(score_sum) AS score_sum, SUM(prospect_count) AS prospect_count,
+                   SUM(candidate_count) AS candidate_count
+            FROM hex_cell_county_stats {scope}
+            GROUP BY cell
+        ) s
+        FULL JOIN (SELECT cell, line_length_km FROM hex_cell_lines {scope}) l ON l.cell = s.cell
+    """
+    return _read(conn, query, {"cells": None if cells is None else [int(c) for c in cells]})
+
+
+def _read(conn, query: str, params: Optional[dict] = None) -> pd.DataFrame:
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+        return pd.DataFrame(cur.fetchall(), columns=[col.name for col in cur.description])
+
+
+def _apply_delta(conn, cells: Optional[np.ndarray]) -> int:
+    """
+    Bring hex_cell_stats in line with the finest-cell truth for the given cells.
+
+    Computes new - old per finest cell and adds it to that cell and all its
+    ancestors; cells=None rebuilds every level from scratch.
+    """
+    new = _finest_totals(conn, cells).set_index("cell")
+    with conn.cursor() as cur:
+        if cells is None:
+            cur.execute("TRUNCATE hex_cell_stats")
+            old = pd.DataFrame(columns=MEASURES)
+        else:
+            old = _read(
+                conn,
+                f"SELECT cell, {', '.join(MEASURES)} FROM hex_cell_stats "
+                "WHERE resolution = %(res)s AND cell = ANY(%(cells)s)",
+                {"res": FINEST, "cells": [int(c) for c in cells]},
+            ).set_index("cell")
+
+    delta = new[MEASURES].astype(float).sub(old[MEASURES].astype(float), fill_value=0)
+    delta = delta[(delta.abs() > 1e-9).any(axis=1)]
+    if delta.empty:
+        return 0
+
+    finest = delta.index.to_numpy(dtype="int64")
+    levels = []
+    for i, res in enumerate(RESOLUTIONS):
+        level = delta.groupby(finest if res == FINEST else parent_cells(finest, res)).sum()
+        level.index.name = "cell"
+        level = level.reset_index()
+        level.insert(0, "resolution", res)
+        level.insert(
+            2, "parent", parent_cells(level["cell"].to_numpy(), RESOLUTIONS[i - 1]) if i else None
+        )
+        levels.append(level)
+    rows = pd.concat(levels, ignore_index=True)
+    for column in ("building_count", "scored_count", "prospect_count", "candidate_count"):
+        rows[column] = rows[column].round().astype("int64")
+    rows["parent"] = rows["parent"].astype("Int64")
+
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TEMP TABLE hex_delta ON COMMIT DROP AS
+            SELECT resolution, cell, parent, {', '.join(MEASURES)} FROM hex_cell_stats LIMIT 0
+        """)
+        copy_frame(cur, "hex_delta", rows[["resolution", "cell", "parent", *MEASURES]])
+        cur.execute(f"""
+            INSERT INTO hex_cell_stats (resolution, cell, parent, {', '.join(MEASURES)})
+            SELECT resolution, cell, parent, {', '.join(MEASURES)} FROM hex_delta
+            ON CONFLICT (resolution, cell) DO UPDATE SET
+                {', '.join(f'{m} = hex_cell_stats.{m} + EXCLUDED.{m}' for m in MEASURES)}
+        """)
+        cur.execute(
+            "DELETE FROM hex_cell_stats WHERE building_count <= 0 AND line_length_km <= 1e-6"
+        )
+    return len(rows)
+
+
+def refresh_cell_stats(fylker: Optional[list[str]] = None, engine: Optional[Engine] = None) -> int:
+    """
+    Recompute building aggregates per cell and roll them up the hierarchy.
+
+    With fylker only those counties' buildings are re-aggregated (a pruned scan
+    of their partitions); the affected finest cells, before and after, are then
+    updated by delta together with their ancestors.
+
+    Args:
+        fylker: Counties to refresh (default: all, full rebuild)
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Rows changed in hex_cell_stats
+    """
+    engine = engine or get_engine()
+    ensure_schema(engine)
+    county_expr = _county_expr(engine)
+    candidates = (
+        table_versions(["weak_grid_candidates_v4"], engine)["weak_grid_candidates_v4"] != "missing"
+    )
+    insert_sql = _county_stats_sql(county_expr, candidates)
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            if fylker is None:
+                cur.execute("TRUNCATE hex_cell_county_stats")
+                cur.execute(insert_sql.format(scope="TRUE"))
+                cells = None
+            else:
+                cur.execute(
+                    "DELETE FROM hex_cell_county_stats "
+                    "WHERE fylkesnummer = ANY(%(f)s) RETURNING cell",
+                    {"f": fylker},
+                )
+                old_cells = {row[0] for row in cur.fetchall()}
+                cur.execute(insert_sql.format(scope=f"{county_expr} = ANY(%(f)s)"), {"f": fylker})
+                cells = np.array(
+                    sorted(old_cells | {row[0] for row in cur.fetchall()}), dtype="int64"
+                )
+        changed = _apply_delta(conn, cells)
+        conn.commit()
+    finally:
+        conn.close()
+
+    scope = "all counties" if fylker is None else f"fylke {', '.join(fylker)}"
+    logger.success(f"✓ Refreshed hex cell statistics for {scope} ({changed:,} cell rows changed)")
+    return changed
+
+
+def line_pieces(
+    lines: np.ndarray, segment_m: float = LINE_SEGMENT_M
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Midpoints and lengths of the pieces of (Multi)LineStrings, at most segment_m long.
+
+    Args:
+        lines: Array of line geometries in a metric CRS
+        segment_m: Maximum piece length in meters
+
+    Returns:
+        (midpoints as an (n, 2) array, piece lengths in km)
+    """
+    import shapely
+
+    # Parts first: the gap between two parts of a MultiLineString is not a line
+    parts = shapely.segmentize(shapely.get_parts(lines), segment_m)
+    coords, part = shapely.get_coordinates(parts, return_index=True)
+    same_part = part[1:] == part[:-1]
+    start, end = coords[:-1][same_part], coords[1:][same_part]
+    return (start + end) / 2, np.hypot(*(end - start).T) / 1000
+
+
+def refresh_line_lengths(
+    lines_table: str = "power_lines_new",
+    segment_m: float = LINE_SEGMENT_M,
+    chunk_size: int = 20_000,
+    engine: Optional[Engine] = None,
+) -> int:
+    """
+    Recompute power line length per finest cell and roll the change up.
+
+    Lines are split into pieces of at most segment_m (in EPSG:25833) and each
+    piece is assigned to the cell of its midpoint.
+
+    Args:
+        lines_table: Line table with a geometry column
+        segment_m: Maximum piece length in meters
+        chunk_size: Lines per streamed chunk
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Rows changed in hex_cell_stats
+    """
+    import shapely
+
+    engine = engine or get_engine()
+    ensure_schema(engine)
+    to_wgs84 = Transformer.from_crs(25833, 4326, always_xy=True)
+
+    lengths = []
+    query = (
+        "SELECT ST_AsBinary(ST_Transform(geometry, 25833)) AS wkb "
+        f"FROM {lines_table} WHERE geometry IS NOT NULL"
+    )
+    for chunk in stream_query(query, chunk_size=chunk_size, engine=engine):
+        midpoints, length_km = line_pieces(
+            shapely.from_wkb(chunk["wkb"].map(bytes).to_numpy()), segment_m
+        )
+        mid_x, mid_y = to_wgs84.transform(midpoints[:, 0], midpoints[:, 1])
+        cells = cell_ids(mid_x, mid_y, (FINEST,))[FINEST]
+        lengths.append(pd.Series(length_km).groupby(cells).sum())
+
+    totals = pd.concat(lengths).groupby(level=0).sum() if lengths else pd.Series(dtype=float)
+    frame = pd.DataFrame(
+        {"cell": totals.index.astype("int64"), "line_length_km": totals.to_numpy()}
+    )
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM hex_cell_lines RETURNING cell")
+            cells = {row[0] for row in cur.fetchall()} | set(frame["cell"].tolist())
+            copy_frame(cur, "hex_cell_lines", frame)
+        changed = _apply_delta(conn, np.array(sorted(cells), dtype="int64"))
+        conn.commit()
+    finally:
+        conn.close()
+
+    logger.success(
+        f"✓ {frame['line_length_km'].sum():,.0f} km of {lines_table} in {len(frame):,} cells"
+    )
+    return changed
+
+
+def cell_stats(
+    resolution: int,
+    cells: Optional[list[int]] = None,
+    min_count: int = MIN_CELL_COUNT,
+    engine: Optional[Engine] = None,
+) -> pd.DataFrame:
+    """
+    Pre-aggregated statistics per cell (a key lookup, no spatial join).
+
+    Args:
+        resolution: One of RESOLUTIONS
+        cells: Only these cells (default: all at the resolution)
+        min_count: Drop cells with fewer buildings (anonymization); 0 keeps all
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        One row per cell with the measures, mean_score and the H3 index string
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(
+            f"Resolution {resolution} not stored. Use one of: {', '.join(map(str, RESOLUTIONS))}"
+        )
+    engine = engine or get_engine()
+    query = f"""
+        SELECT resolution, cell, parent, {', '.join(MEASURES)}, mean_score
+        FROM hex_cell_stats
+        WHERE resolution = %(res)s AND building_count >= %(min_count)s
+        {'AND cell = ANY(%(cells)s)' if cells is not None else ''}
+    """
+    conn = engine.raw_connection()
+    try:
+        df = _read(conn, query, {"res": resolution, "min_count": min_count, "cells": cells})
+    finally:
+        conn.close()
+    df.insert(2, "h3_index", [h3.int_to_str(int(c)) for c in df["cell"]])
+    return df
+
+
+def cell_at(
+    lon: float, lat: float, resolution: int = 7, engine: Optional[Engine] = None
+) -> Optional[dict]:
+    """Statistics of the cell containing a point (None if the cell has no data)."""
+    cell = h3.latlng_to_cell(lat, lon, resolution)
+    df = cell_stats(resolution, [cell], min_count=0, engine=engine)
+    return df.iloc[0].to_dict() if len(df) else None
+
+
+def export_cells(
+    output_path: str,
+    resolution: int = 7,
+    min_count: int = MIN_CELL_COUNT,
+    engine: Optional[Engine] = None,
+) -> int:
+    """
+    Anonymized export of cell statistics with hexagon geometries.
+
+    The format follows the file extension (.gpkg, .geojson, .parquet, .csv).
+    Cells with fewer than min_count buildings are left out.
+
+    Returns:
+        Cells written
+
+    Example:
+        >>> export_cells('data/processed/hex_r7.gpkg', resolution=7)
+    """
+    import geopandas as gpd
+    from shapely.geometry import Polygon
+
+    df = cell_stats(resolution, min_count=min_count, engine=engine)
+    df["cell"] = df["cell"].astype(str)
+    df["parent"] = df["parent"].astype("Int64").astype(str)
+    if output_path.endswith(".csv"):
+        df.to_csv(output_path, index=False)
+    else:
+        # H3 boundaries are (lat, lng); shapely wants (x, y)
+        geometry = [
+            Polygon([(lng, lat) for lat, lng in h3.cell_to_boundary(int(c))]) for c in df["cell"]
+        ]
+        gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
+        if output_path.endswith(".parquet"):
+            gdf.to_parquet(output_path)
+        else:
+            gdf.to_file(output_path)
+
+    logger.success(
+        f"✓ Exported {len(df):,} r{resolution} cells (≥{min_count} buildings) to {output_path}"
+    )
+    return len(df)
@@ -0,0 +1,113 @@
+"""
+Ingestion ledger - tracks which source datasets have been loaded, and when
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LEDGER_FILENAME = "ingestion_ledger.json"
+
+
+def ledger_dir() -> Path:
+    """
+    Directory holding the ingestion ledger and derived source statistics.
+
+    Returns:
+        Path under DATA_PROCESSED_DIR (default: ./data/processed/ledger), created if missing
+    """
+    base = Path(os.getenv("DATA_PROCESSED_DIR", "./data/processed"))
+    path = base / "ledger"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def default_raster_dir() -> Path:
+    """Output directory for the distance rasters (under DATA_PROCESSED_DIR)."""
+    return Path(os.getenv("DATA_PROCESSED_DIR", "./data/processed")) / "distance_raster"
+
+
+def source_fingerprint(path: str | Path) -> str:
+    """
+    Cheap fingerprint of a source file or directory (e.g. a FileGDB).
+
+    Uses file names, sizes and modification times only, so it never reads the data itself.
+
+    Args:
+        path: Source file or directory
+
+    Returns:
+        Hex digest that changes whenever any file in the source changes
+    """
+    path = Path(path)
+    digest = hashlib.sha1()
+
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    for file in files:
+        stat = file.stat()
+        digest.update(f"{file.relative_to(path) if path.is_dir() else file.name}".encode())
+        digest.update(f":{stat.st_size}:{stat.st_mtime_ns};".encode())
+
+    return digest.hexdigest()
+
+
+def read_ledger() -> dict:
+    """
+    Read the ingestion ledger.
+
+    Returns:
+        Mapping of source name to its last recorded ingestion entry
+    """
+    ledger_path = ledger_dir() / LEDGER_FILENAME
+    if not ledger_path.exists():
+        return {}
+    return json.loads(ledger_path.read_text())
+
+
+def record_source(name: str, path: str | Path, **details) -> dict:
+    """
+    Record that a source dataset has been ingested.
+
+    Args:
+        name: Logical source name (e.g. 'matrikkelen_bygning')
+        path: Source file or directory
+        **details: Extra JSON-serialisable fields (row counts, target table, ...)
+
+    Returns:
+        The ledger entry that was written
+
+    Example:
+        >>> record_source('matrikkelen_bygning', GDB_PATH, table='buildings', rows=130250)
+    """
+    ledger = read_ledger()
+    entry = {
+        "path": str(path),
+        "fingerprint": source_fingerprint(path),
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **details,
+    }
+    ledger[name] = entry
+
+    ledger_path = ledger_dir() / LEDGER_FILENAME
+    ledger_path.write_text(json.dumps(ledger, indent=2, ensure_ascii=False))
+    return entry
+
+
+def ledger_entry(name: str) -> Optional[dict]:
+    """
+    Look up the last ingestion entry for a source.
+
+    Args:
+        name: Logical source name
+
+    Returns:
+        Ledger entry, or None if the source was never recorded
+    """
+    return read_ledger().get(name)
@@ -0,0 +1,186 @@
+"""
+Matrikkelen (Kartverket building register) source statistics
+
+Attribute-only readers that never decode geometry, for profiling the building
+mix of a county before loading it.
+"""
+
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from svakenett.ledger import ledger_dir, source_fingerprint
+
+# Mapping of building type codes (from Matrikkelen documentation)
+BYGNINGSTYPER = {
+    111: "Enebolig",
+    112: "Tomannsbolig",
+    113: "Rekkehus",
+    121: "Våningshus",
+    131: "Sykehjem/aldershjem",
+    161: "Fritidsbygg (hytte)",
+    163: "Anneks til bolig/fritidsbolig",
+    171: "Garasje/uthus",
+    181: "Næringsbygg",
+}
+
+STAT_METHODS = ("sql", "arrow")
+
+
+def _normalize(value):
+    """Map missing values to None and float-typed integer codes back to int."""
+    if value is None or value != value:  # NaN from nullable integer columns
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _histogram_sql(gdb_path: Path, layer: str, column: str) -> Counter:
+    """GROUP BY pushed down into GDAL - only the aggregate rows come back."""
+    import pyogrio
+
+    df = pyogrio.read_dataframe(
+        gdb_path,
+        sql=f"SELECT {column}, COUNT(*) AS n FROM {layer} GROUP BY {column}",
+        read_geometry=False,
+    )
+    counts: Counter = Counter()
+    for value, n in zip(df[column], df["n"]):
+        counts[_normalize(value)] += int(n)
+    return counts
+
+
+def _histogram_arrow(gdb_path: Path, layer: str, column: str, batch_size: int) -> Counter:
+    """Stream a single attribute column as Arrow batches (geometry skipped)."""
+    import pyarrow.compute as pc
+    from pyogrio.raw import open_arrow
+
+    counts: Counter = Counter()
+    with open_arrow(
+        gdb_path,
+        layer=layer,
+        columns=[column],
+        read_geometry=False,
+        batch_size=batch_size,
+        use_pyarrow=True,
+    ) as (_meta, reader):
+        for batch in reader:
+            value_counts = pc.value_counts(batch.column(0))
+            for value, n in zip(
+                value_counts.field("values").to_pylist(),
+                value_counts.field("counts").to_pylist(),
+            ):
+                counts[_normalize(value)] += n
+    return counts
+
+
+def attribute_histogram(
+    gdb_path: str | Path,
+    layer: str = "bygning",
+    column: str = "bygningstype",
+    method: str = "sql",
+    use_cache: bool = True,
+    batch_size: int = 65536,
+) -> Counter:
+    """
+    Count the values of one attribute in a Matrikkelen layer without reading geometry.
+
+    Results are cached next to the ingestion ledger and keyed by the source
+    fingerprint, so re-profiling an unchanged county is a file read.
+
+    Args:
+        gdb_path: Path to the Matrikkelen FileGDB
+        layer: Layer name (default: 'bygning')
+        column: Attribute to count (default: 'bygningstype')
+        method: 'sql' (GROUP BY inside GDAL) or 'arrow' (column-only Arrow batches)
+        use_cache: Reuse a cached histogram if the source is unchanged
+        batch_size: Features per Arrow batch for method='arrow'
+
+    Returns:
+        Counter mapping attribute value to feature count (features without a value under None)
+
+    Example:
+        >>> counts = attribute_histogram(GDB_PATH)
+        >>> counts[161]
+        38219
+    """
+    if method not in STAT_METHODS:
+        raise ValueError(f"Unknown method '{method}'. Use one of: {', '.join(STAT_METHODS)}")
+
+    gdb_path = Path(gdb_path)
+    fingerprint = source_fingerprint(gdb_path)
+    cache_path = ledger_dir() / "stats" / f"{gdb_path.stem}__{layer}__{column}.json"
+
+    if use_cache and cache_path.exists():
+        cached = json.loads(cache_path.read_text())
+        if cached.get("fingerprint") == fingerprint:
+            logger.info(f"Using cached {column} histogram for {gdb_path.name}")
+            # JSON object keys are always strings; restore integer codes and nulls
+            return Counter(
+                {
+                    None if k == "null" else int(k) if k.lstrip("-").isdigit() else k: v
+                    for k, v in cached["counts"].items()
+                }
+            )
+
+    logger.info(f"Counting {column} in {gdb_path.name}:{layer} (method={method})...")
+    if method == "sql":
+        counts = _histogram_sql(gdb_path, layer, column)
+    else:
+        counts = _histogram_arrow(gdb_path, layer, column, batch_size)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(
+        json.dumps(
+            {
+                "source": str(gdb_path),
+                "layer": layer,
+                "column": column,
+                "fingerprint": fingerprint,
+                "counts": {"null" if k is None else str(k): v for k, v in counts.items()},
+            },
+            indent=2,
+        )
+    )
+    logger.success(f"✓ Counted {sum(counts.values()):,} features ({len(counts)} distinct values)")
+
+    return counts
+
+
+def building_type_histogram(
+    gdb_path: str | Path,
+    method: str = "sql",
+    use_cache: bool = True,
+) -> Counter:
+    """
+    Building type (bygningstype) distribution of a Matrikkelen FileGDB.
+
+    Args:
+        gdb_path: Path to the Matrikkelen FileGDB
+        method: 'sql' or 'arrow' (see attribute_histogram)
+        use_cache: Reuse a cached histogram if the source is unchanged
+
+    Returns:
+        Counter mapping bygningstype code to building count
+    """
+    return attribute_histogram(
+        gdb_path, layer="bygning", column="bygningstype", method=method, use_cache=use_cache
+    )
+
+
+def type_name(code: int, default: Optional[str] = None) -> str:
+    """
+    Human-readable name for a bygningstype code.
+
+    Args:
+        code: bygningstype code
+        default: Fallback name (default: 'Unknown (<code>)')
+
+    Returns:
+        Building type name
+    """
+    return BYGNINGSTYPER.get(code, default or f"Unknown ({code})")
@@ -0,0 +1,470 @@
+"""
+Power line network topology and along-grid distance to transformers
+
+Lines from power_lines_new are turned into a graph: line endpoints within a
+snap tolerance become one node, and an endpoint touching the interior of
+another line (a T-junction) splits that line there. Edges are the line pieces
+between break points, held as a SciPy CSR matrix with lengths in meters.
+
+Every transformer is attached to its nearest line position, and a single
+multi-source Dijkstra from all transformers gives each node its along-grid
+distance and feeding transformer. A building is projected onto its nearest
+line, and its network distance is the cheaper way along that line piece to
+one of the piece's end nodes plus that node's distance - no per-building path
+search. The topology is cached in the ledger per power line table version.
+"""
+
+import hashlib
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import shapely
+from loguru import logger
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+from scipy.spatial import cKDTree
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from svakenett.db import copy_frame, get_engine, stream_query, table_versions
+from svakenett.ledger import ledger_dir
+from svakenett.stats import StatsUpdate
+
+# ETRS89 / UTM 33N - lengths and distances in meters
+METRIC_SRID = 25833
+
+# Line endpoints closer than this are the same node (digitizing gaps in NVE data)
+SNAP_M = 2.0
+
+# Transformers farther than this from any line are not attached to the network
+TRANSFORMER_SNAP_M = 500.0
+
+# Larger than any single line length, so (line, position) keys sort by line first
+_KEY_STRIDE = 1e7
+
+LINES_TABLE = "power_lines_new"
+TRANSFORMERS_TABLE = "transformers_new"
+
+
+@dataclass
+class Topology:
+    """
+    Node/edge graph of the power line network.
+
+    Line pieces are stored CSR-style per line: the break points of line i are
+    break_pos[line_ptr[i]:line_ptr[i + 1]] (meters along the line, starting at
+    0 and ending at its length) with nodes break_node[...] at those positions.
+    """
+
+    lines: np.ndarray  # LineStrings in METRIC_SRID
+    line_ids: np.ndarray  # power_lines_new.id of each line
+    line_ptr: np.ndarray
+    break_pos: np.ndarray
+    break_node: np.ndarray
+    break_key: np.ndarray  # line index * _KEY_STRIDE + position, for piece lookup
+    graph: csr_matrix  # symmetric, edge weight = piece length in meters
+
+    @cached_property
+    def tree(self) -> shapely.STRtree:
+        return shapely.STRtree(self.lines)
+
+    @property
+    def n_nodes(self) -> int:
+        return self.graph.shape[0]
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.break_pos) - len(self.lines)
+
+    def locate(self, x: np.ndarray, y: np.ndarray, max_distance: Optional[float] = None):
+        """
+        Project points onto their nearest line.
+
+        Returns:
+            (point index, line index, position along line in m, distance to line in m)
+            for points with a line within max_distance
+        """
+        points = shapely.points(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        (point_idx, line_idx), distances = self.tree.query_nearest(
+            points, max_distance=max_distance, return_distance=True, all_matches=False
+        )
+        positions = shapely.line_locate_point(self.lines[line_idx], points[point_idx])
+        return point_idx, line_idx, positions, distances
+
+    def piece_of(
+        self, line_idx: np.ndarray, positions: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Line piece containing each position.
+
+        Returns:
+            (index of the piece's start break point, index of its end break point)
+        """
+        start = self.line_ptr[line_idx]
+        end = self.line_ptr[line_idx + 1] - 1
+        # Break points are sorted by (line, position), so one global search
+        # finds the piece of every point at once
+        lower = (
+            np.searchsorted(self.break_key, line_idx * _KEY_STRIDE + positions, side="right") - 1
+        )
+        lower = np.clip(lower, start, end - 1)
+        return lower, lower + 1
+
+
+def build_topology(lines: np.ndarray, line_ids: np.ndarray, snap_m: float = SNAP_M) -> Topology:
+    """
+    Build the node/edge graph from LineStrings in a metric CRS.
+
+    Args:
+        lines: LineStrings (METRIC_SRID)
+        line_ids: Source id of each line
+        snap_m: Endpoint snap tolerance in meters
+
+    Returns:
+        Topology
+    """
+    n_lines = len(lines)
+    lengths = shapely.length(lines)
+    # Endpoint k of line k % n_lines (start, then end)
+    ends = np.vstack(
+        [
+            shapely.get_coordinates(shapely.get_point(lines, 0)),
+            shapely.get_coordinates(shapely.get_point(lines, -1)),
+        ]
+    )
+
+    # Nodes: endpoints within snap_m of each other form one node
+    pairs = cKDTree(ends).query_pairs(snap_m, output_type="ndarray")
+    adjacency = csr_matrix(
+        (np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(len(ends), len(ends))
+    )
+    n_nodes, end_node = connected_components(adjacency, directed=False)
+
+    # T-junctions: an endpoint on the interior of another line splits that line
+    end_points = shapely.points(ends)
+    end_idx, hit_line = shapely.STRtree(lines).query(
+        end_points, predicate="dwithin", distance=snap_m
+    )
+    hit_pos = shapely.line_locate_point(lines[hit_line], end_points[end_idx])
+    interior = (
+        (hit_pos > snap_m)
+        & (hit_pos < lengths[hit_line] - snap_m)
+        & (hit_line != end_idx % n_lines)
+    )
+
+    line_of = np.concatenate([np.arange(n_lines), np.arange(n_lines), hit_line[interior]])
+    pos = np.concatenate([np.zeros(n_lines), lengths, hit_pos[interior]])
+    node = np.concatenate([end_node, end_node[end_idx[interior]]])
+    order = np.lexsort((pos, line_of))
+    line_of, pos, node = line_of[order], pos[order], node[order]
+    line_ptr = np.concatenate([[0], np.cumsum(np.bincount(line_of, minlength=n_lines))])
+
+    # Edges: consecutive break points on the same line
+    same_line = line_of[1:] == line_of[:-1]
+    u, v = node[:-1][same_line], node[1:][same_line]
+    # A weight of 0 would read as "no edge" in a sparse matrix
+    weight = np.maximum(np.diff(pos)[same_line], 1e-3)
+    keep = u != v
+    graph = _min_duplicates(u[keep], v[keep], weight[keep], n_nodes)
+
+    return Topology(
+        lines, np.asarray(line_ids), line_ptr, pos, node, line_of * _KEY_STRIDE + pos, graph
+    )
+
+
+def _min_duplicates(u: np.ndarray, v: np.ndarray, weight: np.ndarray, n_nodes: int) -> csr_matrix:
+    """Symmetric CSR graph keeping the shortest of parallel edges (csr_matrix would sum them)."""
+    rows = np.concatenate([u, v])
+    cols = np.concatenate([v, u])
+    edges = (
+        pd.DataFrame({"r": rows, "c": cols, "w": np.concatenate([weight, weight])})
+        .groupby(["r", "c"])["w"]
+        .min()
+    )
+    r, c = (edges.index.get_level_values(level).to_numpy() for level in (0, 1))
+    return csr_matrix((edges.to_numpy(), (r, c)), shape=(n_nodes, n_nodes))
+
+
+def transformer_distances(
+    topology: Topology,
+    x: np.ndarray,
+    y: np.ndarray,
+    transformer_ids: np.ndarray,
+    snap_m: float = TRANSFORMER_SNAP_M,
+) -> tuple[np.ndarray, np.ndarray, pd.DataFrame]:
+    """
+    Along-grid distance from every node to its nearest transformer.
+
+    Each transformer becomes a virtual node joined to both ends of the line
+    piece it projects onto, and one multi-source Dijkstra runs from all of them.
+
+    Returns:
+        (distance per node in m (inf when not fed), transformer id per node (-1
+        when not fed), attached transformers as DataFrame piece/position/transformer_id,
+        where piece is the index of the piece's start break point)
+    """
+    t_idx, t_line, t_pos, _ = topology.locate(x, y, snap_m)
+    lower, upper = topology.piece_of(t_line, t_pos)
+    n = topology.n_nodes
+    virtual = n + np.arange(len(t_idx))
+
+    u = topology.break_node[lower]
+    v = topology.break_node[upper]
+    to_u = np.maximum(t_pos - topology.break_pos[lower], 1e-3)
+    to_v = np.maximum(topology.break_pos[upper] - t_pos, 1e-3)
+    base = topology.graph.tocoo()
+    graph = csr_matrix(
+        (
+            np.concatenate([base.data, to_u, to_u, to_v, to_v]),
+            (
+                np.concatenate([base.row, virtual, u, virtual, v]),
+                np.concatenate([base.col, u, virtual, v, virtual]),
+            ),
+        ),
+        shape=(n + len(t_idx), n + len(t_idx)),
+    )
+
+    attached_ids = np.asarray(transformer_ids)[t_idx]
+    if len(virtual):
+        distances, _, sources = dijkstra(
+            graph, directed=False, indices=virtual, min_only=True, return_predecessors=True
+        )
+        feeder = np.where(sources >= n, attached_ids[np.clip(sources - n, 0, None)], -1)
+    else:
+        distances, feeder = np.full(n, np.inf), np.full(n, -1)
+
+    on_piece = pd.DataFrame({"piece": lower, "position": t_pos, "transformer_id": attached_ids})
+
+    logger.info(
+        f"  {len(t_idx):,} of {len(x):,} transformers attached; "
+        f"{np.isfinite(distances[:n]).sum():,} of {n:,} nodes fed"
+    )
+    return distances[:n], feeder[:n], on_piece
+
+
+def network_distances(
+    topology: Topology,
+    node_distance: np.ndarray,
+    node_feeder: np.ndarray,
+    on_piece: pd.DataFrame,
+    x: np.ndarray,
+    y: np.ndarray,
+    max_attach_m: Optional[float] = None,
+) -> pd.DataFrame:
+    """
+    Along-grid distance from points (buildings) to their feeding transformer.
+
+    Args:
+        topology: Network
+        node_distance, node_feeder, on_piece: From transformer_distances()
+        x, y: Points in METRIC_SRID
+        max_attach_m: Points farther than this from any line get no value
+
+    Returns:
+        DataFrame aligned with the points: network_distance_m, feeding_transformer_id,
+        attach_distance_m (NaN / -1 where not reachable)
+    """
+    p_idx, p_line, p_pos, p_gap = topology.locate(x, y, max_attach_m)
+    lower, upper = topology.piece_of(p_line, p_pos)
+    via_u = node_distance[topology.break_node[lower]] + (p_pos - topology.break_pos[lower])
+    via_v = node_distance[topology.break_node[upper]] + (topology.break_pos[upper] - p_pos)
+    distance = np.minimum(via_u, via_v)
+    feeder = np.where(
+        via_u <= via_v,
+        node_feeder[topology.break_node[lower]],
+        node_feeder[topology.break_node[upper]],
+    )
+
+    # A transformer on the building's own piece can be closer than either end node
+    same_piece = pd.DataFrame({"i": np.arange(len(lower)), "piece": lower, "p": p_pos}).merge(
+        on_piece, on="piece"
+    )
+    if len(same_piece):
+        same_piece["direct"] = (same_piece["p"] - same_piece["position"]).abs()
+        best = same_piece.loc[same_piece.groupby("i")["direct"].idxmin()]
+        i = best["i"].to_numpy()
+        closer = best["direct"].to_numpy() < distance[i]
+        distance[i[closer]] = best["direct"].to_numpy()[closer]
+        feeder[i[closer]] = best["transformer_id"].to_numpy()[closer]
+
+    result = pd.DataFrame(
+        {
+            "network_distance_m": np.full(len(x), np.nan),
+            "feeding_transformer_id": np.full(len(x), -1, dtype="int64"),
+            "attach_distance_m": np.full(len(x), np.nan),
+        }
+    )
+    reachable = np.isfinite(distance)
+    result.loc[p_idx[reachable], "network_distance_m"] = distance[reachable]
+    result.loc[p_idx[reachable], "feeding_transformer_id"] = feeder[reachable]
+    result.loc[p_idx, "attach_distance_m"] = p_gap
+    return result
+
+
+def load_topology(
+    snap_m: float = SNAP_M,
+    use_cache: bool = True,
+    lines_table: str = LINES_TABLE,
+    engine: Optional[Engine] = None,
+) -> Topology:
+    """
+    Topology of a line table, cached in the ledger per table version.
+
+    Args:
+        snap_m: Endpoint snap tolerance in meters
+        use_cache: Reuse the cached topology if the lines are unchanged
+        lines_table: Line table or view with id and geometry (default: power_lines_new)
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Topology
+    """
+    engine = engine or get_engine()
+    version = table_versions([lines_table], engine)[lines_table]
+    key = hashlib.sha1(f"{lines_table}:{version}:{snap_m}".encode()).hexdigest()[:12]
+    cache_path = ledger_dir() / "network" / f"topology_{key}.pkl"
+    if use_cache and cache_path.exists():
+        logger.info(f"Using cached network topology ({cache_path.name})")
+        return pd.read_pickle(cache_path)
+
+    logger.info(f"Building network topology from {lines_table}...")
+    df = pd.read_sql(
+        f"SELECT id, ST_AsBinary(ST_Transform(geometry, {METRIC_SRID})) AS wkb "
+        f"FROM {lines_table} WHERE geometry IS NOT NULL",
+        engine,
+    )
+    geometries = shapely.from_wkb(df["wkb"].map(bytes).to_numpy())
+    # MultiLineStrings -> LineStrings
+    lines, part_of = shapely.get_parts(geometries, return_index=True)
+    keep = shapely.length(lines) > 0
+    topology = build_topology(lines[keep], df["id"].to_numpy()[part_of[keep]], snap_m)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    pd.to_pickle(topology, cache_path)
+    logger.success(
+        f"✓ Topology: {len(topology.lines):,} lines, {topology.n_nodes:,} nodes, "
+        f"{topology.n_edges:,} edges"
+    )
+    return topology
+
+
+def update_network_distances(
+    table: str = "buildings",
+    where: Optional[str] = None,
+    snap_m: float = SNAP_M,
+    max_attach_m: Optional[float] = None,
+    chunk_size: int = 200_000,
+    use_cache: bool = True,
+    engine: Optional[Engine] = None,
+) -> int:
+    """
+    Store along-grid distance to the feeding transformer for every building.
+
+    Sets network_distance_to_transformer_m and feeding_transformer_id (NULL
+    when the building's line is not connected to any transformer). Without a
+    filter the stored metric sketches of the table are updated as well.
+
+    Args:
+        table: Point table with id and geometry
+        where: Optional SQL filter
+        snap_m: Endpoint snap tolerance in meters
+        max_attach_m: Buildings farther than this from any line are skipped
+        chunk_size: Buildings per streamed chunk
+        use_cache: Reuse the cached topology
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Buildings with a network distance
+    """
+    engine = engine or get_engine()
+    written = ["network_distance_to_transformer_m", "feeding_transformer_id"]
+    # A filtered run rewrites rows of unknown groups: those sketches are rebuilt on next read
+    stats = StatsUpdate(table, written, engine=engine) if where is None else None
+    group_by = stats.group_by if stats else []
+    topology = load_topology(snap_m, use_cache, engine=engine)
+
+    transformers = pd.read_sql(
+        f"SELECT id, ST_X(p) AS x, ST_Y(p) AS y FROM "
+        f"(SELECT id, ST_Transform(geometry, {METRIC_SRID}) AS p FROM {TRANSFORMERS_TABLE}) t",
+        engine,
+    )
+    node_distance, node_feeder, on_piece = transformer_distances(
+        topology,
+        transformers["x"].to_numpy(),
+        transformers["y"].to_numpy(),
+        transformers["id"].to_numpy(),
+    )
+
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"ALTER TABLE {table} "
+                "ADD COLUMN IF NOT EXISTS network_distance_to_transformer_m REAL"
+            )
+        )
+        conn.execute(
+            text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS feeding_transformer_id INTEGER")
+        )
+
+    columns = ", ".join(["id", *group_by])
+    query = f"""
+        SELECT {columns}, ST_X(p) AS x, ST_Y(p) AS y
+        FROM (SELECT {columns}, ST_Transform(geometry, {METRIC_SRID}) AS p FROM {table}
+              WHERE geometry IS NOT NULL{f' AND ({where})' if where else ''}) s
+    """
+    n_reached = n_rows = 0
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "CREATE TEMP TABLE network_distance "
+                "(id BIGINT, distance_m REAL, transformer_id INTEGER)"
+            )
+            for chunk in stream_query(query, chunk_size=chunk_size, engine=engine):
+                result = network_distances(
+                    topology,
+                    node_distance,
+                    node_feeder,
+                    on_piece,
+                    chunk["x"].to_numpy(float),
+                    chunk["y"].to_numpy(float),
+                    max_attach_m,
+                )
+                batch = pd.DataFrame(
+                    {
+                        "id": chunk["id"],
+                        "distance_m": result["network_distance_m"].round(1),
+                        "transformer_id": result["feeding_transformer_id"]
+                        .where(result["feeding_transformer_id"] >= 0)
+                        .astype("Int64"),
+                    }
+                )
+                if stats is not None:
+                    frame = chunk[group_by].assign(
+                        network_distance_to_transformer_m=batch["distance_m"],
+                        feeding_transformer_id=batch["transformer_id"],
+                    )
+                    stats.add(stats.sketch([frame]))
+                cur.execute("TRUNCATE network_distance")
+                copy_frame(cur, "network_distance", batch)
+                cur.execute(f"""
+                    UPDATE {table} t
+                    SET network_distance_to_transformer_m = n.distance_m,
+                        feeding_transformer_id = n.transformer_id
+                    FROM network_distance n
+                    WHERE t.id = n.id
+                """)
+                conn.commit()
+                n_rows += len(batch)
+                n_reached += int(batch["distance_m"].notna().sum())
+                logger.info(f"  {n_rows:,} buildings processed")
+    finally:
+        conn.close()
+    if stats is not None:
+        stats.save()
+
+    logger.success(f"✓ Network distance to transformer for {n_reached:,} of {n_rows:,} buildings")
+    return n_reached
@@ -0,0 +1,335 @@
+"""
+County partitions of the buildings table
+
+buildings is LIST-partitioned on fylkesnummer (see sql/buildings_partitioned.sql).
+This module lists the partitions, runs a psql script once per partition in
+parallel (each run sees :partition and :fylke), and reloads a single county
+by loading a staging table and swapping it in with DETACH/ATTACH, so the rest
+of the country stays readable while one county is replaced.
+
+A per-partition run can read each partition back into metric sketches right
+after its script finishes, while the partition is still cached, and swap the
+merged result into the stored metric statistics (see svakenett.stats).
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from svakenett.db import get_engine, stream_query
+from svakenett.stats import MetricStatsStore, StatsUpdate
+
+# Counties after the 2024 regional reform
+FYLKER = {
+    "03": "Oslo",
+    "11": "Rogaland",
+    "15": "Møre og Romsdal",
+    "18": "Nordland",
+    "31": "Østfold",
+    "32": "Akershus",
+    "33": "Buskerud",
+    "34": "Innlandet",
+    "39": "Vestfold",
+    "40": "Telemark",
+    "42": "Agder",
+    "46": "Vestland",
+    "50": "Trøndelag",
+    "55": "Troms",
+    "56": "Finnmark",
+}
+
+PARENT_TABLE = "buildings"
+
+
+@dataclass
+class Partition:
+    """One partition of buildings; fylke is None for the default partition."""
+
+    table: str
+    fylke: Optional[str]
+    rows: int
+
+
+def partition_table(fylke: str) -> str:
+    """Partition table name for a county, e.g. '42' -> 'buildings_f42'."""
+    return f"{PARENT_TABLE}_f{fylke}"
+
+
+def fylke_of(kommunenummer: str) -> str:
+    """County code of a municipality number, e.g. '4204' -> '42'."""
+    return kommunenummer[:2]
+
+
+def is_partitioned(engine: Optional[Engine] = None) -> bool:
+    """True when buildings is a partitioned table."""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        relkind = conn.execute(
+            text("SELECT relkind FROM pg_class WHERE relname = :t AND pg_table_is_visible(oid)"),
+            {"t": PARENT_TABLE},
+        ).scalar()
+    return relkind == "p"
+
+
+def list_partitions(
+    engine: Optional[Engine] = None, include_empty: bool = False
+) -> list[Partition]:
+    """
+    Partitions of buildings with their (estimated) row counts.
+
+    Args:
+        engine: Optional engine (default: get_engine())
+        include_empty: Also return partitions without rows
+
+    Returns:
+        Partitions ordered by table name (empty list if buildings is not partitioned)
+    """
+    engine = engine or get_engine()
+    if not is_partitioned(engine):
+        return []
+
+    query = text("""
+        SELECT
+            c.relname,
+            substring(pg_get_expr(c.relpartbound, c.oid) from '[0-9]+'),
+            GREATEST(c.reltuples, COALESCE(s.n_live_tup, 0))::bigint
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE i.inhparent = CAST(:parent AS regclass)
+        ORDER BY c.relname
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"parent": PARENT_TABLE}).fetchall()
+    partitions = [Partition(table, fylke, n_rows) for table, fylke, n_rows in rows]
+    return partitions if include_empty else [p for p in partitions if p.rows > 0]
+
+
+def run_per_partition(
+    sql_file: str,
+    variables: Optional[list[str]] = None,
+    fylker: Optional[list[str]] = None,
+    workers: int = 4,
+    engine: Optional[Engine] = None,
+    record_stats: bool = False,
+) -> dict[str, int]:
+    """
+    Run a psql script once per partition, in parallel.
+
+    Each run gets -v partition=<table> and -v fylke=<code>. When buildings is
+    not partitioned the script runs once without these variables, so scripts
+    stay usable on an unpartitioned database.
+
+    Args:
+        sql_file: psql script
+        variables: Extra psql variables ('name=value')
+        fylker: Only these counties (default: all non-empty partitions)
+        workers: Concurrent psql sessions
+        engine: Optional engine (default: get_engine())
+        record_stats: Sketch every partition after its run and replace the
+            stored metric sketches of buildings with the merged result (only
+            when all partitions run; otherwise they are rebuilt on next read)
+
+    Returns:
+        psql exit code per partition table
+    """
+    base = ["psql", os.getenv("DATABASE_URL", ""), "-v", "ON_ERROR_STOP=1"]
+    for variable in variables or []:
+        base += ["-v", variable]
+
+    partitions = list_partitions(engine, include_empty=fylker is not None)
+    if not partitions:
+        logger.info(f"buildings is not partitioned; running {sql_file} once")
+        return {PARENT_TABLE: subprocess.run(base + ["-f", sql_file]).returncode}
+    if fylker is not None:
+        partitions = [p for p in partitions if p.fylke in fylker]
+    # Rows without kommunenummer share a stats group across counties, so only a
+    # run over every partition can replace the stored sketches
+    stats = StatsUpdate(PARENT_TABLE, engine=engine) if record_stats and fylker is None else None
+
+    def run(partition: Partition) -> tuple[int, Optional[MetricStatsStore]]:
+        variables = ["-v", f"partition={partition.table}", "-v", f"fylke={partition.fylke or '00'}"]
+        command = base + variables
+        result = subprocess.run(command + ["-q", "-f", sql_file], capture_output=True, text=True)
+        if result.returncode != 0:
+            logger.error(f"✗ {partition.table}: {result.stderr.strip()}")
+            return result.returncode, None
+        logger.info(f"  ✓ {partition.table} ({partition.rows:,} rows)")
+        if stats is None:
+            return result.returncode, None
+        columns = ", ".join(stats.group_by + stats.metrics)
+        chunks = stream_query(f"SELECT {columns} FROM {partition.table}", engine=engine)
+        return result.returncode, stats.sketch(chunks)
+
+    logger.info(f"Running {sql_file} on {len(partitions)} partitions ({workers} parallel)...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = dict(zip((p.table for p in partitions), pool.map(run, partitions)))
+    codes = {table: code for table, (code, _) in results.items()}
+
+    failed = [table for table, code in codes.items() if code != 0]
+    if failed:
+        logger.error(f"✗ {len(failed)} partition(s) failed: {', '.join(failed)}")
+    else:
+        logger.success(f"✓ {sql_file} complete on all partitions")
+        if stats is not None:
+            for _, partial in results.values():
+                stats.add(partial)
+            stats.save()
+    return codes
+
+
+def _parent_index_definitions(conn) -> list[str]:
+    """CREATE INDEX statements for each index on buildings, with '{table}' as target."""
+    definitions = conn.execute(
+        text(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+            "WHERE indrelid = CAST(:parent AS regclass)"
+        ),
+        {"parent": PARENT_TABLE},
+    ).scalars()
+    return [
+        re.sub(
+            r"^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?\S+", r"CREATE \1INDEX ON {table}", definition
+        )
+        for definition in definitions
+    ]
+
+
+def reload_partition(
+    fylke: str,
+    source_sql: str,
+    keep_where: Optional[str] = None,
+    engine: Optional[Engine] = None,
+) -> int:
+    """
+    Replace one county's buildings by swapping in a freshly loaded partition.
+
+    The new rows go into a staging table carrying the partition's CHECK
+    constraint and are then indexed like the parent, so ATTACH needs neither a
+    validation scan nor an index build. Other counties stay readable
+    throughout; the swap itself is a short DETACH/ATTACH transaction.
+
+    Args:
+        fylke: County code, e.g. '42'
+        source_sql: SELECT returning buildings columns (by name) for the county;
+            fylkesnummer is set automatically
+        keep_where: Optional filter of current rows to carry over, e.g.
+            "building_source <> 'residential'" when only reloading residential buildings
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Rows in the new partition
+
+    Example:
+        >>> reload_partition('42', "SELECT ... FROM residential_buildings",
+        ...                  keep_where="building_source <> 'residential'")
+    """
+    engine = engine or get_engine()
+    if fylke not in FYLKER:
+        raise ValueError(f"Unknown fylkesnummer '{fylke}'. Use one of: {', '.join(FYLKER)}")
+    if not is_partitioned(engine):
+        raise ValueError("buildings is not partitioned; run sql/buildings_partitioned.sql first")
+
+    table = partition_table(fylke)
+    staging = f"{table}_new"
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+        conn.execute(text(f"CREATE TABLE {staging} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)"))
+        conn.execute(
+            text(
+                f"ALTER TABLE {staging} "
+                f"ADD CONSTRAINT {staging}_fylke CHECK (fylkesnummer = '{fylke}')"
+            )
+        )
+
+        columns = [
+            c
+            for c in conn.execute(text(f"SELECT * FROM ({source_sql}) s LIMIT 0")).keys()
+            if c != "fylkesnummer"
+        ]
+        column_list = ", ".join(columns)
+
+        logger.info(f"Loading {FYLKER[fylke]} ({fylke}) into {staging}...")
+        if keep_where:
+            conn.execute(text(f"INSERT INTO {staging} SELECT * FROM {table} WHERE {keep_where}"))
+        conn.execute(text(f"""
+            INSERT INTO {staging} ({column_list}, fylkesnummer)
+            SELECT {column_list}, '{fylke}' FROM ({source_sql}) s
+        """))
+        rows = conn.execute(text(f"SELECT COUNT(*) FROM {staging}")).scalar()
+
+        # Index after loading; ATTACH adopts matching indexes as the parent's partitions
+        logger.info(f"Indexing {staging}...")
+        for definition in _parent_index_definitions(conn):
+            conn.execute(text(definition.replace("{table}", staging)))
+
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {table}"))
+        conn.execute(text(f"DROP TABLE {table}"))
+        conn.execute(text(f"ALTER TABLE {staging} RENAME TO {table}"))
+        conn.execute(
+            text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {table} FOR VALUES IN ('{fylke}')")
+        )
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"ANALYZE {table}"))
+
+    logger.success(f"✓ Reloaded {table} with {rows:,} buildings")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-partition operations on buildings")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="List partitions and row counts")
+
+    run = sub.add_parser(
+        "run", help="Run a psql script once per partition (-v partition=..., -v fylke=...)"
+    )
+    run.add_argument("sql_file")
+    run.add_argument(
+        "-v", "--variable", action="append", default=[], help="Extra psql variable name=value"
+    )
+    run.add_argument("--fylke", nargs="+", help="Only these counties")
+    run.add_argument("--workers", type=int, default=4, help="Concurrent psql sessions")
+    run.add_argument(
+        "--drop", nargs="+", default=[], metavar="TABLE", help="Drop these tables before the run"
+    )
+    run.add_argument(
+        "--record-stats",
+        action="store_true",
+        help="Sketch each partition after its run into the stored metric statistics",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for partition in list_partitions(include_empty=True):
+            name = FYLKER.get(partition.fylke, "(default)")
+            print(f"{partition.table:<20} {name:<18} {partition.rows:>10,}")
+        return
+
+    if args.drop:
+        with get_engine().begin() as conn:
+            for table in args.drop:
+                conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+    codes = run_per_partition(
+        args.sql_file, args.variable, args.fylke, args.workers, record_stats=args.record_stats
+    )
+    sys.exit(1 if any(codes.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
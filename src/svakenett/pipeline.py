@@ -0,0 +1,659 @@
+"""
+Pipeline runner - ingest → metrics → scoring → v4 filter → reports/exports/maps
+
+Each stage declares the stages it depends on, the source files it reads and
+the tables/files it produces. A stage is skipped when its key (a hash of its
+own definition, its source file fingerprints and the keys of its upstream
+stages) matches the last successful run and its outputs still exist.
+Independent stages run concurrently, so a full run only takes as long as the
+critical path. Stage state lives in the ledger directory; every stage run is
+appended to pipeline_runs.jsonl with its timing, and stage output goes to
+<ledger>/pipeline_logs/<run_id>/<stage>.log. With --profile, the run also
+writes a profile bundle (see svakenett.profiling).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from svakenett.db import get_engine, table_versions
+from svakenett.ledger import default_raster_dir, ledger_dir, source_fingerprint
+from svakenett.profiling import (
+    diff_snapshots,
+    profile_dir,
+    profiled_command,
+    snapshot,
+    write_bundle,
+)
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+STATE_FILENAME = "pipeline_state.json"
+RUNS_FILENAME = "pipeline_runs.jsonl"
+
+# Source datasets (same environment variables and defaults as the loader scripts)
+NVE_DATA_DIR = os.getenv(
+    "NVE_DATA_DIR", "/mnt/c/Users/klaus/klauspython/svakenett/data/nve_infrastructure"
+)
+MATRIKKELEN_GDB = os.getenv(
+    "MATRIKKELEN_GDB",
+    "/mnt/c/users/klaus/klauspython/qgis/svakenett/matrikkelen_data/"
+    "Basisdata_42_Agder_25833_MatrikkelenBygning_FGDB.gdb",
+)
+
+
+def default_output_dir() -> Path:
+    """Dated output folder for reports, CSVs and maps (override with SVAKENETT_OUTPUT_DIR)."""
+    base = Path(os.getenv("DATA_PROCESSED_DIR", "./data/processed"))
+    return Path(
+        os.getenv("SVAKENETT_OUTPUT_DIR", base / f"unified_buildings_{date.today().isoformat()}")
+    )
+
+
+@dataclass
+class Stage:
+    """
+    One pipeline step, run as a subprocess.
+
+    Paths in command and sources are relative to the repository root.
+    Outputs are table names or 'file:<path>' entries. `writes` lists tables
+    the stage modifies besides its outputs (e.g. columns it adds to
+    buildings); at most one running stage writes any one table.
+    """
+
+    name: str
+    command: list[str]
+    description: str = ""
+    depends_on: list[str] = field(default_factory=list)
+    sources: list[str] = field(default_factory=list)
+    outputs: list[str] = field(default_factory=list)
+    env: dict[str, str] = field(default_factory=dict)
+    writes: list[str] = field(default_factory=list)
+
+
+def _psql(sql_file: str, *variables: str) -> list[str]:
+    command = ["psql", os.getenv("DATABASE_URL", ""), "-v", "ON_ERROR_STOP=1"]
+    for variable in variables:
+        command += ["-v", variable]
+    return command + ["-f", sql_file]
+
+
+def default_stages(output_dir: Optional[Path] = None) -> list[Stage]:
+    """
+    Stages of the overnight run.
+
+    Args:
+        output_dir: Folder for reports, CSVs and maps (default: default_output_dir())
+
+    Returns:
+        Stages in a valid (topological) order
+    """
+    output_dir = Path(output_dir or default_output_dir())
+    python = sys.executable
+    map_file = output_dir / "weak_grid_map_type_aware.html"
+
+    return [
+        Stage(
+            "ingest_nve",
+            [python, "scripts/processing/load_nve_gdb_to_postgres.py"],
+            "Load NVE power lines and transformers",
+            sources=["scripts/processing/load_nve_gdb_to_postgres.py", NVE_DATA_DIR],
+            outputs=["power_lines_new", "transformers_new"],
+            env={"NVE_DATA_DIR": NVE_DATA_DIR},
+        ),
+        Stage(
+            "transformer_catchments",
+            [python, "scripts/processing/build_transformer_catchments.py"],
+            "Voronoi catchments of transformers_new (nearest-transformer lookup)",
+            depends_on=["ingest_nve"],
+            sources=[
+                "scripts/processing/build_transformer_catchments.py",
+                "src/svakenett/catchments.py",
+            ],
+            outputs=["transformer_catchments", "transformer_catchments_subdivided"],
+        ),
+        Stage(
+            "area_index",
+            _psql("sql/area_index_subdivided.sql"),
+            "Subdivided postal code, municipality and grid company polygons",
+            sources=["sql/area_index_subdivided.sql"],
+            outputs=["postal_codes_subdivided", "municipalities_subdivided"],
+        ),
+        Stage(
+            "ingest_buildings",
+            [python, "scripts/processing/load_residential_buildings.py"],
+            "Load Matrikkelen residential buildings",
+            sources=["scripts/processing/load_residential_buildings.py", MATRIKKELEN_GDB],
+            outputs=["residential_buildings"],
+            env={"MATRIKKELEN_GDB": MATRIKKELEN_GDB},
+        ),
+        Stage(
+            "distribution_view",
+            _psql("sql/distribution_lines_view.sql"),
+            "Materialized view of 11-24 kV distribution lines",
+            depends_on=["ingest_nve"],
+            sources=["sql/distribution_lines_view.sql"],
+            outputs=["distribution_lines_11_24kv"],
+        ),
+        Stage(
+            "simplified_lines",
+            [python, "scripts/export/export_line_geometries.py", "build"],
+            "Zoom-level simplified power lines for maps",
+            depends_on=["ingest_nve"],
+            sources=[
+                "scripts/export/export_line_geometries.py",
+                "src/svakenett/geometry_export.py",
+            ],
+            outputs=["power_lines_simplified"],
+        ),
+        Stage(
+            "metrics",
+            ["bash", "scripts/processing/calculate_metrics_buildings.sh"],
+            "Grid metrics per building (per county partition)",
+            depends_on=["ingest_nve", "ingest_buildings", "transformer_catchments"],
+            sources=[
+                "scripts/processing/calculate_metrics_buildings.sh",
+                "sql/building_metrics_partition.sql",
+                "sql/building_metrics_batch.sql",
+                "src/svakenett/partitions.py",
+                "src/svakenett/batches.py",
+            ],
+            outputs=["buildings"],
+        ),
+        Stage(
+            "network_distance",
+            [python, "scripts/processing/calculate_network_distance.py"],
+            "Along-grid distance to the feeding transformer",
+            depends_on=["metrics"],
+            sources=[
+                "scripts/processing/calculate_network_distance.py",
+                "src/svakenett/network.py",
+            ],
+            outputs=["buildings"],
+        ),
+        Stage(
+            "scoring",
+            _psql("sql/calculate_weak_grid_scores_v3_unified.sql"),
+            "v3.0 weak grid scores",
+            depends_on=["metrics"],
+            sources=[
+                "sql/calculate_weak_grid_scores_v3_unified.sql",
+                "sql/weak_grid_score_v3_function.sql",
+            ],
+            outputs=["buildings"],
+        ),
+        Stage(
+            "v4_filter",
+            [
+                python, "-m", "svakenett.partitions", "run",
+                "sql/optimized_weak_grid_filter_v4.sql",
+                "-v", "distribution_view_ready=1", "--drop", "weak_grid_candidates_v4",
+            ],
+            "v4 filter-first weak grid candidates (per county partition)",
+            depends_on=["distribution_view", "ingest_buildings", "transformer_catchments"],
+            sources=["sql/optimized_weak_grid_filter_v4.sql", "src/svakenett/partitions.py"],
+            outputs=["weak_grid_candidates_v4"],
+        ),
+        Stage(
+            "distance_raster",
+            [python, "scripts/processing/build_distance_raster.py"],
+            "Memory-mapped distance rasters (11-24 kV lines, transformers)",
+            depends_on=["distribution_view", "ingest_buildings"],
+            sources=[
+                "scripts/processing/build_distance_raster.py",
+                "src/svakenett/distance_raster.py",
+            ],
+            outputs=[f"file:{default_raster_dir() / 'metadata.json'}"],
+        ),
+        Stage(
+            "density",
+            [python, "scripts/processing/estimate_density.py"],
+            "FFT building and line density within 1 km of every building",
+            depends_on=["distribution_view", "metrics", "v4_filter"],
+            sources=["scripts/processing/estimate_density.py", "src/svakenett/density.py"],
+            outputs=["buildings"],
+        ),
+        Stage(
+            "hex_grid",
+            [python, "scripts/processing/build_hex_grid.py"],
+            "H3 cell statistics (r5/r7/r9)",
+            depends_on=["scoring", "v4_filter"],
+            sources=["scripts/processing/build_hex_grid.py", "src/svakenett/hexgrid.py"],
+            outputs=["hex_cell_stats"],
+            writes=["buildings"],
+        ),
+        Stage(
+            "feeders",
+            [python, "scripts/processing/build_feeders.py"],
+            "Feeders of the 11-24 kV network with per-feeder load",
+            depends_on=["distribution_view", "scoring"],
+            sources=[
+                "scripts/processing/build_feeders.py",
+                "src/svakenett/feeders.py",
+                "src/svakenett/network.py",
+            ],
+            outputs=["feeders"],
+            writes=["buildings"],
+        ),
+        Stage(
+            "voltage_drop",
+            [python, "scripts/processing/estimate_voltage_drop.py"],
+            "Estimated voltage drop per building as a scoring factor",
+            depends_on=["distribution_view", "metrics"],
+            sources=[
+                "scripts/processing/estimate_voltage_drop.py",
+                "src/svakenett/voltage.py",
+                "src/svakenett/network.py",
+                "src/svakenett/building_types.py",
+            ],
+            outputs=["buildings"],
+        ),
+        Stage(
+            "reports",
+            [
+                python,
+                "scripts/reporting/generate_type_aware_reports.py",
+                "--output-dir",
+                str(output_dir),
+            ],
+            "Type-aware reports (text, CSV, HTML)",
+            depends_on=["scoring"],
+            sources=[
+                "scripts/reporting/generate_type_aware_reports.py",
+                "src/svakenett/reports.py",
+                "src/svakenett/building_types.py",
+            ],
+            outputs=[f"file:{output_dir / '01_type_aware_prospects.txt'}"],
+        ),
+        Stage(
+            "exports",
+            [python, "scripts/export/export_prospect_csvs.py", "--output-dir", str(output_dir)],
+            "Type-aware prospect CSVs",
+            depends_on=["scoring"],
+            sources=[
+                "scripts/export/export_prospect_csvs.py",
+                "src/svakenett/prospect_export.py",
+                "src/svakenett/building_types.py",
+            ],
+            outputs=[f"file:{output_dir / 'all_buildings_scored.csv'}"],
+        ),
+        Stage(
+            "maps",
+            [
+                python,
+                "scripts/visualization/generate_type_aware_html_map.py",
+                "--output",
+                str(map_file),
+            ],
+            "Interactive HTML map",
+            depends_on=["scoring", "simplified_lines"],
+            sources=[
+                "scripts/visualization/generate_type_aware_html_map.py",
+                "src/svakenett/building_types.py",
+            ],
+            outputs=[f"file:{map_file}"],
+        ),
+    ]
+
+
+def _fingerprint(source: str) -> str:
+    path = Path(source) if Path(source).is_absolute() else REPO_ROOT / source
+    return source_fingerprint(path) if path.exists() else "missing"
+
+
+def stage_key(stage: Stage, upstream_keys: dict[str, str]) -> str:
+    """
+    Hash of a stage's definition, source fingerprints and upstream keys.
+
+    Args:
+        stage: Stage
+        upstream_keys: Keys of the stages it depends on
+
+    Returns:
+        Hex digest
+    """
+    payload = {
+        "command": stage.command,
+        "env": stage.env,
+        "sources": {source: _fingerprint(source) for source in stage.sources},
+        "upstream": {name: upstream_keys[name] for name in sorted(stage.depends_on)},
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _outputs_exist(stage: Stage, engine) -> bool:
+    files = [o[len("file:") :] for o in stage.outputs if o.startswith("file:")]
+    tables = [o for o in stage.outputs if not o.startswith("file:")]
+    if not all(Path(f).exists() for f in files):
+        return False
+    if tables and "missing" in table_versions(tables, engine).values():
+        return False
+    return True
+
+
+def written_tables(stage: Stage) -> set[str]:
+    """Tables a stage modifies: its table outputs plus `writes`."""
+    return {o for o in stage.outputs if not o.startswith("file:")} | set(stage.writes)
+
+
+def _select(stages: list[Stage], targets: Optional[list[str]]) -> list[Stage]:
+    """Targets plus everything upstream of them, in pipeline order.
+
+    Raises:
+        ValueError: On unknown targets, dependencies on stages that are not
+            defined, or dependency cycles
+    """
+    by_name = {s.name: s for s in stages}
+    missing = {f"{s.name} -> {d}" for s in stages for d in s.depends_on if d not in by_name}
+    if missing:
+        raise ValueError(f"Undefined upstream stage(s): {', '.join(sorted(missing))}")
+    _check_acyclic(stages)
+    if not targets:
+        return stages
+    unknown = set(targets) - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+
+    needed = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(by_name[name].depends_on)
+    return [s for s in stages if s.name in needed]
+
+
+def _check_acyclic(stages: list[Stage]) -> None:
+    """Raise ValueError when the depends_on edges form a cycle."""
+    by_name = {s.name: s for s in stages}
+    done: set[str] = set()
+
+    def visit(name: str, path: list[str]) -> None:
+        if name in path:
+            cycle = path[path.index(name) :] + [name]
+            raise ValueError(f"Stage dependency cycle: {' -> '.join(cycle)}")
+        if name in done:
+            return
+        for dep in by_name[name].depends_on:
+            visit(dep, path + [name])
+        done.add(name)
+
+    for stage in stages:
+        visit(stage.name, [])
+
+
+def _read_state() -> dict:
+    path = ledger_dir() / STATE_FILENAME
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def _run_stage(stage: Stage, log_path: Path, profile_bundle: Optional[Path] = None) -> None:
+    env = {**os.environ, **stage.env}
+    command = stage.command
+    if profile_bundle is not None:
+        command = profiled_command(command, profile_bundle / f"{stage.name}.prof")
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "w") as log:
+        subprocess.run(
+            command, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT, check=True
+        )
+
+
+def run_pipeline(
+    stages: Optional[list[Stage]] = None,
+    targets: Optional[list[str]] = None,
+    force: Optional[list[str]] = None,
+    workers: int = 4,
+    dry_run: bool = False,
+    profile: bool = False,
+) -> dict[str, dict]:
+    """
+    Run the pipeline, skipping up-to-date stages and running independent stages concurrently.
+
+    Stages that write the same table never run at the same time, even when
+    their dependencies would allow it.
+
+    Args:
+        stages: Stage definitions (default: default_stages())
+        targets: Only run these stages and their upstream stages (default: all)
+        force: Stage names to rerun even when up to date ('all' for every stage)
+        workers: Maximum number of concurrently running stages
+        dry_run: Only report which stages would run
+        profile: Write a profile bundle: database statistics deltas over the
+            run and cProfile output of Python stages
+
+    Returns:
+        Result per stage: status ('ran', 'skipped', 'failed', 'blocked', 'pending'),
+        key and duration in seconds
+
+    Example:
+        >>> run_pipeline(targets=['reports', 'exports', 'maps'])
+    """
+    stages = _select(stages if stages is not None else default_stages(), targets)
+    force = set(force or [])
+    engine = get_engine()
+    state = _read_state()
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    log_dir = ledger_dir() / "pipeline_logs" / run_id
+    profile_bundle = profile_dir(run_id) if profile and not dry_run else None
+    before = snapshot(engine) if profile_bundle else None
+
+    keys: dict[str, str] = {}
+    results: dict[str, dict] = {}
+    # Upstream stages that run in this invocation make their dependents stale too
+    stale: set[str] = set()
+
+    def schedule(stage: Stage) -> bool:
+        """Decide whether a stage with finished dependencies needs to run."""
+        keys[stage.name] = stage_key(stage, keys)
+        previous = state.get(stage.name, {})
+        up_to_date = (
+            previous.get("key") == keys[stage.name]
+            and not (set(stage.depends_on) & stale)
+            and "all" not in force
+            and stage.name not in force
+            and _outputs_exist(stage, engine)
+        )
+        if up_to_date:
+            results[stage.name] = {"status": "skipped", "key": keys[stage.name], "duration_s": 0.0}
+            logger.info(f"  ○ {stage.name}: up to date")
+            return False
+        stale.add(stage.name)
+        return True
+
+    logger.info(f"Pipeline run {run_id}: {len(stages)} stages, up to {workers} in parallel")
+    started_at = time.perf_counter()
+
+    remaining = list(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while remaining or running:
+            pending_before = len(remaining)
+            for stage in list(remaining):
+                if any(
+                    results.get(d, {}).get("status") in ("failed", "blocked")
+                    for d in stage.depends_on
+                ):
+                    results[stage.name] = {"status": "blocked", "key": None, "duration_s": 0.0}
+                    remaining.remove(stage)
+                    logger.warning(f"  ✗ {stage.name}: blocked by failed upstream stage")
+                    continue
+                if not all(
+                    results.get(d, {}).get("status") in ("ran", "skipped", "pending")
+                    for d in stage.depends_on
+                ):
+                    continue
+                # One writer per table: stages updating buildings would wait on each other's locks
+                busy = set().union(*(written_tables(s) for s, _, _ in running.values()))
+                if written_tables(stage) & busy:
+                    continue
+                remaining.remove(stage)
+                if not schedule(stage):
+                    continue
+                if dry_run:
+                    results[stage.name] = {
+                        "status": "pending",
+                        "key": keys[stage.name],
+                        "duration_s": 0.0,
+                    }
+                    logger.info(f"  → {stage.name}: would run ({stage.description})")
+                    continue
+                logger.info(f"  ▶ {stage.name}: {stage.description}")
+                future = pool.submit(
+                    _run_stage, stage, log_dir / f"{stage.name}.log", profile_bundle
+                )
+                running[future] = (stage, time.perf_counter(), datetime.now(timezone.utc))
+
+            if not running:
+                if len(remaining) == pending_before:
+                    # Nothing finished and nothing could start: the rest can never run
+                    for stage in remaining:
+                        results[stage.name] = {"status": "blocked", "key": None, "duration_s": 0.0}
+                        logger.warning(f"  ✗ {stage.name}: upstream stage never finished")
+                    break
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, t0, stage_started = running.pop(future)
+                duration = round(time.perf_counter() - t0, 1)
+                error = future.exception()
+                status = "failed" if error else "ran"
+                results[stage.name] = {
+                    "status": status,
+                    "key": keys[stage.name],
+                    "duration_s": duration,
+                }
+
+                if error:
+                    log_file = log_dir / f"{stage.name}.log"
+                    logger.error(f"  ✗ {stage.name} failed after {duration:.0f}s ({log_file})")
+                else:
+                    logger.success(f"  ✓ {stage.name} ({duration:.0f}s)")
+                    state[stage.name] = {
+                        "key": keys[stage.name],
+                        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                        "duration_s": duration,
+                    }
+                    (ledger_dir() / STATE_FILENAME).write_text(json.dumps(state, indent=2))
+
+                with open(ledger_dir() / RUNS_FILENAME, "a") as runs:
+                    runs.write(
+                        json.dumps(
+                            {
+                                "run_id": run_id,
+                                "stage": stage.name,
+                                "status": status,
+                                "started_at": stage_started.isoformat(timespec="seconds"),
+                                "duration_s": duration,
+                                "key": keys[stage.name],
+                            }
+                        )
+                        + "\n"
+                    )
+
+    total = time.perf_counter() - started_at
+    ran = [name for name, r in results.items() if r["status"] == "ran"]
+    failed = [name for name, r in results.items() if r["status"] in ("failed", "blocked")]
+    skipped = sum(r["status"] == "skipped" for r in results.values())
+    summary = (
+        f"Pipeline finished in {total / 60:.1f} min: "
+        f"{len(ran)} ran, {skipped} skipped, {len(failed)} failed/blocked"
+    )
+    for name in ran:
+        logger.info(f"  {name:<20} {results[name]['duration_s']:>8.0f}s")
+    (logger.error if failed else logger.success)(summary)
+    if profile_bundle:
+        # Stages overlap, so database deltas cover the whole run, not single stages
+        durations = {
+            name: results[name]["duration_s"]
+            for name in ran + failed
+            if results[name]["duration_s"]
+        }
+        write_bundle(profile_bundle, diff_snapshots(before, snapshot(engine)), durations=durations)
+    return results
+
+
+def mark_done(names: list[str], stages: Optional[list[Stage]] = None) -> None:
+    """
+    Record stages as up to date without running them.
+
+    For adopting the runner on a database that was built by hand: the current
+    keys are stored so later runs only redo stages whose inputs change.
+
+    Args:
+        names: Stage names (upstream stages are marked as well)
+        stages: Stage definitions (default: default_stages())
+    """
+    stages = _select(stages if stages is not None else default_stages(), names)
+    state = _read_state()
+    keys: dict[str, str] = {}
+    for stage in stages:
+        keys[stage.name] = stage_key(stage, keys)
+        state[stage.name] = {
+            "key": keys[stage.name],
+            "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "duration_s": None,
+            "marked_done": True,
+        }
+        logger.info(f"  ✓ {stage.name}: marked as up to date")
+    (ledger_dir() / STATE_FILENAME).write_text(json.dumps(state, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the svakenett pipeline")
+    parser.add_argument(
+        "targets", nargs="*", help="Stages to run (with their upstream stages); default: all"
+    )
+    parser.add_argument(
+        "--force", nargs="+", default=[], help="Stages to rerun even if up to date, or 'all'"
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Maximum concurrent stages")
+    parser.add_argument(
+        "--output-dir", type=Path, default=None, help="Folder for reports, CSVs and maps"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Only show which stages would run")
+    parser.add_argument("--list", action="store_true", help="List stages and exit")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write a profile bundle (database statistics, Python profiles)",
+    )
+    parser.add_argument(
+        "--mark-done",
+        nargs="+",
+        default=None,
+        metavar="STAGE",
+        help="Record stages (and their upstream stages) as up to date without running them",
+    )
+    args = parser.parse_args()
+
+    stages = default_stages(args.output_dir)
+    if args.mark_done:
+        mark_done(args.mark_done, stages)
+        return
+    if args.list:
+        for stage in stages:
+            upstream = f" ← {', '.join(stage.depends_on)}" if stage.depends_on else ""
+            print(f"{stage.name:<20} {stage.description}{upstream}")
+        return
+
+    results = run_pipeline(
+        stages, args.targets or None, args.force, args.workers, args.dry_run, args.profile
+    )
+    sys.exit(1 if any(r["status"] in ("failed", "blocked") for r in results.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,489 @@
+"""
+Profiling mode - which statement or function a run spent its time in
+
+A profile bundle (<ledger>/profiles/<run_id>/) holds:
+    statements.csv   pg_stat_statements delta over the run (if the extension is installed)
+    tables.csv       pg_stat_user_tables / pg_statio_user_tables delta over the run
+    explain/         EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) of each statement of a profiled
+                     SQL file (auto_explain plans for psql scripts, with psql.log)
+    <name>.prof      cProfile output of a profiled Python stage, with the top functions
+                     in <name>.txt
+    summary.txt      Top statements by execution time and by blocks read
+
+Usage:
+    python -m svakenett.pipeline --profile v4_filter
+    python -m svakenett.profiling sql sql/calculate_weak_grid_scores_v3_unified.sql
+    python -m svakenett.profiling sql sql/optimized_weak_grid_filter_v4.sql \\
+        -v distribution_view_ready=1 -v partition=buildings_f42
+    python -m svakenett.profiling run --output profile.prof -- scripts/processing/build_feeders.py
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import re
+import runpy
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from svakenett.db import get_engine, needs_psql, read_statements
+from svakenett.ledger import ledger_dir
+
+TOP_N = 15
+
+STATEMENT_COUNTERS = [
+    "calls", "total_exec_time", "rows", "shared_blks_hit", "shared_blks_read", "temp_blks_written",
+]
+TABLE_COUNTERS = [
+    "seq_scan", "seq_tup_read", "idx_scan", "idx_tup_fetch", "n_tup_ins", "n_tup_upd", "n_tup_del",
+    "heap_blks_read", "heap_blks_hit", "idx_blks_read", "idx_blks_hit",
+]
+
+# Statements EXPLAIN accepts; everything else in a profiled file just runs and is timed
+_EXPLAINABLE = re.compile(
+    r"^\s*(select|insert|update|delete|merge|values|with|table|execute"
+    r"|create\s+(?:(?:temp|temporary|unlogged)\s+)?table\b[^(]*\bas\b"
+    r"|create\s+materialized\s+view\b)",
+    re.IGNORECASE,
+)
+
+# Session settings making psql scripts log the analyzed plan of every statement they run
+AUTO_EXPLAIN_OPTIONS = {
+    "session_preload_libraries": "auto_explain",
+    "auto_explain.log_min_duration": "0",
+    "auto_explain.log_analyze": "on",
+    "auto_explain.log_buffers": "on",
+    "auto_explain.log_format": "json",
+    "auto_explain.log_level": "notice",
+    "auto_explain.log_nested_statements": "on",
+}
+
+_AUTO_EXPLAIN_PLAN = re.compile(r"duration: ([\d.]+) ms\s+plan:\s*")
+
+
+def new_run_id() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def profile_dir(run_id: str) -> Path:
+    """Profile bundle folder of a run, created if missing."""
+    path = ledger_dir() / "profiles" / run_id
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def snapshot(engine: Optional[Engine] = None) -> dict[str, Optional[pd.DataFrame]]:
+    """
+    Cumulative statement and table statistics of the current database.
+
+    Args:
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        {'statements': ..., 'tables': ...}; 'statements' is None without pg_stat_statements
+    """
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        has_statements = conn.execute(
+            text("SELECT to_regclass('pg_stat_statements') IS NOT NULL")
+        ).scalar()
+        statements = None
+        if has_statements:
+            statements = pd.read_sql(text("""
+                SELECT s.*
+                FROM pg_stat_statements s
+                JOIN pg_database d ON d.oid = s.dbid
+                WHERE d.datname = current_database()
+            """), conn)
+            # PostgreSQL < 13 calls it total_time
+            statements = statements.rename(columns={"total_time": "total_exec_time"})
+            statements = statements[["userid", "queryid", "query", *STATEMENT_COUNTERS]]
+        tables = pd.read_sql(text(f"""
+            SELECT t.schemaname, t.relname, {', '.join(TABLE_COUNTERS)}
+            FROM pg_stat_user_tables t
+            JOIN pg_statio_user_tables io USING (relid, schemaname, relname)
+        """), conn)
+    return {"statements": statements, "tables": tables.fillna(0)}
+
+
+def _delta(
+    before: pd.DataFrame, after: pd.DataFrame, keys: list[str], counters: list[str]
+) -> pd.DataFrame:
+    """Counter increase per key; keys new since `before` count from zero."""
+    merged = after.merge(before[keys + counters], on=keys, how="left", suffixes=("", "_before"))
+    for counter in counters:
+        # Entries evicted and re-added in between restart from zero
+        merged[counter] = (merged[counter] - merged[f"{counter}_before"].fillna(0)).clip(lower=0)
+    merged = merged.drop(columns=[f"{c}_before" for c in counters])
+    return merged[(merged[counters] > 0).any(axis=1)].reset_index(drop=True)
+
+
+def diff_snapshots(before: dict, after: dict) -> dict[str, Optional[pd.DataFrame]]:
+    """
+    What happened between two snapshots.
+
+    Returns:
+        {'statements': ..., 'tables': ...}, sorted by execution time and rows read
+    """
+    statements = None
+    if before["statements"] is not None and after["statements"] is not None:
+        statements = _delta(
+            before["statements"], after["statements"], ["userid", "queryid"], STATEMENT_COUNTERS
+        ).sort_values("total_exec_time", ascending=False)
+    tables = _delta(
+        before["tables"], after["tables"], ["schemaname", "relname"], TABLE_COUNTERS
+    ).sort_values("seq_tup_read", ascending=False)
+    return {"statements": statements, "tables": tables}
+
+
+def explain_sql_file(
+    sql_file: str | Path, bundle: Path, engine: Optional[Engine] = None
+) -> pd.DataFrame:
+    """
+    Execute a SQL file statement by statement, capturing EXPLAIN ANALYZE plans.
+
+    EXPLAIN ANALYZE runs the statement, so the file has the same effect as
+    execute_sql_file(). Statements run in autocommit mode, like psql, so a
+    file's own BEGIN/COMMIT work. Plans are written to
+    <bundle>/explain/<file>_<nn>.json. psql scripts (see needs_psql()) go
+    through explain_psql_file() instead.
+
+    Args:
+        sql_file: SQL file
+        bundle: Profile bundle folder
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        One row per statement: index, statement, explained, seconds,
+        execution_ms, shared_blks_hit, shared_blks_read, plan_file
+    """
+    engine = engine or get_engine()
+    sql_file = Path(sql_file)
+    explain_dir = bundle / "explain"
+    explain_dir.mkdir(parents=True, exist_ok=True)
+
+    rows = []
+    conn = engine.raw_connection()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for i, statement in enumerate(read_statements(sql_file), start=1):
+                row = {
+                    "index": i,
+                    "statement": " ".join(statement.split())[:200],
+                    "explained": False,
+                }
+                t0 = time.perf_counter()
+                if _EXPLAINABLE.match(statement):
+                    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}")
+                    plan = cur.fetchone()[0]
+                    plan = json.loads(plan) if isinstance(plan, str) else plan
+                    plan_file = explain_dir / f"{sql_file.stem}_{i:02d}.json"
+                    plan_file.write_text(json.dumps(plan, indent=2))
+                    top = plan[0]["Plan"]
+                    row.update(
+                        explained=True,
+                        execution_ms=plan[0].get("Execution Time"),
+                        shared_blks_hit=top.get("Shared Hit Blocks"),
+                        shared_blks_read=top.get("Shared Read Blocks"),
+                        plan_file=plan_file.name,
+                    )
+                else:
+                    cur.execute(statement)
+                row["seconds"] = round(time.perf_counter() - t0, 3)
+                rows.append(row)
+    finally:
+        conn.autocommit = False
+        conn.close()
+    return pd.DataFrame(rows)
+
+
+def explain_psql_file(
+    sql_file: str | Path, bundle: Path, variables: Optional[list[str]] = None
+) -> pd.DataFrame:
+    """
+    Run a psql script with \\timing and auto_explain, capturing the plans it logs.
+
+    The script runs as `psql -f`, so \\if/\\set/\\gset, :variables and its own
+    transactions behave as in a normal run. auto_explain is loaded for the
+    session through PGOPTIONS, which needs a superuser (the postgres user of
+    the docker database). psql output is written to <bundle>/psql.log, plans
+    (nested statements included) to <bundle>/explain/<file>_<nn>.json.
+
+    Args:
+        sql_file: psql script
+        bundle: Profile bundle folder
+        variables: psql variables ('name=value')
+
+    Returns:
+        One row per logged plan, with the columns of explain_sql_file()
+    """
+    sql_file = Path(sql_file)
+    explain_dir = bundle / "explain"
+    explain_dir.mkdir(parents=True, exist_ok=True)
+
+    command = ["psql", os.getenv("DATABASE_URL", ""), "-v", "ON_ERROR_STOP=1", "-c", "\\timing on"]
+    for variable in variables or []:
+        command += ["-v", variable]
+    options = " ".join(f"-c {name}={value}" for name, value in AUTO_EXPLAIN_OPTIONS.items())
+    env = {**os.environ, "PGOPTIONS": f"{os.getenv('PGOPTIONS', '')} {options}".strip()}
+    result = subprocess.run(
+        command + ["-f", str(sql_file)], env=env, capture_output=True, text=True
+    )
+    (bundle / "psql.log").write_text(result.stdout + result.stderr)
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"psql exited with {result.returncode} on {sql_file} (see {bundle / 'psql.log'})"
+        )
+
+    rows = []
+    decoder = json.JSONDecoder()
+    for i, match in enumerate(_AUTO_EXPLAIN_PLAN.finditer(result.stderr), start=1):
+        plan, _end = decoder.raw_decode(result.stderr, match.end())
+        plan_file = explain_dir / f"{sql_file.stem}_{i:02d}.json"
+        plan_file.write_text(json.dumps(plan, indent=2))
+        top = plan["Plan"]
+        rows.append(
+            {
+                "index": i,
+                "statement": " ".join(plan.get("Query Text", "").split())[:200],
+                "explained": True,
+                "execution_ms": float(match.group(1)),
+                "shared_blks_hit": top.get("Shared Hit Blocks"),
+                "shared_blks_read": top.get("Shared Read Blocks"),
+                "plan_file": plan_file.name,
+                "seconds": round(float(match.group(1)) / 1000, 3),
+            }
+        )
+    if not rows:
+        logger.warning(
+            f"No auto_explain plans in the psql output of {sql_file}; is the user a superuser?"
+        )
+    return pd.DataFrame(rows)
+
+
+def write_pstats(prof_file: Path, limit: int = 40) -> Path:
+    """Top functions of a cProfile file by cumulative time, as <name>.txt next to it."""
+    out = prof_file.with_suffix(".txt")
+    with open(out, "w") as f:
+        pstats.Stats(str(prof_file), stream=f).sort_stats("cumulative").print_stats(limit)
+    return out
+
+
+def _table(df: pd.DataFrame, columns: list[str], limit: int = TOP_N) -> str:
+    return df[columns].head(limit).to_string(index=False) if len(df) else "  (none)"
+
+
+def write_bundle(
+    bundle: Path,
+    diffs: dict[str, Optional[pd.DataFrame]],
+    explained: Optional[pd.DataFrame] = None,
+    durations: Optional[dict[str, float]] = None,
+) -> Path:
+    """
+    Write the statement/table deltas, pstats summaries and summary.txt of a bundle.
+
+    Args:
+        bundle: Profile bundle folder
+        diffs: Result of diff_snapshots()
+        explained: Result of explain_sql_file(), if any
+        durations: Wall time per stage or step in seconds, if any
+
+    Returns:
+        Path of summary.txt
+    """
+    lines = [f"Profile {bundle.name}", ""]
+
+    if durations:
+        lines += ["Wall time", "---------"]
+        lines += [
+            f"  {name:<24} {seconds:>9.1f}s"
+            for name, seconds in sorted(durations.items(), key=lambda d: -d[1])
+        ]
+        lines.append("")
+
+    statements = diffs["statements"]
+    if statements is None:
+        lines += ["pg_stat_statements is not installed; no per-statement totals", ""]
+    else:
+        statements.to_csv(bundle / "statements.csv", index=False)
+        top = statements.assign(
+            time_s=(statements["total_exec_time"] / 1000).round(1),
+            mean_ms=(
+                statements["total_exec_time"] / statements["calls"].where(statements["calls"] > 0)
+            ).round(1),
+            query=statements["query"].str.split().str.join(" ").str[:100],
+        )
+        columns = [
+            "time_s",
+            "calls",
+            "mean_ms",
+            "rows",
+            "shared_blks_read",
+            "shared_blks_hit",
+            "query",
+        ]
+        lines += [
+            f"Statements: {len(statements):,} ({statements['total_exec_time'].sum() / 1000:,.1f}s)",
+            "",
+            "Top statements by execution time",
+            "--------------------------------",
+            _table(top, columns),
+            "",
+            "Top statements by blocks read",
+            "-----------------------------",
+            _table(top.sort_values("shared_blks_read", ascending=False), columns),
+            "",
+        ]
+
+    tables = diffs["tables"]
+    tables.to_csv(bundle / "tables.csv", index=False)
+    lines += [
+        "Tables by rows read in sequential scans",
+        "---------------------------------------",
+        _table(
+            tables,
+            ["relname", "seq_scan", "seq_tup_read", "idx_scan", "heap_blks_read", "n_tup_upd"],
+        ),
+        "",
+    ]
+
+    if explained is not None and len(explained):
+        explained.to_csv(bundle / "explain" / "statements.csv", index=False)
+        lines += [
+            "SQL file statements by time",
+            "---------------------------",
+            _table(
+                explained.sort_values("seconds", ascending=False),
+                [
+                    c
+                    for c in ["index", "seconds", "shared_blks_read", "plan_file", "statement"]
+                    if c in explained
+                ],
+            ),
+            "",
+        ]
+
+    prof_files = sorted(bundle.glob("*.prof"))
+    if prof_files:
+        lines += ["Python profiles", "---------------"]
+        for prof_file in prof_files:
+            lines.append(f"  {write_pstats(prof_file).name}")
+        lines.append("")
+
+    summary = bundle / "summary.txt"
+    summary.write_text("\n".join(lines))
+    logger.info(f"Profile bundle: {bundle}")
+    return summary
+
+
+def profile_sql_file(
+    sql_file: str | Path, engine: Optional[Engine] = None, variables: Optional[list[str]] = None
+) -> Path:
+    """
+    Run a SQL file with statistics snapshots and EXPLAIN ANALYZE plans.
+
+    psql scripts (\\if, \\set, \\gset, :variables) run through psql with
+    auto_explain (explain_psql_file()), other files statement by statement
+    (explain_sql_file()).
+
+    Args:
+        sql_file: SQL file
+        engine: Optional engine (default: get_engine())
+        variables: psql variables ('name=value') for psql scripts
+
+    Returns:
+        Profile bundle folder
+    """
+    engine = engine or get_engine()
+    bundle = profile_dir(f"{new_run_id()}_{Path(sql_file).stem}")
+    before = snapshot(engine)
+    t0 = time.perf_counter()
+    if needs_psql(sql_file):
+        explained = explain_psql_file(sql_file, bundle, variables)
+    else:
+        explained = explain_sql_file(sql_file, bundle, engine)
+    durations = {Path(sql_file).name: time.perf_counter() - t0}
+    write_bundle(bundle, diff_snapshots(before, snapshot(engine)), explained, durations)
+    return bundle
+
+
+def profiled_command(command: list[str], prof_file: Path) -> list[str]:
+    """
+    Command with a Python interpreter wrapped by `svakenett.profiling run`.
+
+    Commands that do not start with a Python interpreter are returned unchanged.
+    """
+    if not Path(command[0]).name.startswith("python"):
+        return command
+    return [
+        command[0],
+        "-m",
+        "svakenett.profiling",
+        "run",
+        "--output",
+        str(prof_file),
+        "--",
+        *command[1:],
+    ]
+
+
+def run_profiled(argv: list[str], prof_file: Path) -> None:
+    """
+    Run a script (`script.py args`) or module (`-m module args`) under cProfile.
+
+    Unlike `python -m cProfile`, exit codes of the profiled program are kept.
+    """
+    profiler = cProfile.Profile()
+    if argv[0] == "-m":
+        sys.argv = argv[1:]
+        run = lambda: runpy.run_module(argv[1], run_name="__main__", alter_sys=True)  # noqa: E731
+    else:
+        sys.argv = argv
+        sys.path.insert(0, str(Path(argv[0]).resolve().parent))
+        run = lambda: runpy.run_path(argv[0], run_name="__main__")  # noqa: E731
+    profiler.enable()
+    try:
+        run()
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(prof_file))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile SQL files and Python scripts")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sql = sub.add_parser("sql", help="Run a SQL file with EXPLAIN ANALYZE and statistics snapshots")
+    sql.add_argument("sql_file")
+    sql.add_argument(
+        "-v", "--variable", action="append", default=[], help="psql variable name=value"
+    )
+
+    run = sub.add_parser("run", help="Run a Python script or module under cProfile")
+    run.add_argument("--output", type=Path, required=True, help="cProfile output file")
+    run.add_argument(
+        "argv", nargs=argparse.REMAINDER, help="-- script.py args, or -- -m module args"
+    )
+
+    args = parser.parse_args()
+    if args.command == "sql":
+        print(profile_sql_file(args.sql_file, variables=args.variable) / "summary.txt")
+    else:
+        argv = args.argv[1:] if args.argv[:1] == ["--"] else args.argv
+        run_profiled(argv, args.output)
+
+
+if __name__ == "__main__":
+    main()
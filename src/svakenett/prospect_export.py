@@ -0,0 +1,252 @@
+"""
+Single-scan fan-out export of type-aware prospect CSVs
+
+Reads the scored buildings once through a server-side cursor and routes every
+chunk to all outputs it belongs to (all scored buildings, high prospects, one
+file per building type and one per municipality). Output columns are rendered
+as text in PostgreSQL, so files match what `COPY ... TO STDOUT WITH CSV HEADER`
+produced. Writers run in a thread pool and can compress with gzip or zstd.
+"""
+
+import gzip
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+from loguru import logger
+from sqlalchemy.engine import Engine
+
+from svakenett.building_types import BUILDING_TYPES, HIGH_PROSPECT
+from svakenett.db import get_engine, stream_query
+
+# Output column name -> SQL expression (alias b = buildings, t = thresholds)
+COLUMN_SQL = {
+    "id": "b.id",
+    "bygningstype": "b.bygningstype",
+    "building_type_name": "b.building_type_name",
+    "building_source": "b.building_source",
+    "postal_code": "b.postal_code",
+    "kommunenummer": "b.kommunenummer",
+    "kommunenavn": "b.kommunenavn",
+    "latitude": "ROUND(ST_Y(b.geometry)::numeric, 6)",
+    "longitude": "ROUND(ST_X(b.geometry)::numeric, 6)",
+    "distance_to_line_m": "ROUND(b.distance_to_line_m)",
+    "grid_density_lines_1km": "b.grid_density_lines_1km",
+    "voltage_level_kv": "b.voltage_level_kv",
+    "grid_age_years": "ROUND(b.grid_age_years::numeric, 1)",
+    "distance_to_transformer_m": "ROUND(b.distance_to_transformer_m)",
+    "weak_grid_score": "ROUND(b.weak_grid_score::numeric, 1)",
+    "type_threshold": "t.threshold",
+    "prospect_category": """CASE
+            WHEN b.weak_grid_score >= t.threshold THEN 'HIGH_PROSPECT'
+            WHEN b.weak_grid_score >= t.medium_threshold THEN 'MEDIUM_PROSPECT'
+            ELSE 'LOW_PROSPECT'
+        END""",
+}
+
+ALL_COLUMNS = list(COLUMN_SQL)
+
+HIGH_PROSPECT_COLUMNS = [c for c in ALL_COLUMNS if c != "prospect_category"]
+
+TYPE_COLUMNS = [
+    c for c in ALL_COLUMNS
+    if c not in ("building_source", "distance_to_transformer_m", "type_threshold")
+]
+
+COMPRESSIONS = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+@dataclass
+class ExportTarget:
+    """One output file: which rows (mask over a chunk) and which columns."""
+
+    name: str
+    columns: list[str]
+    select: Callable[[pd.DataFrame], pd.Series]
+
+
+def default_targets() -> list[ExportTarget]:
+    """
+    The outputs of the original export_type_aware_csvs.sh.
+
+    Returns:
+        all_buildings_scored, high_prospects_only and <slug>_prospects per type
+    """
+    targets = [
+        ExportTarget(
+            "all_buildings_scored", ALL_COLUMNS, lambda df: pd.Series(True, index=df.index)
+        ),
+        ExportTarget(
+            "high_prospects_only",
+            HIGH_PROSPECT_COLUMNS,
+            lambda df: df["prospect_category"] == HIGH_PROSPECT,
+        ),
+    ]
+    for code, config in BUILDING_TYPES.items():
+        targets.append(
+            ExportTarget(
+                f"{config['slug']}_prospects",
+                TYPE_COLUMNS,
+                lambda df, code=code: df["_type"] == code,
+            )
+        )
+    return targets
+
+
+def scored_buildings_query() -> str:
+    """
+    SQL for the single scan: every output column as text plus routing columns.
+
+    Rows are ordered by score so every routed subset stays sorted as well.
+    """
+    thresholds = ", ".join(
+        f"({code}, {config['threshold']}, {config['medium_threshold']})"
+        for code, config in BUILDING_TYPES.items()
+    )
+    columns = ",\n            ".join(
+        f"({expr})::text AS {name}" for name, expr in COLUMN_SQL.items()
+    )
+    return f"""
+        SELECT
+            {columns},
+            b.bygningstype AS _type
+        FROM buildings b
+        LEFT JOIN (VALUES {thresholds}) AS t(bygningstype, threshold, medium_threshold)
+            ON t.bygningstype = b.bygningstype
+        WHERE b.weak_grid_score IS NOT NULL
+        ORDER BY b.weak_grid_score DESC, b.bygningstype
+    """
+
+
+def _open_output(path: Path, compression: Optional[str]):
+    if compression is None:
+        return open(path, "w", newline="", encoding="utf-8")
+    if compression == "gzip":
+        return gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd compression requires the 'zstandard' package") from e
+        raw = open(path, "wb")
+        stream = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, newline="", encoding="utf-8")
+    raise ValueError(f"Unknown compression '{compression}'. Use one of: gzip, zstd")
+
+
+class _CsvWriter:
+    """Lazily opened CSV file that writes its header with the first chunk."""
+
+    def __init__(self, path: Path, columns: list[str], compression: Optional[str]):
+        self.path = path
+        self.columns = columns
+        self.compression = compression
+        self.handle = None
+        self.rows = 0
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.handle is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.handle = _open_output(self.path, self.compression)
+            self.handle.write(",".join(self.columns) + "\n")
+        if len(df):
+            df.to_csv(self.handle, columns=self.columns, header=False, index=False, na_rep="")
+            self.rows += len(df)
+
+    def close(self) -> None:
+        if self.handle is None:
+            # Empty outputs still get a header, like COPY ... WITH CSV HEADER
+            self.write(pd.DataFrame(columns=self.columns))
+        self.handle.close()
+
+
+def _municipality_filename(kommunenummer: Optional[str], kommunenavn: Optional[str]) -> str:
+    if not kommunenummer:
+        return "unknown"
+    name = re.sub(r"[^0-9A-Za-zÆØÅæøå]+", "_", kommunenavn or "").strip("_").lower()
+    return f"{kommunenummer}_{name}" if name else kommunenummer
+
+
+def export_prospect_csvs(
+    output_dir: str | Path,
+    targets: Optional[list[ExportTarget]] = None,
+    by_municipality: bool = True,
+    compression: Optional[str] = None,
+    workers: int = 4,
+    chunk_size: int = 50_000,
+    engine: Optional[Engine] = None,
+) -> dict[str, int]:
+    """
+    Export all prospect CSVs from a single scan of the scored buildings.
+
+    Args:
+        output_dir: Output directory
+        targets: Outputs to write (default: default_targets())
+        by_municipality: Also write municipalities/<nr>_<name>.csv with all scored buildings
+        compression: None, 'gzip' or 'zstd' (needs the zstandard package)
+        workers: Writer threads
+        chunk_size: Rows streamed per chunk
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Row count per written file (relative path)
+
+    Example:
+        >>> export_prospect_csvs('data/processed/prospects', compression='gzip')
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression '{compression}'. Use one of: gzip, zstd")
+
+    engine = engine or get_engine()
+    output_dir = Path(output_dir)
+    targets = targets if targets is not None else default_targets()
+    suffix = ".csv" + COMPRESSIONS[compression]
+
+    writers = {
+        t.name: _CsvWriter(output_dir / f"{t.name}{suffix}", t.columns, compression)
+        for t in targets
+    }
+    municipality_writers: dict[str, _CsvWriter] = {}
+
+    extra = " + municipalities" if by_municipality else ""
+    logger.info(f"Exporting {len(targets)} outputs{extra} to {output_dir}...")
+
+    n_rows = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for chunk in stream_query(
+                scored_buildings_query(), chunk_size=chunk_size, engine=engine
+            ):
+                jobs = [(writers[t.name], chunk[t.select(chunk)]) for t in targets]
+
+                if by_municipality:
+                    keys = chunk["kommunenummer"].fillna("")
+                    for key, group in chunk.groupby(keys, sort=False):
+                        writer = municipality_writers.get(key)
+                        if writer is None:
+                            filename = _municipality_filename(key, group["kommunenavn"].iloc[0])
+                            path = output_dir / "municipalities" / f"{filename}{suffix}"
+                            writer = _CsvWriter(path, ALL_COLUMNS, compression)
+                            municipality_writers[key] = writer
+                        jobs.append((writer, group))
+
+                # Each file gets at most one job per chunk, so file order is preserved
+                for future in [pool.submit(writer.write, rows) for writer, rows in jobs]:
+                    future.result()
+
+                n_rows += len(chunk)
+                logger.info(f"  Routed {n_rows:,} buildings")
+        finally:
+            for writer in [*writers.values(), *municipality_writers.values()]:
+                writer.close()
+
+    counts = {
+        str(writer.path.relative_to(output_dir)): writer.rows
+        for writer in [*writers.values(), *municipality_writers.values()]
+    }
+    logger.success(f"✓ Exported {n_rows:,} scored buildings to {len(counts)} files in {output_dir}")
+    return counts
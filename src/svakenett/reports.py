@@ -0,0 +1,413 @@
+"""
+Type-aware report engine
+
+Reads the per-building metrics and scores once, computes every report section
+with vectorized pandas groupbys, caches the aggregates (keyed by the buildings
+table version and the threshold/top N settings) and renders them as text, CSV
+and HTML. Adding a section adds a groupby over data already in memory, not
+another scan of buildings.
+"""
+
+import hashlib
+import html
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from sqlalchemy.engine import Engine
+
+from svakenett.building_types import BUILDING_TYPES
+from svakenett.db import get_engine, stream_query, table_versions
+from svakenett.ledger import ledger_dir
+
+REPORT_COLUMNS_SQL = """
+    SELECT
+        id,
+        bygningstype,
+        building_type_name,
+        building_source,
+        postal_code,
+        kommunenummer,
+        kommunenavn,
+        weak_grid_score,
+        distance_to_line_m,
+        grid_density_lines_1km,
+        voltage_level_kv,
+        grid_age_years,
+        ST_X(geometry) AS longitude,
+        ST_Y(geometry) AS latitude
+    FROM buildings
+"""
+
+# Section key -> (file stem, title)
+SECTIONS = {
+    "type_prospects": ("01_type_aware_prospects", "Weak Grid Prospects by Building Type"),
+    "type_totals": ("01_type_aware_prospects", "Summary Totals"),
+    "postal_codes": (
+        "02_geographic_distribution",
+        "Geographic Distribution of Weak Grid Prospects",
+    ),
+    "municipalities": ("02_geographic_distribution", "Prospects by Municipality"),
+    "score_distribution": ("03_score_distribution", "Weak Grid Score Distribution"),
+    "top_prospects": ("04_top_prospects_per_type", "Top 100 Prospects Per Building Type"),
+    "infrastructure": ("05_infrastructure_quality", "Grid Infrastructure Quality by Building Type"),
+}
+
+TOP_N = 100
+TOP_POSTAL_CODES = 30
+
+
+def load_report_frame(engine: Optional[Engine] = None) -> pd.DataFrame:
+    """
+    One scan of buildings with the columns every report needs, plus thresholds.
+
+    Args:
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        DataFrame with one row per building and 'threshold' / 'is_prospect' columns
+    """
+    chunks = list(stream_query(REPORT_COLUMNS_SQL, chunk_size=100_000, engine=engine))
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+    for column in (
+        "weak_grid_score",
+        "distance_to_line_m",
+        "grid_density_lines_1km",
+        "voltage_level_kv",
+        "grid_age_years",
+        "longitude",
+        "latitude",
+    ):
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+
+    thresholds = {code: config["threshold"] for code, config in BUILDING_TYPES.items()}
+    df["threshold"] = df["bygningstype"].map(thresholds)
+    df["is_prospect"] = (df["weak_grid_score"] >= df["threshold"]).fillna(False)
+    df["prospect_score"] = df["weak_grid_score"].where(df["is_prospect"])
+    return df
+
+
+def _pct(part: pd.Series, whole: pd.Series) -> pd.Series:
+    return (100.0 * part / whole.replace(0, np.nan)).round(1)
+
+
+def compute_sections(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """
+    Compute all report sections from the building frame.
+
+    Args:
+        df: Output of load_report_frame()
+
+    Returns:
+        Mapping of section key (see SECTIONS) to result table
+    """
+    sections = {}
+    scored = df[df["weak_grid_score"].notna()]
+
+    # 1. Prospects by building type and source
+    by_type = df.groupby(["bygningstype", "building_type_name", "building_source"], dropna=False)
+    type_prospects = by_type.agg(
+        threshold=("threshold", "first"),
+        total_buildings=("id", "size"),
+        scored_buildings=("weak_grid_score", "count"),
+        prospects=("is_prospect", "sum"),
+        avg_score=("prospect_score", "mean"),
+    ).reset_index()
+    type_prospects.insert(
+        type_prospects.columns.get_loc("avg_score"),
+        "pct_prospects",
+        _pct(type_prospects["prospects"], type_prospects["scored_buildings"]),
+    )
+    type_prospects["avg_score"] = type_prospects["avg_score"].round(1)
+    sections["type_prospects"] = type_prospects.sort_values("bygningstype", kind="stable")
+
+    typed = df[df["threshold"].notna()]
+    totals = pd.DataFrame(
+        [
+            {
+                "total_buildings": len(typed),
+                "scored_buildings": int(typed["weak_grid_score"].count()),
+                "total_prospects": int(typed["is_prospect"].sum()),
+            }
+        ]
+    )
+    totals["prospect_pct"] = _pct(totals["total_prospects"], totals["scored_buildings"])
+    sections["type_totals"] = totals
+
+    # 2. Geography (scored buildings with a type threshold)
+    scored_typed = scored[scored["threshold"].notna()]
+    postal = (
+        scored_typed.assign(postal_code=scored_typed["postal_code"].fillna("Unknown"))
+        .groupby("postal_code")
+        .agg(
+            total_buildings=("id", "size"),
+            prospects=("is_prospect", "sum"),
+            avg_score=("prospect_score", "mean"),
+        )
+        .reset_index()
+    )
+    postal.insert(3, "prospect_pct", _pct(postal["prospects"], postal["total_buildings"]))
+    postal["avg_score"] = postal["avg_score"].round(1)
+    postal = postal[postal["prospects"] > 0]
+    sections["postal_codes"] = postal.sort_values("prospects", ascending=False, kind="stable").head(
+        TOP_POSTAL_CODES
+    )
+
+    municipalities = (
+        scored_typed.groupby(["kommunenummer", "kommunenavn"], dropna=False)
+        .agg(
+            total_buildings=("id", "size"),
+            prospects=("is_prospect", "sum"),
+            avg_score=("prospect_score", "mean"),
+        )
+        .reset_index()
+    )
+    municipalities.insert(
+        4, "prospect_pct", _pct(municipalities["prospects"], municipalities["total_buildings"])
+    )
+    municipalities["avg_score"] = municipalities["avg_score"].round(1)
+    sections["municipalities"] = municipalities.sort_values(
+        "prospects", ascending=False, kind="stable"
+    )
+
+    # 3. Score distribution by type
+    scores = scored.groupby(["bygningstype", "building_type_name"], dropna=False)["weak_grid_score"]
+    distribution = scores.agg(
+        total="size", scored="count", avg_score="mean", min_score="min", max_score="max"
+    )
+    quantiles = scores.quantile([0.25, 0.5, 0.75, 0.9]).unstack()
+    quantiles.columns = ["p25", "median", "p75", "p90"]
+    distribution = distribution.join(quantiles)[
+        ["total", "scored", "avg_score", "p25", "median", "p75", "p90", "min_score", "max_score"]
+    ]
+    sections["score_distribution"] = distribution.round(1).reset_index()
+
+    # 4. Top prospects per type
+    prospects = df[df["is_prospect"]].sort_values(
+        ["bygningstype", "weak_grid_score"], ascending=[True, False]
+    )
+    prospects = prospects.assign(rank=prospects.groupby("bygningstype").cumcount() + 1)
+    top = prospects[prospects["rank"] <= TOP_N]
+    sections["top_prospects"] = pd.DataFrame(
+        {
+            "bygningstype": top["bygningstype"],
+            "building_type_name": top["building_type_name"],
+            "rank": top["rank"],
+            "id": top["id"],
+            "score": top["weak_grid_score"].round(1),
+            "dist_m": top["distance_to_line_m"].round(0),
+            "density": top["grid_density_lines_1km"],
+            "voltage_kv": top["voltage_level_kv"],
+            "postal_code": top["postal_code"],
+            "lon": top["longitude"].round(6),
+            "lat": top["latitude"].round(6),
+        }
+    )
+
+    # 5. Infrastructure quality by type
+    measured = df[df["distance_to_line_m"].notna()]
+    voltage = measured["voltage_level_kv"]
+    measured = measured.assign(
+        high_voltage=voltage >= 132,
+        medium_voltage=(voltage >= 33) & (voltage < 132),
+        low_voltage=voltage < 33,
+    )
+    infra = (
+        measured.groupby(["bygningstype", "building_type_name"], dropna=False)
+        .agg(
+            total_buildings=("id", "size"),
+            avg_dist_m=("distance_to_line_m", "mean"),
+            median_dist_m=("distance_to_line_m", "median"),
+            avg_density=("grid_density_lines_1km", "mean"),
+            high_voltage_count=("high_voltage", "sum"),
+            medium_voltage_count=("medium_voltage", "sum"),
+            low_voltage_count=("low_voltage", "sum"),
+            avg_grid_age_years=("grid_age_years", "mean"),
+        )
+        .reset_index()
+    )
+    infra[["avg_dist_m", "median_dist_m"]] = infra[["avg_dist_m", "median_dist_m"]].round(0)
+    infra[["avg_density", "avg_grid_age_years"]] = infra[
+        ["avg_density", "avg_grid_age_years"]
+    ].round(1)
+    sections["infrastructure"] = infra
+
+    return sections
+
+
+def settings_key() -> str:
+    """Hash of the report settings the cached aggregates depend on (thresholds, top N)."""
+    settings = {
+        "thresholds": {str(code): config["threshold"] for code, config in BUILDING_TYPES.items()},
+        "top_n": TOP_N,
+        "top_postal_codes": TOP_POSTAL_CODES,
+    }
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+def report_sections(
+    engine: Optional[Engine] = None,
+    use_cache: bool = True,
+) -> dict[str, pd.DataFrame]:
+    """
+    Report aggregates, from cache when neither buildings nor the thresholds
+    and top N settings have changed.
+
+    Args:
+        engine: Optional engine (default: get_engine())
+        use_cache: Reuse cached aggregates for the current buildings version and settings
+
+    Returns:
+        Mapping of section key to result table
+    """
+    engine = engine or get_engine()
+    version = table_versions(["buildings"], engine)["buildings"]
+    key = hashlib.sha1(f"{version}:{settings_key()}".encode()).hexdigest()[:12]
+    cache_path = ledger_dir() / "reports" / f"sections_{key}.pkl"
+
+    if use_cache and cache_path.exists():
+        logger.info(f"Using cached report aggregates ({cache_path.name})")
+        return pd.read_pickle(cache_path)
+
+    logger.info("Scanning buildings for report aggregates...")
+    df = load_report_frame(engine)
+    sections = compute_sections(df)
+    logger.success(f"✓ Aggregated {len(df):,} buildings into {len(sections)} report sections")
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    for stale in cache_path.parent.glob("sections_*.pkl"):
+        stale.unlink()
+    pd.to_pickle(sections, cache_path)
+    return sections
+
+
+def _banner(title: str) -> str:
+    line = "=" * 46
+    return f"{line}\n{title}\n{line}\n"
+
+
+def render_text(sections: dict[str, pd.DataFrame], output_dir: str | Path) -> list[Path]:
+    """
+    Write one aligned text file per report (01_...txt to 05_...txt).
+
+    Returns:
+        Written files
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    files: dict[str, list[str]] = {}
+    for key, (stem, title) in SECTIONS.items():
+        parts = files.setdefault(stem, [])
+        table = (
+            sections[key].to_string(index=False, na_rep="") if len(sections[key]) else "(0 rows)"
+        )
+        parts.append((_banner(title) if not parts else f"\n[{title}]\n") + "\n" + table + "\n")
+
+    written = []
+    for stem, parts in files.items():
+        path = output_dir / f"{stem}.txt"
+        path.write_text("".join(parts))
+        written.append(path)
+    return written
+
+
+def render_csv(sections: dict[str, pd.DataFrame], output_dir: str | Path) -> list[Path]:
+    """
+    Write one CSV per report section to <output_dir>/report_csv/.
+
+    Returns:
+        Written files
+    """
+    csv_dir = Path(output_dir) / "report_csv"
+    csv_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for key, table in sections.items():
+        path = csv_dir / f"{key}.csv"
+        table.to_csv(path, index=False)
+        written.append(path)
+    return written
+
+
+def render_html(sections: dict[str, pd.DataFrame], output_dir: str | Path) -> Path:
+    """
+    Write all sections into a single type_aware_reports.html.
+
+    Returns:
+        Written file
+    """
+    body = []
+    for key, (_, title) in SECTIONS.items():
+        body.append(f"<h2>{html.escape(title)}</h2>")
+        body.append(sections[key].to_html(index=False, na_rep="", border=0, classes="report"))
+
+    page = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Type-Aware Weak Grid Reports</title>
+<style>
+  body {{ font-family: sans-serif; margin: 2em; }}
+  table.report {{ border-collapse: collapse; margin-bottom: 2em; font-size: 13px; }}
+  table.report th, table.report td {{
+    padding: 3px 8px; border-bottom: 1px solid #ddd; text-align: right;
+  }}
+  table.report th {{ background: #f0f0f0; }}
+</style>
+</head>
+<body>
+<h1>Type-Aware Weak Grid Reports</h1>
+<p>Generated {datetime.now():%Y-%m-%d %H:%M}</p>
+{''.join(body)}
+</body>
+</html>
+"""
+    path = Path(output_dir) / "type_aware_reports.html"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(page, encoding="utf-8")
+    return path
+
+
+RENDERERS = {"text": render_text, "csv": render_csv, "html": render_html}
+
+
+def generate_reports(
+    output_dir: str | Path,
+    formats: tuple[str, ...] = ("text", "csv", "html"),
+    use_cache: bool = True,
+    engine: Optional[Engine] = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    Compute (or load cached) report aggregates and render them.
+
+    Args:
+        output_dir: Output directory
+        formats: Any of 'text', 'csv', 'html'
+        use_cache: Reuse cached aggregates for the current buildings version
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        The report sections
+
+    Example:
+        >>> generate_reports(
+        ...     'data/processed/unified_buildings_2025-11-24', formats=('text', 'html')
+        ... )
+    """
+    unknown = set(formats) - set(RENDERERS)
+    if unknown:
+        raise ValueError(
+            f"Unknown format(s): {', '.join(sorted(unknown))}. Use: {', '.join(RENDERERS)}"
+        )
+
+    sections = report_sections(engine, use_cache=use_cache)
+    for fmt in formats:
+        RENDERERS[fmt](sections, output_dir)
+        logger.info(f"  ✓ Rendered {fmt} reports")
+
+    logger.success(f"✓ Reports saved to {output_dir}")
+    return sections
@@ -0,0 +1,615 @@
+"""
+Mergeable distribution statistics for building metrics
+
+Keeps a t-digest quantile sketch plus exact moments (count, mean, variance,
+min, max) per metric, building source, building type and municipality.
+Sketches are updated batch by batch, partial stores from parallel workers
+merge into one, and the result is persisted in the ledger directory. Medians,
+percentiles and histograms are then read from the sketches instead of sorting
+the table (PERCENTILE_CONT) after every stage.
+
+The metric writers (svakenett.batches, svakenett.partitions, voltage, density,
+network) sketch the rows they write and swap them into the stored sketches
+through StatsUpdate; a full scan (collect_stats) only rebuilds sketches that
+are missing or out of date.
+"""
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from svakenett.db import get_engine, stream_query, table_columns, table_versions
+from svakenett.ledger import ledger_dir
+
+DEFAULT_METRICS = [
+    "distance_to_line_m",
+    "grid_density_lines_1km",
+    "grid_age_years",
+    "distance_to_transformer_m",
+    "network_distance_to_transformer_m",
+    "voltage_drop_pct",
+    "weak_grid_score",
+]
+
+DEFAULT_GROUP_BY = ["building_source", "bygningstype", "kommunenummer"]
+
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+# Centroid budget of each t-digest (higher = more accurate, ~2x this many centroids)
+COMPRESSION = 200
+
+
+class TDigest:
+    """
+    Merging t-digest (Dunning) with the k1 (arcsine) scale function.
+
+    Accuracy is highest in the tails; a median estimate is typically within a
+    fraction of a percent in rank.
+    """
+
+    def __init__(self, compression: int = COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self._buffer: list[np.ndarray] = []
+        self._buffered = 0
+
+    @property
+    def count(self) -> float:
+        self._flush()
+        return float(self.weights.sum())
+
+    def update(self, values) -> None:
+        values = np.asarray(values, dtype="float64")
+        values = values[np.isfinite(values)]
+        if len(values):
+            self._buffer.append(values)
+            self._buffered += len(values)
+            if self._buffered >= 10 * self.compression:
+                self._flush()
+
+    def merge(self, other: "TDigest") -> None:
+        other._flush()
+        self._flush()
+        self._compress(
+            np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights])
+        )
+
+    def _flush(self) -> None:
+        if self._buffer:
+            values = np.concatenate(self._buffer)
+            self._buffer, self._buffered = [], 0
+            self._compress(
+                np.concatenate([self.means, values]),
+                np.concatenate([self.weights, np.ones(len(values))]),
+            )
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        if len(means) == 0:
+            return
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+
+        def q_limit(q: float) -> float:
+            k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1) + 1
+            return (np.sin(min(k * 2 * np.pi / self.compression, np.pi / 2)) + 1) / 2
+
+        out_means, out_weights = [], []
+        cur_mean, cur_weight = means[0], weights[0]
+        done = 0.0
+        limit = total * q_limit(0.0)
+        for mean, weight in zip(means[1:], weights[1:]):
+            if done + cur_weight + weight <= limit:
+                cur_weight += weight
+                cur_mean += (mean - cur_mean) * weight / cur_weight
+            else:
+                out_means.append(cur_mean)
+                out_weights.append(cur_weight)
+                done += cur_weight
+                limit = total * q_limit(done / total)
+                cur_mean, cur_weight = mean, weight
+        out_means.append(cur_mean)
+        out_weights.append(cur_weight)
+
+        self.means = np.array(out_means)
+        self.weights = np.array(out_weights)
+
+    def quantile(self, q, lo: float, hi: float):
+        """Estimated q-quantile(s); lo/hi are the exact min/max."""
+        self._flush()
+        if len(self.means) == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        total = self.weights.sum()
+        positions = np.concatenate([[0.0], np.cumsum(self.weights) - self.weights / 2, [total]])
+        values = np.concatenate([[lo], self.means, [hi]])
+        return np.interp(np.asarray(q) * total, positions, values)
+
+    def cdf(self, x, lo: float, hi: float):
+        """Estimated fraction of values <= x."""
+        self._flush()
+        if len(self.means) == 0:
+            return np.zeros(np.shape(x))
+        total = self.weights.sum()
+        positions = np.concatenate([[0.0], np.cumsum(self.weights) - self.weights / 2, [total]])
+        values = np.concatenate([[lo], self.means, [hi]])
+        return np.interp(x, values, positions, left=0.0, right=total) / total
+
+    def to_dict(self) -> dict:
+        self._flush()
+        return {"means": self.means.tolist(), "weights": self.weights.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict, compression: int = COMPRESSION) -> "TDigest":
+        digest = cls(compression)
+        digest.means = np.asarray(data["means"], dtype="float64")
+        digest.weights = np.asarray(data["weights"], dtype="float64")
+        return digest
+
+
+@dataclass
+class MetricStats:
+    """Exact moments and a quantile sketch for one metric in one group."""
+
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min: float = np.inf
+    max: float = -np.inf
+    digest: TDigest = field(default_factory=TDigest)
+
+    def update(self, values) -> None:
+        values = np.asarray(values, dtype="float64")
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        batch_mean = values.mean()
+        self._combine(
+            len(values), batch_mean, ((values - batch_mean) ** 2).sum(), values.min(), values.max()
+        )
+        self.digest.update(values)
+
+    def merge(self, other: "MetricStats") -> None:
+        if other.count == 0:
+            return
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        self.digest.merge(other.digest)
+
+    def _combine(self, n: int, mean: float, m2: float, lo: float, hi: float) -> None:
+        # Chan et al. parallel variance
+        total = self.count + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta**2 * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.min = min(self.min, lo)
+        self.max = max(self.max, hi)
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else np.nan
+
+    def quantile(self, q):
+        return self.digest.quantile(q, self.min, self.max)
+
+    def histogram(self, edges) -> np.ndarray:
+        """Approximate counts per bin for the given bin edges."""
+        return (
+            np.diff(self.digest.cdf(np.asarray(edges, dtype="float64"), self.min, self.max))
+            * self.count
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": self.min,
+            "max": self.max,
+            "digest": self.digest.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MetricStats":
+        return cls(
+            count=data["count"],
+            mean=data["mean"],
+            m2=data["m2"],
+            min=data["min"],
+            max=data["max"],
+            digest=TDigest.from_dict(data["digest"]),
+        )
+
+
+class MetricStatsStore:
+    """
+    MetricStats per (metric, group values), e.g. ('grid_age_years', (111, '4204')).
+
+    Example:
+        >>> store = MetricStatsStore(['distance_to_line_m'], ['bygningstype', 'kommunenummer'])
+        >>> store.update(batch_df)          # as each batch of metrics is written
+        >>> store.merge(other_worker_store)
+        >>> store.summary('distance_to_line_m', by=['bygningstype'])
+    """
+
+    def __init__(self, metrics: list[str], group_by: list[str]):
+        self.metrics = list(metrics)
+        self.group_by = list(group_by)
+        self.stats: dict[tuple[str, tuple], MetricStats] = {}
+        self.version: Optional[str] = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        """Add a batch of rows (needs the metric and group_by columns)."""
+        if len(df) == 0:
+            return
+        groups = (
+            df.groupby(self.group_by, dropna=False, sort=False) if self.group_by else [((), df)]
+        )
+        for key, rows in groups:
+            key = tuple(
+                None if pd.isna(k) else k for k in (key if isinstance(key, tuple) else (key,))
+            )
+            for metric in self.metrics:
+                values = pd.to_numeric(rows[metric], errors="coerce").to_numpy(
+                    dtype="float64", na_value=np.nan
+                )
+                if np.isfinite(values).any():
+                    self.stats.setdefault((metric, key), MetricStats()).update(values)
+
+    def merge(self, other: "MetricStatsStore") -> None:
+        for key, stats in other.stats.items():
+            self.stats.setdefault(key, MetricStats()).merge(stats)
+
+    def replace(
+        self,
+        other: "MetricStatsStore",
+        scope: Optional[dict[str, Callable[[object], bool]]] = None,
+    ) -> None:
+        """
+        Swap in other's sketches for the groups its rows were taken from.
+
+        Sketches of other's metrics are dropped in every group matched by scope
+        (group column -> predicate on its value; None for all groups), then
+        other is merged in. Metrics new to this store are added.
+
+        Example:
+            >>> store.replace(rewritten, {'building_source': lambda v: v == 'residential'})
+        """
+        if other.group_by != self.group_by:
+            raise ValueError(f"Group columns differ: {other.group_by} vs {self.group_by}")
+        tests = [(self.group_by.index(col), test) for col, test in (scope or {}).items()]
+        for metric, key in list(self.stats):
+            if metric in other.metrics and all(test(key[i]) for i, test in tests):
+                del self.stats[(metric, key)]
+        self.metrics += [m for m in other.metrics if m not in self.metrics]
+        self.merge(other)
+
+    def merged(self, metric: str, by: Optional[list[str]] = None) -> dict[tuple, MetricStats]:
+        """MetricStats for metric rolled up to a subset of the group columns (None = overall)."""
+        by = by or []
+        positions = [self.group_by.index(col) for col in by]
+        result: dict[tuple, MetricStats] = {}
+        for (name, key), stats in self.stats.items():
+            if name == metric:
+                result.setdefault(tuple(key[i] for i in positions), MetricStats()).merge(stats)
+        return result
+
+    def summary(
+        self,
+        metric: Optional[str] = None,
+        by: Optional[list[str]] = None,
+        quantiles: tuple[float, ...] = DEFAULT_QUANTILES,
+    ) -> pd.DataFrame:
+        """
+        Count, min, mean, std, quantiles and max per metric (and group).
+
+        Args:
+            metric: One metric, or None for all
+            by: Group columns to keep (subset of group_by), None for overall
+            quantiles: Quantiles to report (median is 'p50')
+
+        Returns:
+            One row per metric and group
+        """
+        by = by or []
+        rows = []
+        for name in [metric] if metric else self.metrics:
+            for key, stats in sorted(self.merged(name, by).items(), key=lambda item: str(item[0])):
+                row = {
+                    "metric": name,
+                    **dict(zip(by, key)),
+                    "count": stats.count,
+                    "min": stats.min,
+                    "mean": stats.mean,
+                    "std": stats.std,
+                }
+                row.update(
+                    {
+                        f"p{round(q * 100)}": v
+                        for q, v in zip(quantiles, stats.quantile(list(quantiles)))
+                    }
+                )
+                row["max"] = stats.max
+                rows.append(row)
+        return pd.DataFrame(rows)
+
+    def histogram(
+        self, metric: str, bins: int | list[float] = 20, by: Optional[list[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Approximate histogram of a metric (per group when by is given).
+
+        Args:
+            metric: Metric name
+            bins: Number of equal-width bins over the overall range, or explicit edges
+            by: Group columns to keep (subset of group_by)
+
+        Returns:
+            Columns: group columns, bin_start, bin_end, count
+        """
+        by = by or []
+        groups = self.merged(metric, by)
+        if isinstance(bins, int):
+            overall = self.merged(metric)[()]
+            edges = np.linspace(overall.min, overall.max, bins + 1)
+        else:
+            edges = np.asarray(bins, dtype="float64")
+
+        frames = []
+        for key, stats in groups.items():
+            frame = pd.DataFrame(
+                {"bin_start": edges[:-1], "bin_end": edges[1:], "count": stats.histogram(edges)}
+            )
+            for col, value in zip(by, key):
+                frame.insert(len(frame.columns) - 3, col, value)
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def save(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "metrics": self.metrics,
+            "group_by": self.group_by,
+            "version": self.version,
+            "stats": [
+                {"metric": metric, "key": list(key), **stats.to_dict()}
+                for (metric, key), stats in self.stats.items()
+            ],
+        }
+        path.write_text(json.dumps(data, default=_json_default))
+        return path
+
+    @classmethod
+    def load(cls, path: str | Path) -> "MetricStatsStore":
+        data = json.loads(Path(path).read_text())
+        store = cls(data["metrics"], data["group_by"])
+        store.version = data.get("version")
+        for entry in data["stats"]:
+            store.stats[(entry["metric"], tuple(entry["key"]))] = MetricStats.from_dict(entry)
+        return store
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stats_version(table: str, where: Optional[str], engine: Engine) -> str:
+    """Table version plus filter, so sketches of a filtered scan are not reused for another."""
+    return f"{table_versions([table], engine)[table]}|{where or ''}"
+
+
+def stats_path(table: str, where: Optional[str] = None) -> Path:
+    """Persisted sketch file: <ledger>/stats/<table>.json (<table>_<hash>.json when filtered)."""
+    suffix = f"_{hashlib.sha1(where.encode()).hexdigest()[:8]}" if where else ""
+    return ledger_dir() / "stats" / f"{table}{suffix}.json"
+
+
+def _stored_stats(table: str, where: Optional[str], engine: Engine) -> Optional[MetricStatsStore]:
+    """Persisted sketches if they match the table's current version, else None."""
+    path = stats_path(table, where)
+    if not path.exists():
+        return None
+    store = MetricStatsStore.load(path)
+    return store if store.version == _stats_version(table, where, engine) else None
+
+
+def collect_stats(
+    table: str = "buildings",
+    metrics: Optional[list[str]] = None,
+    group_by: Optional[list[str]] = None,
+    where: Optional[str] = None,
+    workers: int = 4,
+    chunk_size: int = 50_000,
+    engine: Optional[Engine] = None,
+) -> MetricStatsStore:
+    """
+    Build sketches for a table with parallel id-range scans and merge them.
+
+    No sorting happens in PostgreSQL: each worker streams its id range and
+    updates a partial store, and the partial stores are merged.
+
+    Args:
+        table: Source table (needs an integer id column)
+        metrics: Metric columns (default: DEFAULT_METRICS present in the table)
+        group_by: Group columns (default: DEFAULT_GROUP_BY present in the table)
+        where: Optional SQL filter
+        workers: Parallel scans
+        chunk_size: Rows streamed per chunk
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Merged store
+    """
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        columns = set(
+            conn.execute(
+                text("SELECT column_name FROM information_schema.columns WHERE table_name = :t"),
+                {"t": table},
+            ).scalars()
+        )
+        lo, hi = conn.execute(text(f"SELECT MIN(id), MAX(id) FROM {table}")).one()
+
+    metrics = metrics or [m for m in DEFAULT_METRICS if m in columns]
+    group_by = [g for g in DEFAULT_GROUP_BY if g in columns] if group_by is None else group_by
+    missing = sorted(set(metrics + group_by) - columns)
+    if missing:
+        raise ValueError(f"Column(s) not found in {table}: {', '.join(missing)}")
+
+    store = MetricStatsStore(metrics, group_by)
+    if lo is None:
+        return store
+
+    step = (hi - lo) // workers + 1
+    ranges = [(start, min(start + step - 1, hi)) for start in range(lo, hi + 1, step)]
+    query = f"""
+        SELECT {', '.join(group_by + metrics)}
+        FROM {table}
+        WHERE id BETWEEN %(lo)s AND %(hi)s{f' AND ({where})' if where else ''}
+    """
+
+    def scan(bounds: tuple[int, int]) -> MetricStatsStore:
+        partial = MetricStatsStore(metrics, group_by)
+        for chunk in stream_query(
+            query, {"lo": bounds[0], "hi": bounds[1]}, chunk_size=chunk_size, engine=engine
+        ):
+            partial.update(chunk)
+        return partial
+
+    logger.info(f"Collecting metric sketches for {table} ({len(ranges)} parallel scans)...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(scan, ranges):
+            store.merge(partial)
+
+    store.version = _stats_version(table, where, engine)
+    logger.success(f"✓ Sketched {len(metrics)} metrics over {len(store.stats):,} metric groups")
+    return store
+
+
+def table_stats(
+    table: str = "buildings",
+    refresh: bool = False,
+    engine: Optional[Engine] = None,
+    **kwargs,
+) -> MetricStatsStore:
+    """
+    Persisted sketches for a table, recollected only when the table has changed.
+
+    Args:
+        table: Source table
+        refresh: Recollect even if the stored version matches
+        engine: Optional engine (default: get_engine())
+        **kwargs: Passed to collect_stats()
+
+    Returns:
+        Store for the current table version
+    """
+    engine = engine or get_engine()
+    path = stats_path(table, kwargs.get("where"))
+    store = None if refresh else _stored_stats(table, kwargs.get("where"), engine)
+    if store is not None:
+        same_layout = kwargs.get("metrics") in (None, store.metrics) and kwargs.get("group_by") in (
+            None,
+            store.group_by,
+        )
+        if same_layout:
+            logger.info(f"Using stored metric sketches ({path})")
+            return store
+
+    store = collect_stats(table, engine=engine, **kwargs)
+    store.save(path)
+    return store
+
+
+class StatsUpdate:
+    """
+    Keeps the stored sketches of a table current while a writer rewrites metrics.
+
+    Create it before writing: it loads the stored (unfiltered) sketches if they
+    match the table's version. Sketch every written frame into a partial store
+    with sketch() (safe in worker threads), add() the partials, and save()
+    after the writes. Sketches of the rewritten metrics in the rewritten groups
+    are then replaced and the store is stamped with the table's new version, so
+    table_stats() reads it instead of rescanning. When the stored sketches were
+    already out of date, or scope is not a group column, save() leaves them to
+    be rebuilt by table_stats().
+
+    Args:
+        table: Table being written
+        written: Columns the writer sets (frames carry these plus group_by);
+            None when whole rows are read back, covering every sketched metric
+        scope: Group column -> predicate on its value, selecting the groups
+            whose rows are all rewritten (None: every row of the table)
+        engine: Optional engine (default: get_engine())
+
+    Example:
+        >>> update = StatsUpdate('buildings', written=['voltage_drop_pct'])
+        >>> update.add(update.sketch([frame]))  # frame: update.group_by + voltage_drop_pct
+        >>> update.save()
+    """
+
+    def __init__(
+        self,
+        table: str = "buildings",
+        written: Optional[list[str]] = None,
+        scope: Optional[dict[str, Callable[[object], bool]]] = None,
+        engine: Optional[Engine] = None,
+    ):
+        self.table = table
+        self.scope = scope or {}
+        self.engine = engine or get_engine()
+        self.base = _stored_stats(table, None, self.engine)
+        if self.base is not None:
+            metrics, self.group_by = self.base.metrics, self.base.group_by
+        else:
+            columns = {name for name, _ in table_columns(table, self.engine)}
+            metrics = [m for m in DEFAULT_METRICS if m in columns]
+            self.group_by = [g for g in DEFAULT_GROUP_BY if g in columns]
+        self.metrics = (
+            metrics
+            if written is None
+            else [m for m in dict.fromkeys(metrics + DEFAULT_METRICS) if m in written]
+        )
+        # Without current sketches only a read-back of every row gives a complete store
+        self.enabled = set(self.scope) <= set(self.group_by) and (
+            self.base is not None or (written is None and not self.scope)
+        )
+        self.written = MetricStatsStore(self.metrics, self.group_by)
+
+    def sketch(self, frames: Iterable[pd.DataFrame]) -> MetricStatsStore:
+        """Partial store of written rows (frames need the group and metric columns)."""
+        partial = MetricStatsStore(self.metrics, self.group_by)
+        if self.enabled:
+            for frame in frames:
+                partial.update(frame)
+        return partial
+
+    def add(self, partial: MetricStatsStore) -> None:
+        self.written.merge(partial)
+
+    def save(self) -> Optional[Path]:
+        """Swap the written sketches in and persist them under the table's new version."""
+        if not self.enabled:
+            logger.info(
+                f"Stored metric sketches for {self.table} are out of date; next read rescans"
+            )
+            return None
+        store = self.base or MetricStatsStore(self.metrics, self.group_by)
+        store.replace(self.written, self.scope)
+        # A version stamp taken before the last counters are flushed only costs a rescan
+        store.version = _stats_version(self.table, None, self.engine)
+        path = store.save(stats_path(self.table))
+        logger.info(f"Updated metric sketches for {len(self.metrics)} metric(s) ({path})")
+        return path
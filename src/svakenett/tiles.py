@@ -0,0 +1,545 @@
+"""
+Mapbox Vector Tiles (MVT) straight from PostGIS
+
+Serves buildings, power lines, transformers and weak grid candidates as
+ST_AsMVT tiles with per-zoom generalization, so the browser only loads what is
+visible instead of one huge static HTML file. Rendered tiles are cached on disk
+under a directory named after the current data version of the source tables.
+"""
+
+import hashlib
+import json
+import math
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator, Optional
+
+from loguru import logger
+from sqlalchemy.engine import Engine
+
+from svakenett.db import get_engine, table_versions
+
+# Web Mercator constants
+WORLD_SIZE_M = 2 * math.pi * 6378137.0
+TILE_SIZE_PX = 256
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+
+# Agder region (lon_min, lat_min, lon_max, lat_max)
+DEFAULT_BOUNDS = (6.1, 57.9, 9.3, 59.7)
+
+
+@dataclass
+class TileLayer:
+    """
+    One MVT layer backed by a PostGIS table.
+
+    Attributes:
+        name: Layer name in the tile
+        table: Source table (geometry in EPSG:4326)
+        columns: Attribute expressions included at every zoom
+        detail_columns: Extra attributes included from detail_zoom and up
+        min_zoom: No features below this zoom
+        detail_zoom: Zoom where full detail starts (points are aggregated below it)
+        where: Optional filter per zoom, as {min_zoom: sql} (highest matching key wins)
+        simplify: Simplify lines/polygons to the pixel size of the zoom
+        aggregate_by: Column kept when aggregating points below detail_zoom
+        aggregate_value: Column whose maximum is kept when aggregating points
+    """
+
+    name: str
+    table: str
+    columns: dict[str, str]
+    detail_columns: dict[str, str] = field(default_factory=dict)
+    min_zoom: int = 0
+    detail_zoom: int = 0
+    where: dict[int, str] = field(default_factory=dict)
+    simplify: bool = False
+    aggregate_by: Optional[str] = None
+    aggregate_value: Optional[str] = None
+
+
+TILE_LAYERS = {
+    "buildings": TileLayer(
+        name="buildings",
+        table="buildings",
+        columns={
+            "bygningstype": "bygningstype",
+            "score": "ROUND(weak_grid_score::numeric, 1)::real",
+        },
+        detail_columns={
+            "id": "id",
+            "postal_code": "postal_code",
+            "distance_to_line_m": "ROUND(distance_to_line_m)::integer",
+            "voltage_kv": "voltage_level_kv",
+        },
+        min_zoom=6,
+        detail_zoom=13,
+        where={0: "weak_grid_score IS NOT NULL"},
+        aggregate_by="bygningstype",
+        aggregate_value="weak_grid_score",
+    ),
+    "power_lines": TileLayer(
+        name="power_lines",
+        table="power_lines_new",
+        columns={"voltage_kv": "spenning_kv"},
+        detail_columns={
+            "id": "id",
+            "owner_orgnr": "eierorgnr::text",
+            "year_built": "driftsattaar",
+        },
+        min_zoom=5,
+        detail_zoom=12,
+        where={0: "spenning_kv >= 33", 9: "TRUE"},
+        simplify=True,
+    ),
+    "transformers": TileLayer(
+        name="transformers",
+        table="transformers_new",
+        columns={"id": "id"},
+        detail_columns={"voltage_kv": "spenning_kv", "owner_orgnr": "eierorgnr::text"},
+        min_zoom=7,
+        detail_zoom=7,
+    ),
+    "weak_grid_candidates": TileLayer(
+        name="weak_grid_candidates",
+        table="weak_grid_candidates_v4",
+        columns={
+            "id": "id",
+            "risk": "ROUND(composite_risk_score::numeric, 1)::real",
+            "tier": "weak_grid_tier",
+        },
+        detail_columns={
+            "load_severity": "load_severity",
+            "transformer_distance_m": "ROUND(transformer_distance_m)::integer",
+            "buildings_within_1km": "buildings_within_1km",
+        },
+        min_zoom=5,
+        detail_zoom=10,
+    ),
+}
+
+
+def meters_per_pixel(zoom: int) -> float:
+    """
+    Web Mercator ground resolution of one 256 px tile pixel at a zoom level.
+
+    Args:
+        zoom: Zoom level
+
+    Returns:
+        Pixel size in EPSG:3857 meters
+    """
+    return WORLD_SIZE_M / (TILE_SIZE_PX * 2**zoom)
+
+
+def lonlat_to_tile(lon: float, lat: float, zoom: int) -> tuple[int, int]:
+    """
+    XYZ tile containing a WGS84 coordinate.
+
+    Args:
+        lon: Longitude
+        lat: Latitude
+        zoom: Zoom level
+
+    Returns:
+        (x, y) tile indices
+    """
+    n = 2**zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_in_bounds(
+    bounds: tuple[float, float, float, float], min_zoom: int, max_zoom: int
+) -> Iterator[tuple[int, int, int]]:
+    """
+    Enumerate XYZ tiles covering a WGS84 bounding box.
+
+    Args:
+        bounds: (lon_min, lat_min, lon_max, lat_max)
+        min_zoom: First zoom level
+        max_zoom: Last zoom level (inclusive)
+
+    Yields:
+        (z, x, y) tuples
+    """
+    lon_min, lat_min, lon_max, lat_max = bounds
+    for z in range(min_zoom, max_zoom + 1):
+        x0, y0 = lonlat_to_tile(lon_min, lat_max, z)
+        x1, y1 = lonlat_to_tile(lon_max, lat_min, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+def _layer_where(layer: TileLayer, z: int) -> str:
+    """Filter for a zoom level: the entry with the highest min zoom <= z."""
+    applicable = [zoom for zoom in layer.where if zoom <= z]
+    return layer.where[max(applicable)] if applicable else "TRUE"
+
+
+def layer_sql(layer: TileLayer, z: int) -> Optional[str]:
+    """
+    SQL returning the MVT bytes of one layer for tile (%(z)s, %(x)s, %(y)s).
+
+    Below detail_zoom, points are aggregated to one feature per pixel cell (per
+    aggregate_by value) and lines are simplified to the pixel size.
+
+    Args:
+        layer: Layer definition
+        z: Zoom level (selects generalization and attributes)
+
+    Returns:
+        SQL string, or None if the layer is not shown at this zoom
+    """
+    if z < layer.min_zoom:
+        return None
+
+    detail = z >= layer.detail_zoom
+    columns = dict(layer.columns)
+    if detail:
+        columns.update(layer.detail_columns)
+
+    geom = "ST_Transform(t.geometry, 3857)"
+    if layer.simplify and not detail:
+        geom = f"ST_SimplifyPreserveTopology({geom}, {meters_per_pixel(z):.3f})"
+
+    envelope = f"ST_TileEnvelope(%(z)s, %(x)s, %(y)s, margin => {MVT_BUFFER / MVT_EXTENT})"
+    filters = f"t.geometry && ST_Transform({envelope}, 4326) AND ({_layer_where(layer, z)})"
+
+    if layer.aggregate_by and not detail:
+        # One point per pixel cell and category, carrying count and max value
+        cell = meters_per_pixel(z) * 4
+        select = f"""
+            SELECT
+                ST_AsMVTGeom(ST_Centroid(ST_Collect({geom})), ST_TileEnvelope(%(z)s, %(x)s, %(y)s),
+                             {MVT_EXTENT}, {MVT_BUFFER}, true) AS geom,
+                t.{layer.aggregate_by} AS {layer.aggregate_by},
+                COUNT(*)::integer AS point_count,
+                ROUND(MAX(t.{layer.aggregate_value})::numeric, 1)::real
+                    AS max_{layer.aggregate_value}
+            FROM {layer.table} t
+            WHERE {filters}
+            GROUP BY ST_SnapToGrid({geom}, {cell:.3f}), t.{layer.aggregate_by}
+        """
+    else:
+        attrs = ",\n                ".join(f"{expr} AS {name}" for name, expr in columns.items())
+        select = f"""
+            SELECT
+                ST_AsMVTGeom({geom}, ST_TileEnvelope(%(z)s, %(x)s, %(y)s),
+                             {MVT_EXTENT}, {MVT_BUFFER}, true) AS geom,
+                {attrs}
+            FROM {layer.table} t
+            WHERE {filters}
+        """
+
+    return (
+        f"SELECT COALESCE(ST_AsMVT(mvt, '{layer.name}', {MVT_EXTENT}, 'geom'), ''::bytea) "
+        f"FROM ({select}) mvt WHERE mvt.geom IS NOT NULL"
+    )
+
+
+def tile_sql(z: int, layers: Optional[list[str]] = None) -> Optional[str]:
+    """
+    SQL returning one complete tile (all layers concatenated).
+
+    Args:
+        z: Zoom level
+        layers: Layer names (default: all TILE_LAYERS)
+
+    Returns:
+        SQL string, or None if no layer is visible at this zoom
+    """
+    parts = [layer_sql(TILE_LAYERS[name], z) for name in (layers or TILE_LAYERS)]
+    parts = [f"({part})" for part in parts if part]
+    if not parts:
+        return None
+    return "SELECT " + " || ".join(parts)
+
+
+class TileCache:
+    """
+    On-disk tile cache keyed by data version.
+
+    Tiles live in <root>/<version>/<z>/<x>/<y>.pbf. The version is a hash of
+    table_versions() for all source tables, so any INSERT/UPDATE/DELETE,
+    TRUNCATE or REFRESH of a source moves the cache to a fresh directory.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        engine: Optional[Engine] = None,
+        layers: Optional[list[str]] = None,
+        version_ttl_s: float = 30.0,
+    ):
+        self.root = Path(root)
+        self.engine = engine or get_engine()
+        self.layers = layers or list(TILE_LAYERS)
+        self.version_ttl_s = version_ttl_s
+        self._version: Optional[str] = None
+        self._version_checked = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def tables(self) -> list[str]:
+        return sorted({TILE_LAYERS[name].table for name in self.layers})
+
+    @property
+    def version(self) -> str:
+        """Current data version (re-checked at most every version_ttl_s seconds)."""
+        with self._lock:
+            if (
+                self._version is None
+                or time.monotonic() - self._version_checked > self.version_ttl_s
+            ):
+                versions = table_versions(self.tables, self.engine)
+                payload = json.dumps({"layers": self.layers, "tables": versions}, sort_keys=True)
+                version = hashlib.sha1(payload.encode()).hexdigest()[:12]
+                if version != self._version:
+                    logger.info(f"Tile data version: {version}")
+                self._version = version
+                self._version_checked = time.monotonic()
+            return self._version
+
+    def path(self, z: int, x: int, y: int) -> Path:
+        return self.root / self.version / str(z) / str(x) / f"{y}.pbf"
+
+    def render(self, z: int, x: int, y: int) -> bytes:
+        """Render a tile from PostGIS (no cache)."""
+        sql = tile_sql(z, self.layers)
+        if sql is None:
+            return b""
+        conn = self.engine.raw_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, {"z": z, "x": x, "y": y})
+                return bytes(cur.fetchone()[0] or b"")
+        finally:
+            conn.close()
+
+    def get(self, z: int, x: int, y: int) -> bytes:
+        """Return a tile from the cache, rendering and storing it on a miss."""
+        path = self.path(z, x, y)
+        if path.exists():
+            return path.read_bytes()
+
+        tile = self.render(z, x, y)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(tile)
+        tmp.replace(path)
+        return tile
+
+    def prune(self) -> int:
+        """Delete cache directories of older data versions. Returns count removed."""
+        current = self.version
+        removed = 0
+        if self.root.exists():
+            for child in self.root.iterdir():
+                if child.is_dir() and child.name != current:
+                    shutil.rmtree(child, ignore_errors=True)
+                    removed += 1
+        return removed
+
+
+def prerender(
+    cache: TileCache,
+    bounds: tuple[float, float, float, float] = DEFAULT_BOUNDS,
+    min_zoom: int = 5,
+    max_zoom: int = 12,
+    workers: int = 8,
+) -> int:
+    """
+    Render all tiles of a region into the cache.
+
+    Args:
+        cache: Tile cache to fill
+        bounds: (lon_min, lat_min, lon_max, lat_max)
+        min_zoom: First zoom level
+        max_zoom: Last zoom level (inclusive)
+        workers: Concurrent database sessions
+
+    Returns:
+        Number of tiles rendered
+
+    Example:
+        >>> prerender(TileCache('data/processed/tiles'), max_zoom=11)
+    """
+    tiles = list(tiles_in_bounds(bounds, min_zoom, max_zoom))
+    logger.info(
+        f"Pre-rendering {len(tiles):,} tiles (z{min_zoom}-z{max_zoom}, version {cache.version})"
+    )
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in pool.map(lambda zxy: cache.get(*zxy), tiles):
+            done += 1
+            if done % 500 == 0:
+                logger.info(f"  {done:,}/{len(tiles):,} tiles")
+
+    removed = cache.prune()
+    logger.success(f"✓ Pre-rendered {done:,} tiles ({removed} stale cache versions removed)")
+    return done
+
+
+MAP_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Svakenett - Weak Grid Prospects</title>
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<script src="https://unpkg.com/maplibre-gl@4.1.2/dist/maplibre-gl.js"></script>
+<link href="https://unpkg.com/maplibre-gl@4.1.2/dist/maplibre-gl.css" rel="stylesheet">
+<style>
+  body { margin: 0; } #map { position: absolute; top: 0; bottom: 0; width: 100%; }
+  .legend { position: absolute; bottom: 30px; left: 10px; background: white; padding: 8px;
+            font: 12px Arial; border-radius: 4px; box-shadow: 0 0 4px rgba(0,0,0,.3); }
+</style>
+</head>
+<body>
+<div id="map"></div>
+<div class="legend">
+  <b>Weak Grid Prospects</b><br>
+  <span style="color:#8B4513">&#9679;</span> Cabins (161)
+  <span style="color:#2E8B57">&#9679;</span> Enebolig (111)
+  <span style="color:#4169E1">&#9679;</span> Tomannsbolig (112)<br>
+  <span style="color:#FF8C00">&#9679;</span> Rekkehus (113)
+  <span style="color:#DC143C">&#9679;</span> V&aring;ningshus (121)<br>
+  <span style="color:#FF0000">&#9473;</span> &ge;132 kV / 11-24 kV
+  <span style="color:#FFA500">&#9473;</span> 33-132 kV
+  <span style="color:#800080">&#9679;</span> Transformers
+</div>
+<script>
+const TYPE_COLORS = ['match', ['get', 'bygningstype'],
+  161, '#8B4513', 111, '#2E8B57', 112, '#4169E1', 113, '#FF8C00', 121, '#DC143C', '#999999'];
+const map = new maplibre.Map({
+  container: 'map',
+  center: [7.8, 58.5],
+  zoom: 8,
+  style: {
+    version: 8,
+    sources: {
+      osm: { type: 'raster', tileSize: 256, attribution: '&copy; OpenStreetMap',
+             tiles: ['https://tile.openstreetmap.org/{z}/{x}/{y}.png'] },
+      svakenett: { type: 'vector', tiles: [location.origin + '/tiles/{z}/{x}/{y}.pbf'],
+                   minzoom: 5, maxzoom: 14 }
+    },
+    layers: [
+      { id: 'osm', type: 'raster', source: 'osm' },
+      { id: 'power_lines', type: 'line', source: 'svakenett', 'source-layer': 'power_lines',
+        paint: {
+          'line-color': ['case', ['>=', ['get', 'voltage_kv'], 132], '#FF0000',
+                                 ['>=', ['get', 'voltage_kv'], 33], '#FFA500',
+                                 ['>=', ['get', 'voltage_kv'], 11], '#FF0000', '#CCCCCC'],
+          'line-width': ['case', ['>=', ['get', 'voltage_kv'], 132], 3,
+                                 ['>=', ['get', 'voltage_kv'], 33], 2, 1.5],
+          'line-opacity': 0.6 } },
+      { id: 'buildings', type: 'circle', source: 'svakenett', 'source-layer': 'buildings',
+        paint: {
+          'circle-color': TYPE_COLORS,
+          'circle-radius': ['interpolate', ['linear'], ['zoom'], 6, 1.5, 13, 4, 16, 6],
+          'circle-opacity': 0.8 } },
+      { id: 'transformers', type: 'circle', source: 'svakenett', 'source-layer': 'transformers',
+        paint: { 'circle-color': '#800080', 'circle-radius': 5, 'circle-opacity': 0.7 } },
+      { id: 'weak_grid_candidates', type: 'circle', source: 'svakenett',
+        'source-layer': 'weak_grid_candidates',
+        paint: { 'circle-color': 'rgba(0,0,0,0)', 'circle-radius': 9,
+                 'circle-stroke-color': '#FF0000', 'circle-stroke-width': 2 } }
+    ]
+  }
+});
+map.addControl(new maplibre.NavigationControl());
+['buildings', 'power_lines', 'transformers', 'weak_grid_candidates'].forEach(layer => {
+  map.on('click', layer, e => {
+    const props = e.features[0].properties;
+    const rows = Object.entries(props)
+      .map(([k, v]) => `<tr><td><b>${k}</b></td><td>${v ?? 'N/A'}</td></tr>`).join('');
+    new maplibre.Popup().setLngLat(e.lngLat)
+      .setHTML(`<b>${layer}</b><table>${rows}</table>`).addTo(map);
+  });
+  map.on('mouseenter', layer, () => map.getCanvas().style.cursor = 'pointer');
+  map.on('mouseleave', layer, () => map.getCanvas().style.cursor = '');
+});
+</script>
+</body>
+</html>
+"""
+
+
+def make_handler(cache: TileCache) -> type[BaseHTTPRequestHandler]:
+    """Build a request handler serving /, /tiles/{z}/{x}/{y}.pbf and /version."""
+
+    class TileHandler(BaseHTTPRequestHandler):
+        def _send(
+            self, status: int, body: bytes, content_type: str, cache_control: str = "no-cache"
+        ):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            parts = path.strip("/").split("/")
+
+            if path in ("/", "/index.html"):
+                self._send(200, MAP_HTML.encode(), "text/html; charset=utf-8")
+            elif path == "/version":
+                self._send(200, json.dumps({"version": cache.version}).encode(), "application/json")
+            elif len(parts) == 4 and parts[0] == "tiles" and parts[3].endswith(".pbf"):
+                try:
+                    z, x, y = int(parts[1]), int(parts[2]), int(parts[3][:-4])
+                except ValueError:
+                    self._send(400, b"Invalid tile coordinates", "text/plain")
+                    return
+                if not (0 <= z <= 22 and 0 <= x < 2**z and 0 <= y < 2**z):
+                    self._send(404, b"Tile out of range", "text/plain")
+                    return
+                try:
+                    tile = cache.get(z, x, y)
+                except Exception as e:
+                    logger.error(f"✗ Tile {z}/{x}/{y} failed: {e}")
+                    self._send(500, str(e).encode(), "text/plain")
+                    return
+                self._send(200, tile, "application/vnd.mapbox-vector-tile", "max-age=300")
+            else:
+                self._send(404, b"Not found", "text/plain")
+
+        def log_message(self, format, *args):
+            logger.debug(f"{self.address_string()} {format % args}")
+
+    return TileHandler
+
+
+def serve(cache: TileCache, host: str = "127.0.0.1", port: int = 8080) -> None:
+    """
+    Run the local tile server until interrupted.
+
+    Args:
+        cache: Tile cache (tiles are rendered on demand on a miss)
+        host: Bind address
+        port: Port
+
+    Example:
+        >>> serve(TileCache('data/processed/tiles'), port=8080)
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(cache))
+    logger.success(f"✓ Serving map at http://{host}:{port}/ (tile cache: {cache.root})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping tile server")
+    finally:
+        server.server_close()
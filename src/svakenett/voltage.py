@@ -0,0 +1,336 @@
+"""
+Approximate voltage drop at every building on the 11-24 kV network
+
+All feeders are solved together as one forest: a multi-source Dijkstra from
+the transformers over the distribution line topology gives each node its
+upstream node (radial feeding), each building's estimated peak load is placed
+at its upstream attachment node, loads are summed downstream-to-upstream one
+tree level at a time, and each edge contributes
+
+    ΔU% = 100 · (R·P + X·Q) / U²
+
+with R and X from the assumed conductor of the line's age, P the load
+downstream of the edge and U the line voltage. Drops are accumulated from the
+transformer outwards by pointer jumping. The low-voltage leg from the line to
+the building (its distance to the line, at 400 V with the building's own load)
+is added on top; for remote buildings that leg dominates. Every step is an
+array operation over all feeders at once; the only loops are over tree depth.
+
+The result is stored as buildings.voltage_drop_pct and a 0-100 scoring factor
+voltage_drop_factor (100 at the 10% limit of the Norwegian quality of supply
+regulation).
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from svakenett.building_types import BUILDING_TYPES, DEFAULT_PEAK_LOAD_KW
+from svakenett.db import copy_frame, get_engine, stream_query
+from svakenett.feeders import LINES_TABLE, MAX_ATTACH_M
+from svakenett.network import METRIC_SRID, TRANSFORMER_SNAP_M, Topology, load_topology
+from svakenett.stats import StatsUpdate
+
+# Assumed overhead conductor by commissioning year (driftsattaar):
+# (built up to and including, name, R ohm/km, X ohm/km)
+CONDUCTORS = [
+    (1969, "FeAl 25", 1.20, 0.40),
+    (1989, "FeAl 50", 0.60, 0.38),
+    (2009, "FeAl 95", 0.33, 0.36),
+    (9999, "FeAl 150", 0.21, 0.35),
+]
+UNKNOWN_CONDUCTOR = CONDUCTORS[1]
+
+# Assumed low-voltage service from the distribution line to the building
+LV_VOLTAGE = 400.0
+LV_R_OHM_PER_M = 0.32 / 1000
+LV_X_OHM_PER_M = 0.08 / 1000
+
+POWER_FACTOR = 0.95
+
+# Voltage drop (% of nominal) that maps to factor 100 (FoL §3-3: ±10%)
+LIMIT_PCT = 10.0
+
+_TAN_PHI = float(np.tan(np.arccos(POWER_FACTOR)))
+
+
+def conductor_parameters(year_built: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Resistance and reactance (ohm/m) of the assumed conductor per line age.
+
+    Args:
+        year_built: Commissioning year per line (NaN when unknown)
+
+    Returns:
+        (r, x) in ohm per meter
+    """
+    years = np.asarray(year_built, dtype=float)
+    bins = np.searchsorted([c[0] for c in CONDUCTORS], np.nan_to_num(years, nan=0.0), side="left")
+    r = np.array([c[2] for c in CONDUCTORS])[np.clip(bins, 0, len(CONDUCTORS) - 1)] / 1000
+    x = np.array([c[3] for c in CONDUCTORS])[np.clip(bins, 0, len(CONDUCTORS) - 1)] / 1000
+    r[np.isnan(years)] = UNKNOWN_CONDUCTOR[2] / 1000
+    x[np.isnan(years)] = UNKNOWN_CONDUCTOR[3] / 1000
+    return r, x
+
+
+def _path_sum(values: np.ndarray, parent: np.ndarray) -> np.ndarray:
+    """Sum of values from each node up to its root, by pointer jumping (parent < 0 at roots)."""
+    total = values.astype(float).copy()
+    hop = parent.copy()
+    while (hop >= 0).any():
+        has = hop >= 0
+        total[has] += total[hop[has]]
+        next_hop = np.full_like(hop, -1)
+        next_hop[has] = hop[hop[has]]
+        hop = next_hop
+    return total
+
+
+def _subtree_sum(values: np.ndarray, parent: np.ndarray) -> np.ndarray:
+    """Sum of values over each node's subtree, one tree level at a time from the leaves."""
+    depth = _path_sum((parent >= 0).astype(float), parent).astype(int)
+    total = values.astype(float).copy()
+    order = np.argsort(-depth, kind="stable")
+    level_bounds = np.flatnonzero(np.diff(depth[order])) + 1
+    for level in np.split(order, level_bounds):
+        level = level[parent[level] >= 0]
+        np.add.at(total, parent[level], total[level])
+    return total
+
+
+def voltage_drops(
+    topology: Topology,
+    line_r: np.ndarray,
+    line_x: np.ndarray,
+    line_kv: np.ndarray,
+    transformer_xy: np.ndarray,
+    building_xy: np.ndarray,
+    building_kw: np.ndarray,
+    max_attach_m: float = MAX_ATTACH_M,
+) -> np.ndarray:
+    """
+    Voltage drop (% of nominal) at each building.
+
+    Args:
+        topology: Distribution line topology
+        line_r, line_x: Conductor ohm/m per topology line
+        line_kv: Nominal voltage per topology line
+        transformer_xy: (n, 2) transformer positions (METRIC_SRID)
+        building_xy: (m, 2) building positions (METRIC_SRID)
+        building_kw: Estimated peak load per building
+        max_attach_m: Buildings farther from every line get NaN
+
+    Returns:
+        Drop per building (NaN when not attached to a fed feeder)
+    """
+    n = topology.n_nodes
+    line_of_break = np.repeat(np.arange(len(topology.lines)), np.diff(topology.line_ptr))
+
+    # Edges: line pieces, plus virtual transformer nodes joined to the piece they sit on
+    is_start = np.ones(len(line_of_break), dtype=bool)
+    is_start[topology.line_ptr[1:] - 1] = False
+    starts = np.flatnonzero(is_start)
+    t_idx, t_line, t_pos, _ = topology.locate(
+        transformer_xy[:, 0], transformer_xy[:, 1], TRANSFORMER_SNAP_M
+    )
+    t_lower, t_upper = topology.piece_of(t_line, t_pos)
+    virtual = n + np.arange(len(t_idx))
+
+    edges = pd.DataFrame(
+        {
+            "a": np.concatenate([topology.break_node[starts], virtual, virtual]),
+            "b": np.concatenate(
+                [
+                    topology.break_node[starts + 1],
+                    topology.break_node[t_lower],
+                    topology.break_node[t_upper],
+                ]
+            ),
+            "length": np.concatenate(
+                [
+                    topology.break_pos[starts + 1] - topology.break_pos[starts],
+                    t_pos - topology.break_pos[t_lower],
+                    topology.break_pos[t_upper] - t_pos,
+                ]
+            ),
+            "line": np.concatenate([line_of_break[starts], t_line, t_line]),
+        }
+    )
+    edges = edges[edges["a"] != edges["b"]]
+    edges["length"] = edges["length"].clip(lower=1e-3)
+    lo, hi = np.minimum(edges["a"], edges["b"]), np.maximum(edges["a"], edges["b"])
+    edges = (
+        edges.assign(a=lo, b=hi)
+        .loc[lambda e: e.groupby(["a", "b"])["length"].idxmin()]
+        .reset_index(drop=True)
+    )
+
+    size = n + len(t_idx)
+    rows = np.concatenate([edges["a"], edges["b"]])
+    cols = np.concatenate([edges["b"], edges["a"]])
+    graph = csr_matrix((np.tile(edges["length"].to_numpy(), 2), (rows, cols)), shape=(size, size))
+    edge_of = csr_matrix(
+        (np.tile(np.arange(1, len(edges) + 1), 2), (rows, cols)), shape=(size, size)
+    )
+
+    if len(virtual):
+        distance, parent, _ = dijkstra(
+            graph, directed=False, indices=virtual, min_only=True, return_predecessors=True
+        )
+    else:
+        distance, parent = np.full(size, np.inf), np.full(size, -9999)
+    parent = np.where(parent < 0, -1, parent)
+
+    # Edge from each node's parent to the node
+    child = np.flatnonzero(parent >= 0)
+    edge = np.full(size, -1)
+    edge[child] = np.asarray(edge_of[parent[child], child]).ravel() - 1
+    e_line = edges["line"].to_numpy()[edge[child]]
+    e_len = edges["length"].to_numpy()[edge[child]]
+
+    # Buildings: attach at the upstream end of their piece
+    b_idx, b_line, b_pos, b_gap = topology.locate(
+        building_xy[:, 0], building_xy[:, 1], max_attach_m
+    )
+    lower, upper = topology.piece_of(b_line, b_pos)
+    u, v = topology.break_node[lower], topology.break_node[upper]
+    to_u = b_pos - topology.break_pos[lower]
+    to_v = topology.break_pos[upper] - b_pos
+    use_u = distance[u] + to_u <= distance[v] + to_v
+    node = np.where(use_u, u, v)
+    partial = np.where(use_u, to_u, to_v)
+    load_w = np.asarray(building_kw, dtype=float)[b_idx] * 1000
+
+    downstream = _subtree_sum(np.bincount(node, weights=load_w, minlength=size), parent)
+
+    edge_drop = np.zeros(size)
+    volts = line_kv[e_line] * 1000
+    edge_drop[child] = (
+        100 * e_len * (line_r[e_line] + line_x[e_line] * _TAN_PHI) * downstream[child] / volts**2
+    )
+    node_drop = _path_sum(edge_drop, parent)
+
+    b_volts = line_kv[b_line] * 1000
+    own = 100 * partial * (line_r[b_line] + line_x[b_line] * _TAN_PHI) * load_w / b_volts**2
+    low_voltage = (
+        100 * b_gap * (LV_R_OHM_PER_M + LV_X_OHM_PER_M * _TAN_PHI) * load_w / LV_VOLTAGE**2
+    )
+    result = np.full(len(building_xy), np.nan)
+    fed = np.isfinite(distance[node])
+    result[b_idx[fed]] = node_drop[node[fed]] + own[fed] + low_voltage[fed]
+    return result
+
+
+def voltage_drop_factor(drop_pct: np.ndarray) -> np.ndarray:
+    """Scoring factor 0-100: 0 at no drop, 100 at LIMIT_PCT or more (NaN stays NaN)."""
+    return np.clip(np.asarray(drop_pct, dtype=float) / LIMIT_PCT * 100, 0, 100)
+
+
+def update_voltage_drops(
+    max_attach_m: float = MAX_ATTACH_M,
+    chunk_size: int = 200_000,
+    use_cache: bool = True,
+    engine: Optional[Engine] = None,
+) -> int:
+    """
+    Estimate voltage drop for all buildings and store it with its scoring factor.
+
+    Args:
+        max_attach_m: Max building-to-line distance in meters
+        chunk_size: Buildings per streamed chunk (read and write)
+        use_cache: Reuse the cached distribution line topology
+        engine: Optional engine (default: get_engine())
+
+    Returns:
+        Buildings with an estimate
+    """
+    engine = engine or get_engine()
+    stats = StatsUpdate(written=["voltage_drop_pct", "voltage_drop_factor"], engine=engine)
+    topology = load_topology(use_cache=use_cache, lines_table=LINES_TABLE, engine=engine)
+
+    attrs = pd.read_sql(f"SELECT id, voltage_kv, year_built FROM {LINES_TABLE}", engine).set_index(
+        "id"
+    )
+    attrs = attrs.reindex(topology.line_ids)
+    line_r, line_x = conductor_parameters(attrs["year_built"].to_numpy(float))
+    line_kv = attrs["voltage_kv"].fillna(22).to_numpy(float)
+
+    transformers = pd.read_sql(
+        f"SELECT ST_X(p) AS x, ST_Y(p) AS y FROM "
+        f"(SELECT ST_Transform(geometry, {METRIC_SRID}) AS p FROM transformers_new) t",
+        engine,
+    )
+    peak_kw = {code: config["peak_load_kw"] for code, config in BUILDING_TYPES.items()}
+    columns = ", ".join(dict.fromkeys(["id", "bygningstype", *stats.group_by]))
+    buildings = pd.concat(
+        stream_query(
+            f"SELECT {columns}, ST_X(p) AS x, ST_Y(p) AS y FROM "
+            f"(SELECT {columns}, ST_Transform(geometry, {METRIC_SRID}) AS p FROM buildings "
+            f"WHERE geometry IS NOT NULL) b",
+            chunk_size=chunk_size,
+            engine=engine,
+        ),
+        ignore_index=True,
+    )
+    load_kw = buildings["bygningstype"].map(peak_kw).fillna(DEFAULT_PEAK_LOAD_KW).to_numpy(float)
+
+    drops = voltage_drops(
+        topology,
+        line_r,
+        line_x,
+        line_kv,
+        transformers[["x", "y"]].to_numpy(float),
+        buildings[["x", "y"]].to_numpy(float),
+        load_kw,
+        max_attach_m,
+    )
+    result = pd.DataFrame(
+        {
+            "id": buildings["id"],
+            "drop_pct": np.round(drops, 3),
+            "factor": np.round(voltage_drop_factor(drops), 1),
+        }
+    )
+
+    written = buildings[stats.group_by].assign(
+        voltage_drop_pct=result["drop_pct"], voltage_drop_factor=result["factor"]
+    )
+    stats.add(stats.sketch([written]))
+
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE buildings ADD COLUMN IF NOT EXISTS voltage_drop_pct REAL"))
+        conn.execute(
+            text("ALTER TABLE buildings ADD COLUMN IF NOT EXISTS voltage_drop_factor REAL")
+        )
+
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("CREATE TEMP TABLE voltage_drop (id BIGINT, drop_pct REAL, factor REAL)")
+            for start in range(0, len(result), chunk_size):
+                cur.execute("TRUNCATE voltage_drop")
+                copy_frame(cur, "voltage_drop", result.iloc[start : start + chunk_size])
+                cur.execute("""
+                    UPDATE buildings b
+                    SET voltage_drop_pct = v.drop_pct, voltage_drop_factor = v.factor
+                    FROM voltage_drop v
+                    WHERE b.id = v.id
+                """)
+                conn.commit()
+    finally:
+        conn.close()
+    stats.save()
+
+    n_estimated = int(result["drop_pct"].notna().sum())
+    logger.success(
+        f"✓ Voltage drop for {n_estimated:,} of {len(result):,} buildings "
+        f"(median {np.nanmedian(drops) if n_estimated else 0:.2f}%, "
+        f"{int((drops >= LIMIT_PCT).sum()):,} at or above {LIMIT_PCT:g}%)"
+    )
+    return n_estimated
@@ -0,0 +1,49 @@
+"""Tests for svakenett.areas.AreaIndex (containment and nearest-area fallback)"""
+
+import numpy as np
+import shapely
+
+from svakenett.areas import METHOD_CONTAINS, METHOD_NEAREST, AreaIndex
+
+
+def _index() -> AreaIndex:
+    """Area '4630' cut into two pieces, and area '4631' next to it with a 100 m gap."""
+    return AreaIndex.from_geometries(
+        "postal_code",
+        ["4630", "4630", "4631"],
+        [
+            shapely.box(0, 0, 500, 1_000),
+            shapely.box(500, 0, 1_000, 1_000),
+            shapely.box(1_100, 0, 2_000, 1_000),
+        ],
+        srid=25833,
+    )
+
+
+def test_assign_by_containment():
+    codes = _index().assign(np.array([250.0, 500.0, 1_500.0, 1_050.0]), np.array([500.0] * 4))
+
+    assert codes.tolist() == ["4630", "4630", "4631", None]
+
+
+def test_assign_with_fallback_uses_the_nearest_area_within_the_cap():
+    codes, methods, distances = _index().assign_with_fallback(
+        np.array([250.0, 1_030.0, 1_500.0, 5_000.0]),
+        np.array([500.0, 500.0, 1_200.0, 500.0]),
+        1_000.0,
+    )
+
+    assert codes.tolist() == ["4630", "4630", "4631", None]
+    assert methods.tolist() == [METHOD_CONTAINS, METHOD_NEAREST, METHOD_NEAREST, None]
+    np.testing.assert_allclose(distances[:3], [0.0, 30.0, 200.0])
+    assert np.isnan(distances[3])
+
+
+def test_assign_with_fallback_disabled():
+    codes, methods, distances = _index().assign_with_fallback(
+        np.array([1_050.0]), np.array([500.0]), 0
+    )
+
+    assert codes.tolist() == [None]
+    assert methods.tolist() == [None]
+    assert np.isnan(distances[0])
@@ -0,0 +1,38 @@
+"""Tests for svakenett.batches.read_batch_sql"""
+
+import pytest
+
+from svakenett.batches import read_batch_sql
+
+
+def test_read_batch_sql_splits_setup_batch_and_finish(tmp_path):
+    path = tmp_path / "metrics_batch.sql"
+    path.write_text("""
+        \\timing on
+        CREATE UNLOGGED TABLE IF NOT EXISTS staging (id bigint);
+        TRUNCATE staging;
+        -- per batch
+        SELECT id FROM buildings WHERE id BETWEEN %(lo)s AND %(hi)s;
+        DELETE FROM log WHERE building_id >= %(lo)s;
+        UPDATE buildings b SET x = s.x FROM staging s WHERE b.id = s.id;
+        DROP TABLE staging;
+        """)
+    setup, per_batch, finish = read_batch_sql(path)
+
+    assert setup == ["CREATE UNLOGGED TABLE IF NOT EXISTS staging (id bigint)", "TRUNCATE staging"]
+    assert per_batch == [
+        "SELECT id FROM buildings WHERE id BETWEEN %(lo)s AND %(hi)s",
+        "DELETE FROM log WHERE building_id >= %(lo)s",
+    ]
+    assert finish == [
+        "UPDATE buildings b SET x = s.x FROM staging s WHERE b.id = s.id",
+        "DROP TABLE staging",
+    ]
+
+
+def test_read_batch_sql_requires_a_batch_statement(tmp_path):
+    path = tmp_path / "no_batch.sql"
+    path.write_text("UPDATE buildings SET x = 1;\n")
+
+    with pytest.raises(ValueError, match="no statement using"):
+        read_batch_sql(path)
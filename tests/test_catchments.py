@@ -0,0 +1,68 @@
+"""Tests for svakenett.catchments (Voronoi catchments and incremental refresh)"""
+
+import numpy as np
+import pytest
+import shapely
+
+from svakenett.catchments import changed_cells, local_cells, voronoi_cells
+
+EXTENT = (0.0, 0.0, 10_000.0, 10_000.0)
+
+
+def _points(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).uniform(500, 9_500, (n, 2))
+
+
+def test_voronoi_cells_are_aligned_with_their_points():
+    xy = _points(50)
+    cells = voronoi_cells(xy, EXTENT)
+
+    assert len(cells) == len(xy)
+    assert shapely.contains(cells, shapely.points(xy)).all()
+    assert shapely.area(cells).sum() == pytest.approx(10_000.0**2)
+
+
+def test_voronoi_cells_of_a_single_point_is_the_extent():
+    (cell,) = voronoi_cells(np.array([[5.0, 5.0]]), EXTENT)
+
+    assert cell.equals(shapely.box(*EXTENT))
+
+
+def test_local_cells_match_the_full_diagram():
+    xy = _points(200)
+    points = np.array([3, 40, 41, 150])
+
+    local = local_cells(xy, points, EXTENT)
+    full = voronoi_cells(xy, EXTENT)[points]
+
+    assert shapely.equals_exact(shapely.normalize(local), shapely.normalize(full), 1e-6).all()
+
+
+def test_changed_cells_only_touches_neighbours_of_the_change():
+    xy = _points(200)
+    ids = np.arange(1_000, 1_200)
+    new_xy = xy.copy()
+    new_xy[10] += 50.0  # moved
+    keep = np.ones(len(ids), dtype=bool)
+    keep[20] = False  # removed
+
+    rewrite, delete = changed_cells(ids, xy, ids[keep], new_xy[keep])
+
+    assert 0 < len(rewrite) < 40
+    assert np.flatnonzero(ids[keep] == 1_010)[0] in rewrite
+    assert {1_010, 1_020} <= set(delete)
+    # Every cell that differs from the stored one is rewritten
+    before = voronoi_cells(xy, EXTENT)[keep]
+    after = voronoi_cells(new_xy[keep], EXTENT)
+    differ = ~shapely.equals_exact(shapely.normalize(before), shapely.normalize(after), 1e-6)
+    assert set(np.flatnonzero(differ)) <= set(rewrite)
+
+
+def test_changed_cells_without_changes():
+    xy = _points(20)
+    ids = np.arange(20)
+
+    rewrite, delete = changed_cells(ids, xy, ids, xy)
+
+    assert len(rewrite) == 0
+    assert len(delete) == 0
@@ -0,0 +1,64 @@
+"""Tests for the SQL text helpers in svakenett.db"""
+
+from svakenett.db import normalize_sql, read_script, read_statements, split_sql
+
+
+def test_normalize_sql_collapses_case_whitespace_and_comments():
+    a = "SELECT  id,\n  Name -- the name\nFROM Buildings  WHERE x = 1"
+    b = "select id, name from buildings /* filter */ where x = 1"
+
+    assert normalize_sql(a) == normalize_sql(b)
+
+
+def test_normalize_sql_keeps_quoted_text():
+    query = "SELECT 'Mixed  Case' AS a, $$ Body  Text $$ AS b, $t$X  Y$t$ AS c"
+    normalized = normalize_sql(query)
+
+    assert "'Mixed  Case'" in normalized
+    assert "$$ Body  Text $$" in normalized
+    assert "$t$X  Y$t$" in normalized
+    assert normalize_sql("SELECT 'A'") != normalize_sql("SELECT 'a'")
+
+
+def test_split_sql_keeps_semicolons_in_literals_and_function_bodies():
+    sql = """
+        -- comment; not a statement
+        CREATE FUNCTION f() RETURNS trigger AS $$
+        BEGIN
+            NEW.note := 'a;b';
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        SELECT ';' AS s; /* block; comment */
+        DO $body$ BEGIN PERFORM 1; END $body$
+    """
+    statements = split_sql(sql)
+
+    assert len(statements) == 3
+    assert statements[0].startswith("CREATE FUNCTION f()")
+    assert "NEW.note := 'a;b';" in statements[0]
+    assert statements[1] == "SELECT ';' AS s"
+    assert statements[2] == "DO $body$ BEGIN PERFORM 1; END $body$"
+
+
+def test_read_statements_inlines_includes_and_drops_meta_commands(tmp_path):
+    (tmp_path / "included.sql").write_text("CREATE TABLE t (id int);\n")
+    main = tmp_path / "main.sql"
+    main.write_text("\\timing on\n\\echo start\n\\ir included.sql\nINSERT INTO t VALUES (1);\n")
+
+    assert read_statements(main) == ["CREATE TABLE t (id int)", "INSERT INTO t VALUES (1)"]
+
+
+def test_read_script_keeps_echo_texts_in_order(tmp_path):
+    script = tmp_path / "report.sql"
+    script.write_text(
+        "\\echo ''\n\\echo '1. Coverage:'\nSELECT 1;\n\\echo 'it''s' done\nSELECT 2;\n"
+    )
+
+    assert read_script(script) == [
+        ("echo", ""),
+        ("echo", "1. Coverage:"),
+        ("sql", "SELECT 1"),
+        ("echo", "it's done"),
+        ("sql", "SELECT 2"),
+    ]
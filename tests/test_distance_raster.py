@@ -0,0 +1,82 @@
+"""Tests for svakenett.distance_raster (tiled EDT rasters and point queries)"""
+
+import json
+import pickle
+
+import numpy as np
+import pytest
+import shapely
+
+from svakenett.distance_raster import (
+    DistanceRaster,
+    _grid,
+    distance_tiles,
+    rasterize_features,
+)
+
+CELL_M = 10.0
+EXTENT = (0.0, 0.0, 2_000.0, 1_500.0)
+
+
+def _lines() -> np.ndarray:
+    return np.array(
+        [
+            shapely.LineString([(100, 100), (1_900, 100)]),
+            shapely.LineString([(1_000, 700), (1_000, 1_400)]),
+        ]
+    )
+
+
+def _rasters(max_distance_m: float, tile_cells: int) -> tuple[np.ndarray, np.ndarray]:
+    xmin, ymax, n_rows, n_cols = _grid(EXTENT, CELL_M)
+    seeds = rasterize_features(_lines(), xmin, ymax, CELL_M)
+    distance = np.empty((n_rows, n_cols), dtype=np.float32)
+    feature = np.empty((n_rows, n_cols), dtype=np.int32)
+    distance_tiles(seeds, (n_rows, n_cols), CELL_M, max_distance_m, distance, feature, tile_cells)
+    return distance, feature
+
+
+def test_grid_snaps_extent_to_cells():
+    assert _grid((3.0, 7.0, 95.0, 41.0), 10.0) == (0.0, 50.0, 5, 10)
+
+
+def test_tiles_match_a_single_tile():
+    tiled = _rasters(max_distance_m=400.0, tile_cells=16)
+    whole = _rasters(max_distance_m=400.0, tile_cells=1_000)
+
+    np.testing.assert_array_equal(tiled[0], whole[0])
+    np.testing.assert_array_equal(tiled[1], whole[1])
+
+
+def test_cells_beyond_max_distance_have_no_feature():
+    distance, feature = _rasters(max_distance_m=200.0, tile_cells=64)
+
+    assert np.isinf(distance).any()
+    assert (feature[np.isinf(distance)] == -1).all()
+    assert (distance[np.isfinite(distance)] <= 200.0).all()
+
+
+def test_query_reads_distance_and_feature_id(tmp_path):
+    distance, feature = _rasters(max_distance_m=300.0, tile_cells=64)
+    np.save(tmp_path / "line_distance.npy", distance)
+    np.save(tmp_path / "line_feature.npy", feature)
+    np.save(tmp_path / "line_ids.npy", np.array([501, 502], dtype=np.int64))
+    xmin, ymax, n_rows, n_cols = _grid(EXTENT, CELL_M)
+    (tmp_path / "metadata.json").write_text(
+        json.dumps(
+            {"layers": {"line": {"cell_m": CELL_M, "xmin": xmin, "ymax": ymax}}, "srid": 25833}
+        )
+    )
+
+    raster = pickle.loads(pickle.dumps(DistanceRaster(tmp_path)))
+    d, ids = raster.query(
+        "line", np.array([500.0, 1_100.0, 300.0, -50.0]), np.array([150.0, 1_000.0, 900.0, 0.0])
+    )
+
+    assert d[0] == pytest.approx(50.0, abs=CELL_M)
+    assert d[1] == pytest.approx(100.0, abs=CELL_M)
+    assert ids[:2].tolist() == [501, 502]
+    assert np.isinf(d[2]) and ids[2] == -1  # farther than 300 m from both lines
+    assert np.isnan(d[3]) and ids[3] == -1  # outside the grid
+    with pytest.raises(ValueError, match="not built"):
+        raster.query("transformer", 0.0, 0.0)
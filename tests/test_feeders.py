@@ -0,0 +1,25 @@
+"""Tests for svakenett.feeders.union_find"""
+
+import numpy as np
+
+from svakenett.feeders import union_find
+
+
+def test_union_find_labels_components_by_smallest_member():
+    labels = union_find(7, np.array([4, 1, 5, 3]), np.array([3, 2, 6, 1]))
+
+    np.testing.assert_array_equal(labels, [0, 1, 1, 1, 1, 5, 5])
+
+
+def test_union_find_long_chain():
+    n = 1_000
+    order = np.random.default_rng(0).permutation(n)
+    labels = union_find(n, order[:-1], order[1:])
+
+    assert (labels == 0).all()
+
+
+def test_union_find_without_pairs():
+    labels = union_find(3, np.array([], dtype=int), np.array([], dtype=int))
+
+    np.testing.assert_array_equal(labels, [0, 1, 2])
@@ -0,0 +1,31 @@
+"""Tests for svakenett.hexgrid.line_pieces (line length per cell)"""
+
+import numpy as np
+import pytest
+import shapely
+
+from svakenett.hexgrid import line_pieces
+
+
+def test_line_pieces_skip_the_gap_between_parts():
+    lines = np.array(
+        [
+            shapely.MultiLineString([[(0, 0), (100, 0)], [(1_000, 0), (1_100, 0)]]),
+            shapely.LineString([(0, 50), (30, 50)]),
+        ]
+    )
+    midpoints, length_km = line_pieces(lines, segment_m=100)
+
+    assert length_km.sum() == pytest.approx(0.230)
+    assert len(midpoints) == len(length_km)
+    # No piece bridges the 900 m gap
+    assert not ((midpoints[:, 0] > 100) & (midpoints[:, 0] < 1_000)).any()
+
+
+def test_line_pieces_are_at_most_segment_m_long():
+    lines = np.array([shapely.LineString([(0, 0), (1_000, 0), (1_000, 450)])])
+    midpoints, length_km = line_pieces(lines, segment_m=100)
+
+    assert length_km.max() <= 0.1 + 1e-9
+    assert length_km.sum() == pytest.approx(1.45)
+    np.testing.assert_allclose(midpoints[0], [50, 0])
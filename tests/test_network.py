@@ -0,0 +1,66 @@
+"""Tests for svakenett.network (line topology and along-grid distances)"""
+
+import numpy as np
+import pytest
+import shapely
+
+from svakenett.network import build_topology, transformer_distances
+
+
+def _chain():
+    """Three 100 m lines end to end along y = 0, plus a branch from x = 150."""
+    lines = np.array(
+        [
+            shapely.LineString([(0, 0), (100, 0)]),
+            shapely.LineString([(100.5, 0), (200, 0)]),  # 0.5 m digitizing gap
+            shapely.LineString([(200, 0), (300, 0)]),
+            shapely.LineString([(150, 0), (150, 80)]),  # T-junction on line 1
+        ]
+    )
+    return build_topology(lines, np.array([11, 12, 13, 14]))
+
+
+def _node_at(topology, line: int, position: float) -> int:
+    """Node of the break point at position along line."""
+    start, end = topology.line_ptr[line], topology.line_ptr[line + 1]
+    i = start + np.argmin(np.abs(topology.break_pos[start:end] - position))
+    return topology.break_node[i]
+
+
+def test_build_topology_snaps_ends_and_splits_t_junctions():
+    topology = _chain()
+
+    # x = 0, 100, 150, 200, 300 on the main line and the end of the branch
+    assert topology.n_nodes == 6
+    assert _node_at(topology, 0, 100) == _node_at(topology, 1, 0)
+    assert _node_at(topology, 1, 49.5) == _node_at(topology, 3, 0)
+    # Line 1 is split into two pieces at the junction
+    assert topology.line_ptr[2] - topology.line_ptr[1] == 3
+
+
+def test_transformer_distances_along_the_grid():
+    topology = _chain()
+    distances, feeder, on_piece = transformer_distances(
+        topology, np.array([50.0]), np.array([5.0]), np.array([7])
+    )
+
+    assert distances[_node_at(topology, 0, 0)] == pytest.approx(50)
+    assert distances[_node_at(topology, 0, 100)] == pytest.approx(50)
+    assert distances[_node_at(topology, 3, 80)] == pytest.approx(50 + 49.5 + 80)
+    assert distances[_node_at(topology, 2, 100)] == pytest.approx(50 + 99.5 + 100)
+    assert (feeder == 7).all()
+    assert on_piece["transformer_id"].tolist() == [7]
+    assert on_piece["position"].iloc[0] == pytest.approx(50)
+
+
+def test_transformer_distances_nearest_transformer_feeds_each_node():
+    topology = _chain()
+    distances, feeder, _ = transformer_distances(
+        topology, np.array([0.0, 290.0, 5_000.0]), np.array([0.0, 0.0, 0.0]), np.array([1, 2, 3])
+    )
+
+    assert feeder[_node_at(topology, 0, 100)] == 1
+    assert feeder[_node_at(topology, 2, 0)] == 2
+    assert distances[_node_at(topology, 2, 100)] == pytest.approx(10)
+    # The transformer 5 km away is not attached
+    assert 3 not in feeder
@@ -0,0 +1,30 @@
+"""Tests for svakenett.pipeline stage selection"""
+
+import pytest
+
+from svakenett.pipeline import Stage, _select
+
+
+def _stage(name, *depends_on):
+    return Stage(name, ["true"], depends_on=list(depends_on))
+
+
+def test_select_returns_targets_and_upstream_in_pipeline_order():
+    stages = [_stage("a"), _stage("b", "a"), _stage("c", "b"), _stage("d", "a")]
+
+    assert [s.name for s in _select(stages, ["c"])] == ["a", "b", "c"]
+    assert _select(stages, None) == stages
+
+
+def test_select_rejects_undefined_upstream_stage():
+    stages = [_stage("a"), _stage("b", "a", "missing")]
+
+    with pytest.raises(ValueError, match="b -> missing"):
+        _select(stages, None)
+
+
+def test_select_rejects_dependency_cycle():
+    stages = [_stage("a", "c"), _stage("b", "a"), _stage("c", "b"), _stage("d")]
+
+    with pytest.raises(ValueError, match="cycle"):
+        _select(stages, ["d"])
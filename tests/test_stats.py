@@ -0,0 +1,114 @@
+"""Tests for svakenett.stats (t-digest sketches and per-group metric stats)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from svakenett.stats import MetricStats, MetricStatsStore, TDigest
+
+
+def test_tdigest_quantiles_close_to_exact():
+    values = np.random.default_rng(0).lognormal(3, 1, 50_000)
+    digest = TDigest()
+    digest.update(values)
+
+    assert digest.count == len(values)
+    for q in (0.1, 0.5, 0.9, 0.99):
+        estimate = digest.quantile(q, values.min(), values.max())
+        assert estimate == pytest.approx(np.quantile(values, q), rel=0.02)
+
+
+def test_metric_stats_merge_matches_single_pass():
+    values = np.random.default_rng(1).normal(100, 15, 20_000)
+    whole, left, right = MetricStats(), MetricStats(), MetricStats()
+    whole.update(values)
+    left.update(values[:7_000])
+    right.update(values[7_000:])
+    left.merge(right)
+
+    assert left.count == whole.count
+    assert left.mean == pytest.approx(values.mean())
+    assert left.std == pytest.approx(values.std(ddof=1))
+    assert (left.min, left.max) == (values.min(), values.max())
+    assert left.quantile(0.5) == pytest.approx(np.median(values), rel=0.01)
+
+
+def test_metric_stats_ignores_non_finite_values():
+    stats = MetricStats()
+    stats.update([1.0, np.nan, 3.0, np.inf])
+
+    assert stats.count == 2
+    assert stats.mean == 2.0
+
+
+def test_store_summary_and_roll_up():
+    df = pd.DataFrame(
+        {
+            "bygningstype": [111, 111, 121, 121],
+            "kommunenummer": ["4204", "4205", "4204", "4204"],
+            "distance_to_line_m": [10.0, 30.0, 100.0, 300.0],
+        }
+    )
+    store = MetricStatsStore(["distance_to_line_m"], ["bygningstype", "kommunenummer"])
+    store.update(df)
+
+    overall = store.summary("distance_to_line_m")
+    assert overall.loc[0, "count"] == 4
+    assert overall.loc[0, "mean"] == pytest.approx(110.0)
+
+    by_type = store.summary("distance_to_line_m", by=["bygningstype"]).set_index("bygningstype")
+    assert by_type.loc[111, "mean"] == pytest.approx(20.0)
+    assert by_type.loc[121, "max"] == 300.0
+
+
+def test_store_save_load_round_trip(tmp_path):
+    df = pd.DataFrame({"bygningstype": [111, 111, 121], "grid_age_years": [10.0, 20.0, 40.0]})
+    store = MetricStatsStore(["grid_age_years"], ["bygningstype"])
+    store.update(df)
+    store.version = "abc"
+
+    loaded = MetricStatsStore.load(store.save(tmp_path / "stats.json"))
+
+    assert loaded.version == "abc"
+    pd.testing.assert_frame_equal(
+        loaded.summary(by=["bygningstype"]), store.summary(by=["bygningstype"])
+    )
+
+
+def test_store_replace_swaps_only_rewritten_groups():
+    old = pd.DataFrame(
+        {
+            "building_source": ["residential", "residential", "cabin"],
+            "distance_to_line_m": [10.0, 20.0, 500.0],
+            "grid_age_years": [30.0, 40.0, 50.0],
+        }
+    )
+    store = MetricStatsStore(["distance_to_line_m", "grid_age_years"], ["building_source"])
+    store.update(old)
+
+    rewritten = MetricStatsStore(["distance_to_line_m"], ["building_source"])
+    rewritten.update(
+        pd.DataFrame({"building_source": ["residential"] * 2, "distance_to_line_m": [1.0, 3.0]})
+    )
+    store.replace(rewritten, {"building_source": lambda source: source == "residential"})
+
+    distance = store.merged("distance_to_line_m", ["building_source"])
+    assert distance[("residential",)].count == 2
+    assert distance[("residential",)].mean == 2.0
+    assert distance[("cabin",)].mean == 500.0
+    # Metrics the writer did not rewrite keep their sketches
+    assert store.merged("grid_age_years", ["building_source"])[("residential",)].mean == 35.0
+
+
+def test_store_replace_adds_new_metrics():
+    store = MetricStatsStore(["grid_age_years"], ["bygningstype"])
+    store.update(pd.DataFrame({"bygningstype": [111], "grid_age_years": [10.0]}))
+    rewritten = MetricStatsStore(["voltage_drop_pct"], ["bygningstype"])
+    rewritten.update(pd.DataFrame({"bygningstype": [111, 111], "voltage_drop_pct": [2.0, 4.0]}))
+
+    store.replace(rewritten)
+
+    assert store.metrics == ["grid_age_years", "voltage_drop_pct"]
+    assert store.merged("voltage_drop_pct")[()].mean == 3.0
+    with pytest.raises(ValueError, match="Group columns differ"):
+        store.replace(MetricStatsStore(["grid_age_years"], []))
@@ -0,0 +1,62 @@
+"""Tests for svakenett.voltage (tree sums and voltage drop along feeders)"""
+
+import numpy as np
+import pytest
+import shapely
+
+from svakenett.network import build_topology
+from svakenett.voltage import (
+    _TAN_PHI,
+    LV_R_OHM_PER_M,
+    LV_VOLTAGE,
+    LV_X_OHM_PER_M,
+    _path_sum,
+    _subtree_sum,
+    voltage_drops,
+)
+
+# Two trees: 0 <- 1 <- {2, 3} and 4 <- 5
+PARENT = np.array([-1, 0, 1, 1, -1, 4])
+VALUES = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+
+def test_path_sum_adds_everything_up_to_the_root():
+    np.testing.assert_array_equal(_path_sum(VALUES, PARENT), [1, 3, 6, 7, 5, 11])
+
+
+def test_subtree_sum_adds_everything_below():
+    np.testing.assert_array_equal(_subtree_sum(VALUES, PARENT), [10, 9, 3, 4, 11, 6])
+
+
+def test_voltage_drops_on_a_two_line_feeder():
+    lines = np.array(
+        [
+            shapely.LineString([(0, 0), (1_000, 0)]),
+            shapely.LineString([(1_000, 0), (2_000, 0)]),
+            shapely.LineString([(5_000, 5_000), (6_000, 5_000)]),  # no transformer
+        ]
+    )
+    topology = build_topology(lines, np.array([1, 2, 3]))
+    r, x, kv = 0.6e-3, 0.38e-3, 22.0
+    load_kw = np.array([100.0, 100.0, 100.0, 100.0])
+
+    drops = voltage_drops(
+        topology,
+        np.full(3, r),
+        np.full(3, x),
+        np.full(3, kv),
+        np.array([[0.0, 0.0]]),
+        np.array([[1_000.0, 10.0], [2_000.0, 0.0], [5_500.0, 0.0], [1_000.0, 5_000.0]]),
+        load_kw,
+        max_attach_m=500.0,
+    )
+
+    # dU% = 100 * length * (R + X tan phi) * P / U^2 per edge, P = load downstream
+    per_w_m = 100 * (r + x * _TAN_PHI) / (kv * 1000) ** 2
+    first = per_w_m * 1_000 * 200_000
+    second = per_w_m * 1_000 * 100_000
+    service = 100 * 10 * (LV_R_OHM_PER_M + LV_X_OHM_PER_M * _TAN_PHI) * 100_000 / LV_VOLTAGE**2
+    assert drops[0] == pytest.approx(first + service, rel=1e-4)
+    assert drops[1] == pytest.approx(first + second, rel=1e-4)
+    assert np.isnan(drops[2])  # on a line no transformer feeds
+    assert np.isnan(drops[3])  # farther than max_attach_m from every line